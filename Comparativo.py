@@ -1,5 +1,4 @@
 import re
-import matplotlib.pyplot as plt
 import statistics
 import os
 
@@ -159,6 +158,8 @@ def summarize_chart(nps):
 
 def plot_comparison(file1, file2, level_index=1):
     """Compara dois charts com validação e informações detalhadas"""
+    # Importado aqui para que parse_sm/beats_to_seconds possam ser usados sem matplotlib
+    import matplotlib.pyplot as plt
     
     print("=== COMPARADOR DE CHARTS STEPMANIA ===")
     print(f"📁 Arquivo 1: {os.path.basename(file1)}")
@@ -8,6 +8,9 @@ from pathlib import Path
 from datetime import datetime
 import getpass
 
+from api_config import get_artifact_config
+from artifact_store import make_run_id, put_artifact, apply_retention
+
 # ======= CONFIGURAÇÕES - MODIFIQUE AQUI =======
 SONG_FOLDER = r"C:\Games\Etterna\Songs\Loca"
 SM_FILENAME = "Stepchart.sm"
@@ -40,16 +43,15 @@ def create_ai_responses_folder():
     return folder_path
 
 def save_ai_response(response_content, folder_path):
-    """Salva a resposta da AI em um arquivo na pasta criada"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"ai_response_{timestamp}.txt"
-    filepath = os.path.join(folder_path, filename)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(response_content)
-    
-    print(f"Resposta da AI salva em: {filepath}")
-    return filepath
+    """Salva a resposta da AI no armazenamento de artefatos da pasta (comprimida, sem duplicatas)"""
+    cfg = get_artifact_config()
+    run_id = make_run_id()
+    stored = put_artifact(folder_path, run_id, "response", response_content, cfg["compression"],
+                          meta={"user": USERNAME})
+    apply_retention(folder_path, cfg["keep_runs"], cfg["max_age_days"], cfg["max_bytes"])
+    
+    print(f"Resposta da AI salva em: {stored['path']} (execução {run_id})")
+    return stored["path"]
 
 def rename_latest_replay_file():
     """Renomeia o último arquivo de replay com nome do usuário e timestamp"""
@@ -11,25 +11,56 @@ Modules:
 Author: Generated for StepMania Analysis
 """
 
+from __future__ import annotations
+
 # import matplotlib.pyplot as plt
-import pandas as pd
 import json
-import requests
 import os
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+
+# pandas, numpy, requests e asyncio são importados só nos caminhos que os
+# usam: comandos como "config", "artifacts" e "telemetry" não pagam por eles
+# (ver benchmark_imports.py)
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Importa nossos módulos customizados
-from replay_extractor import (
-    get_latest_replay_data, 
-    parse_replay_data, 
-    analyze_performance
-)
 from chart_extractor import (
     parse_sm_difficulties,
     choose_difficulty,
     extract_chart_data,
     count_steps_by_track,
     save_modified_chart,
-    read_file_with_encoding
+    read_file_with_encoding,
+    split_measures,
+    join_measures
+)
+from ai_cache import make_cache_key, cache_get, cache_put, cache_stats, clear_cache
+from rate_limiter import get_rate_limiter, estimate_payload_tokens
+from chart_scanner import IncrementalChartScanner, scan_chart_blocks, pick_chart_block
+from chart_encoding import ENCODING_LEGEND, encode_chart, decode_chart_response
+from token_budget import estimate_prompt_tokens, estimate_completion_tokens, plan_token_budget
+from chart_validator import validate_chart, repair_chart, repair_measures
+from stats_payload import build_stats_payload
+from single_flight import single_flight, in_flight_count
+from artifact_store import (
+    begin_artifact_run,
+    save_run_artifact,
+    end_artifact_run,
+    get_artifact,
+    list_runs
+)
+from run_trace import start_run, finish_run, trace_stage, trace_span, trace_annotate, trace_event
+from telemetry import (
+    record_provider_call,
+    record_validation,
+    track_calls,
+    select_model,
+    print_telemetry_report
 )
 
 
@@ -45,19 +76,65 @@ SM_FILE_PATH = os.path.join(SONG_FOLDER, SM_FILENAME)
 
 # ======= CONFIGURAÇÃO DA API =======
 FORCE_API_CALL = True  # Mude para False para usar arquivo local
+USE_AI_CACHE = True  # Mude para False para sempre chamar a API (ignora o cache de respostas)
+HEDGED_GENERATION = False  # True: envia para várias APIs ao mesmo tempo e usa a primeira resposta válida
+HEDGED_APIS = []  # APIs do modo hedged (vazio = HEDGED_APIS do .env ou todas com chave válida)
+STREAM_GENERATION = False  # True: recebe a resposta em streaming e aborta cedo se o chart vier malformado
+CHUNKED_GENERATION = False  # True: gera charts longos em partes paralelas (liga sozinho acima de CHUNK_AUTO_ROWS)
+LOCAL_GENERATION = False  # True: gera o chart com o simplificador local (sem IA, offline e instantâneo)
+CHART_VARIANT = "primary"  # "primary" (regras pela acurácia), "easier" (um nível mais fácil) ou "harder" (um nível mais difícil)
+SPECULATIVE_GENERATION = False  # True: depois da resposta, gera em segundo plano as variantes vizinhas no cache
 # ===============================================
 
+
+@dataclass(frozen=True)
+class RunOptions:
+    """
+    Opções de uma execução, com as constantes acima como padrão.
+    
+    Imutáveis e passadas explicitamente (main, lote, geração especulativa):
+    os comandos da linha de comando criam uma cópia com replace() em vez de
+    alterar as constantes do módulo.
+    
+    Example:
+        >>> main(replace(RunOptions(), stream=True))
+    """
+    force_api_call: bool = FORCE_API_CALL
+    use_cache: bool = USE_AI_CACHE
+    hedged: bool = HEDGED_GENERATION
+    hedged_apis: tuple = tuple(HEDGED_APIS)
+    stream: bool = STREAM_GENERATION
+    chunked: bool = CHUNKED_GENERATION
+    local: bool = LOCAL_GENERATION
+    variant: str = CHART_VARIANT
+    speculative: bool = SPECULATIVE_GENERATION
+
 # ======= CONFIGURAÇÕES DA API =======
 # Importa configurações do arquivo separado
 try:
     from api_config import (
         API_CONFIG, 
         get_api_config,
+        resolve_provider_config,
+        get_configured_apis,
+        get_hedge_config,
+        get_stream_config,
+        get_prompt_config,
+        get_chunk_config,
+        get_model_limits,
+        get_token_budget_config,
+        get_batch_config,
+        get_trace_config,
+        get_telemetry_config,
+        get_artifact_config,
+        get_single_flight_config,
+        get_speculative_config,
         get_available_models, 
         get_active_api, 
         get_available_apis,
         set_active_api,
         set_model,
+        get_cache_config,
         show_config as show_api_config_detailed
     )
 except ImportError:
@@ -73,7 +150,7 @@ except ImportError:
     print("⚠️ Arquivo api_config.py não encontrado, usando configurações padrão")
     
     # Funções fallback
-    def get_available_models():
+    def get_available_models(api_name=None):
         return {"deepseek-chat": "Modelo padrão"}
     def get_active_api():
         return "deepseek"
@@ -87,6 +164,44 @@ except ImportError:
         return False
     def show_api_config_detailed():
         print("⚠️ Função não disponível sem api_config.py")
+    def get_cache_config():
+        return {"enabled": True, "dir": ".ai_cache", "max_bytes": 50 * 1024 * 1024}
+    def get_api_config(api_name=None):
+        return API_CONFIG.copy()
+    def resolve_provider_config(api_name=None, model=None):
+        from types import SimpleNamespace
+        return SimpleNamespace(api="deepseek", **dict(API_CONFIG, model=model or API_CONFIG["model"]))
+    def get_configured_apis():
+        return ["deepseek"]
+    def get_hedge_config():
+        return {"enabled": False, "apis": [], "delay": 0.0}
+    def get_stream_config():
+        return {"enabled": False}
+    def get_prompt_config():
+        return {"chart_encoding": "raw"}
+    def get_chunk_config():
+        return {"enabled": False, "auto_rows": 800, "measures_per_chunk": 32,
+                "overlap": 2, "concurrency": 4, "max_attempts": 2}
+    def get_model_limits(model_name):
+        return {"context": 16000, "max_output": API_CONFIG["max_tokens"]}
+    def get_token_budget_config():
+        return {"enabled": False, "margin": 1.25, "min_tokens": 512, "allow_model_switch": False}
+    def get_batch_config():
+        return {"workers": 2, "concurrency": 4, "results_file": "batch_results.jsonl",
+                "skip_existing": False, "duplicate_threshold": 0.8}
+    def get_trace_config():
+        return {"enabled": False, "dir": ".traces", "keep": 50}
+    def get_telemetry_config():
+        return {"enabled": False, "db": ".telemetry.sqlite3", "auto_select": False,
+                "min_validity": 0.9, "min_samples": 5}
+    def get_artifact_config():
+        return {"enabled": False, "dir": ".artifacts", "compression": "gzip", "keep_runs": 100,
+                "max_age_days": 30, "max_bytes": 200 * 1024 * 1024}
+    def get_single_flight_config():
+        return {"enabled": False, "cross_process": False, "dir": ".inflight",
+                "wait_timeout": 900, "stale_seconds": 30}
+    def get_speculative_config():
+        return {"enabled": False, "variants": ["easier", "harder"], "max_wait": 600}
 # ===============================================
 
 # ======= PROMPT PARA IA - MODIFICAR AQUI =======
@@ -98,7 +213,9 @@ a partir do desempenho observado.
 Contexto:
 - Você receberá:
   - original_sm_file: texto completo do arquivo .sm original.
-  - stats: lista com estatísticas de performance por nota/trilha (tracks 0=←, 1=↓, 2=↑, 3=→) e julgamentos.
+  - stats: resumo da performance: overall_accuracy e lane_accuracy (W1+W2, 0-1, trilhas na ordem de "lanes": \
+0=←, 1=↓, 2=↑, 3=→), lane_histogram (contagem de cada julgamento de "judgments" por trilha) e, quando \
+disponível, measure_errors (erros abaixo de W2 em cada medida, a partir da medida measure_offset; 0 = primeira).
 - O objetivo é gerar um novo "corpo de notas" (apenas a parte de notas) da mesma música e duração, adequado ao nível \
 do jogador.
 
@@ -142,6 +259,38 @@ Saída:
 ;
 ```
 - Fora do bloco você pode listar 3–5 mudanças principais (opcional), mas o bloco deve vir primeiro."""
+
+# Substitui o formato de saída quando o chart é enviado codificado (CHART_ENCODING=compact)
+COMPACT_OUTPUT_INSTRUCTIONS = """Formato compacto (substitui o formato de saída acima):
+- O chart original foi enviado em "original_chart" no formato descrito em "chart_encoding".
+- Responda com UM bloco de código no MESMO formato: uma linha por medida, na mesma ordem e com o mesmo \
+número de medidas do original.
+- Cada linha é "N|tokens" (N = linhas da medida no .sm; os tokens devem preencher R posições, com R \
+dividindo N) ou "@k" para repetir a medida k.
+- Exemplo: "16|1000 .3 0100 .3" são 16 linhas com notas na 1ª e na 9ª; "4|." é uma medida vazia.
+- Não escreva linhas 0000 soltas nem vírgulas entre medidas."""
+
+# Acrescentado quando o chart é gerado em partes (charts longos)
+CHUNK_INSTRUCTIONS = """Geração em partes:
+- Você está recebendo apenas UM TRECHO do chart (ver "chunk"); gere somente este trecho.
+- "context_before" traz as medidas imediatamente anteriores, só para manter a continuidade do groove: \
+NÃO as inclua na resposta.
+- A resposta deve ter EXATAMENTE o número de medidas indicado em "chunk"."""
+
+# Degraus de dificuldade das variantes: as regras pedagógicas acima escolhem
+# o degrau 1 (acurácia <= 85%) ou o 3 (> 85%); "easier"/"harder" pedem o
+# degrau vizinho. None = as regras acima valem como estão.
+VARIANT_LEVELS = (
+    """Variante pedida (substitui a regra dos 85%): versão BEM MAIS FÁCIL. Reduza a densidade em até 30%, \
+remova jacks, trêmulos e alternâncias rápidas e deixe as notas restantes nos tempos fortes.""",
+    None,
+    """Variante pedida (substitui a regra dos 85%): versão de CONSOLIDAÇÃO. Mantenha a densidade do original \
+(±5%): apenas troque padrões difíceis (jacks, alternâncias rápidas) por equivalentes mais legíveis, \
+principalmente nas trilhas com pior acurácia.""",
+    None,
+    """Variante pedida (substitui a regra dos 85%): versão BEM MAIS DIFÍCIL. Aumente a densidade em até 25%, \
+com alternâncias controladas e notas extras nas trilhas com melhor acurácia, sem jacks longos."""
+)
 # ===============================================
 
 
@@ -191,6 +340,8 @@ def generate_performance_report(performance_stats: pd.DataFrame, step_counts: di
         >>> generate_performance_report(stats_df, {0: 10, 1: 12, 2: 8, 3: 15})
         # Imprime relatório detalhado
     """
+    import pandas as pd
+    
     track_names = {
         0: "Seta Esquerda",
         1: "Seta Baixo",
@@ -216,13 +367,223 @@ def generate_performance_report(performance_stats: pd.DataFrame, step_counts: di
     print(performance_stats.sort_values(['track', 'judgment']))
 
 
-def call_ai_for_chart_improvement(chart_data: str, performance_stats: pd.DataFrame) -> str:
+def variant_instructions(variant: str, accuracy: float) -> str:
+    """
+    Retorna as instruções extras de uma variante de dificuldade.
+    
+    Args:
+        variant (str): "primary", "easier" ou "harder"
+        accuracy (float): Acurácia geral (W1 + W2) do jogador, de 0 a 1
+        
+    Returns:
+        str: Instruções a acrescentar ao prompt ("" para a variante primária)
+        
+    Example:
+        >>> variant_instructions("harder", 0.72)[:40]
+        'Variante pedida (substitui a regra dos 8'
+    """
+    from local_generator import ACCURACY_THRESHOLD
+    
+    offsets = {"primary": 0, "easier": -1, "harder": 1}
+    if variant not in offsets:
+        raise ValueError(f"Variante inválida: '{variant}' (use primary, easier ou harder)")
+    level = (1 if accuracy <= ACCURACY_THRESHOLD else 3) + offsets[variant]
+    return VARIANT_LEVELS[level] or ""
+
+
+def build_ai_request_content(chart_data: str, performance_stats: pd.DataFrame,
+                             chunk: dict = None, variant: str = None) -> str:
+    """
+    Monta o conteúdo (JSON) enviado à IA com chart, estatísticas e instruções.
+    
+    Args:
+        chart_data (str): Dados do chart original (ou do trecho, na geração em partes)
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        chunk (dict, optional): Descrição do trecho na geração em partes
+            (chaves "description", "context_chart" e "measure_range")
+        variant (str, optional): Variante de dificuldade (padrão: CHART_VARIANT)
+        
+    Returns:
+        str: Conteúdo da mensagem do usuário (JSON compacto)
+    """
+    stats = build_stats_payload(performance_stats, chunk.get("measure_range") if chunk else None)
+    compact = get_prompt_config()["chart_encoding"] == "compact"
+    instructions = PROMPT_INSTRUCTIONS
+    extra = variant_instructions(variant or CHART_VARIANT, stats["overall_accuracy"])
+    if extra:
+        instructions += "\n\n" + extra
+    if compact:
+        instructions += "\n\n" + COMPACT_OUTPUT_INSTRUCTIONS
+        data = {
+            "chart_encoding": ENCODING_LEGEND,
+            "original_chart": encode_chart(chart_data)
+        }
+    else:
+        data = {
+            "original_sm_file": chart_data
+        }
+    
+    if chunk:
+        instructions += "\n\n" + CHUNK_INSTRUCTIONS
+        data["chunk"] = chunk["description"]
+        context_chart = chunk.get("context_chart", "")
+        data["context_before"] = encode_chart(context_chart) if (compact and context_chart) else context_chart
+    
+    data["stats"] = stats
+    data["instructions"] = instructions
+    # Sem indentação e sem escapes \uXXXX: menos tokens no prompt
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def extract_generated_chart(full_response: str) -> str:
+    """
+    Extrai o chart da resposta da IA em qualquer um dos formatos de prompt.
+    
+    Com CHART_ENCODING=compact tenta primeiro decodificar o formato
+    compacto; se não houver chart codificado, cai na extração normal
+    (linhas 0000).
+    
+    Args:
+        full_response (str): Resposta completa da IA
+        
+    Returns:
+        str: Chart no formato SM, ou string vazia se não encontrado
+    """
+    if get_prompt_config()["chart_encoding"] == "compact":
+        decoded = decode_chart_response(full_response)
+        if decoded:
+            print(f"✅ Chart compacto decodificado: {len(decoded.splitlines())} linhas")
+            return decoded
+        print("⚠️ Nenhum chart compacto na resposta, tentando formato de linhas")
+    return extract_chart_from_ai_response(full_response)
+
+
+def is_valid_generated_chart(generated_chart: str, original_chart: str) -> bool:
+    """
+    Verifica se o chart extraído da resposta tem a estrutura do original.
+    
+    Defeitos triviais (reparáveis por chart_validator.repair_chart) não
+    invalidam a resposta: o reparo é feito antes de salvar.
+    
+    Args:
+        generated_chart (str): Chart extraído da resposta da IA
+        original_chart (str): Chart original
+        
+    Returns:
+        bool: True se o chart é válido ou reparável
+    """
+    if not generated_chart:
+        return False
+    repaired, _ = repair_chart(generated_chart, original_chart)
+    return bool(repaired)
+
+
+def _store_cached_response(cache_cfg: dict, cache_key: str, content: str,
+                           api_name: str, model: str) -> None:
+    """Grava a resposta no cache sem deixar falhas de disco interromperem o pipeline"""
+    try:
+        cache_put(cache_cfg["dir"], cache_key, content, cache_cfg["max_bytes"],
+                  metadata={"api": api_name, "model": model})
+        print(f"💾 Resposta guardada no cache ({cache_key[:12]}...)")
+    except OSError as e:
+        print(f"⚠️ Não foi possível gravar no cache: {e}")
+
+
+def plan_request_budget(chart_data: str, data_json: str, provider=None) -> dict:
+    """
+    Estima os tokens da requisição e planeja max_tokens/estratégia (ver token_budget.py).
+    
+    Args:
+        chart_data (str): Chart enviado na requisição (inteiro ou a parte)
+        data_json (str): Conteúdo já montado da mensagem
+        provider (ProviderConfig, optional): API e modelo usados (padrão:
+            seleção atual, ver resolve_provider_config)
+        
+    Returns:
+        dict: Plano com strategy, model, max_tokens e estimativas,
+            ou None se o orçamento adaptativo estiver desligado
+    """
+    budget_cfg = get_token_budget_config()
+    if not budget_cfg["enabled"]:
+        return None
+    
+    provider = provider or resolve_provider_config()
+    model = provider.model
+    alternatives = None
+    if budget_cfg["allow_model_switch"]:
+        alternatives = {name: get_model_limits(name) for name in get_available_models(provider.api)}
+    
+    plan = plan_token_budget(
+        estimate_prompt_tokens(data_json),
+        estimate_completion_tokens(chart_data, get_prompt_config()["chart_encoding"]),
+        model,
+        get_model_limits(model),
+        margin=budget_cfg["margin"],
+        min_tokens=budget_cfg["min_tokens"],
+        alternatives=alternatives,
+        total_measures=len(split_measures(chart_data))
+    )
+    print(f"🧮 Tokens estimados: prompt ~{plan['prompt_tokens']}, resposta ~{plan['completion_tokens']} "
+          f"-> max_tokens {plan['max_tokens']} ({plan['strategy']})")
+    return plan
+
+
+def choose_model_for_request(data_json: str, provider=None):
+    """
+    Escolhe API e modelo da requisição pela telemetria (se MODEL_AUTO_SELECT).
+    
+    Considera os modelos de todas as APIs com chave configurada; sem
+    histórico suficiente para charts desse tamanho, mantém o provedor
+    recebido.
+    
+    Args:
+        data_json (str): Conteúdo já montado da mensagem
+        provider (ProviderConfig, optional): Provedor padrão da requisição
+            (padrão: seleção atual)
+        
+    Returns:
+        ProviderConfig: Provedor da requisição
+        
+    Example:
+        >>> provider = choose_model_for_request(data_json)
+    """
+    default = provider or resolve_provider_config()
+    if not get_telemetry_config()["auto_select"]:
+        return default
+    
+    candidates = [(api_name, model) for api_name in get_configured_apis()
+                  for model in get_available_models(api_name)]
+    prompt_tokens = estimate_prompt_tokens(data_json)
+    choice = select_model(prompt_tokens, candidates)
+    if not choice:
+        print(f"📊 Telemetria sem histórico suficiente para prompts de ~{prompt_tokens} tokens, "
+              f"usando {default.api}/{default.model}")
+        return default
+    print(f"📊 Modelo escolhido pela telemetria: {choice['api']}/{choice['model']} "
+          f"(p95 {choice['p95']:.1f}s, {choice['validity']:.0%} válidos em {choice['judged']} chamadas)")
+    return resolve_provider_config(choice["api"], choice["model"])
+
+
+def call_ai_for_chart_improvement(chart_data: str, performance_stats: pd.DataFrame,
+                                  use_cache: bool = None, variant: str = None,
+                                  provider=None) -> str:
     """
     Chama API de IA para gerar versão melhorada do chart baseado na performance.
     
+    Respostas de requisições idênticas são servidas do cache em disco
+    (ver ai_cache.py), sem custo de tokens nem latência de rede. O
+    max_tokens é dimensionado pelo tamanho do chart; se a resposta não
+    couber no modelo, usa outro modelo da API (se permitido) ou a geração
+    em partes. Com MODEL_AUTO_SELECT, o modelo vem da telemetria.
+    Chamadas idênticas simultâneas (watch, lote e execução manual) esperam
+    a primeira em vez de chamar a API de novo (ver single_flight.py).
+    
     Args:
         chart_data (str): Dados do chart original
         performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        use_cache (bool, optional): Sobrescreve USE_AI_CACHE para esta chamada
+        variant (str, optional): Variante de dificuldade (padrão: CHART_VARIANT)
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
         
     Returns:
         str: Resposta completa da IA com análise e chart modificado
@@ -234,101 +595,111 @@ def call_ai_for_chart_improvement(chart_data: str, performance_stats: pd.DataFra
         >>> response = call_ai_for_chart_improvement(chart, stats)
         >>> print("IA respondeu com sucesso")
     """
-    stats_dict = performance_stats.to_dict(orient="records")
+    data_json = build_ai_request_content(chart_data, performance_stats, variant=variant)
+    provider = choose_model_for_request(data_json, provider)
     
-    # Usa configurações globais da API (sempre atualizadas)
-    cfg = get_api_config()
-    API_URL = cfg["url"]
-    API_KEY = cfg["key"]
-    MODEL = cfg["model"]
-    TIMEOUT = cfg["timeout"]
-    TEMPERATURE = cfg["temperature"]
+    def generate() -> str:
+        return _generate_chart_improvement(chart_data, performance_stats, data_json,
+                                           provider, use_cache, variant)
     
-    # Determina tokens (unificado)
-    try:
-        active_api = get_active_api()
-        if active_api == "openai":
-            # OpenAI pode requerer max_completion_tokens para alguns modelos
-            MAX_TOKENS = cfg.get("max_completion_tokens", cfg.get("max_tokens", 4000))
-            tokens_param = "max_completion_tokens"
-        else:
-            MAX_TOKENS = cfg.get("max_tokens", 4000)
-            tokens_param = "max_tokens"
-    except:
-        MAX_TOKENS = cfg.get("max_tokens", cfg.get("max_completion_tokens", 4000))
-        tokens_param = "max_tokens"
-    
-    # Dados para enviar para a IA
-    data = {
-        "original_sm_file": chart_data,
-        "stats": stats_dict,
-        "instructions": PROMPT_INSTRUCTIONS
-    }
+    flight_cfg = get_single_flight_config()
+    if not flight_cfg["enabled"]:
+        return generate()
+    flight_key = make_cache_key(provider.api, {"model": provider.model, "content": data_json})
+    with trace_span("single_flight", key=flight_key[:12]):
+        return single_flight(flight_key, generate,
+                             lock_dir=flight_cfg["dir"] if flight_cfg["cross_process"] else None,
+                             wait_timeout=flight_cfg["wait_timeout"],
+                             stale_seconds=flight_cfg["stale_seconds"])
+
+
+def _generate_chart_improvement(chart_data: str, performance_stats: pd.DataFrame, data_json: str,
+                                provider, use_cache: bool = None, variant: str = None) -> str:
+    """Gera a resposta de call_ai_for_chart_improvement (sem a deduplicação)"""
+    plan = plan_request_budget(chart_data, data_json, provider)
+    if not plan:
+        return request_ai_completion(data_json, use_cache=use_cache, provider=provider)
+    
+    if plan["strategy"] == "chunked":
+        print(f"🧩 Chart não cabe em uma resposta de {plan['model']}, gerando em partes")
+        return call_ai_chunked(chart_data, performance_stats, use_cache=use_cache,
+                               measures_per_chunk=plan["measures_per_chunk"], variant=variant,
+                               provider=provider)
+    if plan["strategy"] == "switch_model":
+        print(f"🔀 Chart não cabe no modelo configurado, usando {plan['model']}")
+    return request_ai_completion(data_json, use_cache=use_cache, max_tokens=plan["max_tokens"],
+                                 provider=provider.with_model(plan["model"]))
+
+
+def request_ai_completion(data_json: str, use_cache: bool = None, max_tokens: int = None,
+                          provider=None, mode: str = "normal") -> str:
+    """
+    Envia um conteúdo já montado à API, passando pelo cache de respostas.
+    
+    Args:
+        data_json (str): Conteúdo da mensagem (ver build_ai_request_content)
+        use_cache (bool, optional): Sobrescreve USE_AI_CACHE para esta chamada
+        max_tokens (int, optional): Sobrescreve o limite de tokens da configuração
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
+        mode (str): Modo registrado na telemetria ("normal" ou "chunk")
+        
+    Returns:
+        str: Resposta completa da IA
+        
+    Raises:
+        requests.RequestException: Se houver erro na chamada da API
+    """
+    import requests
+    from ai_providers import (
+        build_provider_request, parse_provider_response, post_with_retry, response_usage
+    )
     
-    data_json = json.dumps(data, indent=2)
+    # Configuração resolvida uma vez para esta requisição (imutável)
+    provider = provider or resolve_provider_config()
+    active_api = provider.api
+    API_URL = provider.url
+    MODEL = provider.model
+    TIMEOUT = provider.timeout
+    TEMPERATURE = provider.temperature
     
     print("🚀 Enviando dados para IA...")
     print(f"📊 Tamanho dos dados: {len(data_json)} caracteres")
     print(f"🔗 API URL: {API_URL}")
     print(f"🤖 Modelo: {MODEL}")
     print(f"⏱️ Timeout: {TIMEOUT}s")
-    print(f"📝 Max Tokens: {MAX_TOKENS}")
     print(f"🌡️ Temperature: {TEMPERATURE}")
     
     try:
-        print("📡 Iniciando requisição POST...")
+        # Prepara payload e headers no formato do provedor
+        API_URL, request_payload, headers = build_provider_request(provider, data_json, max_tokens)
+        MAX_TOKENS = request_payload.get("max_tokens", request_payload.get("max_completion_tokens"))
         print(f"📝 Max Tokens: {MAX_TOKENS}")
-        print(f"📝 API_URL: {API_URL}")
-        print(f"Model: {MODEL}")
-        
-        # Prepara payload e headers
-        if active_api == "claude":
-            request_payload = {
-                "model": MODEL,
-                "max_tokens": MAX_TOKENS,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": data_json}
-                        ]
-                    }
-                ]
-            }
-            # Temperature opcional para Claude
-            request_payload["temperature"] = TEMPERATURE
-            headers = {
-                "x-api-key": API_KEY,
-                "anthropic-version": "2023-06-01",
-                "Content-Type": "application/json"
-            }
-        else:
-            request_payload = {
-                "model": MODEL,
-                "messages": [{"role": "user", "content": data_json}]
-            }
-            # Adiciona o parâmetro correto de tokens
-            request_payload[tokens_param] = MAX_TOKENS
-            
-            # Adiciona temperature apenas se o modelo suportar
-            if active_api == "openai" and MODEL in ["gpt-5", "gpt-4o"]:
-                # GPT-5 e GPT-4o só suportam temperature padrão (1)
-                print("⚠️ Modelo OpenAI não suporta temperature customizada, usando padrão (1.0)")
-            else:
-                request_payload["temperature"] = TEMPERATURE
-            
-            headers = {
-                "Authorization": f"Bearer {API_KEY}",
-                "Content-Type": "application/json"
-            }
+        if "temperature" not in request_payload:
+            print("⚠️ Modelo OpenAI não suporta temperature customizada, usando padrão (1.0)")
         
-        # Faz a requisição com timeout
-        response = requests.post(
-            API_URL,
-            json=request_payload,
-            headers=headers,
-            timeout=TIMEOUT
-        )
+        save_run_artifact("request", data_json, api=active_api, model=MODEL)
+        
+        # Consulta o cache antes de pagar por uma nova chamada
+        cache_cfg = get_cache_config()
+        if use_cache is None:
+            use_cache = USE_AI_CACHE
+        use_cache = use_cache and cache_cfg["enabled"]
+        cache_key = make_cache_key(active_api, {"url": API_URL, "payload": request_payload})
+        if use_cache:
+            cached = cache_get(cache_cfg["dir"], cache_key)
+            trace_event("cache", hit=bool(cached), key=cache_key[:12])
+            if cached:
+                print(f"⚡ Resposta servida do cache ({cache_key[:12]}...): {len(cached)} caracteres")
+                return cached
+            print(f"🗃️ Cache miss ({cache_key[:12]}...), chamando a API")
+        
+        print("📡 Iniciando requisição POST...")
+        
+        # Faz a requisição pela sessão keep-alive do host, com limite de taxa e retry/backoff
+        started = time.monotonic()
+        response = post_with_retry(API_URL, request_payload, headers, read_timeout=TIMEOUT,
+                                   rate_limiter=get_rate_limiter(active_api, MODEL, API_URL),
+                                   tokens=estimate_payload_tokens(request_payload))
         
         print(f"📡 Status Code: {response.status_code}")
         print(f"📋 Response Headers: {dict(response.headers)}")
@@ -337,41 +708,36 @@ def call_ai_for_chart_improvement(chart_data: str, performance_stats: pd.DataFra
         if response.status_code == 200:
             print("✅ Resposta 200 recebida, processando...")
             response_data = response.json()
-            if active_api == "claude":
-                try:
-                    parts = response_data.get("content", [])
-                    texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
-                    content = "\n".join([t for t in texts if t])
-                except Exception:
-                    content = ""
-                if content:
-                    print(f"✅ Resposta da IA recebida: {len(content)} caracteres")
-                    return content
-                print("⚠️ Resposta da IA (Claude) sem conteúdo de texto utilizável")
-                print(f"📄 Resposta completa: {response_data}")
-                raise requests.RequestException("Resposta da IA inválida (Claude)")
-            else:
-                if "choices" in response_data and len(response_data["choices"]) > 0:
-                    content = response_data["choices"][0]["message"]["content"]
-                    print(f"✅ Resposta da IA recebida: {len(content)} caracteres")
-                    return content
-                else:
-                    print("⚠️ Resposta da IA não contém choices válidos")
-                    print(f"📄 Resposta completa: {response_data}")
-                    raise requests.RequestException("Resposta da IA inválida")
+            content = parse_provider_response(active_api, response_data)
+            usage = response_usage(active_api, response_data)
+            trace_annotate(api=active_api, model=MODEL, **usage)
+            record_provider_call(active_api, MODEL, started, data_json, usage, content,
+                                 error=None if content else "sem conteúdo", mode=mode)
+            if content:
+                print(f"✅ Resposta da IA recebida: {len(content)} caracteres")
+                if use_cache:
+                    _store_cached_response(cache_cfg, cache_key, content, active_api, MODEL)
+                return content
+            print(f"⚠️ Resposta da IA ({active_api}) sem conteúdo de texto utilizável")
+            print(f"📄 Resposta completa: {response_data}")
+            raise requests.RequestException(f"Resposta da IA inválida ({active_api})")
         else:
             print(f"❌ Erro na API: {response.status_code}")
             print(f"📄 Resposta de erro: {response.text}")
+            record_provider_call(active_api, MODEL, started, data_json,
+                                 error=f"HTTP {response.status_code}", mode=mode)
             raise requests.RequestException(f"API Error {response.status_code}: {response.text}")
             
     except requests.exceptions.Timeout:
         print("⏰ Timeout na requisição da API")
+        record_provider_call(active_api, MODEL, started, data_json, error="Timeout", mode=mode)
         raise requests.RequestException("Timeout na requisição da API")
     except requests.exceptions.SSLError as e:
         print(f"🔒 Erro SSL: {e}")
         raise requests.RequestException(f"Erro SSL: {e}")
     except requests.exceptions.ConnectionError:
         print("🌐 Erro de conexão com a API")
+        record_provider_call(active_api, MODEL, started, data_json, error="ConnectionError", mode=mode)
         raise requests.RequestException("Erro de conexão com a API")
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro na requisição: {e}")
@@ -383,6 +749,469 @@ def call_ai_for_chart_improvement(chart_data: str, performance_stats: pd.DataFra
         raise requests.RequestException(f"Erro inesperado: {e}")
 
 
+def call_ai_streaming(chart_data: str, performance_stats: pd.DataFrame,
+                      use_cache: bool = None, variant: str = None, provider=None) -> str:
+    """
+    Chama a API em modo streaming, validando o chart conforme as linhas chegam.
+    
+    O texto recebido alimenta um IncrementalChartScanner; a conexão é
+    encerrada assim que o chart termina (sem esperar o texto explicativo)
+    ou assim que a saída fica claramente malformada.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        use_cache (bool, optional): Sobrescreve USE_AI_CACHE para esta chamada
+        variant (str, optional): Variante de dificuldade (padrão: CHART_VARIANT)
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
+        
+    Returns:
+        str: Resposta da IA recebida até o fim do chart
+        
+    Raises:
+        StreamAbortedError: Se a geração foi abortada por saída malformada
+        requests.RequestException: Se houver erro na chamada da API
+        
+    Example:
+        >>> response = call_ai_streaming(chart, stats)
+    """
+    from ai_providers import build_provider_request, stream_provider, StreamAbortedError
+    
+    data_json = build_ai_request_content(chart_data, performance_stats, variant=variant)
+    provider = provider or resolve_provider_config()
+    active_api = provider.api
+    save_run_artifact("request", data_json, api=active_api, model=provider.model, mode="stream")
+    
+    # Mesma chave do modo normal: o cache é compartilhado entre os dois modos
+    cache_cfg = get_cache_config()
+    if use_cache is None:
+        use_cache = USE_AI_CACHE
+    use_cache = use_cache and cache_cfg["enabled"]
+    plan = plan_request_budget(chart_data, data_json, provider)
+    max_tokens = plan["max_tokens"] if plan and plan["strategy"] == "single" else None
+    url, request_payload, _ = build_provider_request(provider, data_json, max_tokens)
+    cache_key = make_cache_key(active_api, {"url": url, "payload": request_payload})
+    if use_cache:
+        cached = cache_get(cache_cfg["dir"], cache_key)
+        if cached:
+            print(f"⚡ Resposta servida do cache ({cache_key[:12]}...): {len(cached)} caracteres")
+            return cached
+    
+    expected_measures = [line.strip() for line in chart_data.splitlines()].count(',') + 1
+    scanner = IncrementalChartScanner(expected_measures=expected_measures)
+    
+    # O scanner valida linhas 0000; no formato compacto o stream é apenas repassado
+    compact = get_prompt_config()["chart_encoding"] == "compact"
+    on_text = (lambda text: True) if compact else scanner.feed
+    
+    print(f"🌊 Streaming de {active_api} ({provider.model}), {expected_measures} medidas esperadas...")
+    started = time.monotonic()
+    content = stream_provider(provider, data_json, on_text, max_tokens,
+                              abort_reason=lambda: scanner.error)
+    scanner.finish()
+    elapsed = time.monotonic() - started
+    
+    if scanner.error:
+        print(f"🛑 Geração abortada após {elapsed:.1f}s: {scanner.error}")
+        raise StreamAbortedError(f"Chart malformado no streaming: {scanner.error}")
+    
+    if compact:
+        print(f"✅ Stream recebido em {elapsed:.1f}s ({len(content)} caracteres)")
+    elif scanner.complete:
+        print(f"✅ Chart completo recebido em {elapsed:.1f}s ({scanner.measures} medidas)")
+    else:
+        print(f"⚠️ Stream terminou em {elapsed:.1f}s sem chart completo")
+    
+    if use_cache and (compact or scanner.complete):
+        _store_cached_response(cache_cfg, cache_key, content, active_api, provider.model)
+    return content
+
+
+def should_use_chunked_generation(chart_data: str, forced: bool = CHUNKED_GENERATION) -> bool:
+    """
+    Decide se o chart deve ser gerado em partes.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        forced (bool): Geração em partes pedida na execução (RunOptions.chunked)
+        
+    Returns:
+        bool: True se o modo foi forçado ou o chart passa de CHUNK_AUTO_ROWS linhas
+    """
+    chunk_cfg = get_chunk_config()
+    if forced or chunk_cfg["enabled"]:
+        return True
+    note_rows = sum(1 for line in chart_data.splitlines() if line.strip() not in ('', ',', ';'))
+    return chunk_cfg["auto_rows"] > 0 and note_rows > chunk_cfg["auto_rows"]
+
+
+def call_ai_chunked(chart_data: str, performance_stats: pd.DataFrame,
+                    use_cache: bool = None, measures_per_chunk: int = None,
+                    variant: str = None, provider=None) -> str:
+    """
+    Gera o chart em partes paralelas e retorna o resultado costurado.
+    
+    Cada parte leva algumas medidas anteriores como contexto e é conferida
+    (número de medidas) antes de ser aceita; partes que falham são pedidas
+    de novo e, se ainda falharem, mantêm as medidas originais.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        use_cache (bool, optional): Sobrescreve USE_AI_CACHE para esta chamada
+        measures_per_chunk (int, optional): Sobrescreve CHUNK_MEASURES (usado
+            quando o orçamento de tokens exige partes menores)
+        variant (str, optional): Variante de dificuldade (padrão: CHART_VARIANT)
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
+        
+    Returns:
+        str: Resposta no mesmo formato das outras chamadas (chart em bloco de código)
+        
+    Raises:
+        requests.RequestException: Se nenhuma parte for gerada com sucesso
+        
+    Example:
+        >>> response = call_ai_chunked(long_chart, stats)
+    """
+    import requests
+    from chunked_generation import generate_chunked
+    
+    chunk_cfg = get_chunk_config()
+    total_measures = len(split_measures(chart_data))
+    provider = provider or resolve_provider_config()
+    
+    def request_chunk(chunk: dict, attempt: int) -> str:
+        description = (f"medidas {chunk['start'] + 1} a {chunk['end']} de {total_measures} "
+                       f"({len(chunk['measures'])} medidas)")
+        if attempt > 1:
+            description += f"; tentativa {attempt}: a anterior veio com número de medidas errado"
+        chunk_chart = join_measures(chunk["measures"])
+        content = build_ai_request_content(
+            chunk_chart,
+            performance_stats,
+            chunk={
+                "description": description,
+                "context_chart": join_measures(chunk["context"]) if chunk["context"] else "",
+                "measure_range": (chunk["start"], chunk["end"])
+            },
+            variant=variant
+        )
+        plan = plan_request_budget(chunk_chart, content, provider)
+        max_tokens = None
+        if plan:
+            # Parte ainda grande demais: pede o máximo que o modelo aceita
+            max_tokens = (get_model_limits(plan["model"])["max_output"]
+                          if plan["strategy"] == "chunked" else plan["max_tokens"])
+        return request_ai_completion(content, use_cache=use_cache, max_tokens=max_tokens,
+                                     provider=provider, mode="chunk")
+    
+    stitched, report = generate_chunked(
+        chart_data,
+        request_chunk,
+        extract_generated_chart,
+        measures_per_chunk=measures_per_chunk or chunk_cfg["measures_per_chunk"],
+        overlap=chunk_cfg["overlap"],
+        concurrency=chunk_cfg["concurrency"],
+        max_attempts=chunk_cfg["max_attempts"],
+        repair=lambda generated, original: repair_measures(generated, original)[0]
+    )
+    
+    failed = [r for r in report if not r["ok"]]
+    if len(failed) == len(report):
+        raise requests.RequestException("Nenhuma parte do chart foi gerada com sucesso")
+    if failed:
+        ranges = ", ".join(f"{r['start'] + 1}-{r['end']}" for r in failed)
+        print(f"⚠️ {len(failed)} de {len(report)} partes mantiveram as medidas originais: {ranges}")
+    
+    return f"```\n{stitched}\n```"
+
+
+def call_ai_hedged(chart_data: str, performance_stats: pd.DataFrame,
+                   api_names: list = None, use_cache: bool = None, variant: str = None) -> str:
+    """
+    Envia a requisição a várias APIs ao mesmo tempo e usa a primeira resposta válida.
+    
+    Cada resposta passa por extract_chart_from_ai_response e pela validação
+    estrutural assim que chega; as requisições restantes são canceladas.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        api_names (list, optional): APIs a usar (padrão: HEDGED_APIS ou todas com chave válida)
+        use_cache (bool, optional): Sobrescreve USE_AI_CACHE para esta chamada
+        variant (str, optional): Variante de dificuldade (padrão: CHART_VARIANT)
+        
+    Returns:
+        str: Resposta completa da API vencedora
+        
+    Raises:
+        requests.RequestException: Se nenhuma API retornar um chart válido
+        
+    Example:
+        >>> response = call_ai_hedged(chart, stats, ["deepseek", "openai"])
+    """
+    import asyncio
+    import requests
+    from ai_providers import build_provider_request, hedged_generate
+    
+    hedge_cfg = get_hedge_config()
+    if not api_names:
+        api_names = hedge_cfg["apis"] or get_configured_apis()
+    if not api_names:
+        raise requests.RequestException("Nenhuma API configurada para o modo hedged")
+    
+    data_json = build_ai_request_content(chart_data, performance_stats, variant=variant)
+    providers = {name: resolve_provider_config(name) for name in api_names}
+    save_run_artifact("request", data_json, apis=api_names, mode="hedged")
+    
+    # Mesmo orçamento do modo normal, por provedor, para que max_tokens e as
+    # chaves de cache coincidam (um chart que só cabe em partes vai sem ajuste)
+    max_tokens = {}
+    for name, provider in providers.items():
+        plan = plan_request_budget(chart_data, data_json, provider)
+        if plan and plan["strategy"] != "chunked":
+            providers[name] = provider.with_model(plan["model"])
+            max_tokens[name] = plan["max_tokens"]
+    
+    # Se qualquer provedor já tem a resposta no cache, não há o que disputar
+    cache_cfg = get_cache_config()
+    if use_cache is None:
+        use_cache = USE_AI_CACHE
+    use_cache = use_cache and cache_cfg["enabled"]
+    cache_keys = {}
+    for name, provider in providers.items():
+        url, payload, _ = build_provider_request(provider, data_json, max_tokens.get(name))
+        cache_keys[name] = make_cache_key(name, {"url": url, "payload": payload})
+        if use_cache:
+            cached = cache_get(cache_cfg["dir"], cache_keys[name])
+            if cached:
+                print(f"⚡ Resposta servida do cache ({name}): {len(cached)} caracteres")
+                return cached
+    
+    providers_desc = ", ".join(f"{name} ({provider.model})" for name, provider in providers.items())
+    print(f"🏎️ Modo hedged: {providers_desc}")
+    print(f"📊 Tamanho dos dados: {len(data_json)} caracteres")
+    
+    def is_valid(response_text: str) -> bool:
+        return is_valid_generated_chart(extract_generated_chart(response_text), chart_data)
+    
+    winner, content = asyncio.run(
+        hedged_generate(data_json, list(providers.values()), is_valid, hedge_delay=hedge_cfg["delay"],
+                        max_tokens=max_tokens)
+    )
+    if not content:
+        raise requests.RequestException("Nenhuma API retornou um chart válido no modo hedged")
+    
+    if use_cache:
+        _store_cached_response(cache_cfg, cache_keys[winner], content, winner,
+                               providers[winner].model)
+    return content
+
+
+def call_local_generator(chart_data: str, performance_stats: pd.DataFrame) -> str:
+    """
+    Gera o chart com o simplificador local (ver local_generator.py), sem chamar a IA.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        
+    Returns:
+        str: Resposta no mesmo formato das chamadas à IA (chart em bloco de código)
+        
+    Example:
+        >>> response = call_local_generator(chart, stats)
+    """
+    from local_generator import generate_local_chart
+    
+    started = time.monotonic()
+    chart, report = generate_local_chart(chart_data, performance_stats)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    mode = "facilitado" if report["mode"] == "easier" else "dificultado"
+    print(f"⚙️ Chart {mode} localmente em {elapsed_ms:.0f}ms: acurácia {report['accuracy']:.0%}, "
+          f"notas {report['notes_before']} -> {report['notes_after']}")
+    if report["mode"] == "easier":
+        print(f"   Removidas: {report['removed']} (jacks: {report['removed_jacks']}, "
+              f"alternâncias rápidas: {report['removed_alternations']})")
+    return f"```\n{chart}\n```"
+
+
+# Gerações em primeiro plano em andamento (ver start_speculative_variants)
+_FOREGROUND_CALLS = 0
+_FOREGROUND_LOCK = threading.Lock()
+
+
+@contextmanager
+def _foreground_generation():
+    """Conta a geração do bloco como primeiro plano enquanto ela roda"""
+    global _FOREGROUND_CALLS
+    with _FOREGROUND_LOCK:
+        _FOREGROUND_CALLS += 1
+    try:
+        yield
+    finally:
+        with _FOREGROUND_LOCK:
+            _FOREGROUND_CALLS -= 1
+
+
+def foreground_count() -> int:
+    """Número de gerações em primeiro plano em andamento neste processo"""
+    with _FOREGROUND_LOCK:
+        return _FOREGROUND_CALLS
+
+
+def generate_ai_response(chart_data: str, performance_stats: pd.DataFrame,
+                         options: RunOptions = None, provider=None) -> str:
+    """
+    Chama a IA no modo configurado (partes, hedged, streaming ou normal).
+    
+    A chamada conta como primeiro plano: a geração especulativa espera
+    ela terminar antes de começar a próxima variante.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        options (RunOptions, optional): Opções da execução (padrão: constantes do módulo)
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
+        
+    Returns:
+        str: Resposta completa da IA
+        
+    Raises:
+        requests.RequestException: Se houver erro na chamada da API
+    """
+    with _foreground_generation():
+        return _dispatch_ai_response(chart_data, performance_stats, options, provider)
+
+
+def _dispatch_ai_response(chart_data: str, performance_stats: pd.DataFrame,
+                          options: RunOptions = None, provider=None) -> str:
+    """Escolhe o modo de geração (ver generate_ai_response), sem contar como primeiro plano"""
+    options = options or RunOptions()
+    provider = provider or resolve_provider_config()
+    if should_use_chunked_generation(chart_data, options.chunked):
+        return call_ai_chunked(chart_data, performance_stats, use_cache=options.use_cache,
+                               variant=options.variant, provider=provider)
+    if options.hedged or get_hedge_config()["enabled"]:
+        return call_ai_hedged(chart_data, performance_stats, list(options.hedged_apis),
+                              use_cache=options.use_cache, variant=options.variant)
+    if options.stream or get_stream_config()["enabled"]:
+        return call_ai_streaming(chart_data, performance_stats, use_cache=options.use_cache,
+                                 variant=options.variant, provider=provider)
+    return call_ai_for_chart_improvement(chart_data, performance_stats, use_cache=options.use_cache,
+                                         variant=options.variant, provider=provider)
+
+
+def start_speculative_variants(chart_data: str, performance_stats: pd.DataFrame,
+                               options: RunOptions = None, provider=None) -> threading.Thread:
+    """
+    Gera em segundo plano as variantes vizinhas (mais fácil/mais difícil) no cache.
+    
+    Roda depois da resposta principal e com prioridade ociosa: antes de cada
+    variante espera não haver nenhuma geração em primeiro plano em andamento
+    (qualquer modo, ver generate_ai_response). As variantes usam o mesmo modo
+    e as mesmas opções da execução, então um pedido seguinte da variante
+    (ex.: "variant easier") é servido do cache.
+    
+    Args:
+        chart_data (str): Dados do chart original
+        performance_stats (pd.DataFrame): Estatísticas de performance do jogador
+        options (RunOptions, optional): Opções da execução (padrão: constantes do módulo)
+        provider (ProviderConfig, optional): API e modelo (padrão: seleção atual)
+        
+    Returns:
+        threading.Thread: Thread da geração (None se desativada ou sem cache)
+        
+    Example:
+        >>> speculative = start_speculative_variants(chart, stats)
+        >>> speculative.join(timeout=600)
+    """
+    options = options or RunOptions()
+    provider = provider or resolve_provider_config()
+    spec_cfg = get_speculative_config()
+    if not (options.speculative or spec_cfg["enabled"]):
+        return None
+    if not get_cache_config()["enabled"]:
+        print("⚠️ Geração especulativa exige o cache de respostas (AI_CACHE_ENABLED)")
+        return None
+    variants = [v for v in spec_cfg["variants"] if v != options.variant]
+    if options.variant != "primary":
+        variants.insert(0, "primary")
+    if not variants:
+        return None
+    
+    def run() -> None:
+        for variant in variants:
+            while foreground_count() > 0 or in_flight_count() > 0:
+                time.sleep(0.5)
+            started = time.monotonic()
+            try:
+                _dispatch_ai_response(chart_data, performance_stats,
+                                      replace(options, use_cache=True, variant=variant), provider)
+                print(f"🔮 Variante '{variant}' pronta no cache ({time.monotonic() - started:.1f}s)")
+            except Exception as e:
+                print(f"⚠️ Variante especulativa '{variant}' falhou: {e}")
+    
+    print(f"🔮 Gerando em segundo plano as variantes: {', '.join(variants)}")
+    thread = threading.Thread(target=run, name="speculative", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_batch_command(manifest_path: str, results_path: str = None,
+                      options: RunOptions = None, skip_existing: bool = None) -> list:
+    """
+    Executa um manifesto de jobs (música, dificuldade, replay) sem interação.
+    
+    Jobs com "mode": "local" usam o simplificador local; os demais chamam
+    a IA no modo configurado, com a API/modelo do job ("api"/"model") ou a
+    seleção atual. Ver batch_runner.py para o formato do manifesto.
+    
+    Args:
+        manifest_path (str): Caminho do manifesto (.json ou .jsonl)
+        results_path (str, optional): Arquivo JSONL de resultados
+            (padrão: BATCH_RESULTS_FILE)
+        options (RunOptions, optional): Opções da execução (padrão: constantes do módulo)
+        skip_existing (bool, optional): Pula jobs cujo chart, ou um quase
+            duplicado dele na biblioteca, já tem variante LearnMode
+            (padrão: BATCH_SKIP_EXISTING)
+        
+    Returns:
+        list: Registros de resultado por job
+        
+    Example:
+        >>> records = run_batch_command("turma.json")
+    """
+    from batch_runner import load_manifest, run_batch
+    
+    batch_cfg = get_batch_config()
+    options = options or RunOptions()
+    jobs = load_manifest(manifest_path)
+    if batch_cfg["skip_existing"] if skip_existing is None else skip_existing:
+        from duplicate_detector import find_existing_variants
+        existing = find_existing_variants(jobs, batch_cfg["duplicate_threshold"], workers=batch_cfg["workers"])
+        jobs = [job for job in jobs if job["id"] not in existing]
+        print(f"⏭️ {len(existing)} jobs pulados (variante já existe), {len(jobs)} restantes")
+    # Cada job resolve seu provedor uma vez; jobs com APIs diferentes dividem o pool
+    providers = {job["id"]: resolve_provider_config(job.get("api"), job.get("model"))
+                 for job in jobs if job["mode"] != "local"}
+    
+    def generate(job: dict, prepared: dict) -> str:
+        if job["mode"] == "local":
+            return call_local_generator(prepared["chart_data"], prepared["performance_stats"])
+        return generate_ai_response(prepared["chart_data"], prepared["performance_stats"],
+                                    options, providers[job["id"]])
+    
+    return run_batch(
+        jobs,
+        generate,
+        extract_generated_chart,
+        results_path or batch_cfg["results_file"],
+        workers=batch_cfg["workers"],
+        concurrency=batch_cfg["concurrency"]
+    )
+
+
 def test_api_connectivity():
     """
     Testa a conectividade com a API da IA.
@@ -390,49 +1219,46 @@ def test_api_connectivity():
     Returns:
         bool: True se a API estiver funcionando, False caso contrário
     """
+    import requests
+    from ai_providers import get_session, post_with_retry
+    
     print("🔍 Testando conectividade com a API...")
     
     try:
         # Teste simples de conectividade
-        response = requests.get(
+        response = get_session("https://httpbin.org").get(
             "https://httpbin.org/status/200",
             timeout=10
         )
         print("✅ Conectividade básica OK")
         
         # Teste da API real (sem enviar dados completos)
-        cfg = get_api_config()
-        active_api = get_active_api()
-        if active_api == "claude":
+        provider = resolve_provider_config()
+        if provider.api == "claude":
             test_payload = {
-                "model": cfg["model"],
+                "model": provider.model,
                 "max_tokens": 10,
                 "messages": [
                     {"role": "user", "content": [{"type": "text", "text": "Teste de conectividade"}]}
                 ]
             }
             headers = {
-                "x-api-key": cfg["key"],
+                "x-api-key": provider.key,
                 "anthropic-version": "2023-06-01",
                 "Content-Type": "application/json"
             }
         else:
             test_payload = {
-                "model": cfg["model"],
+                "model": provider.model,
                 "messages": [{"role": "user", "content": "Teste de conectividade"}],
                 "max_tokens": 10
             }
             headers = {
-                "Authorization": f"Bearer {cfg['key']}",
+                "Authorization": f"Bearer {provider.key}",
                 "Content-Type": "application/json"
             }
         
-        test_response = requests.post(
-            cfg["url"],
-            json=test_payload,
-            headers=headers,
-            timeout=30
-        )
+        test_response = post_with_retry(provider.url, test_payload, headers, read_timeout=30)
         
         if test_response.status_code == 200:
             print("✅ API da IA respondendo corretamente")
@@ -474,6 +1300,13 @@ def show_api_config():
     print(f"\n⚙️ CONFIGURAÇÃO DE EXECUÇÃO:")
     print(f"   API Forçada: {'✅ SIM' if FORCE_API_CALL else '❌ NÃO'}")
     print(f"   Modo: {'🚀 API' if FORCE_API_CALL else '📁 Arquivo Local'}")
+    
+    cache_cfg = get_cache_config()
+    cache_enabled = USE_AI_CACHE and cache_cfg["enabled"]
+    print(f"   Cache de respostas: {'✅ ATIVO' if cache_enabled else '❌ DESATIVADO'} ({cache_cfg['dir']})")
+    if cache_enabled:
+        info = cache_stats(cache_cfg["dir"])
+        print(f"   Entradas no cache: {info['entries']} ({info['bytes'] / 1024:.1f} KB de {cache_cfg['max_bytes'] / 1024 / 1024:.0f} MB)")
 
 
 def switch_api_model(new_model: str):
@@ -487,16 +1320,19 @@ def switch_api_model(new_model: str):
         >>> switch_api_model("deepseek-coder")
         # Altera para o modelo deepseek-coder
     """
-    global API_CONFIG
-    old_model = API_CONFIG["model"]
-    API_CONFIG["model"] = new_model
-    print(f"🔄 Modelo alterado: {old_model} → {new_model}")
+    old_model = resolve_provider_config().model
+    if set_model(new_model):
+        print(f"🔄 Modelo alterado: {old_model} → {new_model}")
 
 
 def extract_chart_from_ai_response(full_response: str) -> str:
     """
     Extrai conteúdo do chart da resposta da IA.
     
+    Percorre a resposta uma única vez (chart_scanner.scan_chart_blocks),
+    encontrando os trechos de chart dentro e fora de blocos de código, e
+    usa o trecho com mais cara de chart completo.
+    
     Args:
         full_response (str): Resposta completa da IA
         
@@ -513,119 +1349,37 @@ def extract_chart_from_ai_response(full_response: str) -> str:
         print("❌ Resposta vazia da IA")
         return ""
     
-    chart_content = ""
-    
-    # Método 1: Procurar por blocos de código markdown
-    if "```" in full_response:
-        print("📋 Detectados blocos de código markdown")
-        # Procura por todos os blocos de código
-        blocks = []
-        start_pos = 0
-        while True:
-            start_marker = full_response.find("```", start_pos)
-            if start_marker == -1:
-                break
-            
-            # Pula o ``` e possível linguagem (ex: ```sm)
-            content_start = full_response.find("\n", start_marker)
-            if content_start == -1:
-                content_start = start_marker + 3
-            else:
-                content_start += 1
-                
-            end_marker = full_response.find("```", content_start)
-            if end_marker == -1:
-                break
-                
-            block_content = full_response[content_start:end_marker].strip()
-            blocks.append(block_content)
-            start_pos = end_marker + 3
-        
-        print(f"📦 Encontrados {len(blocks)} blocos de código")
-        
-        # Analisa cada bloco para encontrar o chart
-        for i, block in enumerate(blocks):
-            lines = block.split('\n')
-            note_lines = [line for line in lines if len(line.strip()) == 4 and all(c in '01234' for c in line.strip())]
-            separators = [line for line in lines if line.strip() in [',', ';']]
-            
-            print(f"   Bloco {i+1}: {len(note_lines)} linhas de notas, {len(separators)} separadores")
-            
-            if len(note_lines) > 10 and len(separators) > 0:  # Parece ser um chart
-                chart_content = block
-                print(f"✅ Chart encontrado no bloco {i+1}")
-                break
-    
-    # Método 2: Procurar por padrões de chart sem markdown
-    if not chart_content:
-        print("🔍 Procurando padrões de chart sem markdown...")
-        lines = full_response.split('\n')
-        chart_lines = []
-        in_chart_section = False
-        
-        for line in lines:
-            line_clean = line.strip()
-            
-            # Detecta início de seção de chart
-            if len(line_clean) == 4 and all(c in '01234' for c in line_clean):
-                in_chart_section = True
-                chart_lines.append(line_clean)
-            elif line_clean in [',', ';'] and in_chart_section:
-                chart_lines.append(line_clean)
-                if line_clean == ';':  # Fim do chart
-                    break
-            elif in_chart_section and line_clean == '':
-                continue  # Ignora linhas vazias dentro do chart
-            elif in_chart_section and line_clean:
-                # Se encontrou texto que não é chart, pode ter terminado
-                if len(chart_lines) > 10:  # Se já tem bastante conteúdo, para
-                    break
-        
-        if chart_lines:
-            chart_content = '\n'.join(chart_lines)
-            print(f"✅ Chart encontrado por padrão: {len(chart_lines)} linhas")
-    
-    # Método 3: Procurar qualquer sequência que pareça um chart
-    if not chart_content:
-        print("🔍 Busca avançada por sequências de chart...")
-        import re
-        
-        # Procura por sequências de linhas que parecem chart data
-        pattern = r'(?:^|\n)([01]{4}(?:\n[01]{4})*(?:\n,)*(?:\n[01]{4})*)*\n;'
-        matches = re.findall(pattern, full_response, re.MULTILINE)
-        
-        if matches:
-            # Pega a maior sequência encontrada
-            chart_content = max(matches, key=len)
-            print(f"✅ Chart encontrado por regex: {len(chart_content)} caracteres")
-    
-    if chart_content:
-        # Valida e limpa o chart extraído
-        lines = chart_content.split('\n')
-        valid_lines = []
-        for line in lines:
-            line = line.strip()
-            if line and ((len(line) == 4 and all(c in '01234' for c in line)) or line in [',', ';']):
-                valid_lines.append(line)
-        
-        chart_content = '\n'.join(valid_lines)
-        print(f"✅ Chart final: {len(valid_lines)} linhas válidas")
-        
-        # Mostra primeiras linhas para debug
-        preview_lines = valid_lines[:5]
-        print(f"📝 Preview: {preview_lines}")
-    else:
+    blocks = scan_chart_blocks(full_response)
+    fenced = sum(1 for block in blocks if block["fenced"])
+    print(f"📦 Encontrados {len(blocks)} trechos de chart ({fenced} em blocos de código)")
+    for i, block in enumerate(blocks[:10]):
+        print(f"   Trecho {i+1}: {block['note_rows']} linhas de notas, {block['separators']} separadores"
+              f"{' (bloco de código)' if block['fenced'] else ''}")
+    
+    best = pick_chart_block(blocks)
+    if not best:
         print("❌ Nenhum chart encontrado na resposta")
         print("📄 Início da resposta:")
         print(full_response[:500] + "..." if len(full_response) > 500 else full_response)
+        return ""
+    
+    chart_content = join_measures(best["measures"])
+    print(f"✅ Chart encontrado no trecho {blocks.index(best) + 1}: {len(best['measures'])} medidas")
+    
+    # Mostra primeiras linhas para debug
+    preview_lines = chart_content.split('\n')[:5]
+    print(f"📝 Preview: {preview_lines}")
     
     return chart_content
 
 
-def main():
+def main(options: RunOptions = None):
     """
     Função principal que executa todo o pipeline de análise e geração de charts.
     
+    Args:
+        options (RunOptions, optional): Opções da execução (padrão: constantes do módulo)
+        
     Returns:
         None: Executa o processo completo
         
@@ -633,70 +1387,102 @@ def main():
         >>> main()
         # Executa análise completa e gera chart modificado
     """
+    from replay_extractor import get_latest_replay_data, parse_replay_data, analyze_performance
+    
+    options = options or RunOptions()
+    # API e modelo resolvidos uma vez para toda a execução
+    provider = resolve_provider_config()
+    trace_cfg = get_trace_config()
+    run = start_run("main", trace_cfg["dir"], trace_cfg["keep"]) if trace_cfg["enabled"] else None
+    # Artefatos da execução (requisição, resposta, chart e trace) com o mesmo id do trace
+    begin_artifact_run("main", run.run_id if run else None)
+    speculative = None
     try:
         print("=== SISTEMA DE ANÁLISE DE PERFORMANCE DO STEPMANIA ===\n")
         
         # 1. Extrair dados de replay
         print("1. Extraindo dados de replay...")
+        trace_stage("1.replay_load")
         data_str = get_latest_replay_data(REPLAYS_DIR)
         if not data_str:
             print("Erro: Não foi possível carregar dados de replay")
             return
+        trace_annotate(replay_bytes=len(data_str))
         
         # 2. Processar dados de replay
         print("2. Processando dados de replay...")
+        trace_stage("2.replay_parse")
         df = parse_replay_data(data_str)
         analysis_results = analyze_performance(df)
+        trace_annotate(notes=len(df))
         
         # 3. Criar visualização
         print("3. Criando visualização de performance...")
+        trace_stage("3.visualization")
         create_performance_visualization(analysis_results['dataframe'])
         
         # 4. Extrair dados do chart
         print("4. Extraindo dados do chart...")
+        trace_stage("4.chart_extract")
         chart_data, difficulty_name, difficulty_data = extract_chart_data(SM_FILE_PATH, TARGET_DIFFICULTY)
         if not chart_data:
             print("Erro: Não foi possível extrair dados do chart")
             return
         
         print(f"Chart extraído: {difficulty_name}")
+        trace_annotate(difficulty=difficulty_name, chart_chars=len(chart_data),
+                       measures=len(split_measures(chart_data)))
         
         # 5. Analisar passos do chart
         step_counts = count_steps_by_track(chart_data)
         
         # 6. Gerar relatório
         print("5. Gerando relatório de performance...")
+        trace_stage("5.report")
         generate_performance_report(analysis_results['performance_stats'], step_counts)
         
         # 7. Chamar IA para melhoria
         print("6. Chamando IA para análise e melhoria...")
+        trace_stage("6.generate")
+        
+        # Chamadas que produziram a resposta (vazio se veio do cache ou de arquivo)
+        call_ids = []
         
-        # VERIFICA SE DEVE USAR API OU ARQUIVO LOCAL
-        if FORCE_API_CALL:
+        # VERIFICA SE DEVE USAR GERADOR LOCAL, API OU ARQUIVO LOCAL
+        if options.local:
+            print("⚙️ Usando o simplificador local (sem IA)...")
+            ai_response = call_local_generator(chart_data, analysis_results['performance_stats'])
+        elif options.force_api_call:
             print("🚀 FORÇANDO CHAMADA DA API...")
-            print(f"🔧 Configuração atual: FORCE_API_CALL = {FORCE_API_CALL}")
+            print(f"🔧 Configuração atual: {provider.api}/{provider.model}")
             
             try:
                 print("📡 Iniciando chamada da API...")
-                ai_response = call_ai_for_chart_improvement(chart_data, analysis_results['performance_stats'])
+                with track_calls() as call_ids:
+                    ai_response = generate_ai_response(chart_data, analysis_results['performance_stats'],
+                                                       options, provider)
                 print("✅ Resposta da IA recebida com sucesso!")
                 print(f"📊 Tamanho da resposta: {len(ai_response)} caracteres")
-                
-                # Salva a resposta da API para debug
-                with open("api_response_debug.txt", "w", encoding="utf-8") as f:
-                    f.write(ai_response)
-                print("💾 Resposta da API salva em api_response_debug.txt")
+                speculative = start_speculative_variants(chart_data, analysis_results['performance_stats'],
+                                                         options, provider)
                 
             except Exception as e:
                 print(f"❌ Erro ao chamar API: {e}")
-                print("⚠️ Tentando usar arquivo local como fallback...")
+                print("⚠️ Usando o simplificador local como fallback...")
+                # O chart do fallback não diz nada sobre as chamadas que falharam
+                call_ids = []
                 try:
-                    with open("generated_chart.sm", "r", encoding="utf-8", errors="ignore") as f:
-                        ai_response = f.read()
-                    print("✅ Usando arquivo generated_chart.sm como fallback")
-                except:
-                    print("❌ Falha total: nem API nem arquivo local funcionaram")
-                    return
+                    ai_response = call_local_generator(chart_data, analysis_results['performance_stats'])
+                except Exception as local_error:
+                    print(f"⚠️ Simplificador local falhou: {local_error}")
+                    print("⚠️ Tentando usar arquivo local como fallback...")
+                    try:
+                        with open("generated_chart.sm", "r", encoding="utf-8", errors="ignore") as f:
+                            ai_response = f.read()
+                        print("✅ Usando arquivo generated_chart.sm como fallback")
+                    except:
+                        print("❌ Falha total: nem API nem arquivo local funcionaram")
+                        return
         else:
             print("📁 Usando arquivo local (API desabilitada)...")
             try:
@@ -706,31 +1492,58 @@ def main():
             except:
                 print("❌ Arquivo local não encontrado, tentando API...")
                 try:
-                    ai_response = call_ai_for_chart_improvement(chart_data, analysis_results['performance_stats'])
+                    with track_calls() as call_ids:
+                        ai_response = call_ai_for_chart_improvement(chart_data, analysis_results['performance_stats'],
+                                                                    use_cache=options.use_cache,
+                                                                    variant=options.variant, provider=provider)
                     print("✅ Resposta da IA recebida com sucesso!")
                 except Exception as e:
                     print(f"❌ Falha total: {e}")
                     return
         
+        trace_annotate(response_chars=len(ai_response))
+        
         # 8. Extrair chart modificado
         print("7. Extraindo chart modificado...")
+        trace_stage("7.response_extract")
         print(f"📄 Tamanho da resposta da IA: {len(ai_response)} caracteres")
         
-        # Salva a resposta completa para debug
-        try:
-            with open("debug_ai_response.txt", "w", encoding="utf-8") as f:
-                f.write(ai_response)
-            print("💾 Resposta completa salva em debug_ai_response.txt")
-        except Exception as e:
-            print(f"⚠️ Erro ao salvar debug: {e}")
+        # Guarda a resposta completa (comprimida, indexada pelo id da execução) para debug
+        stored = save_run_artifact("response", ai_response)
+        if stored:
+            print(f"💾 Resposta guardada nos artefatos ({stored['hash'][:12]}, "
+                  f"{stored['stored_size'] / 1024:.1f} KB comprimidos)")
+        
+        modified_chart = extract_generated_chart(ai_response)
+        
+        # Valida a estrutura contra o original e repara defeitos triviais
+        if modified_chart:
+            violations = validate_chart(modified_chart, chart_data)
+            if violations:
+                print(f"⚠️ {len(violations)} problemas estruturais no chart gerado:")
+                for violation in violations[:10]:
+                    where = f"medida {violation['measure']}" if violation["measure"] else "chart"
+                    print(f"   - {where}: {violation['detail']}")
+                modified_chart, fixes = repair_chart(modified_chart, chart_data)
+                for fix in fixes:
+                    print(f"   🔧 {fix}")
+                if modified_chart:
+                    print("✅ Chart reparado automaticamente")
+                else:
+                    print("❌ Chart gerado não é reparável, nada será salvo")
+                trace_annotate(violations=len(violations), fixes=len(fixes))
         
-        modified_chart = extract_chart_from_ai_response(ai_response)
+        # Resultado da validação entra na telemetria da chamada que gerou a resposta
+        record_validation(call_ids, bool(modified_chart))
+        if modified_chart:
+            save_run_artifact("chart", modified_chart, difficulty=difficulty_name)
         
         if modified_chart:
             print(f"✅ Chart extraído com sucesso! ({len(modified_chart)} caracteres)")
             
             # 9. Salvar chart modificado
             print("8. Salvando chart modificado...")
+            trace_stage("8.save", chart_chars=len(modified_chart))
             original_content = read_file_with_encoding(SM_FILE_PATH)
             saved_path = save_modified_chart(
                 SM_FILE_PATH, 
@@ -761,12 +1574,29 @@ def main():
             print("   - IA não gerou chart em formato esperado")
             print("   - Resposta não contém blocos de código ```")
             print("   - Chart não está no formato de linhas 0000/0001/etc.")
-            print("   - Verifique o arquivo debug_ai_response.txt para análise completa")
+            print("   - Veja a resposta completa com: python PlayerStats_Modular.py artifact latest response")
             
     except Exception as e:
         print(f"❌ Erro durante execução: {e}")
+        trace_annotate(error=f"{type(e).__name__}: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        summary = finish_run()
+        if summary:
+            try:
+                with open(summary["trace_path"], "r", encoding="utf-8") as f:
+                    save_run_artifact("trace", f.read())
+            except OSError:
+                pass
+        if speculative and speculative.is_alive():
+            max_wait = get_speculative_config()["max_wait"]
+            print(f"⏳ Aguardando as variantes especulativas (até {max_wait:.0f}s, Ctrl+C para pular)...")
+            try:
+                speculative.join(max_wait)
+            except KeyboardInterrupt:
+                print("⏭️ Variantes especulativas interrompidas")
+        end_artifact_run()
 
 
 def test_ai_extraction():
@@ -993,13 +1823,15 @@ Essas mudanças devem ajudar."""
     result2 = extract_chart_from_ai_response(test2)
     print(f"Resultado: {'✅ Sucesso' if result2 else '❌ Falha'}")
     
-    # Teste 3: Arquivo de debug se existir
+    # Teste 3: Última resposta guardada nos artefatos (ou arquivo de debug antigo, se existir)
     try:
-        with open("debug_ai_response.txt", "r", encoding="utf-8") as f:
-            debug_response = f.read()
+        debug_response = get_artifact(get_artifact_config()["dir"], "latest", "response")
+        if debug_response is None:
+            with open("debug_ai_response.txt", "r", encoding="utf-8") as f:
+                debug_response = f.read()
         
         if debug_response.strip():
-            print("\n📋 Teste 3: Resposta real da API (debug_ai_response.txt)")
+            print("\n📋 Teste 3: Resposta real da API (última resposta guardada)")
             result3 = extract_chart_from_ai_response(debug_response)
             print(f"Resultado: {'✅ Sucesso' if result3 else '❌ Falha'}")
         else:
@@ -1027,6 +1859,8 @@ def clean_and_regenerate():
 
 if __name__ == "__main__":
     import sys
+    # Cada comando cria suas opções (cópia imutável) em vez de alterar as constantes
+    options = RunOptions()
     if len(sys.argv) > 1:
         if sys.argv[1] == "test":
             test_ai_extraction()
@@ -1065,13 +1899,81 @@ if __name__ == "__main__":
                     status = "✅" if api == get_active_api() else "  "
                     print(f"   {status} {api}")
         elif sys.argv[1] == "force_api":
-            # Modifica a variável global
-            globals()['FORCE_API_CALL'] = True
+            # Executa chamando a API
             print("🚀 API forçada para execução!")
+            main(replace(options, force_api_call=True))
         elif sys.argv[1] == "use_local":
-            # Modifica a variável global
-            globals()['FORCE_API_CALL'] = False
+            # Executa com o arquivo local generated_chart.sm
             print("📁 Arquivo local forçado para execução!")
+            main(replace(options, force_api_call=False))
+        elif sys.argv[1] == "no_cache":
+            # Executa ignorando o cache de respostas da IA
+            print("🚫 Cache de respostas desativado para esta execução")
+            main(replace(options, use_cache=False))
+        elif sys.argv[1] == "hedged":
+            # Executa enviando para várias APIs ao mesmo tempo (ex.: hedged deepseek,openai)
+            hedged_apis = options.hedged_apis
+            if len(sys.argv) > 2:
+                hedged_apis = tuple(name.strip() for name in sys.argv[2].split(",") if name.strip())
+            print("🏎️ Modo hedged ativado para esta execução")
+            main(replace(options, hedged=True, hedged_apis=hedged_apis))
+        elif sys.argv[1] == "stream":
+            # Executa recebendo a resposta em streaming, com aborto antecipado
+            print("🌊 Modo streaming ativado para esta execução")
+            main(replace(options, stream=True))
+        elif sys.argv[1] == "chunked":
+            # Executa gerando o chart em partes paralelas
+            print("🧩 Geração em partes ativada para esta execução")
+            main(replace(options, chunked=True))
+        elif sys.argv[1] == "variant":
+            # Executa pedindo uma variante de dificuldade: variant <easier|harder|primary>
+            if len(sys.argv) > 2 and sys.argv[2] in ("primary", "easier", "harder"):
+                print(f"🎚️ Variante '{sys.argv[2]}' para esta execução")
+                main(replace(options, variant=sys.argv[2]))
+            else:
+                print("❌ Uso: python PlayerStats_Modular.py variant <easier|harder|primary>")
+        elif sys.argv[1] == "speculative":
+            # Executa e depois gera as variantes vizinhas em segundo plano no cache
+            print("🔮 Geração especulativa ativada para esta execução")
+            main(replace(options, speculative=True))
+        elif sys.argv[1] == "local":
+            # Executa com o simplificador local, sem chamar a IA
+            print("⚙️ Simplificador local ativado para esta execução")
+            main(replace(options, local=True))
+        elif sys.argv[1] == "batch":
+            # Executa um manifesto de jobs: batch <manifesto.json> [resultados.jsonl] [--skip-existing]
+            batch_args = [arg for arg in sys.argv[2:] if arg != "--skip-existing"]
+            if batch_args:
+                run_batch_command(batch_args[0], batch_args[1] if len(batch_args) > 1 else None, options,
+                                  True if "--skip-existing" in sys.argv else None)
+            else:
+                print("❌ Uso: python PlayerStats_Modular.py batch <manifesto.json> [resultados.jsonl] [--skip-existing]")
+        elif sys.argv[1] == "telemetry":
+            # Latência, validade e custo observados por modelo (telemetry [tokens_do_prompt])
+            print_telemetry_report(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        elif sys.argv[1] == "artifacts":
+            # Lista as execuções guardadas e seus artefatos
+            runs = list_runs(get_artifact_config()["dir"], int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+            if not runs:
+                print("📭 Nenhum artefato guardado ainda")
+            for entry in runs:
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["created"]))
+                print(f"📦 {entry['run_id']} ({created})")
+                for artifact in entry["artifacts"]:
+                    print(f"   {artifact['kind']:<10} {artifact['hash'][:12]} "
+                          f"{artifact['size'] / 1024:>8.1f} KB ({artifact['stored_size'] / 1024:.1f} KB comprimidos)")
+        elif sys.argv[1] == "artifact":
+            # Mostra um artefato: artifact <id_da_execução|hash|latest> [tipo]
+            if len(sys.argv) > 2:
+                kind = sys.argv[3] if len(sys.argv) > 3 else "response"
+                content = get_artifact(get_artifact_config()["dir"], sys.argv[2], kind)
+                print(content if content is not None else f"❌ Artefato não encontrado: {sys.argv[2]} ({kind})")
+            else:
+                print("❌ Uso: python PlayerStats_Modular.py artifact <id_da_execução|hash|latest> [request|response|chart|trace]")
+        elif sys.argv[1] == "clear_cache":
+            cache_dir = get_cache_config()["dir"]
+            removed = clear_cache(cache_dir)
+            print(f"🗑️ Cache limpo: {removed} entradas removidas de {cache_dir}")
         else:
             main()
     else:
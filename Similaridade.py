@@ -1,6 +1,9 @@
-import difflib
 import re
 
+from chart_diff import diff_chart_lines, unified_diff
+from chart_similarity import compare_charts
+from Comparativo import parse_sm
+
 def extract_chart_data_only(file_path):
     """Extrai APENAS as linhas de chart data (0000, 0001, etc.) de cada nível"""
     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
@@ -113,23 +116,25 @@ def compare_chart_data(file1, file2, level_index1=0, level_index2=None, output="
     file1_name = file1.replace("_LearnMode", "")
     file2_name = file2.replace("_LearnMode", " (LearnMode)")
 
-    diff = difflib.unified_diff(
-        lines1, lines2,
+    # Alinha medidas inteiras (hash) e só compara linhas dentro das medidas alteradas
+    result = diff_chart_lines(lines1, lines2)
+
+    diff = unified_diff(
+        lines1, lines2, result["opcodes"],
         fromfile=f"{file1_name} (chart data nivel {level_index1})",
-        tofile=f"{file2_name} (chart data nivel {level_index2})",
-        lineterm=""
+        tofile=f"{file2_name} (chart data nivel {level_index2})"
     )
 
     diff_lines = list(diff)
 
-    matcher = difflib.SequenceMatcher(None, lines1, lines2)
-    matching_blocks = matcher.get_matching_blocks()
-
-    same_lines = sum(block.size for block in matching_blocks)
+    same_lines = result["same_lines"]
     total1 = len(lines1)
     total2 = len(lines2)
-    different_lines = max(total1, total2) - same_lines
-    similarity = matcher.ratio() * 100
+    different_lines = result["different_lines"]
+    similarity = result["similarity"]
+
+    # Linha a linha, uma medida requantizada parece toda diferente; por tempo, não
+    timing = compare_charts("\n".join(lines1), "\n".join(lines2), parse_sm(file1)[0], parse_sm(file2)[0])
 
     with open(output, "w", encoding="utf-8") as out:
         out.write("=== COMPARAÇÃO DE CHART DATA ===\n\n")
@@ -145,11 +150,21 @@ def compare_chart_data(file1, file2, level_index1=0, level_index2=None, output="
         out.write(f"Total linhas chart modificado: {total2}\n")
         out.write(f"Linhas iguais: {same_lines}\n")
         out.write(f"Linhas diferentes: {different_lines}\n")
+        out.write(f"Medidas alteradas: {result['measures_changed']}/{result['measures1']}\n")
         out.write(f"Similaridade do chart data: {similarity:.2f}%\n")
 
+        out.write("\n=== Similaridade por tempo (beat, trilha, tipo) ===\n")
+        out.write(f"Precisão: {timing['precision']:.2%} ({timing['matched_candidate']}/{timing['candidate_events']})\n")
+        out.write(f"Recall: {timing['recall']:.2%} ({timing['matched_source']}/{timing['source_events']})\n")
+        out.write(f"F1: {timing['f1']:.2%}\n")
+        out.write(f"Concordância média por medida: {timing['mean_measure_agreement']:.2%}\n")
+        for lane in timing["lanes"]:
+            out.write(f"Trilha {lane['lane']}: {lane['source']} -> {lane['candidate']} notas ({lane['delta']:+d})\n")
+
     print(f"✅ Comparação de chart data salva em {output}")
     print(f"📊 Similaridade: {similarity:.2f}%")
     print(f"📈 Linhas iguais: {same_lines}/{max(total1, total2)}")
+    print(f"🎯 Similaridade por tempo (F1): {timing['f1']:.2%}")
 
 # Função para compatibilidade com código antigo
 def compare_levels(file1, file2, level_index=0, output="diff_result.txt"):
@@ -0,0 +1,199 @@
+"""
+AI Cache Module
+
+Este módulo contém funções para guardar em disco as respostas da IA,
+endereçadas pelo hash do payload da requisição. Uma requisição idêntica
+(mesmo chart, stats, prompt, modelo e temperature) é servida do cache
+sem nova chamada à API.
+
+Author: Generated for StepMania Analysis
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional, Any
+
+
+def make_cache_key(api_name: str, request_payload: Dict[str, Any]) -> str:
+    """
+    Gera a chave do cache a partir do payload normalizado da requisição.
+
+    Args:
+        api_name (str): Nome da API ("deepseek", "openai", "claude")
+        request_payload (Dict[str, Any]): Payload enviado ao provedor
+
+    Returns:
+        str: Hash SHA-256 (hex) do payload normalizado
+
+    Example:
+        >>> key = make_cache_key("deepseek", {"model": "deepseek-chat", "messages": []})
+        >>> len(key)
+        64
+    """
+    normalized = json.dumps(
+        {"api": api_name, "payload": request_payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _entry_path(cache_dir: str, key: str) -> str:
+    """Retorna o caminho do arquivo de uma entrada do cache"""
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def cache_get(cache_dir: str, key: str) -> Optional[str]:
+    """
+    Busca uma resposta no cache e marca a entrada como usada recentemente.
+
+    Args:
+        cache_dir (str): Pasta do cache
+        key (str): Chave gerada por make_cache_key
+
+    Returns:
+        Optional[str]: Resposta guardada, ou None se não existir
+
+    Example:
+        >>> response = cache_get(".ai_cache", key)
+        >>> if response:
+        ...     print("Cache hit")
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # Atualiza o mtime: é a referência de recência usada na evicção LRU
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+    return entry.get("response")
+
+
+def cache_put(cache_dir: str, key: str, response: str, max_bytes: int,
+              metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Guarda uma resposta no cache e aplica a evicção por tamanho.
+
+    Args:
+        cache_dir (str): Pasta do cache
+        key (str): Chave gerada por make_cache_key
+        response (str): Resposta completa da IA
+        max_bytes (int): Tamanho máximo do cache em bytes
+        metadata (Optional[Dict[str, Any]]): Dados extras (api, modelo, etc.)
+
+    Returns:
+        str: Caminho do arquivo gravado
+
+    Example:
+        >>> cache_put(".ai_cache", key, ai_response, 50 * 1024 * 1024)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    entry = {
+        "key": key,
+        "created": time.time(),
+        "metadata": metadata or {},
+        "response": response
+    }
+
+    # Grava em arquivo temporário e troca atomicamente para não deixar
+    # entradas corrompidas se o processo cair no meio da escrita
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    evict_cache(cache_dir, max_bytes)
+    return path
+
+
+def evict_cache(cache_dir: str, max_bytes: int) -> int:
+    """
+    Remove as entradas menos usadas até o cache caber em max_bytes.
+
+    Args:
+        cache_dir (str): Pasta do cache
+        max_bytes (int): Tamanho máximo do cache em bytes
+
+    Returns:
+        int: Número de entradas removidas
+
+    Example:
+        >>> removed = evict_cache(".ai_cache", 10 * 1024 * 1024)
+        >>> print(f"{removed} entradas removidas")
+    """
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return 0
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            st = os.stat(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+        total += st.st_size
+
+    removed = 0
+    if total <= max_bytes:
+        return removed
+
+    # Mais antigo (menos usado) primeiro
+    for mtime, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            total -= size
+            removed += 1
+        except OSError:
+            continue
+
+    return removed
+
+
+def cache_stats(cache_dir: str) -> Dict[str, int]:
+    """
+    Retorna número de entradas e tamanho total do cache.
+
+    Args:
+        cache_dir (str): Pasta do cache
+
+    Returns:
+        Dict[str, int]: {"entries": n, "bytes": total}
+    """
+    entries = 0
+    total = 0
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json"):
+                entries += 1
+                total += os.path.getsize(os.path.join(cache_dir, name))
+    return {"entries": entries, "bytes": total}
+
+
+def clear_cache(cache_dir: str) -> int:
+    """
+    Remove todas as entradas do cache.
+
+    Args:
+        cache_dir (str): Pasta do cache
+
+    Returns:
+        int: Número de entradas removidas
+    """
+    return evict_cache(cache_dir, -1)
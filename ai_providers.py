@@ -0,0 +1,606 @@
+"""
+AI Providers Module
+
+Este módulo contém funções para montar, enviar e interpretar requisições
+aos provedores de IA suportados (DeepSeek, OpenAI e Claude), além do modo
+"hedged": a mesma requisição é enviada a vários provedores ao mesmo tempo
+e a primeira resposta com chart válido vence.
+
+Todas as requisições passam por post_with_retry, que reaproveita uma sessão
+HTTP (keep-alive) por host, respeita o limitador de taxa do provedor
+(rate_limiter.py) e repete respostas 429/5xx com backoff.
+
+Author: Generated for StepMania Analysis
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Tuple, Optional, Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_config import ProviderConfig, get_retry_config
+from rate_limiter import ProviderRateLimiter, get_rate_limiter, estimate_payload_tokens
+from run_trace import trace_span, tracing_active
+from telemetry import record_provider_call, record_validation, track_calls, attach_calls, CANCELLED_ERROR
+
+
+# Status HTTP que valem uma nova tentativa
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+# Uma sessão por host (esquema + host + porta), compartilhada entre threads
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Retorna a sessão HTTP (pool keep-alive) do host da URL.
+
+    Args:
+        url (str): URL do provedor
+
+    Returns:
+        requests.Session: Sessão reaproveitada entre chamadas ao mesmo host
+
+    Example:
+        >>> session = get_session("https://api.deepseek.com/v1/chat/completions")
+    """
+    parts = urlsplit(url)
+    host_key = f"{parts.scheme}://{parts.netloc}"
+
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(host_key)
+        if session is None:
+            pool_size = get_retry_config()["pool_size"]
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount(f"{parts.scheme}://", adapter)
+            _SESSIONS[host_key] = session
+        return session
+
+
+def close_sessions() -> None:
+    """Fecha todas as sessões HTTP abertas"""
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Lê o header Retry-After (segundos ou data HTTP)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, retry_cfg: Dict[str, Any]) -> float:
+    """Backoff exponencial com jitter total: uniforme entre 0 e base * 2^tentativa"""
+    ceiling = min(retry_cfg["backoff_max"], retry_cfg["backoff_base"] * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def post_with_retry(url: str, payload: Dict[str, Any], headers: Dict[str, str],
+                    read_timeout: float, retry_cfg: Optional[Dict[str, Any]] = None,
+                    rate_limiter: Optional[ProviderRateLimiter] = None, tokens: int = 0,
+                    **kwargs) -> requests.Response:
+    """
+    Faz POST pela sessão do host, repetindo falhas transitórias com backoff.
+
+    Repete em respostas 408/429/5xx e em erros de conexão. Timeouts de
+    leitura não são repetidos: o provedor pode ter processado a requisição
+    e repetir custaria outra geração inteira.
+
+    Args:
+        url (str): URL do provedor
+        payload (Dict[str, Any]): Corpo JSON da requisição
+        headers (Dict[str, str]): Headers da requisição
+        read_timeout (float): Timeout de leitura em segundos
+        retry_cfg (Optional[Dict[str, Any]]): Sobrescreve a configuração de retry
+        rate_limiter (Optional[ProviderRateLimiter]): Limitador do provedor;
+            cada tentativa espera a vez e 429 reduz a taxa. Com stream=True,
+            a vaga de concorrência de uma resposta bem-sucedida (status < 400)
+            continua ocupada enquanto o corpo chega: quem chama libera com
+            rate_limiter.release() depois de ler ou fechar a resposta
+        tokens (int): Tokens estimados da requisição (para o limite de TPM)
+        **kwargs: Repassados para session.post (ex.: stream=True)
+
+    Returns:
+        requests.Response: Última resposta recebida (pode ser de erro se as
+            tentativas se esgotarem)
+
+    Raises:
+        requests.RequestException: Se todas as tentativas falharem sem resposta
+
+    Example:
+        >>> response = post_with_retry(url, payload, headers, read_timeout=300)
+        >>> response.status_code
+        200
+    """
+    if retry_cfg is None:
+        retry_cfg = get_retry_config()
+    session = get_session(url)
+    timeout = (retry_cfg["connect_timeout"], read_timeout)
+    max_retries = max(0, retry_cfg["max_retries"])
+    # Tamanho do corpo só é calculado quando há trace ativo
+    request_bytes = len(json.dumps(payload).encode("utf-8")) if tracing_active() else 0
+
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        rate_wait = rate_limiter.acquire(tokens) if rate_limiter else 0.0
+        keep_slot = False
+        try:
+            with trace_span("provider.post", host=urlsplit(url).netloc, attempt=attempt + 1,
+                            request_bytes=request_bytes, rate_wait=round(rate_wait, 3)) as span:
+                response = session.post(url, json=payload, headers=headers, timeout=timeout, **kwargs)
+                span["http_status"] = response.status_code
+                if not kwargs.get("stream"):
+                    span["response_bytes"] = len(response.content)
+                # Stream aceito: o provedor segue gerando até o corpo terminar
+                keep_slot = bool(kwargs.get("stream")) and response.status_code < 400
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+            if last_attempt:
+                raise
+            delay = _backoff_delay(attempt, retry_cfg)
+            print(f"🔁 Erro de conexão ({e.__class__.__name__}), nova tentativa em {delay:.1f}s "
+                  f"({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            continue
+        finally:
+            if rate_limiter and not keep_slot:
+                rate_limiter.release()
+
+        retry_after = _retry_after_seconds(response)
+        if rate_limiter:
+            if response.status_code == 429:
+                rate_limiter.on_throttle(retry_after)
+            elif response.status_code < 400:
+                rate_limiter.on_success()
+
+        if response.status_code not in RETRYABLE_STATUS or last_attempt:
+            return response
+
+        if retry_after is not None:
+            # O provedor diz quando voltar; um pouco de jitter evita rajadas sincronizadas
+            delay = min(retry_after, retry_cfg["backoff_max"]) + random.uniform(0, 0.5)
+        else:
+            delay = _backoff_delay(attempt, retry_cfg)
+        print(f"🔁 Status {response.status_code}, nova tentativa em {delay:.1f}s "
+              f"({attempt + 1}/{max_retries})")
+        response.close()
+        time.sleep(delay)
+
+    # Inalcançável: a última tentativa sempre retorna ou levanta exceção
+    raise requests.RequestException("Tentativas esgotadas")
+
+
+def build_provider_request(provider: ProviderConfig, content: str,
+                           max_tokens: Optional[int] = None) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """
+    Monta URL, payload e headers no formato esperado por cada provedor.
+
+    Args:
+        provider (ProviderConfig): API, modelo e parâmetros da requisição
+            (ver api_config.resolve_provider_config)
+        content (str): Conteúdo da mensagem do usuário
+        max_tokens (Optional[int]): Sobrescreve o limite de tokens da configuração
+
+    Returns:
+        Tuple[str, Dict[str, Any], Dict[str, str]]: URL, payload e headers
+
+    Example:
+        >>> url, payload, headers = build_provider_request(resolve_provider_config("claude"), "Olá")
+        >>> payload["model"]
+        'claude-3-7-sonnet-20250219'
+    """
+    api_name = provider.api
+    model = provider.model
+    temperature = provider.temperature
+
+    # OpenAI pode requerer max_completion_tokens para alguns modelos
+    tokens_param = "max_completion_tokens" if api_name == "openai" else "max_tokens"
+    tokens = provider.max_tokens if max_tokens is None else max_tokens
+
+    if api_name == "claude":
+        payload = {
+            "model": model,
+            "max_tokens": tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": content}
+                    ]
+                }
+            ],
+            # Temperature opcional para Claude
+            "temperature": temperature
+        }
+        headers = {
+            "x-api-key": provider.key,
+            "anthropic-version": "2023-06-01",
+            "Content-Type": "application/json"
+        }
+    else:
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": content}]
+        }
+        payload[tokens_param] = tokens
+
+        # GPT-5 e GPT-4o só suportam temperature padrão (1)
+        if not (api_name == "openai" and model in ["gpt-5", "gpt-4o"]):
+            payload["temperature"] = temperature
+
+        headers = {
+            "Authorization": f"Bearer {provider.key}",
+            "Content-Type": "application/json"
+        }
+
+    return provider.url, payload, headers
+
+
+def parse_provider_response(api_name: str, response_data: Dict[str, Any]) -> str:
+    """
+    Extrai o texto gerado do JSON de resposta do provedor.
+
+    Args:
+        api_name (str): Nome da API ("deepseek", "openai", "claude")
+        response_data (Dict[str, Any]): JSON decodificado da resposta
+
+    Returns:
+        str: Texto gerado (string vazia se não houver conteúdo utilizável)
+
+    Example:
+        >>> parse_provider_response("openai", {"choices": [{"message": {"content": "0000"}}]})
+        '0000'
+    """
+    if api_name == "claude":
+        try:
+            parts = response_data.get("content", [])
+            texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
+            return "\n".join([t for t in texts if t])
+        except Exception:
+            return ""
+
+    choices = response_data.get("choices") or []
+    if choices:
+        return choices[0].get("message", {}).get("content") or ""
+    return ""
+
+
+def response_usage(api_name: str, response_data: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Extrai a contagem de tokens informada pelo provedor.
+
+    Args:
+        api_name (str): Nome da API ("deepseek", "openai", "claude")
+        response_data (Dict[str, Any]): JSON decodificado da resposta
+
+    Returns:
+        Dict[str, int]: prompt_tokens e completion_tokens (vazio se o
+            provedor não informou)
+
+    Example:
+        >>> response_usage("claude", {"usage": {"input_tokens": 900, "output_tokens": 400}})
+        {'prompt_tokens': 900, 'completion_tokens': 400}
+    """
+    usage = response_data.get("usage") or {}
+    if api_name == "claude":
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+    else:
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    if prompt is None and completion is None:
+        return {}
+    return {"prompt_tokens": int(prompt or 0), "completion_tokens": int(completion or 0)}
+
+
+def call_provider(provider: ProviderConfig, content: str,
+                  max_tokens: Optional[int] = None, mode: str = "normal") -> str:
+    """
+    Envia uma requisição a um provedor e retorna o texto gerado.
+
+    Args:
+        provider (ProviderConfig): API, modelo e parâmetros da requisição
+        content (str): Conteúdo da mensagem do usuário
+        max_tokens (Optional[int]): Sobrescreve o limite de tokens da configuração
+        mode (str): Modo registrado na telemetria ("normal", "hedged", ...)
+
+    Returns:
+        str: Texto gerado pelo modelo
+
+    Raises:
+        requests.RequestException: Se houver erro HTTP ou resposta sem conteúdo
+
+    Example:
+        >>> text = call_provider(resolve_provider_config("deepseek"), prompt)
+    """
+    api_name, model = provider.api, provider.model
+    url, payload, headers = build_provider_request(provider, content, max_tokens)
+    started = time.monotonic()
+    with trace_span("provider.call", api=api_name, model=model) as span:
+        try:
+            response = post_with_retry(url, payload, headers, read_timeout=provider.timeout,
+                                       rate_limiter=get_rate_limiter(api_name, model, url),
+                                       tokens=estimate_payload_tokens(payload))
+        except requests.RequestException as e:
+            record_provider_call(api_name, model, started, content, error=type(e).__name__, mode=mode)
+            raise
+
+        if response.status_code != 200:
+            record_provider_call(api_name, model, started, content,
+                                 error=f"HTTP {response.status_code}", mode=mode)
+            raise requests.RequestException(f"API Error {response.status_code}: {response.text[:500]}")
+
+        response_data = response.json()
+        usage = response_usage(api_name, response_data)
+        span.update(usage)
+        text = parse_provider_response(api_name, response_data)
+        record_provider_call(api_name, model, started, content, usage, text,
+                             error=None if text else "sem conteúdo", mode=mode)
+        if not text:
+            raise requests.RequestException(f"Resposta da IA inválida ({api_name})")
+        span["response_chars"] = len(text)
+        return text
+
+
+class StreamAbortedError(requests.RequestException):
+    """Geração interrompida no meio do streaming por saída malformada"""
+
+
+class RequestCancelledError(requests.RequestException):
+    """Requisição cancelada por quem chamou (ex.: perdedora do modo hedged)"""
+
+
+def _stream_delta_text(api_name: str, event: Dict[str, Any]) -> str:
+    """Extrai o pedaço de texto de um evento SSE do provedor"""
+    if api_name == "claude":
+        if event.get("type") == "error":
+            raise requests.RequestException(f"Erro no streaming (claude): {event.get('error')}")
+        if event.get("type") == "content_block_delta":
+            return event.get("delta", {}).get("text") or ""
+        return ""
+
+    choices = event.get("choices") or []
+    if choices:
+        return choices[0].get("delta", {}).get("content") or ""
+    return ""
+
+
+def stream_provider(provider: ProviderConfig, content: str,
+                    on_text: Callable[[str], bool], max_tokens: Optional[int] = None,
+                    abort_reason: Optional[Callable[[], Optional[str]]] = None,
+                    mode: str = "stream", cancel: Optional[threading.Event] = None) -> str:
+    """
+    Envia uma requisição em modo streaming (SSE) e repassa o texto conforme chega.
+
+    A leitura para quando o provedor termina ou quando on_text retorna
+    False; nesse caso a conexão é fechada e o provedor deixa de gerar
+    (e de cobrar) tokens. Parar cedo não é erro por si só (o chart pode
+    ter terminado): só conta como falha na telemetria se abort_reason
+    informar um motivo.
+
+    Com cancel, outra thread pode encerrar a requisição: o evento é
+    conferido antes do envio e a cada linha recebida, e a conexão (com a
+    vaga do limitador) é liberada na primeira linha depois de ele ser
+    acionado.
+
+    Args:
+        provider (ProviderConfig): API, modelo e parâmetros da requisição
+        content (str): Conteúdo da mensagem do usuário
+        on_text (Callable[[str], bool]): Recebe cada pedaço; retorna False para parar
+        max_tokens (Optional[int]): Sobrescreve o limite de tokens da configuração
+        abort_reason (Optional[Callable[[], Optional[str]]]): Consultada quando
+            on_text para a leitura; retorna o motivo da interrupção (saída
+            malformada) ou None para uma parada normal
+        mode (str): Modo registrado na telemetria ("stream", "hedged", ...)
+        cancel (Optional[threading.Event]): Quando acionado, fecha a conexão
+
+    Returns:
+        str: Texto recebido até o fim (ou até a interrupção)
+
+    Raises:
+        RequestCancelledError: Se cancel foi acionado antes do fim
+        requests.RequestException: Se houver erro HTTP ou evento de erro no stream
+
+    Example:
+        >>> scanner = IncrementalChartScanner(expected_measures=32)
+        >>> text = stream_provider(provider, prompt, scanner.feed, abort_reason=lambda: scanner.error)
+    """
+    api_name, model = provider.api, provider.model
+    url, payload, headers = build_provider_request(provider, content, max_tokens)
+    payload["stream"] = True
+    started = time.monotonic()
+    rate_limiter = get_rate_limiter(api_name, model, url)
+    if cancel is not None and cancel.is_set():
+        raise RequestCancelledError(f"Requisição cancelada antes do envio ({api_name})")
+    try:
+        response = post_with_retry(url, payload, headers, read_timeout=provider.timeout,
+                                   rate_limiter=rate_limiter,
+                                   tokens=estimate_payload_tokens(payload), stream=True)
+    except requests.RequestException as e:
+        record_provider_call(api_name, model, started, content, error=type(e).__name__, mode=mode)
+        raise
+
+    error: Optional[str] = None
+    parts = []
+    try:
+        if response.status_code != 200:
+            error = f"HTTP {response.status_code}"
+            raise requests.RequestException(f"API Error {response.status_code}: {response.text[:500]}")
+
+        # SSE sem charset seria decodificado como latin-1 pelo requests
+        response.encoding = "utf-8"
+        with trace_span("provider.stream", api=api_name, model=model) as span:
+            stream_bytes = 0
+            for raw_line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if cancel is not None and cancel.is_set():
+                    span["cancelled"] = True
+                    error = CANCELLED_ERROR
+                    break
+                stream_bytes += len(raw_line) + 1
+                if not raw_line or not raw_line.startswith("data:"):
+                    continue
+                data = raw_line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                delta = _stream_delta_text(api_name, event)
+                if not delta:
+                    continue
+                parts.append(delta)
+                if not on_text(delta):
+                    reason = abort_reason() if abort_reason else None
+                    if reason:
+                        # Interrompido por saída malformada: conta como chart inválido
+                        span["aborted"] = True
+                        error = "abortado"
+                    break
+            span.update(response_bytes=stream_bytes, chunks=len(parts),
+                        response_chars=sum(len(part) for part in parts))
+        if error == CANCELLED_ERROR:
+            raise RequestCancelledError(f"Requisição cancelada ({api_name})")
+        return "".join(parts)
+    except requests.RequestException as e:
+        error = error or type(e).__name__
+        raise
+    finally:
+        response.close()
+        # A vaga de concorrência só é liberada com o stream encerrado (ver post_with_retry)
+        if rate_limiter and response.status_code < 400:
+            rate_limiter.release()
+        record_provider_call(api_name, model, started, content, content="".join(parts),
+                             error=error, mode=mode)
+
+
+def _run_in_daemon_thread(loop: asyncio.AbstractEventLoop, fn: Callable, *args) -> asyncio.Future:
+    """
+    Executa fn em uma thread daemon e expõe o resultado como Future do loop.
+
+    Threads daemon não seguram a saída do processo; quem chama é
+    responsável por encerrar fn (ver o cancel de stream_provider).
+    """
+    future = loop.create_future()
+
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def runner():
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            callback = (deliver, future.set_exception, e)
+        else:
+            callback = (deliver, future.set_result, result)
+        try:
+            loop.call_soon_threadsafe(*callback)
+        except RuntimeError:
+            # Loop já encerrado: ninguém espera mais por este resultado
+            pass
+
+    threading.Thread(target=runner, daemon=True, name="hedged-provider").start()
+    return future
+
+
+async def hedged_generate(content: str, providers: List[ProviderConfig],
+                          validate: Callable[[str], bool],
+                          hedge_delay: float = 0.0,
+                          max_tokens: Optional[Dict[str, Optional[int]]] = None
+                          ) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Envia a mesma requisição a vários provedores e retorna a primeira resposta válida.
+
+    Cada requisição vai em streaming e cada resposta é validada quando
+    termina; a primeira aprovada vence e as demais são canceladas: as que
+    ainda esperam o atraso não são enviadas e as que estão na rede fecham a
+    conexão na próxima linha recebida, liberando a vaga do limitador e
+    deixando de gerar tokens. Respostas reprovadas já ficam anotadas como
+    inválidas na telemetria (as canceladas, como "cancelado"); a chamada
+    vencedora entra no coletor de quem chamou (ver telemetry.track_calls).
+
+    Args:
+        content (str): Conteúdo da mensagem do usuário
+        providers (List[ProviderConfig]): Provedores, na ordem de preferência
+        validate (Callable[[str], bool]): Recebe o texto da resposta e diz se o chart é válido
+        hedge_delay (float): Segundos de espera antes de disparar os provedores
+            secundários (0 = todos ao mesmo tempo)
+        max_tokens (Optional[Dict[str, Optional[int]]]): Limite de tokens por API
+            (ausente = limite da configuração)
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (api vencedora, resposta), ou (None, None)
+            se nenhum provedor retornou chart válido
+
+    Example:
+        >>> api, text = asyncio.run(hedged_generate(prompt, providers, is_valid))
+        >>> print(f"Vencedor: {api}")
+    """
+    if not providers:
+        return None, None
+
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    max_tokens = max_tokens or {}
+
+    # Um evento por tentativa: acionado, a requisição fecha a conexão
+    cancels = [threading.Event() for _ in providers]
+
+    def tracked_call(provider: ProviderConfig, cancel: threading.Event) -> Tuple[str, List[int]]:
+        # A thread daemon não herda o coletor: os ids voltam junto com o texto
+        with track_calls() as call_ids:
+            text = stream_provider(provider, content, lambda piece: True, max_tokens.get(provider.api),
+                                   mode="hedged", cancel=cancel)
+        return text, call_ids
+
+    async def attempt(index: int, provider: ProviderConfig) -> Tuple[str, str, List[int]]:
+        if index > 0 and hedge_delay > 0:
+            await asyncio.sleep(hedge_delay * index)
+        print(f"📡 [{provider.api}] requisição enviada ({provider.model})")
+        text, call_ids = await _run_in_daemon_thread(loop, tracked_call, provider, cancels[index])
+        return provider.api, text, call_ids
+
+    tasks = [asyncio.ensure_future(attempt(i, provider)) for i, provider in enumerate(providers)]
+    pending = set(tasks)
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    api_name, text, call_ids = task.result()
+                except Exception as e:
+                    print(f"⚠️ Provedor falhou: {e}")
+                    continue
+
+                elapsed = time.monotonic() - started
+                if validate(text):
+                    print(f"🏁 [{api_name}] primeira resposta válida em {elapsed:.1f}s")
+                    attach_calls(call_ids)
+                    return api_name, text
+                record_validation(call_ids, False)
+                print(f"⚠️ [{api_name}] resposta inválida após {elapsed:.1f}s, aguardando os demais")
+        return None, None
+    finally:
+        for cancel in cancels:
+            cancel.set()
+        for task in pending:
+            task.cancel()
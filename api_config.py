@@ -12,6 +12,8 @@ IMPORTANTE:
 
 # Carrega variáveis de ambiente do arquivo .env
 import os
+import threading
+from dataclasses import dataclass, replace
 try:
     from dotenv import load_dotenv
     load_dotenv(override=True)  # Carrega .env se python-dotenv estiver disponível
@@ -27,7 +29,7 @@ ACTIVE_API = os.getenv("ACTIVE_API", "deepseek")  # Padrão: deepseek
 
 # ======= CONFIGURAÇÕES DAS APIS =======
 DEEPSEEK_CONFIG = {
-    "url": "https://api.deepseek.com/v1/chat/completions",
+    "url": os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions"),  # Sobrescreva para proxies ou o mock_llm_server.py
     "key": os.getenv("DEEPSEEK_API_KEY", ""),  # Carregada do .env
     "model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
     "timeout": int(os.getenv("API_TIMEOUT", "300")),
@@ -36,7 +38,7 @@ DEEPSEEK_CONFIG = {
 }
 
 OPENAI_CONFIG = {
-    "url": "https://api.openai.com/v1/chat/completions",
+    "url": os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions"),  # Sobrescreva para proxies ou o mock_llm_server.py
     "key": os.getenv("OPENAI_API_KEY", ""),  # Carregada do .env
     "model": os.getenv("OPENAI_MODEL", "gpt-4o"),
     "timeout": int(os.getenv("API_TIMEOUT", "300")),
@@ -45,7 +47,7 @@ OPENAI_CONFIG = {
 }
 
 CLAUDE_CONFIG = {
-    "url": "https://api.anthropic.com/v1/messages",
+    "url": os.getenv("CLAUDE_API_URL", "https://api.anthropic.com/v1/messages"),  # Sobrescreva para proxies ou o mock_llm_server.py
     "key": os.getenv("CLAUDE_API_KEY", ""),  # Carregada do .env
     "model": os.getenv("CLAUDE_MODEL", "claude-3-7-sonnet-20250219"),
     "timeout": int(os.getenv("API_TIMEOUT", "300")),
@@ -65,9 +67,171 @@ if ACTIVE_API not in API_CONFIGS:
     print(f"⚠️ ACTIVE_API inválido no .env: '{ACTIVE_API}'. Usando 'deepseek' como padrão.")
     ACTIVE_API = "deepseek"
 
-# Configuração atual ativa
+# Configuração inicial da API ativa (do .env); a seleção atual, que pode
+# mudar com set_active_api/set_model, vem de resolve_provider_config()
 API_CONFIG = API_CONFIGS[ACTIVE_API].copy()
 
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """
+    Configuração imutável de um provedor para uma requisição.
+
+    Resolvida uma vez (resolve_provider_config) e passada explicitamente
+    pelo pipeline: jobs simultâneos com APIs/modelos diferentes podem
+    dividir o mesmo processo sem alterar estado global.
+
+    Example:
+        >>> provider = resolve_provider_config("claude")
+        >>> provider.with_model("claude-3-5-haiku-20241022").model
+        'claude-3-5-haiku-20241022'
+    """
+    api: str
+    url: str
+    key: str
+    model: str
+    timeout: int
+    max_tokens: int
+    temperature: float
+
+    def with_model(self, model):
+        """Retorna uma cópia com outro modelo"""
+        return replace(self, model=model) if model and model != self.model else self
+
+
+def _provider_from_env(api_name):
+    config = API_CONFIGS[api_name]
+    return ProviderConfig(
+        api=api_name,
+        url=config["url"],
+        key=config["key"],
+        model=config["model"],
+        timeout=config["timeout"],
+        max_tokens=config.get("max_tokens", config.get("max_completion_tokens", 4000)),
+        temperature=config["temperature"]
+    )
+
+
+# Seleção padrão do processo (trocada inteira, sob trava, por set_active_api/set_model)
+_SELECTION_LOCK = threading.Lock()
+_DEFAULT_PROVIDER = _provider_from_env(ACTIVE_API)
+
+# ======= CACHE DE RESPOSTAS DA IA =======
+# Respostas idênticas (mesmo chart, stats, prompt, modelo e temperature) são
+# reaproveitadas do disco sem nova chamada à API.
+CACHE_CONFIG = {
+    "enabled": os.getenv("AI_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "dir": os.getenv("AI_CACHE_DIR", ".ai_cache"),
+    "max_bytes": int(float(os.getenv("AI_CACHE_MAX_MB", "50")) * 1024 * 1024)
+}
+
+# ======= CONEXÃO E RETRY =======
+# Sessões HTTP são reaproveitadas por host (keep-alive). Respostas 429/5xx e
+# falhas de conexão são repetidas com backoff exponencial com jitter,
+# respeitando o header Retry-After. O timeout de leitura é o API_TIMEOUT.
+RETRY_CONFIG = {
+    "max_retries": int(os.getenv("API_MAX_RETRIES", "3")),
+    "backoff_base": float(os.getenv("API_BACKOFF_BASE", "1.0")),
+    "backoff_max": float(os.getenv("API_BACKOFF_MAX", "30")),
+    "connect_timeout": float(os.getenv("API_CONNECT_TIMEOUT", "10")),
+    "pool_size": int(os.getenv("API_POOL_SIZE", "10"))
+}
+
+# ======= FORMATO DO PROMPT =======
+# "raw": chart enviado linha a linha (0000, 0100, ...)
+# "compact": uma medida por linha, com linhas vazias comprimidas e
+#            referências a medidas repetidas (ver chart_encoding.py)
+PROMPT_CONFIG = {
+    "chart_encoding": os.getenv("CHART_ENCODING", "raw").strip().lower()
+}
+
+# ======= GERAÇÃO EM PARTES (CHARTS LONGOS) =======
+# Charts longos não cabem em uma resposta de API_MAX_TOKENS: são divididos
+# em faixas de medidas geradas em paralelo e costuradas no final.
+# CHUNK_AUTO_ROWS: acima deste número de linhas de notas o modo liga sozinho (0 = nunca).
+CHUNK_CONFIG = {
+    "enabled": os.getenv("CHUNKED_GENERATION", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "auto_rows": int(os.getenv("CHUNK_AUTO_ROWS", "800")),
+    "measures_per_chunk": int(os.getenv("CHUNK_MEASURES", "32")),
+    "overlap": int(os.getenv("CHUNK_OVERLAP", "2")),
+    "concurrency": int(os.getenv("CHUNK_CONCURRENCY", "4")),
+    "max_attempts": int(os.getenv("CHUNK_MAX_ATTEMPTS", "2"))
+}
+
+# ======= GERAÇÃO EM LOTE =======
+# Comando batch: vários jobs (música, dificuldade, replay) de um manifesto.
+# BATCH_WORKERS: processos para leitura/análise; BATCH_CONCURRENCY: chamadas simultâneas à IA.
+# BATCH_SKIP_EXISTING: pula jobs cujo chart (ou um quase duplicado) já tem variante LearnMode.
+BATCH_CONFIG = {
+    "workers": int(os.getenv("BATCH_WORKERS", "2")),
+    "concurrency": int(os.getenv("BATCH_CONCURRENCY", "4")),
+    "results_file": os.getenv("BATCH_RESULTS_FILE", "batch_results.jsonl"),
+    "skip_existing": os.getenv("BATCH_SKIP_EXISTING", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "duplicate_threshold": float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+}
+
+# ======= TRACE DE EXECUÇÃO =======
+# Cada execução grava um trace JSONL (tempos por etapa, payloads, tokens e cache)
+TRACE_CONFIG = {
+    "enabled": os.getenv("TRACE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "dir": os.getenv("TRACE_DIR", ".traces"),
+    "keep": int(os.getenv("TRACE_KEEP", "50"))
+}
+
+# ======= ARMAZENAMENTO DE ARTEFATOS =======
+# Requisição, resposta, chart extraído e trace de cada execução, comprimidos
+# e sem duplicatas (ver artifact_store.py). Retenção: 0 desliga o critério.
+ARTIFACT_CONFIG = {
+    "enabled": os.getenv("ARTIFACTS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "dir": os.getenv("ARTIFACTS_DIR", ".artifacts"),
+    "compression": os.getenv("ARTIFACTS_COMPRESSION", "gzip").strip().lower(),
+    "keep_runs": int(os.getenv("ARTIFACTS_KEEP_RUNS", "100")),
+    "max_age_days": float(os.getenv("ARTIFACTS_MAX_AGE_DAYS", "30")),
+    "max_bytes": int(float(os.getenv("ARTIFACTS_MAX_MB", "200")) * 1024 * 1024)
+}
+if ARTIFACT_CONFIG["compression"] not in ("gzip", "lzma"):
+    print(f"⚠️ ARTIFACTS_COMPRESSION inválido: '{ARTIFACT_CONFIG['compression']}'. Usando 'gzip'.")
+    ARTIFACT_CONFIG["compression"] = "gzip"
+
+# ======= DEDUPLICAÇÃO DE REQUISIÇÕES EM ANDAMENTO =======
+# Requisições idênticas simultâneas (mesmo chart, stats e modelo) esperam a
+# primeira em vez de chamar a API de novo, no mesmo processo e entre
+# processos (travas em SINGLE_FLIGHT_DIR). Ver single_flight.py.
+SINGLE_FLIGHT_CONFIG = {
+    "enabled": os.getenv("SINGLE_FLIGHT_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "cross_process": os.getenv("SINGLE_FLIGHT_CROSS_PROCESS", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "dir": os.getenv("SINGLE_FLIGHT_DIR", ".inflight"),
+    "wait_timeout": float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "900")),
+    "stale_seconds": float(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "30"))
+}
+
+# ======= GERAÇÃO ESPECULATIVA DE VARIANTES =======
+# Depois da resposta principal, gera em segundo plano as variantes um nível
+# mais fácil e mais difícil e as deixa no cache de respostas: o próximo
+# pedido ("variant easier"/"variant harder") sai na hora.
+SPECULATIVE_CONFIG = {
+    "enabled": os.getenv("SPECULATIVE_GENERATION", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "variants": [v.strip() for v in os.getenv("SPECULATIVE_VARIANTS", "easier,harder").split(",")
+                 if v.strip() in ("primary", "easier", "harder")],
+    "max_wait": float(os.getenv("SPECULATIVE_MAX_WAIT", "600"))
+}
+
+# ======= STREAMING =======
+# Recebe a resposta em streaming (SSE), valida o chart linha a linha e
+# interrompe a geração assim que a saída estiver malformada.
+STREAM_CONFIG = {
+    "enabled": os.getenv("API_STREAM", "false").strip().lower() in ("1", "true", "yes", "sim")
+}
+
+# ======= GERAÇÃO HEDGED (MÚLTIPLAS APIS) =======
+# Envia a mesma requisição a várias APIs ao mesmo tempo e usa a primeira
+# resposta com chart válido. HEDGED_APIS vazio = todas as APIs com chave válida.
+HEDGE_CONFIG = {
+    "enabled": os.getenv("HEDGED_GENERATION", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "apis": [name.strip() for name in os.getenv("HEDGED_APIS", "").split(",") if name.strip()],
+    "delay": float(os.getenv("HEDGE_DELAY", "0"))
+}
+
 # ======= MODELOS DISPONÍVEIS POR API =======
 AVAILABLE_MODELS = {
     "deepseek": {
@@ -90,17 +254,198 @@ AVAILABLE_MODELS = {
     }
 }
 
+# ======= LIMITES DE TOKENS POR MODELO =======
+# context: janela total (prompt + resposta); max_output: maior max_tokens aceito
+MODEL_LIMITS = {
+    "deepseek-chat": {"context": 64000, "max_output": 8192},
+    "deepseek-coder": {"context": 64000, "max_output": 8192},
+    "deepseek-math": {"context": 4096, "max_output": 4096},
+    "gpt-5": {"context": 400000, "max_output": 128000},
+    "gpt-4o": {"context": 128000, "max_output": 16384},
+    "gpt-4": {"context": 8192, "max_output": 8192},
+    "gpt-3.5-turbo": {"context": 16385, "max_output": 4096},
+    "gpt-4o-mini": {"context": 128000, "max_output": 16384},
+    "claude-3-7-sonnet-20250219": {"context": 200000, "max_output": 64000},
+    "claude-sonnet-4-20250514": {"context": 200000, "max_output": 64000},
+    "claude-3-5-haiku-20241022": {"context": 200000, "max_output": 8192},
+    "claude-opus-4-20250514": {"context": 200000, "max_output": 32000}
+}
+DEFAULT_MODEL_LIMITS = {"context": 16000, "max_output": 4096}
+
+# ======= PREÇOS POR MODELO =======
+# USD por 1 milhão de tokens (entrada, saída); usado na estimativa de custo da telemetria
+MODEL_PRICING = {
+    "deepseek-chat": {"input": 0.27, "output": 1.10},
+    "deepseek-coder": {"input": 0.27, "output": 1.10},
+    "deepseek-math": {"input": 0.27, "output": 1.10},
+    "gpt-5": {"input": 1.25, "output": 10.0},
+    "gpt-4o": {"input": 2.50, "output": 10.0},
+    "gpt-4": {"input": 30.0, "output": 60.0},
+    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "claude-3-7-sonnet-20250219": {"input": 3.0, "output": 15.0},
+    "claude-sonnet-4-20250514": {"input": 3.0, "output": 15.0},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.0},
+    "claude-opus-4-20250514": {"input": 15.0, "output": 75.0}
+}
+
+# ======= TELEMETRIA E ESCOLHA AUTOMÁTICA DE MODELO =======
+# Cada chamada grava latência, tokens, custo e validade do chart em um SQLite
+# local. Com MODEL_AUTO_SELECT, usa o modelo (das APIs com chave) de menor p95
+# entre os que têm pelo menos TELEMETRY_MIN_VALIDITY de charts válidos em
+# charts de tamanho parecido (mínimo de TELEMETRY_MIN_SAMPLES chamadas).
+TELEMETRY_CONFIG = {
+    "enabled": os.getenv("TELEMETRY_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "db": os.getenv("TELEMETRY_DB", ".telemetry.sqlite3"),
+    "auto_select": os.getenv("MODEL_AUTO_SELECT", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "min_validity": float(os.getenv("TELEMETRY_MIN_VALIDITY", "0.9")),
+    "min_samples": int(os.getenv("TELEMETRY_MIN_SAMPLES", "5"))
+}
+
+# ======= LIMITES DE TAXA POR PROVEDOR =======
+# Requisições por minuto (rpm), tokens por minuto (tpm, prompt + max_tokens)
+# e requisições simultâneas por (API, modelo). 0 = sem limite. Ajuste para
+# o tier da sua conta; com 429 a taxa é reduzida automaticamente.
+RATE_LIMIT_CONFIG = {
+    "enabled": os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() in ("1", "true", "yes", "sim"),
+    "providers": {
+        "deepseek": {
+            "rpm": int(os.getenv("DEEPSEEK_RPM", "60")),
+            "tpm": int(os.getenv("DEEPSEEK_TPM", "0")),
+            "concurrency": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8"))
+        },
+        "openai": {
+            "rpm": int(os.getenv("OPENAI_RPM", "500")),
+            "tpm": int(os.getenv("OPENAI_TPM", "30000")),
+            "concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        },
+        "claude": {
+            "rpm": int(os.getenv("CLAUDE_RPM", "50")),
+            "tpm": int(os.getenv("CLAUDE_TPM", "30000")),
+            "concurrency": int(os.getenv("CLAUDE_MAX_CONCURRENCY", "4"))
+        }
+    }
+}
+# Sobrescritas por modelo (só as chaves informadas), ex.: {"gpt-4o-mini": {"tpm": 200000}}
+MODEL_RATE_LIMITS = {
+    "gpt-4o-mini": {"tpm": 200000},
+    "claude-3-5-haiku-20241022": {"tpm": 50000}
+}
+
+# ======= ORÇAMENTO ADAPTATIVO DE TOKENS =======
+# Estima tokens do prompt e da resposta a partir do chart e define max_tokens
+# por requisição (em vez de sempre API_MAX_TOKENS). Se o chart não couber no
+# modelo, usa outro modelo da mesma API (se permitido) ou a geração em partes.
+# Opcional (ADAPTIVE_MAX_TOKENS=true): desligado, nada muda nas requisições.
+TOKEN_BUDGET_CONFIG = {
+    "enabled": os.getenv("ADAPTIVE_MAX_TOKENS", "false").strip().lower() in ("1", "true", "yes", "sim"),
+    "margin": float(os.getenv("TOKEN_BUDGET_MARGIN", "1.25")),
+    "min_tokens": int(os.getenv("TOKEN_BUDGET_MIN", "512")),
+    "allow_model_switch": os.getenv("TOKEN_BUDGET_SWITCH_MODEL", "false").strip().lower() in ("1", "true", "yes", "sim")
+}
+
 # ======= FUNÇÕES DE CONFIGURAÇÃO =======
-def get_api_config():
-    """Retorna a configuração atual da API"""
-    return API_CONFIG.copy()
+def resolve_provider_config(api_name=None, model=None):
+    """
+    Resolve a configuração imutável de (API, modelo) para uma requisição.
+
+    Sem api_name usa a API padrão do processo; sem model usa o modelo
+    selecionado para a API padrão ou o do .env para as demais.
+    """
+    default = _DEFAULT_PROVIDER
+    if api_name is None or api_name == default.api:
+        provider = default
+    elif api_name in API_CONFIGS:
+        provider = _provider_from_env(api_name)
+    else:
+        raise ValueError(f"API '{api_name}' não disponível. Opções: {list(API_CONFIGS.keys())}")
+    return provider.with_model(model)
+
+def get_api_config(api_name=None):
+    """Retorna a configuração atual da API (ou de uma API específica) como dict"""
+    config = API_CONFIGS[api_name or _DEFAULT_PROVIDER.api].copy()
+    config["model"] = resolve_provider_config(api_name).model
+    return config
+
+def get_configured_apis():
+    """Retorna as APIs com chave válida, começando pela API ativa"""
+    active = _DEFAULT_PROVIDER.api
+    ordered = [active] + [name for name in API_CONFIGS if name != active]
+    return [name for name in ordered if validate_api_key(API_CONFIGS[name]["key"])]
+
+def get_retry_config():
+    """Retorna a configuração de conexão, timeouts e retry"""
+    return RETRY_CONFIG.copy()
+
+def get_prompt_config():
+    """Retorna a configuração de formato do prompt"""
+    return PROMPT_CONFIG.copy()
+
+def get_chunk_config():
+    """Retorna a configuração da geração em partes"""
+    return CHUNK_CONFIG.copy()
+
+def get_batch_config():
+    """Retorna a configuração da geração em lote"""
+    return BATCH_CONFIG.copy()
+
+def get_trace_config():
+    """Retorna a configuração do trace de execução"""
+    return TRACE_CONFIG.copy()
+
+def get_telemetry_config():
+    """Retorna a configuração da telemetria e da escolha automática de modelo"""
+    return TELEMETRY_CONFIG.copy()
+
+def get_model_pricing(model_name):
+    """Retorna o preço (USD por 1M tokens) do modelo, ou None se não cadastrado"""
+    price = MODEL_PRICING.get(model_name)
+    return price.copy() if price else None
+
+def get_artifact_config():
+    """Retorna a configuração do armazenamento de artefatos"""
+    return ARTIFACT_CONFIG.copy()
+
+def get_single_flight_config():
+    """Retorna a configuração da deduplicação de requisições em andamento"""
+    return SINGLE_FLIGHT_CONFIG.copy()
+
+def get_speculative_config():
+    """Retorna a configuração da geração especulativa de variantes"""
+    config = SPECULATIVE_CONFIG.copy()
+    config["variants"] = list(config["variants"])
+    return config
+
+def get_rate_limit(api_name, model_name=None):
+    """Retorna os limites de taxa de (API, modelo), ou None se desligados/não configurados"""
+    if not RATE_LIMIT_CONFIG["enabled"] or api_name not in RATE_LIMIT_CONFIG["providers"]:
+        return None
+    limits = RATE_LIMIT_CONFIG["providers"][api_name].copy()
+    limits.update(MODEL_RATE_LIMITS.get(model_name, {}))
+    return limits
+
+def get_model_limits(model_name):
+    """Retorna os limites de tokens do modelo (ou um padrão conservador)"""
+    return MODEL_LIMITS.get(model_name, DEFAULT_MODEL_LIMITS).copy()
+
+def get_token_budget_config():
+    """Retorna a configuração do orçamento adaptativo de tokens"""
+    return TOKEN_BUDGET_CONFIG.copy()
+
+def get_stream_config():
+    """Retorna a configuração do modo streaming"""
+    return STREAM_CONFIG.copy()
+
+def get_hedge_config():
+    """Retorna a configuração do modo hedged (múltiplas APIs em paralelo)"""
+    return HEDGE_CONFIG.copy()
 
 def set_active_api(api_name):
-    """Muda a API ativa"""
-    global API_CONFIG, ACTIVE_API
+    """Muda a API padrão do processo (requisições já resolvidas não mudam)"""
+    global _DEFAULT_PROVIDER
     if api_name in API_CONFIGS:
-        ACTIVE_API = api_name
-        API_CONFIG = API_CONFIGS[api_name].copy()
+        with _SELECTION_LOCK:
+            _DEFAULT_PROVIDER = _provider_from_env(api_name)
         print(f"✅ API alterada para: {api_name}")
         return True
     else:
@@ -109,7 +454,7 @@ def set_active_api(api_name):
 
 def get_active_api():
     """Retorna o nome da API ativa"""
-    return ACTIVE_API
+    return _DEFAULT_PROVIDER.api
 
 def get_available_apis():
     """Retorna as APIs disponíveis"""
@@ -118,22 +463,27 @@ def get_available_apis():
 def get_available_models(api_name=None):
     """Retorna os modelos disponíveis para a API especificada ou ativa"""
     if api_name is None:
-        api_name = ACTIVE_API
+        api_name = _DEFAULT_PROVIDER.api
     return AVAILABLE_MODELS.get(api_name, {})
 
 def set_model(model_name):
-    """Altera o modelo da API ativa"""
-    global API_CONFIG
+    """Altera o modelo padrão da API ativa (requisições já resolvidas não mudam)"""
+    global _DEFAULT_PROVIDER
     available = get_available_models()
     if model_name in available:
-        API_CONFIG["model"] = model_name
+        with _SELECTION_LOCK:
+            _DEFAULT_PROVIDER = _DEFAULT_PROVIDER.with_model(model_name)
         print(f"✅ Modelo alterado para: {model_name}")
         return True
     else:
-        print(f"❌ Modelo '{model_name}' não disponível para {ACTIVE_API}")
+        print(f"❌ Modelo '{model_name}' não disponível para {_DEFAULT_PROVIDER.api}")
         print(f"   Opções: {list(available.keys())}")
         return False
 
+def get_cache_config():
+    """Retorna a configuração do cache de respostas da IA"""
+    return CACHE_CONFIG.copy()
+
 def validate_api_key(api_key):
     """Valida se a API key tem formato correto"""
     if not api_key or len(api_key) < 20:
@@ -145,13 +495,13 @@ def check_api_keys_loaded():
     print("\n=== VERIFICAÇÃO DE CHAVES DE API ===")
     
     # Verifica chave ativa
-    active_config = API_CONFIGS[ACTIVE_API]
-    active_key = active_config["key"]
+    active_api = get_active_api()
+    active_key = API_CONFIGS[active_api]["key"]
     
     if validate_api_key(active_key):
-        print(f"✅ Chave da API ativa ({ACTIVE_API}): carregada corretamente")
+        print(f"✅ Chave da API ativa ({active_api}): carregada corretamente")
     else:
-        print(f"❌ Chave da API ativa ({ACTIVE_API}): NÃO carregada ou inválida")
+        print(f"❌ Chave da API ativa ({active_api}): NÃO carregada ou inválida")
         print("💡 Verifique se o arquivo .env existe e contém a chave correta")
     
     # Verifica todas as chaves
@@ -177,31 +527,30 @@ def load_from_environment():
 
 def show_config():
     """Mostra a configuração atual"""
+    provider = resolve_provider_config()
     print("=== CONFIGURAÇÃO ATUAL DA API ===")
-    print(f"🔗 API Ativa: {ACTIVE_API.upper()}")
-    print(f"🌐 URL: {API_CONFIG['url']}")
-    print(f"🔑 API Key: {API_CONFIG['key'][:10]}...{API_CONFIG['key'][-4:]}")
-    print(f"🤖 Modelo: {API_CONFIG['model']}")
-    print(f"⏱️ Timeout: {API_CONFIG['timeout']}s")
+    print(f"🔗 API Ativa: {provider.api.upper()}")
+    print(f"🌐 URL: {provider.url}")
+    print(f"🔑 API Key: {provider.key[:10]}...{provider.key[-4:]}")
+    print(f"🤖 Modelo: {provider.model}")
+    print(f"⏱️ Timeout: {provider.timeout}s")
     
     # Mostra o parâmetro correto baseado na API
-    if ACTIVE_API == "openai":
-        tokens_value = API_CONFIG.get('max_completion_tokens', 'N/A')
-        print(f"📝 Max Completion Tokens: {tokens_value}")
+    if provider.api == "openai":
+        print(f"📝 Max Completion Tokens: {provider.max_tokens}")
     else:
-        tokens_value = API_CONFIG.get('max_tokens', 'N/A')
-        print(f"📝 Max Tokens: {tokens_value}")
+        print(f"📝 Max Tokens: {provider.max_tokens}")
     
-    print(f"🌡️ Temperature: {API_CONFIG.get('temperature', 'N/A')}")
+    print(f"🌡️ Temperature: {provider.temperature}")
     
-    print(f"\n📋 Modelos disponíveis para {ACTIVE_API}:")
-    for model, desc in get_available_models().items():
-        status = "✅" if model == API_CONFIG['model'] else "  "
+    print(f"\n📋 Modelos disponíveis para {provider.api}:")
+    for model, desc in get_available_models(provider.api).items():
+        status = "✅" if model == provider.model else "  "
         print(f"   {status} {model}: {desc}")
     
     print(f"\n🔄 APIs disponíveis:")
     for api in get_available_apis():
-        status = "✅" if api == ACTIVE_API else "  "
+        status = "✅" if api == provider.api else "  "
         print(f"   {status} {api}")
 
 # Verifica chaves automaticamente ao importar
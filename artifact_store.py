@@ -0,0 +1,344 @@
+"""
+Artifact Store Module
+
+Este módulo contém o armazenamento dos artefatos de cada execução
+(requisição enviada, resposta da IA, chart extraído e trace), no lugar dos
+arquivos de debug soltos na pasta atual:
+
+- Conteúdo comprimido (gzip ou lzma) e endereçado pelo hash SHA-256:
+  conteúdo repetido (ex.: a mesma resposta salva duas vezes) ocupa disco
+  uma única vez
+- Índice SQLite por execução, tipo e hash: a resposta de uma execução
+  passada é encontrada sem varrer arquivos
+- Retenção por número de execuções, idade e tamanho total
+
+Layout da pasta:
+    index.sqlite3
+    blobs/ab/abcdef....gz
+
+Author: Generated for StepMania Analysis
+"""
+
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, List, Any, Optional, Union
+
+from api_config import get_artifact_config
+
+
+COMPRESSORS = {
+    "gzip": (".gz", lambda data: gzip.compress(data, compresslevel=6), gzip.decompress),
+    "lzma": (".xz", lambda data: lzma.compress(data, preset=6), lzma.decompress)
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    meta TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_run ON artifacts (run_id, kind);
+CREATE INDEX IF NOT EXISTS artifacts_hash ON artifacts (hash);
+"""
+
+_INITIALIZED = set()
+_LOCK = threading.Lock()
+
+
+def _connect(store_dir: str) -> sqlite3.Connection:
+    """Abre o índice da pasta (criando a estrutura na primeira vez neste processo)"""
+    os.makedirs(os.path.join(store_dir, "blobs"), exist_ok=True)
+    connection = sqlite3.connect(os.path.join(store_dir, "index.sqlite3"), timeout=10)
+    if store_dir not in _INITIALIZED:
+        with _LOCK:
+            connection.executescript(_SCHEMA)
+            _INITIALIZED.add(store_dir)
+    return connection
+
+
+def make_run_id() -> str:
+    """Gera um id de execução ordenável pelo horário (ex.: 20250101-120000-a1b2c3)"""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def put_artifact(store_dir: str, run_id: str, kind: str, content: Union[str, bytes],
+                 compression: str = "gzip", meta: Optional[Dict[str, Any]] = None,
+                 run_name: str = "main") -> Dict[str, Any]:
+    """
+    Guarda um artefato da execução (o conteúdo só é gravado se ainda não existir).
+
+    Args:
+        store_dir (str): Pasta do armazenamento
+        run_id (str): Id da execução
+        kind (str): Tipo do artefato ("request", "response", "chart", "trace", ...)
+        content (Union[str, bytes]): Conteúdo (texto é gravado em UTF-8)
+        compression (str): "gzip" ou "lzma"
+        meta (Optional[Dict[str, Any]]): Metadados (ex.: API e modelo)
+        run_name (str): Nome da execução, se ela ainda não estiver no índice
+
+    Returns:
+        Dict[str, Any]: hash, path, size, stored_size e new (False se o
+            conteúdo já estava guardado)
+
+    Example:
+        >>> info = put_artifact(".artifacts", run_id, "response", ai_response)
+        >>> print(info["hash"][:12], info["stored_size"])
+    """
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    digest = hashlib.sha256(data).hexdigest()
+    extension, compress, _ = COMPRESSORS[compression]
+    now = time.time()
+
+    with closing(_connect(store_dir)) as connection, connection:
+        connection.execute("INSERT OR IGNORE INTO runs (run_id, name, created) VALUES (?, ?, ?)",
+                           (run_id, run_name, now))
+        row = connection.execute("SELECT path, size, stored_size FROM blobs WHERE hash = ?",
+                                 (digest,)).fetchone()
+        is_new = row is None or not os.path.exists(os.path.join(store_dir, row[0]))
+        if is_new:
+            relative_path = os.path.join("blobs", digest[:2], digest + extension)
+            full_path = os.path.join(store_dir, relative_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            compressed = compress(data)
+            temp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(temp_path, full_path)
+            row = (relative_path, len(data), len(compressed))
+            connection.execute("INSERT OR REPLACE INTO blobs (hash, path, size, stored_size) VALUES (?, ?, ?, ?)",
+                               (digest, *row))
+        connection.execute("INSERT INTO artifacts (run_id, kind, hash, meta, created) VALUES (?, ?, ?, ?, ?)",
+                           (run_id, kind, digest, json.dumps(meta, ensure_ascii=False) if meta else None, now))
+
+    return {"hash": digest, "path": os.path.join(store_dir, row[0]), "size": row[1],
+            "stored_size": row[2], "new": is_new}
+
+
+def _read_blob(store_dir: str, relative_path: str) -> bytes:
+    extension = os.path.splitext(relative_path)[1]
+    decompress = next(entry[2] for entry in COMPRESSORS.values() if entry[0] == extension)
+    with open(os.path.join(store_dir, relative_path), "rb") as f:
+        return decompress(f.read())
+
+
+def get_artifact(store_dir: str, ref: str, kind: str = "response") -> Optional[str]:
+    """
+    Lê um artefato pelo hash (ou prefixo), pelo id da execução ou "latest".
+
+    Args:
+        store_dir (str): Pasta do armazenamento
+        ref (str): Hash/prefixo do conteúdo, id da execução ou "latest"
+        kind (str): Tipo do artefato quando ref é uma execução
+
+    Returns:
+        Optional[str]: Conteúdo (o último do tipo na execução), ou None se
+            não encontrado
+
+    Example:
+        >>> response = get_artifact(".artifacts", "latest", "response")
+        >>> chart = get_artifact(".artifacts", "20250101-120000-a1b2c3", "chart")
+    """
+    if not os.path.exists(os.path.join(store_dir, "index.sqlite3")):
+        return None
+    with closing(_connect(store_dir)) as connection:
+        if ref == "latest":
+            query, params = ("SELECT b.path FROM artifacts a JOIN blobs b ON a.hash = b.hash "
+                             "WHERE a.kind = ? ORDER BY a.id DESC LIMIT 1", (kind,))
+        elif connection.execute("SELECT 1 FROM runs WHERE run_id = ?", (ref,)).fetchone():
+            query, params = ("SELECT b.path FROM artifacts a JOIN blobs b ON a.hash = b.hash "
+                             "WHERE a.run_id = ? AND a.kind = ? ORDER BY a.id DESC LIMIT 1", (ref, kind))
+        else:
+            query, params = "SELECT path FROM blobs WHERE hash >= ? AND hash < ? LIMIT 2", (ref, ref + "g")
+        rows = connection.execute(query, params).fetchall()
+
+    if len(rows) != 1:
+        return None
+    try:
+        return _read_blob(store_dir, rows[0][0]).decode("utf-8", errors="replace")
+    except (OSError, StopIteration):
+        return None
+
+
+def list_runs(store_dir: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Lista as execuções mais recentes e seus artefatos.
+
+    Args:
+        store_dir (str): Pasta do armazenamento
+        limit (int): Número máximo de execuções
+
+    Returns:
+        List[Dict[str, Any]]: run_id, name, created e artifacts (kind, hash,
+            size, stored_size, meta), da mais recente para a mais antiga
+    """
+    if not os.path.exists(os.path.join(store_dir, "index.sqlite3")):
+        return []
+    with closing(_connect(store_dir)) as connection:
+        runs = connection.execute("SELECT run_id, name, created FROM runs ORDER BY created DESC LIMIT ?",
+                                  (limit,)).fetchall()
+        result = []
+        for run_id, name, created in runs:
+            artifacts = connection.execute(
+                "SELECT a.kind, a.hash, b.size, b.stored_size, a.meta FROM artifacts a "
+                "JOIN blobs b ON a.hash = b.hash WHERE a.run_id = ? ORDER BY a.id", (run_id,)
+            ).fetchall()
+            result.append({
+                "run_id": run_id,
+                "name": name,
+                "created": created,
+                "artifacts": [{"kind": kind, "hash": digest, "size": size, "stored_size": stored,
+                               "meta": json.loads(meta) if meta else {}}
+                              for kind, digest, size, stored, meta in artifacts]
+            })
+    return result
+
+
+def apply_retention(store_dir: str, keep_runs: int = 100, max_age_days: float = 30,
+                    max_bytes: int = 200 * 1024 * 1024) -> int:
+    """
+    Remove execuções antigas e o conteúdo que deixou de ser referenciado.
+
+    Mantém no máximo keep_runs execuções, nenhuma mais antiga que
+    max_age_days e, se o total comprimido passar de max_bytes, remove as
+    mais antigas até caber (0 desliga cada critério).
+
+    Args:
+        store_dir (str): Pasta do armazenamento
+        keep_runs (int): Máximo de execuções guardadas
+        max_age_days (float): Idade máxima das execuções em dias
+        max_bytes (int): Tamanho máximo do conteúdo comprimido
+
+    Returns:
+        int: Execuções removidas
+
+    Example:
+        >>> removed = apply_retention(".artifacts", keep_runs=50)
+    """
+    if not os.path.exists(os.path.join(store_dir, "index.sqlite3")):
+        return 0
+    with closing(_connect(store_dir)) as connection, connection:
+        runs = connection.execute("SELECT run_id, created FROM runs ORDER BY created DESC").fetchall()
+        cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+        expired = {run_id for index, (run_id, created) in enumerate(runs)
+                   if (keep_runs > 0 and index >= keep_runs) or (cutoff is not None and created < cutoff)}
+
+        if max_bytes > 0:
+            # Tamanho aproximado de cada execução: conteúdo compartilhado conta para todas que o usam
+            total = connection.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+            sizes = dict(connection.execute(
+                "SELECT a.run_id, SUM(b.stored_size) FROM (SELECT DISTINCT run_id, hash FROM artifacts) a "
+                "JOIN blobs b ON a.hash = b.hash GROUP BY a.run_id").fetchall())
+            total -= sum(sizes.get(run_id, 0) for run_id in expired)
+            # A execução mais recente nunca é removida por tamanho
+            for run_id, _ in reversed(runs[1:]):
+                if total <= max_bytes:
+                    break
+                if run_id not in expired:
+                    expired.add(run_id)
+                    total -= sizes.get(run_id, 0)
+
+        if not expired:
+            return 0
+        connection.executemany("DELETE FROM artifacts WHERE run_id = ?", [(run_id,) for run_id in expired])
+        connection.executemany("DELETE FROM runs WHERE run_id = ?", [(run_id,) for run_id in expired])
+        orphans = connection.execute(
+            "SELECT hash, path FROM blobs WHERE hash NOT IN (SELECT DISTINCT hash FROM artifacts)").fetchall()
+        connection.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest, _ in orphans])
+
+    for _, relative_path in orphans:
+        try:
+            os.remove(os.path.join(store_dir, relative_path))
+        except OSError:
+            pass
+    return len(expired)
+
+
+# ======= EXECUÇÃO ATUAL =======
+# main() abre uma execução; as funções do pipeline gravam nela com
+# save_run_artifact sem precisar receber o id.
+_ACTIVE_RUN: Optional[str] = None
+_ACTIVE_NAME = "main"
+
+
+def begin_artifact_run(name: str = "main", run_id: Optional[str] = None) -> Optional[str]:
+    """
+    Abre a execução que recebe os artefatos e aplica a retenção configurada.
+
+    Args:
+        name (str): Nome da execução
+        run_id (Optional[str]): Id a usar (ex.: o mesmo do trace); padrão: novo id
+
+    Returns:
+        Optional[str]: Id da execução, ou None se o armazenamento estiver desligado
+    """
+    global _ACTIVE_RUN, _ACTIVE_NAME
+    cfg = get_artifact_config()
+    if not cfg["enabled"]:
+        _ACTIVE_RUN = None
+        return None
+    try:
+        removed = apply_retention(cfg["dir"], cfg["keep_runs"], cfg["max_age_days"], cfg["max_bytes"])
+        if removed:
+            print(f"🧹 Artefatos: {removed} execuções antigas removidas")
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Não foi possível aplicar a retenção dos artefatos: {e}")
+    _ACTIVE_RUN = run_id or make_run_id()
+    _ACTIVE_NAME = name
+    return _ACTIVE_RUN
+
+
+def save_run_artifact(kind: str, content: Union[str, bytes], **meta) -> Optional[Dict[str, Any]]:
+    """
+    Guarda um artefato na execução atual (não faz nada sem execução aberta).
+
+    Falhas de disco são avisadas e ignoradas: artefatos nunca interrompem o pipeline.
+
+    Args:
+        kind (str): Tipo do artefato
+        content (Union[str, bytes]): Conteúdo
+        **meta: Metadados do artefato
+
+    Returns:
+        Optional[Dict[str, Any]]: Resultado de put_artifact, ou None
+
+    Example:
+        >>> save_run_artifact("response", ai_response, api="deepseek")
+    """
+    run_id = _ACTIVE_RUN
+    if not run_id or not content:
+        return None
+    cfg = get_artifact_config()
+    try:
+        return put_artifact(cfg["dir"], run_id, kind, content, cfg["compression"], meta or None,
+                            run_name=_ACTIVE_NAME)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Não foi possível guardar o artefato {kind}: {e}")
+        return None
+
+
+def end_artifact_run() -> None:
+    """Fecha a execução atual"""
+    global _ACTIVE_RUN
+    _ACTIVE_RUN = None
@@ -0,0 +1,293 @@
+"""
+Batch Runner Module
+
+Este módulo contém a execução em lote de jobs de geração (música,
+dificuldade, replay) a partir de um manifesto: a leitura do .sm e a
+análise do replay rodam em processos separados, as chamadas à IA rodam
+com concorrência limitada e cada job gera um registro de resultado em
+JSONL (gravado assim que o job termina).
+
+Formato do manifesto (JSON):
+    {
+      "defaults": {"sm_filename": "Stepchart.sm", "mode": "ai"},
+      "jobs": [
+        {"id": "ana-soul-sister", "song_folder": "C:/Songs/Hey, Soul Sister",
+         "difficulty": "Beginner", "replay": "C:/Replays/ana_123",
+         "output": "C:/Saida/ana_Soul_Sister.sm"},
+        {"sm_path": "C:/Songs/*/Stepchart.sm", "difficulty": "Easy",
+         "replays_dir": "C:/Games/Etterna/Save/ReplaysV2", "mode": "local"},
+        {"id": "bia-claude", "song_folder": "C:/Songs/Hey, Soul Sister",
+         "replay": "C:/Replays/bia_7", "api": "claude", "model": "claude-3-5-haiku-20241022"}
+      ]
+    }
+Também aceita uma lista de jobs ou JSONL (um job por linha). sm_path
+aceita padrões glob (um job por arquivo encontrado). "api" e "model" são
+opcionais (padrão: API e modelo selecionados). "library" (pasta, glob ou
+lista) é onde --skip-existing procura variantes já geradas de charts
+quase duplicados (padrão: a pasta da música; ver duplicate_detector.py).
+
+Sem "output", o chart vai para <nome>_<dificuldade>_LearnMode.sm; se
+mais de um job gera a mesma música e dificuldade, o id do job entra no
+nome (<nome>_<dificuldade>_<id>_LearnMode.sm) para um não sobrescrever o
+outro. Dois jobs com o mesmo "output" são recusados.
+
+Author: Generated for StepMania Analysis
+"""
+
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Any, Callable, Optional
+
+from replay_extractor import get_latest_replay_data, parse_replay_data, analyze_performance
+from chart_extractor import (
+    extract_chart_data,
+    save_modified_chart,
+    learn_mode_path,
+    read_file_with_encoding,
+    split_measures
+)
+from chart_validator import repair_chart
+from telemetry import record_validation, track_calls
+
+
+DEFAULT_SM_FILENAME = "Stepchart.sm"
+
+
+def load_manifest(manifest_path: str) -> List[Dict[str, Any]]:
+    """
+    Lê o manifesto e retorna a lista de jobs já expandida.
+
+    Args:
+        manifest_path (str): Caminho do manifesto (.json ou .jsonl)
+
+    Returns:
+        List[Dict[str, Any]]: Jobs com sm_path, difficulty, mode e id definidos
+
+    Raises:
+        ValueError: Se o manifesto não tiver jobs, um job não tiver .sm/replay
+            ou dois jobs tiverem o mesmo id ou o mesmo arquivo de saída
+
+    Example:
+        >>> jobs = load_manifest("turma.json")
+        >>> print(f"{len(jobs)} jobs")
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if manifest_path.lower().endswith(".jsonl"):
+        data: Any = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        data = json.loads(text)
+
+    defaults: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("jobs", [])
+    if not data:
+        raise ValueError(f"Nenhum job no manifesto {manifest_path}")
+
+    jobs = []
+    for number, entry in enumerate(data, 1):
+        job = {**defaults, **entry}
+        sm_pattern = job.get("sm_path")
+        if not sm_pattern and job.get("song_folder"):
+            sm_pattern = os.path.join(job["song_folder"], job.get("sm_filename", DEFAULT_SM_FILENAME))
+        if not sm_pattern:
+            raise ValueError(f"Job {number}: informe sm_path ou song_folder")
+        if not job.get("replay") and not job.get("replays_dir"):
+            raise ValueError(f"Job {number}: informe replay ou replays_dir")
+
+        sm_paths = sorted(glob.glob(sm_pattern)) if glob.has_magic(sm_pattern) else [sm_pattern]
+        for sm_path in sm_paths:
+            expanded = dict(job, sm_path=sm_path)
+            expanded.setdefault("difficulty", "")
+            expanded.setdefault("mode", "ai")
+            base_id = job.get("id", f"job{number}")
+            if len(sm_paths) > 1:
+                song = os.path.basename(os.path.dirname(sm_path)) or os.path.basename(sm_path)
+                expanded["id"] = f"{base_id}:{song}"
+            else:
+                expanded["id"] = base_id
+            jobs.append(expanded)
+
+    _assign_outputs(jobs)
+    return jobs
+
+
+def _output_tag(job_id: str) -> str:
+    """Id do job usável no nome do arquivo ('ana:Soul Sister' -> 'ana-Soul-Sister')"""
+    return re.sub(r"[^0-9A-Za-z-]+", "-", job_id).strip("-") or "job"
+
+
+def _assign_outputs(jobs: List[Dict[str, Any]]) -> None:
+    """Garante um arquivo de saída por job (output_tag nos que dividiriam o nome padrão)"""
+    ids = set()
+    for job in jobs:
+        if job["id"] in ids:
+            raise ValueError(f"Id de job repetido no manifesto: {job['id']}")
+        ids.add(job["id"])
+
+    # Mesma música e dificuldade sem "output": o nome padrão seria o mesmo
+    shared: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for job in jobs:
+        if not job.get("output"):
+            key = (os.path.normcase(os.path.abspath(job["sm_path"])), job["difficulty"].strip().lower())
+            shared.setdefault(key, []).append(job)
+    for group in shared.values():
+        if len(group) > 1:
+            for job in group:
+                job["output_tag"] = _output_tag(job["id"])
+
+    outputs: Dict[str, str] = {}
+    for job in jobs:
+        output = job.get("output") or learn_mode_path(job["sm_path"], job["difficulty"], job.get("output_tag", ""))
+        key = os.path.normcase(os.path.abspath(output))
+        if key in outputs:
+            raise ValueError(f"Jobs {outputs[key]} e {job['id']} gravariam no mesmo arquivo: {output}")
+        outputs[key] = job["id"]
+
+
+def prepare_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lê o replay e o chart do job (roda em um processo do pool).
+
+    Args:
+        job (Dict[str, Any]): Job do manifesto
+
+    Returns:
+        Dict[str, Any]: chart_data, difficulty_name, difficulty_data,
+            performance_stats e prepare_seconds; ou error em caso de falha
+    """
+    started = time.monotonic()
+    try:
+        if job.get("replay"):
+            with open(job["replay"], "r", encoding="utf-8") as f:
+                replay_data = f.read()
+        else:
+            replay_data = get_latest_replay_data(job["replays_dir"])
+        if not replay_data:
+            return {"error": "replay não encontrado"}
+
+        analysis = analyze_performance(parse_replay_data(replay_data))
+        chart_data, difficulty_name, difficulty_data = extract_chart_data(
+            job["sm_path"], job["difficulty"], interactive=False
+        )
+        if not chart_data:
+            return {"error": f"dificuldade '{job['difficulty']}' não encontrada em {job['sm_path']}"}
+
+        return {
+            "chart_data": chart_data,
+            "difficulty_name": difficulty_name,
+            "difficulty_data": difficulty_data,
+            "performance_stats": analysis["performance_stats"],
+            "prepare_seconds": round(time.monotonic() - started, 3)
+        }
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def _generate_tracked(generate: Callable[[Dict[str, Any], Dict[str, Any]], str],
+                      job: Dict[str, Any], prepared: Dict[str, Any]) -> Tuple[str, List[int]]:
+    """Gera a resposta do job e retorna junto os ids das chamadas que a produziram"""
+    with track_calls() as call_ids:
+        response = generate(job, prepared)
+    return response, call_ids
+
+
+def _finish_job(job: Dict[str, Any], prepared: Dict[str, Any], response: str,
+                extract: Callable[[str], str], call_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Extrai, repara e salva o chart gerado; retorna os campos do registro"""
+    chart = extract(response)
+    chart, fixes = repair_chart(chart, prepared["chart_data"]) if chart else ("", ["chart não encontrado na resposta"])
+    # Resultado da validação entra na telemetria das chamadas deste job
+    record_validation(call_ids or [], bool(chart))
+    if not chart:
+        return {"status": "error", "error": "; ".join(fixes)}
+
+    original_content = read_file_with_encoding(job["sm_path"])
+    saved_path = save_modified_chart(
+        job["sm_path"], chart, prepared["difficulty_name"],
+        prepared["difficulty_data"], original_content, output_path=job.get("output"),
+        tag=job.get("output_tag", "")
+    )
+    return {"status": "ok", "output": saved_path,
+            "measures": len(split_measures(chart)), "fixes": fixes}
+
+
+def run_batch(jobs: List[Dict[str, Any]],
+              generate: Callable[[Dict[str, Any], Dict[str, Any]], str],
+              extract: Callable[[str], str],
+              results_path: str, workers: int = 2, concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Executa os jobs: preparação em processos, geração com concorrência limitada.
+
+    Args:
+        jobs (List[Dict[str, Any]]): Jobs de load_manifest
+        generate (Callable): Recebe o job e os dados preparados (chart_data,
+            performance_stats, ...) e retorna a resposta (chart em bloco de código)
+        extract (Callable[[str], str]): Extrai o chart (formato SM) da resposta
+        results_path (str): Arquivo JSONL de resultados (acrescenta uma linha por job)
+        workers (int): Processos para leitura do .sm e análise do replay
+        concurrency (int): Máximo de gerações simultâneas
+
+    Returns:
+        List[Dict[str, Any]]: Registros na ordem dos jobs (id, sm_path,
+            difficulty, mode, status, output, measures, fixes, error e tempos)
+
+    Example:
+        >>> records = run_batch(load_manifest("turma.json"), gen, extract, "resultados.jsonl")
+        >>> print(sum(r["status"] == "ok" for r in records), "charts gerados")
+    """
+    print(f"📦 Lote: {len(jobs)} jobs ({workers} processos, {concurrency} gerações simultâneas)")
+
+    async def run_all() -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        write_lock = asyncio.Lock()
+
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+
+            async def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+                started = time.monotonic()
+                record: Dict[str, Any] = {
+                    "id": job["id"], "sm_path": job["sm_path"],
+                    "difficulty": job["difficulty"], "mode": job["mode"]
+                }
+                prepared = await loop.run_in_executor(pool, prepare_job, job)
+                if "error" in prepared:
+                    record.update(status="error", error=prepared["error"])
+                else:
+                    record["prepare_seconds"] = prepared["prepare_seconds"]
+                    async with semaphore:
+                        generate_started = time.monotonic()
+                        try:
+                            response, call_ids = await asyncio.to_thread(_generate_tracked, generate, job, prepared)
+                            record.update(await asyncio.to_thread(_finish_job, job, prepared, response,
+                                                                  extract, call_ids))
+                        except Exception as e:
+                            record.update(status="error", error=f"{type(e).__name__}: {e}")
+                        record["generate_seconds"] = round(time.monotonic() - generate_started, 3)
+
+                record["seconds"] = round(time.monotonic() - started, 3)
+                icon = "✅" if record["status"] == "ok" else "❌"
+                print(f"{icon} [{record['id']}] {record.get('output') or record.get('error')}")
+
+                async with write_lock:
+                    with open(results_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                return record
+
+            return await asyncio.gather(*(run_job(job) for job in jobs))
+
+    started = time.monotonic()
+    records = asyncio.run(run_all())
+    ok = sum(1 for record in records if record["status"] == "ok")
+    print(f"📦 Lote concluído em {time.monotonic() - started:.1f}s: {ok}/{len(records)} charts gerados "
+          f"(resultados em {results_path})")
+    return records
+
@@ -0,0 +1,151 @@
+"""
+Benchmark Imports Module
+
+Este módulo mede o custo de inicialização do pipeline com
+`python -X importtime` e verifica que os subcomandos leves (config,
+cache-stats, trace, ...) não carregam as dependências pesadas: pandas,
+numpy, requests e asyncio só devem ser importados quando uma função que
+precisa delas é chamada.
+
+- Tempo total de import (soma dos módulos de primeiro nível)
+- Os módulos mais caros (tempo cumulativo)
+- Falha (código 1) se um módulo proibido for importado ou se o tempo
+  passar do orçamento
+
+Uso:
+    python benchmark_imports.py
+    python benchmark_imports.py --command config --budget-ms 150
+    python benchmark_imports.py --allow requests --top 20
+
+Author: Generated for StepMania Analysis
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple, Any, Optional
+
+
+# Dependências pesadas que não devem ser carregadas só pelo import do pipeline
+FORBIDDEN_MODULES = ("pandas", "numpy", "requests", "asyncio", "matplotlib")
+DEFAULT_TARGET = "PlayerStats_Modular"
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Converte a saída de `-X importtime` em registros por módulo.
+
+    Args:
+        stderr (str): Saída de erro do processo (linhas "import time: ...")
+
+    Returns:
+        List[Dict[str, Any]]: name, self_us, cumulative_us e depth (0 para
+            módulos importados diretamente)
+
+    Example:
+        >>> records = parse_importtime("import time:       120 |        450 |   json")
+        >>> records[0]["cumulative_us"]
+        450
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+            cumulative_us = int(parts[1])
+        except ValueError:
+            continue  # cabeçalho "self [us] | cumulative | imported package"
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append({"name": name.strip(), "self_us": self_us,
+                        "cumulative_us": cumulative_us, "depth": depth})
+    return records
+
+
+def measure_imports(target: str = DEFAULT_TARGET, command: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Executa o import (ou um subcomando) num processo novo e mede os imports.
+
+    Args:
+        target (str): Módulo a importar (ex.: "PlayerStats_Modular")
+        command (Optional[str]): Subcomando do script (ex.: "config"); None
+            mede só o import
+
+    Returns:
+        Dict[str, Any]: records (ver parse_importtime), total_ms, wall_ms,
+            modules (conjunto de nomes) e returncode
+    """
+    if command:
+        args = [sys.executable, "-X", "importtime", f"{target}.py", *command.split()]
+    else:
+        args = [sys.executable, "-X", "importtime", "-c", f"import {target}"]
+
+    started = time.perf_counter()
+    result = subprocess.run(args, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    records = parse_importtime(result.stderr)
+    # site e encodings são carregados por qualquer interpretador
+    top_level = [r for r in records if r["depth"] == 0 and r["name"] not in ("site", "encodings")]
+    return {
+        "records": records,
+        "total_ms": sum(r["cumulative_us"] for r in top_level) / 1000,
+        "wall_ms": wall_ms,
+        "modules": {r["name"] for r in records},
+        "returncode": result.returncode
+    }
+
+
+def find_forbidden(modules: set, forbidden: Tuple[str, ...]) -> List[str]:
+    """Pacotes proibidos (ou submódulos deles) presentes na lista de imports"""
+    return sorted({name for name in forbidden
+                   if any(m == name or m.startswith(name + ".") for m in modules)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mede o tempo de import do pipeline")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="módulo a importar")
+    parser.add_argument("--command", default=None, help="subcomando a executar (ex.: config)")
+    parser.add_argument("--budget-ms", type=float, default=0, help="tempo máximo de import (0 = sem limite)")
+    parser.add_argument("--allow", default="", help="módulos proibidos liberados (ex.: requests,asyncio)")
+    parser.add_argument("--top", type=int, default=10, help="quantos módulos mais caros mostrar")
+    args = parser.parse_args()
+
+    allowed = {name.strip() for name in args.allow.split(",") if name.strip()}
+    forbidden = tuple(name for name in FORBIDDEN_MODULES if name not in allowed)
+
+    label = f"{args.target} {args.command}" if args.command else f"import {args.target}"
+    print(f"⏱️ Medindo imports: {label}")
+    report = measure_imports(args.target, args.command)
+    if report["returncode"] != 0:
+        print(f"❌ O processo terminou com código {report['returncode']}")
+        sys.exit(1)
+
+    print(f"   Imports: {report['total_ms']:.1f} ms | processo: {report['wall_ms']:.1f} ms")
+    print(f"   {'Módulo':<40} {'Cumulativo':>12} {'Próprio':>10}")
+    for record in sorted(report["records"], key=lambda r: -r["cumulative_us"])[:args.top]:
+        print(f"   {record['name']:<40} {record['cumulative_us'] / 1000:>10.1f}ms "
+              f"{record['self_us'] / 1000:>8.1f}ms")
+
+    failed = False
+    loaded = find_forbidden(report["modules"], forbidden)
+    if loaded:
+        print(f"❌ Dependências pesadas carregadas no import: {', '.join(loaded)}")
+        failed = True
+    if args.budget_ms and report["total_ms"] > args.budget_ms:
+        print(f"❌ Tempo de import {report['total_ms']:.1f} ms acima do orçamento de {args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ Nenhuma dependência pesada carregada")
+
+
+if __name__ == "__main__":
+    main()
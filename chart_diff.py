@@ -0,0 +1,510 @@
+"""
+Chart Diff Module
+
+Este módulo contém o diff de charts usado pelo comparador
+(Similaridade.compare_chart_data), em duas camadas em vez de um
+SequenceMatcher sobre todas as linhas:
+
+1. As medidas (linhas até a ',' ou ';') são comparadas inteiras, por
+   hash, e alinhadas com o patience diff: medidas únicas nos dois lados
+   viram âncoras; entre âncoras, trechos de tamanhos diferentes usam o
+   diff de Myers em espaço linear (O((N+D)·D), N = medidas, D = medidas
+   diferentes)
+2. Trechos trocados com o mesmo número de medidas são pareados medida a
+   medida; nos outros, as medidas são realinhadas pelo número de linhas
+   (medidas inseridas ou removidas)
+3. Só então as linhas dentro de cada par de medidas alteradas são
+   comparadas, com o mesmo algoritmo
+4. Se o pareamento das medidas acha menos de ROW_FALLBACK_COVERAGE das
+   linhas do lado menor (medidas unidas ou divididas desalinham o
+   realinhamento por tamanho e podem criar âncoras erradas), o trecho
+   trocado, e depois o chart inteiro, é comparado linha a linha com o
+   Myers, se tiver até ROW_FALLBACK_MAX_ROWS linhas; vale o resultado com
+   mais linhas iguais
+
+Linhas repetidas ("0000") não atrapalham: elas só são comparadas dentro
+de medidas já pareadas (ou no fallback do passo 4). Dois charts de 10 mil
+linhas com edições pontuais são comparados em milissegundos; um chart todo
+reescrito, em menos de um segundo.
+
+Author: Generated for StepMania Analysis
+"""
+
+from typing import Dict, List, Tuple, Any, Hashable, Iterator, Sequence
+
+
+MEASURE_SEPARATORS = (',', ';')
+
+# Trechos alterados em que o pareamento por medidas acha menos que esta
+# fração de linhas iguais são refeitos linha a linha (até o limite de
+# linhas: num trecho todo reescrito o Myers custa O(N·D))
+ROW_FALLBACK_COVERAGE = 0.9
+ROW_FALLBACK_MAX_ROWS = 2000
+
+# (tag, i1, i2, j1, j2), como SequenceMatcher.get_opcodes
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _middle_snake(a: Sequence[int], alo: int, ahi: int,
+                  b: Sequence[int], blo: int, bhi: int) -> Tuple[int, int, int, int]:
+    """Snake do meio do caminho de edição mínimo (Myers, seção 4b)"""
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[offset + delta - k] >= n:
+                return x0, y0, x, y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - x0, m - y0
+
+    return 0, 0, 0, 0  # inalcançável: o caminho sempre se encontra até max_d
+
+
+def _match(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int,
+           blocks: List[Tuple[int, int, int]]) -> None:
+    """Acrescenta a blocks os trechos iguais de a[alo:ahi] e b[blo:bhi], em ordem"""
+    start = alo
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        alo += 1
+        blo += 1
+    if alo > start:
+        blocks.append((start, blo - (alo - start), alo - start))
+
+    suffix = 0
+    while alo < ahi - suffix and blo < bhi - suffix and a[ahi - 1 - suffix] == b[bhi - 1 - suffix]:
+        suffix += 1
+    ahi -= suffix
+    bhi -= suffix
+
+    if alo < ahi and blo < bhi:
+        x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi)
+        _match(a, alo, alo + x, b, blo, blo + y, blocks)
+        if u > x:
+            blocks.append((alo + x, blo + y, u - x))
+        _match(a, alo + u, ahi, b, blo + v, bhi, blocks)
+
+    if suffix:
+        blocks.append((ahi, bhi, suffix))
+
+
+def myers_matching_blocks(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+    """
+    Trechos iguais de uma subsequência comum máxima (diff de Myers em espaço linear).
+
+    Args:
+        a (Sequence[Hashable]): Primeira sequência
+        b (Sequence[Hashable]): Segunda sequência
+
+    Returns:
+        List[Tuple[int, int, int]]: (i, j, tamanho) em ordem, com os trechos
+            vizinhos unidos, como SequenceMatcher.get_matching_blocks (sem
+            o bloco final vazio)
+
+    Example:
+        >>> myers_matching_blocks("abcabba", "cbabac")
+        [(1, 1, 1), (3, 2, 2), (6, 4, 1)]
+    """
+    ids: Dict[Hashable, int] = {}
+    a_ids = [ids.setdefault(item, len(ids)) for item in a]
+    b_ids = [ids.setdefault(item, len(ids)) for item in b]
+
+    # Itens que só existem de um lado nunca casam: saem antes do Myers (como
+    # no GNU diff), senão um chart todo reescrito custaria O(N²)
+    common = set(a_ids).intersection(b_ids)
+    a_index = [i for i, item in enumerate(a_ids) if item in common]
+    b_index = [j for j, item in enumerate(b_ids) if item in common]
+    a_kept = [a_ids[i] for i in a_index]
+    b_kept = [b_ids[j] for j in b_index]
+
+    blocks: List[Tuple[int, int, int]] = []
+    _match(a_kept, 0, len(a_kept), b_kept, 0, len(b_kept), blocks)
+
+    merged: List[Tuple[int, int, int]] = []
+    for i, j, size in blocks:
+        for offset in range(size):
+            ai, bj = a_index[i + offset], b_index[j + offset]
+            if merged and merged[-1][0] + merged[-1][2] == ai and merged[-1][1] + merged[-1][2] == bj:
+                merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + 1)
+            else:
+                merged.append((ai, bj, 1))
+    return merged
+
+
+def _unique_anchors(a: Sequence[Hashable], alo: int, ahi: int,
+                    b: Sequence[Hashable], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Pares (i, j) de itens únicos nos dois lados, na maior sequência crescente em j"""
+    positions: Dict[Hashable, List[int]] = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], [0, i, 0, -1])[0] += 1
+    for j in range(blo, bhi):
+        entry = positions.get(b[j])
+        if entry is not None:
+            entry[2] += 1
+            entry[3] = j
+    pairs = sorted((i, j) for count_a, i, count_b, j in positions.values() if count_a == 1 and count_b == 1)
+
+    # Patience sorting: pilhas com o menor j no topo e ponteiro para a pilha anterior
+    tops: List[int] = []
+    previous: List[int] = []
+    for index, (_, j) in enumerate(pairs):
+        low, high = 0, len(tops)
+        while low < high:
+            middle = (low + high) // 2
+            if pairs[tops[middle]][1] < j:
+                low = middle + 1
+            else:
+                high = middle
+        previous.append(tops[low - 1] if low else -1)
+        if low == len(tops):
+            tops.append(index)
+        else:
+            tops[low] = index
+
+    anchors = []
+    index = tops[-1] if tops else -1
+    while index >= 0:
+        anchors.append(pairs[index])
+        index = previous[index]
+    return anchors[::-1]
+
+
+def patience_matching_blocks(a: Sequence[Hashable], b: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+    """
+    Trechos iguais pelo patience diff: itens únicos nos dois lados viram
+    âncoras e os trechos entre elas são resolvidos do mesmo jeito.
+
+    Trechos sem âncora do mesmo tamanho ficam sem par (o chamador os
+    compara posição a posição, que é o caso de um chart com as notas
+    alteradas em cada medida); os de tamanhos diferentes caem no Myers.
+
+    Args:
+        a (Sequence[Hashable]): Primeira sequência
+        b (Sequence[Hashable]): Segunda sequência
+
+    Returns:
+        List[Tuple[int, int, int]]: (i, j, tamanho) em ordem, como
+            myers_matching_blocks
+
+    Example:
+        >>> patience_matching_blocks("xAyBz", "yAxBz")
+        [(2, 0, 1), (3, 3, 2)]
+    """
+    blocks: List[Tuple[int, int, int]] = []
+    # Pilha de tarefas em ordem reversa: ("range", alo, ahi, blo, bhi) ou ("block", i, j, n)
+    tasks: List[Tuple[str, int, int, int, int]] = [("range", 0, len(a), 0, len(b))]
+    while tasks:
+        task = tasks.pop()
+        if task[0] == "block":
+            blocks.append(task[1:4])
+            continue
+        _, alo, ahi, blo, bhi = task
+
+        prefix = 0
+        while alo + prefix < ahi and blo + prefix < bhi and a[alo + prefix] == b[blo + prefix]:
+            prefix += 1
+        if prefix:
+            blocks.append((alo, blo, prefix))
+            alo += prefix
+            blo += prefix
+        suffix = 0
+        while alo < ahi - suffix and blo < bhi - suffix and a[ahi - 1 - suffix] == b[bhi - 1 - suffix]:
+            suffix += 1
+        ahi -= suffix
+        bhi -= suffix
+        if suffix:
+            tasks.append(("block", ahi, bhi, suffix, 0))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if not anchors:
+            if ahi - alo != bhi - blo:
+                for i, j, size in reversed(myers_matching_blocks(a[alo:ahi], b[blo:bhi])):
+                    tasks.append(("block", alo + i, blo + j, size, 0))
+            continue
+        gaps = []
+        i, j = alo, blo
+        for ai, bj in anchors:
+            gaps.append(("range", i, ai, j, bj))
+            gaps.append(("block", ai, bj, 1, 0))
+            i, j = ai + 1, bj + 1
+        gaps.append(("range", i, ahi, j, bhi))
+        tasks.extend(reversed(gaps))
+
+    merged: List[Tuple[int, int, int]] = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def _blocks_to_opcodes(blocks: List[Tuple[int, int, int]], alo: int, ahi: int,
+                       blo: int, bhi: int) -> List[Opcode]:
+    """Converte trechos iguais (relativos a alo/blo) em opcodes absolutos"""
+    opcodes: List[Opcode] = []
+    i, j = alo, blo
+    for bi, bj, size in blocks + [(ahi - alo, bhi - blo, 0)]:
+        bi += alo
+        bj += blo
+        if i < bi and j < bj:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(("delete", i, bi, j, j))
+        elif j < bj:
+            opcodes.append(("insert", i, i, j, bj))
+        if size:
+            opcodes.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes
+
+
+def split_measure_spans(lines: List[str]) -> List[Tuple[int, int]]:
+    """
+    Intervalos [início, fim) de cada medida na lista de linhas do chart.
+
+    Cada medida inclui o separador (',' ou ';') que a fecha, então os
+    intervalos cobrem todas as linhas.
+
+    Example:
+        >>> split_measure_spans(["1000", "0000", ",", "0100", ";"])
+        [(0, 3), (3, 5)]
+    """
+    spans = []
+    start = 0
+    for index, line in enumerate(lines):
+        if line in MEASURE_SEPARATORS:
+            spans.append((start, index + 1))
+            start = index + 1
+    if start < len(lines):
+        spans.append((start, len(lines)))
+    return spans
+
+
+def _diff_rows(lines1: List[str], lines2: List[str], i1: int, i2: int, j1: int, j2: int) -> List[Opcode]:
+    blocks = myers_matching_blocks(lines1[i1:i2], lines2[j1:j2])
+    return _blocks_to_opcodes(blocks, i1, i2, j1, j2)
+
+
+def _diff_measure_run(lines1: List[str], lines2: List[str], spans1: List[Tuple[int, int]],
+                      spans2: List[Tuple[int, int]]) -> List[Opcode]:
+    """Diff de linhas de um trecho de medidas trocadas (spans1 x spans2)"""
+    if len(spans1) == len(spans2):
+        opcodes = []
+        for (i1, i2), (j1, j2) in zip(spans1, spans2):
+            opcodes.extend(_diff_rows(lines1, lines2, i1, i2, j1, j2))
+        return opcodes
+
+    # Medidas inseridas/removidas: realinha pelo número de linhas de cada medida
+    sizes1 = [end - start for start, end in spans1]
+    sizes2 = [end - start for start, end in spans2]
+    opcodes = []
+    for tag, s1, e1, s2, e2 in _blocks_to_opcodes(myers_matching_blocks(sizes1, sizes2),
+                                                  0, len(spans1), 0, len(spans2)):
+        if tag == "equal":
+            opcodes.extend(_diff_measure_run(lines1, lines2, spans1[s1:e1], spans2[s2:e2]))
+            continue
+        i1 = spans1[s1][0] if s1 < len(spans1) else spans1[-1][1]
+        i2 = spans1[e1 - 1][1] if s1 < e1 else i1
+        j1 = spans2[s2][0] if s2 < len(spans2) else spans2[-1][1]
+        j2 = spans2[e2 - 1][1] if s2 < e2 else j1
+        opcodes.extend(_diff_rows(lines1, lines2, i1, i2, j1, j2))
+    return opcodes
+
+
+def _same_rows(opcodes: List[Opcode]) -> int:
+    return sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+
+
+def _prefer_rows(lines1: List[str], lines2: List[str], opcodes: List[Opcode],
+                 i1: int, i2: int, j1: int, j2: int) -> List[Opcode]:
+    """Refaz lines1[i1:i2] x lines2[j1:j2] linha a linha se o diff por medidas achou pouco"""
+    same = _same_rows(opcodes)
+    if (same >= ROW_FALLBACK_COVERAGE * min(i2 - i1, j2 - j1)
+            or (i2 - i1) + (j2 - j1) > ROW_FALLBACK_MAX_ROWS):
+        return opcodes
+    row_opcodes = _diff_rows(lines1, lines2, i1, i2, j1, j2)
+    return row_opcodes if _same_rows(row_opcodes) > same else opcodes
+
+
+def _diff_changed_run(lines1: List[str], lines2: List[str], spans1: List[Tuple[int, int]],
+                      spans2: List[Tuple[int, int]]) -> List[Opcode]:
+    """Diff de um trecho de medidas trocadas, linha a linha se o pareamento achar pouco"""
+    return _prefer_rows(lines1, lines2, _diff_measure_run(lines1, lines2, spans1, spans2),
+                        spans1[0][0], spans1[-1][1], spans2[0][0], spans2[-1][1])
+
+
+def _merge_opcodes(opcodes: List[Opcode]) -> List[Opcode]:
+    """Une opcodes vizinhos (equal com equal; o resto vira replace)"""
+    merged: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2 and j1 == j2:
+            continue
+        if merged:
+            last_tag, li1, li2, lj1, lj2 = merged[-1]
+            if (last_tag == "equal") == (tag == "equal"):
+                if tag != "equal" and (last_tag != tag):
+                    tag = "replace"
+                merged[-1] = (tag, li1, i2, lj1, j2)
+                continue
+        merged.append((tag, i1, i2, j1, j2))
+    return merged
+
+
+def diff_chart_lines(lines1: List[str], lines2: List[str]) -> Dict[str, Any]:
+    """
+    Compara duas listas de linhas de chart (notas, ',' e ';').
+
+    Args:
+        lines1 (List[str]): Linhas do chart original
+        lines2 (List[str]): Linhas do chart modificado
+
+    Returns:
+        Dict[str, Any]: opcodes (como SequenceMatcher.get_opcodes),
+            same_lines, different_lines, similarity (0-100, mesma fórmula
+            de SequenceMatcher.ratio), measures1, measures2 e
+            measures_changed (medidas do original fora de trechos iguais)
+
+    Example:
+        >>> result = diff_chart_lines(["1000", ",", "0100", ";"], ["1000", ",", "0010", ";"])
+        >>> result["same_lines"], round(result["similarity"], 1)
+        (3, 75.0)
+    """
+    spans1 = split_measure_spans(lines1)
+    spans2 = split_measure_spans(lines2)
+    measures1 = [tuple(lines1[start:end]) for start, end in spans1]
+    measures2 = [tuple(lines2[start:end]) for start, end in spans2]
+
+    opcodes: List[Opcode] = []
+    measures_changed = 0
+    for tag, s1, e1, s2, e2 in _blocks_to_opcodes(patience_matching_blocks(measures1, measures2),
+                                                  0, len(spans1), 0, len(spans2)):
+        if tag == "equal":
+            opcodes.append(("equal", spans1[s1][0], spans1[e1 - 1][1], spans2[s2][0], spans2[e2 - 1][1]))
+        elif s1 < e1 and s2 < e2:
+            opcodes.extend(_diff_changed_run(lines1, lines2, spans1[s1:e1], spans2[s2:e2]))
+        elif s1 < e1:
+            i2 = spans1[e1 - 1][1]
+            j = spans2[s2][0] if s2 < len(spans2) else len(lines2)
+            opcodes.append(("delete", spans1[s1][0], i2, j, j))
+        else:
+            i = spans1[s1][0] if s1 < len(spans1) else len(lines1)
+            opcodes.append(("insert", i, i, spans2[s2][0], spans2[e2 - 1][1]))
+        if tag != "equal":
+            measures_changed += e1 - s1
+
+    # Âncoras erradas (uma medida editada que ficou igual a outra) viram
+    # delete + insert em vez de trecho trocado: confere o chart inteiro
+    opcodes = _merge_opcodes(_prefer_rows(lines1, lines2, opcodes, 0, len(lines1), 0, len(lines2)))
+    if not opcodes:
+        opcodes = [("equal", 0, 0, 0, 0)]
+    same_lines = _same_rows(opcodes)
+    total = len(lines1) + len(lines2)
+    return {
+        "opcodes": opcodes,
+        "same_lines": same_lines,
+        "different_lines": max(len(lines1), len(lines2)) - same_lines,
+        "similarity": 200.0 * same_lines / total if total else 100.0,
+        "measures1": len(spans1),
+        "measures2": len(spans2),
+        "measures_changed": measures_changed
+    }
+
+
+def _grouped_opcodes(opcodes: List[Opcode], n: int) -> Iterator[List[Opcode]]:
+    """Agrupa os opcodes em blocos com n linhas de contexto (SequenceMatcher.get_grouped_opcodes)"""
+    codes = list(opcodes)
+    if not codes:
+        codes = [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    beginning = start + 1
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(lines1: List[str], lines2: List[str], opcodes: List[Opcode],
+                 fromfile: str = "", tofile: str = "", n: int = 3) -> Iterator[str]:
+    """
+    Diff unificado (mesmo formato de difflib.unified_diff com lineterm="")
+    a partir dos opcodes de diff_chart_lines.
+
+    Args:
+        lines1 (List[str]): Linhas do chart original
+        lines2 (List[str]): Linhas do chart modificado
+        opcodes (List[Opcode]): Opcodes de diff_chart_lines
+        fromfile (str): Nome do original no cabeçalho
+        tofile (str): Nome do modificado no cabeçalho
+        n (int): Linhas de contexto
+
+    Yields:
+        str: Linhas do diff (cabeçalhos, @@ e linhas ' ', '-', '+')
+    """
+    started = False
+    for group in _grouped_opcodes(opcodes, n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}"
+            yield f"+++ {tofile}"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in lines1[i1:i2]:
+                    yield " " + line
+                continue
+            for line in lines1[i1:i2]:
+                yield "-" + line
+            for line in lines2[j1:j2]:
+                yield "+" + line
@@ -0,0 +1,269 @@
+"""
+Chart Encoding Module
+
+Este módulo contém a codificação compacta (e sem perdas) de charts usada
+nos prompts: uma linha por medida, linhas vazias comprimidas, medida
+reduzida à menor quantização que preserva as notas e referências a
+medidas repetidas. O decodificador aceita a resposta da IA no mesmo
+formato e a expande de volta para o formato .sm.
+
+Formato (uma medida por linha):
+    16|1000 .3 0100 .3      16 linhas no .sm, escritas em 8 posições
+    4|.                     medida vazia de 4 linhas
+    @3                      igual à medida 3 (numeração a partir de 1)
+
+Author: Generated for StepMania Analysis
+"""
+
+import re
+from typing import Dict, List
+
+from chart_extractor import split_measures, join_measures
+
+
+EMPTY_ROW_CHAR = '0'
+
+ENCODING_LEGEND = (
+    "Chart codificado: uma medida por linha, na ordem. "
+    "'N|tokens': a medida tem N linhas no .sm e é escrita em R posições igualmente espaçadas "
+    "(R divide N); cada token é uma linha de 4 colunas (ex.: 1000) ou '.k' = k posições vazias "
+    "('.' = 1). '@k': medida idêntica à medida k (contando a partir de 1)."
+)
+
+_MEASURE_LINE = re.compile(r'^(\d+)\|(.*)$')
+_REFERENCE_LINE = re.compile(r'^@(\d+)$')
+
+
+def _is_empty_row(row: str) -> bool:
+    return all(c == EMPTY_ROW_CHAR for c in row)
+
+
+def _divisors(n: int) -> List[int]:
+    return [d for d in range(1, n + 1) if n % d == 0]
+
+
+def quantize_measure(rows: List[str]) -> List[str]:
+    """
+    Reduz a medida à menor quantização que mantém todas as notas no lugar.
+
+    Args:
+        rows (List[str]): Linhas de notas da medida
+
+    Returns:
+        List[str]: Linhas na menor quantização (R linhas, R divide len(rows))
+
+    Example:
+        >>> quantize_measure(['1000', '0000', '0100', '0000'])
+        ['1000', '0100']
+    """
+    n = len(rows)
+    if n == 0:
+        return []
+    filled = [i for i, row in enumerate(rows) if not _is_empty_row(row)]
+    for r in _divisors(n):
+        step = n // r
+        if all(i % step == 0 for i in filled):
+            return rows[::step]
+    return rows
+
+
+def _encode_rows(rows: List[str]) -> str:
+    tokens = []
+    empty_run = 0
+    for row in rows:
+        if _is_empty_row(row):
+            empty_run += 1
+            continue
+        if empty_run:
+            tokens.append('.' if empty_run == 1 else f'.{empty_run}')
+            empty_run = 0
+        tokens.append(row)
+    if empty_run:
+        tokens.append('.' if empty_run == 1 else f'.{empty_run}')
+    return ' '.join(tokens)
+
+
+def encode_measures(measures: List[List[str]]) -> str:
+    """
+    Codifica uma lista de medidas no formato compacto.
+
+    Args:
+        measures (List[List[str]]): Linhas de notas agrupadas por medida
+
+    Returns:
+        str: Chart codificado, uma medida por linha
+
+    Example:
+        >>> encode_measures([['1000', '0000', '0000', '0000'], ['1000', '0000', '0000', '0000']])
+        '4|1000\\n@1'
+    """
+    lines = []
+    first_seen: Dict[str, int] = {}
+    for index, rows in enumerate(measures, 1):
+        body = f"{len(rows)}|{_encode_rows(quantize_measure(rows))}"
+        if body in first_seen:
+            reference = f"@{first_seen[body]}"
+            if len(reference) < len(body):
+                lines.append(reference)
+                continue
+        else:
+            first_seen[body] = index
+        lines.append(body)
+    return '\n'.join(lines)
+
+
+def encode_chart(chart_data: str) -> str:
+    """
+    Codifica um chart .sm (linhas, ',' e ';') no formato compacto.
+
+    Args:
+        chart_data (str): Dados do chart no formato SM
+
+    Returns:
+        str: Chart codificado
+
+    Example:
+        >>> encoded = encode_chart(chart_data)
+        >>> print(f"{len(chart_data)} -> {len(encoded)} caracteres")
+    """
+    return encode_measures(split_measures(chart_data))
+
+
+def _lane_width(rows_text: str, default: int = 4) -> int:
+    for token in rows_text.split():
+        if not token.startswith('.'):
+            return len(token)
+    return default
+
+
+def _chart_lane_width(encoded: str) -> int:
+    """Número de colunas das notas do chart (usado também nas medidas vazias)"""
+    matches = (_MEASURE_LINE.match(line.strip()) for line in encoded.splitlines())
+    return _lane_width(' '.join(match.group(2) for match in matches if match))
+
+
+def decode_measures(encoded: str, lane_width: int = 4) -> List[List[str]]:
+    """
+    Expande o chart codificado de volta para medidas.
+
+    Args:
+        encoded (str): Chart no formato compacto (linhas vazias e ';' são ignorados)
+        lane_width (int): Número de colunas usado nas medidas vazias
+
+    Returns:
+        List[List[str]]: Linhas de notas agrupadas por medida
+
+    Raises:
+        ValueError: Se alguma linha não estiver no formato esperado
+
+    Example:
+        >>> decode_measures("4|1000\\n@1")
+        [['1000', '0000', '0000', '0000'], ['1000', '0000', '0000', '0000']]
+    """
+    measures: List[List[str]] = []
+    empty_row = EMPTY_ROW_CHAR * lane_width
+
+    for line_number, line in enumerate(encoded.splitlines(), 1):
+        line = line.strip()
+        if not line or line == ';':
+            continue
+
+        ref = _REFERENCE_LINE.match(line)
+        if ref:
+            target = int(ref.group(1))
+            if not 1 <= target <= len(measures):
+                raise ValueError(f"Linha {line_number}: referência @{target} inválida")
+            measures.append(list(measures[target - 1]))
+            continue
+
+        match = _MEASURE_LINE.match(line)
+        if not match:
+            raise ValueError(f"Linha {line_number}: formato inválido: '{line}'")
+
+        total_rows = int(match.group(1))
+        width = _lane_width(match.group(2), lane_width)
+        positions: List[str] = []
+        for token in match.group(2).split():
+            if token.startswith('.'):
+                count = int(token[1:]) if len(token) > 1 else 1
+                positions.extend([EMPTY_ROW_CHAR * width] * count)
+            else:
+                positions.append(token)
+
+        if not positions:
+            positions = [empty_row]
+        if total_rows <= 0 or total_rows % len(positions) != 0:
+            raise ValueError(
+                f"Linha {line_number}: {len(positions)} posições não dividem {total_rows} linhas"
+            )
+
+        step = total_rows // len(positions)
+        rows = []
+        for row in positions:
+            rows.append(row)
+            rows.extend([EMPTY_ROW_CHAR * len(row)] * (step - 1))
+        measures.append(rows)
+
+    return measures
+
+
+def decode_chart(encoded: str) -> str:
+    """
+    Expande o chart codificado para o formato .sm (linhas, ',' e ';').
+
+    Args:
+        encoded (str): Chart no formato compacto
+
+    Returns:
+        str: Chart no formato SM
+
+    Raises:
+        ValueError: Se o texto não estiver no formato compacto
+
+    Example:
+        >>> decode_chart("2|1000 0100\\n@1")
+        '1000\\n0100\\n,\\n1000\\n0100\\n;'
+    """
+    # Medidas vazias ("4|.") não dizem o número de colunas: vale o das notas
+    measures = decode_measures(encoded, _chart_lane_width(encoded))
+    if not measures:
+        raise ValueError("Nenhuma medida encontrada no chart codificado")
+    return join_measures(measures)
+
+
+def decode_chart_response(full_response: str) -> str:
+    """
+    Procura um chart codificado na resposta da IA e o expande.
+
+    Considera os blocos de código (```) e, se não houver, a resposta
+    inteira; usa as linhas consecutivas no formato compacto.
+
+    Args:
+        full_response (str): Resposta completa da IA
+
+    Returns:
+        str: Chart no formato SM, ou string vazia se não encontrado/inválido
+
+    Example:
+        >>> chart = decode_chart_response(ai_response)
+    """
+    if not full_response:
+        return ""
+
+    segments = full_response.split("```")
+    # Conteúdo dos blocos fica nas posições ímpares; sem blocos, usa tudo
+    candidates = segments[1::2] if len(segments) > 2 else [full_response]
+
+    for candidate in candidates:
+        lines = [line.strip() for line in candidate.splitlines()]
+        encoded_lines = [
+            line for line in lines
+            if _MEASURE_LINE.match(line) or _REFERENCE_LINE.match(line) or line == ';'
+        ]
+        if not any(line != ';' for line in encoded_lines):
+            continue
+        try:
+            return decode_chart('\n'.join(encoded_lines))
+        except ValueError as e:
+            print(f"⚠️ Chart codificado inválido: {e}")
+    return ""
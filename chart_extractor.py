@@ -130,13 +130,16 @@ def parse_sm_difficulties(sm_file_path: str) -> Dict[str, Dict[str, Any]]:
     return difficulties
 
 
-def choose_difficulty(difficulties: Dict[str, Dict], target_difficulty: str = "") -> Tuple[Optional[str], Optional[Dict]]:
+def choose_difficulty(difficulties: Dict[str, Dict], target_difficulty: str = "",
+                      interactive: bool = True) -> Tuple[Optional[str], Optional[Dict]]:
     """
     Permite ao usuário escolher uma dificuldade específica.
     
     Args:
         difficulties (Dict[str, Dict]): Dicionário de dificuldades disponíveis
         target_difficulty (str, optional): Dificuldade específica para buscar
+        interactive (bool): Se False, nunca pergunta ao usuário (modo batch):
+            retorna (None, None) quando a dificuldade não é encontrada
         
     Returns:
         Tuple[Optional[str], Optional[Dict]]: Nome da dificuldade escolhida e seus dados
@@ -158,6 +161,10 @@ def choose_difficulty(difficulties: Dict[str, Dict], target_difficulty: str = ""
                 return key, difficulties[key]
         print(f"Dificuldade '{target_difficulty}' não encontrada. Dificuldades disponíveis:")
     
+    if not interactive:
+        print(f"Dificuldades disponíveis: {', '.join(difficulties.keys())}")
+        return None, None
+    
     # Mostra dificuldades disponíveis
     print("\nDificuldades disponíveis:")
     diff_list = list(difficulties.keys())
@@ -180,13 +187,15 @@ def choose_difficulty(difficulties: Dict[str, Dict], target_difficulty: str = ""
             return None, None
 
 
-def extract_chart_data(sm_file_path: str, target_difficulty: str = "") -> Tuple[str, str, Dict]:
+def extract_chart_data(sm_file_path: str, target_difficulty: str = "",
+                       interactive: bool = True) -> Tuple[str, str, Dict]:
     """
     Extrai dados de chart de uma dificuldade específica.
     
     Args:
         sm_file_path (str): Caminho para o arquivo .sm
         target_difficulty (str, optional): Dificuldade alvo
+        interactive (bool): Se False, não pergunta a dificuldade ao usuário
         
     Returns:
         Tuple[str, str, Dict]: Chart data, nome da dificuldade, dados da dificuldade
@@ -196,7 +205,7 @@ def extract_chart_data(sm_file_path: str, target_difficulty: str = "") -> Tuple[
         >>> print(f"Chart extraído para {name}")
     """
     difficulties = parse_sm_difficulties(sm_file_path)
-    difficulty_name, difficulty_data = choose_difficulty(difficulties, target_difficulty)
+    difficulty_name, difficulty_data = choose_difficulty(difficulties, target_difficulty, interactive)
     
     if not difficulty_data:
         return "", "", {}
@@ -270,8 +279,78 @@ def extract_original_metadata(sm_content: str) -> Dict[str, str]:
     return metadata
 
 
+LEARN_MODE_SUFFIX = "_LearnMode.sm"
+
+
+def learn_mode_path(original_path: str, difficulty_name: str, tag: str = "") -> str:
+    """
+    Caminho padrão da variante LearnMode de uma dificuldade.
+    
+    Args:
+        original_path (str): Caminho do arquivo original
+        difficulty_name (str): Nome da dificuldade (texto entre parênteses é ignorado)
+        tag (str): Identifica a variante quando há mais de uma para a mesma
+            dificuldade (ex.: o jogador); sem "_"
+        
+    Returns:
+        str: <nome>_<dificuldade>[_<tag>]_LearnMode.sm na pasta do original
+        
+    Example:
+        >>> learn_mode_path("Songs/Loca2/Stepchart.sm", "Beginner (Autor)", "Neko")
+        'Songs/Loca2/Stepchart_Beginner_Neko_LearnMode.sm'
+    """
+    original_name = os.path.splitext(os.path.basename(original_path))[0]
+    
+    # Inclui nome da dificuldade no arquivo (remove texto entre parênteses)
+    # Remove tudo entre parênteses e espaços extras
+    clean_difficulty = re.sub(r'\s*\([^)]*\)', '', difficulty_name).strip()
+    safe_difficulty = clean_difficulty.replace(' ', '_')
+    parts = [original_name, safe_difficulty] + ([tag] if tag else [])
+    return os.path.join(os.path.dirname(original_path), "_".join(parts) + LEARN_MODE_SUFFIX)
+
+
+def parse_learn_mode_path(path: str) -> Optional[Dict[str, str]]:
+    """
+    Separa original, dificuldade e tag do nome de uma variante LearnMode.
+    
+    Com tag o nome é ambíguo (Song_Hard_Neko ou My_Song_Hard): vale a
+    leitura cujo .sm original existe na pasta, e a leitura sem tag quando
+    nenhum dos dois existe.
+    
+    Args:
+        path (str): Caminho do arquivo
+        
+    Returns:
+        Optional[Dict[str, str]]: original (caminho do .sm), difficulty e
+            tag (vazia se não houver), ou None se não for variante LearnMode
+        
+    Example:
+        >>> parse_learn_mode_path("Songs/Loca2/Stepchart_Beginner_Neko_LearnMode.sm")  # com Stepchart.sm
+        {'original': 'Songs/Loca2/Stepchart.sm', 'difficulty': 'Beginner', 'tag': 'Neko'}
+    """
+    name = os.path.basename(path)
+    if not name.lower().endswith(LEARN_MODE_SUFFIX.lower()):
+        return None
+    parts = name[:-len(LEARN_MODE_SUFFIX)].split("_")
+    readings = []
+    if len(parts) >= 2:
+        readings.append(("_".join(parts[:-1]), parts[-1], ""))
+    if len(parts) >= 3:
+        readings.append(("_".join(parts[:-2]), parts[-2], parts[-1]))
+    if not readings:
+        return None
+    
+    folder = os.path.dirname(path)
+    original, difficulty, tag = next(
+        (reading for reading in readings if os.path.exists(os.path.join(folder, reading[0] + ".sm"))),
+        readings[0]
+    )
+    return {"original": os.path.join(folder, original + ".sm"), "difficulty": difficulty, "tag": tag}
+
+
 def save_modified_chart(original_path: str, chart_content: str, difficulty_name: str, 
-                       difficulty_data: Dict, original_content: str) -> str:
+                       difficulty_data: Dict, original_content: str,
+                       output_path: Optional[str] = None, tag: str = "") -> str:
     """
     Salva uma versão modificada do chart na mesma pasta do original.
     
@@ -281,6 +360,10 @@ def save_modified_chart(original_path: str, chart_content: str, difficulty_name:
         difficulty_name (str): Nome da dificuldade modificada
         difficulty_data (Dict): Dados da dificuldade original
         original_content (str): Conteúdo original completo do arquivo
+        output_path (Optional[str]): Caminho de saída (padrão:
+            <nome>_<dificuldade>_LearnMode.sm na pasta do original)
+        tag (str): Entra no nome padrão para separar variantes da mesma
+            dificuldade (ver learn_mode_path)
         
     Returns:
         str: Caminho do arquivo salvo
@@ -289,15 +372,7 @@ def save_modified_chart(original_path: str, chart_content: str, difficulty_name:
         >>> path = save_modified_chart("song.sm", new_chart, "Hard", data, content)
         >>> print(f"Arquivo salvo em: {path}")
     """
-    original_dir = os.path.dirname(original_path)
-    original_name = os.path.splitext(os.path.basename(original_path))[0]
-    
-    # Inclui nome da dificuldade no arquivo (remove texto entre parênteses)
-    # Remove tudo entre parênteses e espaços extras
-    clean_difficulty = re.sub(r'\s*\([^)]*\)', '', difficulty_name).strip()
-    safe_difficulty = clean_difficulty.replace(' ', '_')
-    new_filename = f"{original_name}_{safe_difficulty}_LearnMode.sm"
-    new_filepath = os.path.join(original_dir, new_filename)
+    new_filepath = output_path or learn_mode_path(original_path, difficulty_name, tag)
     
     # Encontra e substitui apenas a seção da dificuldade selecionada
     if difficulty_data and 'raw_section' in difficulty_data:
@@ -351,4 +426,56 @@ def save_modified_chart(original_path: str, chart_content: str, difficulty_name:
     with open(new_filepath, 'w', encoding='utf-8') as f:
         f.write(new_content)
     
-    return new_filepath
\ No newline at end of file
+    return new_filepath
+
+def split_measures(chart_data: str) -> List[List[str]]:
+    """
+    Divide o chart em medidas (lista de linhas de notas por medida).
+    
+    É a representação matricial usada pelos módulos de codificação,
+    validação e geração local: uma lista de medidas, cada uma com suas
+    linhas de notas ("0000", "1001", ...).
+    
+    Args:
+        chart_data (str): Dados do chart no formato SM (linhas, ',' e ';')
+        
+    Returns:
+        List[List[str]]: Linhas de notas agrupadas por medida
+        
+    Example:
+        >>> split_measures("1000\\n0000\\n,\\n0100\\n0000\\n;")
+        [['1000', '0000'], ['0100', '0000']]
+    """
+    measures = [[]]
+    for line in chart_data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line == ',':
+            measures.append([])
+        elif line == ';':
+            break
+        else:
+            measures[-1].append(line)
+    
+    # Descarta a medida vazia criada por uma vírgula final sem notas
+    if len(measures) > 1 and not measures[-1]:
+        measures.pop()
+    return measures
+
+
+def join_measures(measures: List[List[str]]) -> str:
+    """
+    Monta o texto do chart (linhas, ',' e ';') a partir das medidas.
+    
+    Args:
+        measures (List[List[str]]): Linhas de notas agrupadas por medida
+        
+    Returns:
+        str: Chart no formato SM, terminado em ';'
+        
+    Example:
+        >>> join_measures([['1000', '0000'], ['0100', '0000']])
+        '1000\\n0000\\n,\\n0100\\n0000\\n;'
+    """
+    return '\n,\n'.join('\n'.join(rows) for rows in measures) + '\n;'
@@ -0,0 +1,301 @@
+"""
+Chart Scanner Module
+
+Este módulo contém o scanner incremental de charts usado no modo streaming:
+o texto gerado pela IA é alimentado em pedaços, as linhas de notas são
+validadas conforme chegam e a geração pode ser interrompida assim que a
+saída estiver claramente malformada (largura de linha errada, medida sem
+fim, medidas demais) ou assim que o chart estiver completo.
+
+Contém também o scanner de passada única usado para extrair o chart de
+uma resposta completa (scan_chart_blocks / extract_chart_measures).
+
+Author: Generated for StepMania Analysis
+"""
+
+from typing import Dict, List, Any, Optional
+
+
+# Caracteres válidos em uma linha de notas do formato .sm
+NOTE_CHARS = set("01234MKLF")
+_NOTE_CHARS_STR = "".join(sorted(NOTE_CHARS))
+
+# Maior quantização de medida suportada pelo StepMania
+MAX_ROWS_PER_MEASURE = 192
+
+
+def is_note_line(line: str) -> bool:
+    """
+    Verifica se a linha tem apenas caracteres de nota (sem checar a largura).
+
+    Args:
+        line (str): Linha já sem espaços nas pontas
+
+    Returns:
+        bool: True se todos os caracteres são de nota
+    """
+    return bool(line) and not line.strip(_NOTE_CHARS_STR)
+
+
+class IncrementalChartScanner:
+    """
+    Valida a estrutura do chart enquanto a resposta da IA chega.
+
+    Uso: chame feed() a cada pedaço de texto; quando retornar False a
+    leitura pode parar. Depois verifique `error` (saída malformada) ou
+    `complete` (chart terminou com ';').
+
+    Example:
+        >>> scanner = IncrementalChartScanner(expected_measures=32)
+        >>> for piece in stream:
+        ...     if not scanner.feed(piece):
+        ...         break
+        >>> scanner.finish()
+        >>> print(scanner.error or f"{scanner.measures} medidas")
+    """
+
+    def __init__(self, lane_width: int = 4, expected_measures: Optional[int] = None,
+                 max_rows_per_measure: int = MAX_ROWS_PER_MEASURE):
+        self.lane_width = lane_width
+        self.expected_measures = expected_measures
+        self.max_rows_per_measure = max_rows_per_measure
+        # Folga antes de considerar "medidas demais" (ou um bloco com medidas de menos): 10% ou 2 medidas
+        self.max_measures = None
+        self.min_measures = None
+        if expected_measures:
+            slack = max(2, expected_measures // 10)
+            self.max_measures = expected_measures + slack
+            self.min_measures = expected_measures - slack
+
+        self.in_fence = False
+        self.in_chart = False
+        self.chart_closed = False
+        self.complete = False
+        self.error: Optional[str] = None
+        self.measures = 0
+        self.rows_in_measure = 0
+        self.chart_lines: List[str] = []
+        self.lines_seen = 0
+        self._buffer = ""
+
+    def feed(self, text: str) -> bool:
+        """
+        Alimenta um pedaço do texto gerado.
+
+        Args:
+            text (str): Próximo pedaço da resposta
+
+        Returns:
+            bool: True para continuar lendo, False para interromper
+                (chart completo ou saída malformada)
+        """
+        self._buffer += text
+        while "\n" in self._buffer and not self.done:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._process_line(line.strip())
+        return not self.done
+
+    def finish(self) -> None:
+        """Processa a última linha pendente (sem quebra de linha final)"""
+        if self._buffer and not self.done:
+            line, self._buffer = self._buffer, ""
+            self._process_line(line.strip())
+
+    @property
+    def done(self) -> bool:
+        """True quando não há motivo para continuar lendo"""
+        return self.complete or self.error is not None
+
+    def chart_text(self) -> str:
+        """Retorna o chart reconhecido até agora (linhas de notas e separadores)"""
+        return "\n".join(self.chart_lines)
+
+    def _reset_chart(self) -> None:
+        self.in_chart = False
+        self.chart_closed = False
+        self.measures = 0
+        self.rows_in_measure = 0
+        self.chart_lines = []
+
+    def _process_line(self, line: str) -> None:
+        self.lines_seen += 1
+
+        if line.startswith("```"):
+            if self.in_fence:
+                self.in_fence = False
+                # Bloco fechado depois de um chart: nada mais interessa, a não ser
+                # que tenha medidas de menos (exemplo do formato antes do chart)
+                if self.in_chart:
+                    measures = self.measures if self.chart_closed else self.measures + 1
+                    if self.min_measures and measures < self.min_measures:
+                        self._reset_chart()
+                    else:
+                        self.complete = True
+            else:
+                self.in_fence = True
+                self._reset_chart()
+            return
+
+        if not line:
+            return
+
+        if line == ",":
+            if not self.in_chart:
+                return
+            self.chart_lines.append(line)
+            self.measures += 1
+            self.rows_in_measure = 0
+            if self.max_measures and self.measures > self.max_measures:
+                self.error = (f"medidas demais: {self.measures} "
+                              f"(original tem {self.expected_measures})")
+            return
+
+        if line == ";":
+            if not self.in_chart:
+                return
+            self.chart_lines.append(line)
+            self.measures += 1
+            self.rows_in_measure = 0
+            self.chart_closed = True
+            if not self.in_fence:
+                self.complete = True
+            return
+
+        if is_note_line(line):
+            if self.chart_closed:
+                return
+            if len(line) != self.lane_width:
+                if self.in_chart:
+                    self.error = (f"largura de linha inválida na medida {self.measures + 1}: "
+                                  f"'{line}' ({len(line)} colunas, esperado {self.lane_width})")
+                return
+            self.in_chart = True
+            self.chart_lines.append(line)
+            self.rows_in_measure += 1
+            if self.rows_in_measure > self.max_rows_per_measure:
+                self.error = (f"medida {self.measures + 1} sem fim: mais de "
+                              f"{self.max_rows_per_measure} linhas")
+            return
+
+        # Texto comum fora de bloco descarta um chart que ainda não terminou em ';'
+        if self.in_chart and not self.in_fence and not self.chart_closed:
+            self._reset_chart()
+
+
+def _new_block(fenced: bool, start_line: int) -> Dict[str, Any]:
+    return {"fenced": fenced, "terminated": False, "start_line": start_line,
+            "note_rows": 0, "separators": 0, "measures": [[]]}
+
+
+def scan_chart_blocks(text: str, lane_width: int = 4) -> List[Dict[str, Any]]:
+    """
+    Encontra todos os trechos de chart (dentro ou fora de blocos ```) em uma passada.
+
+    Máquina de estados linha a linha, sem regex: dentro de um bloco de
+    código o texto comum é ignorado; fora dele o texto comum encerra o
+    trecho atual. ';' sempre encerra o trecho. Comentários '//' são
+    descartados.
+
+    Args:
+        text (str): Resposta completa da IA
+        lane_width (int): Número de colunas das linhas de notas
+
+    Returns:
+        List[Dict[str, Any]]: Trechos na ordem em que aparecem, com chaves
+            fenced, terminated (terminou em ';'), start_line, note_rows,
+            separators e measures (linhas de notas agrupadas por medida)
+
+    Example:
+        >>> blocks = scan_chart_blocks(ai_response)
+        >>> [(b["fenced"], len(b["measures"])) for b in blocks]
+        [(True, 2), (True, 64)]
+    """
+    blocks: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    in_fence = False
+
+    def close() -> None:
+        nonlocal current
+        if current and current["note_rows"]:
+            # Vírgula final sem notas depois dela não cria medida
+            if len(current["measures"]) > 1 and not current["measures"][-1]:
+                current["measures"].pop()
+            blocks.append(current)
+        current = None
+
+    for number, raw_line in enumerate(text.splitlines(), 1):
+        stripped = raw_line.strip()
+        if stripped.startswith("```"):
+            close()
+            in_fence = not in_fence
+            continue
+
+        line = stripped.split("//", 1)[0].rstrip() if "//" in stripped else stripped
+        if not line:
+            continue
+
+        if line == "," or line == ";":
+            if current is None:
+                continue
+            current["separators"] += 1
+            if line == ",":
+                current["measures"].append([])
+            else:
+                current["terminated"] = True
+                close()
+            continue
+
+        if len(line) == lane_width and is_note_line(line):
+            if current is None:
+                current = _new_block(in_fence, number)
+            current["measures"][-1].append(line)
+            current["note_rows"] += 1
+            continue
+
+        if not in_fence:
+            close()
+
+    close()
+    return blocks
+
+
+def _block_score(block: Dict[str, Any]) -> tuple:
+    # Trechos com cara de chart completo primeiro; exemplos curtos por último
+    looks_like_chart = block["note_rows"] > 10 and block["separators"] > 0
+    return (looks_like_chart, block["terminated"], block["fenced"],
+            len(block["measures"]), block["note_rows"])
+
+
+def pick_chart_block(blocks: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Escolhe o trecho com mais cara de chart completo.
+
+    Preferência: mais de 10 linhas de notas com separadores, terminado em
+    ';', dentro de bloco de código e, por fim, o maior.
+
+    Args:
+        blocks (List[Dict[str, Any]]): Trechos de scan_chart_blocks
+
+    Returns:
+        Optional[Dict[str, Any]]: Melhor trecho, ou None se não houver
+    """
+    return max(blocks, key=_block_score) if blocks else None
+
+
+def extract_chart_measures(text: str, lane_width: int = 4) -> List[List[str]]:
+    """
+    Extrai da resposta da IA as medidas do melhor trecho de chart.
+
+    Args:
+        text (str): Resposta completa da IA
+        lane_width (int): Número de colunas das linhas de notas
+
+    Returns:
+        List[List[str]]: Linhas de notas agrupadas por medida ([] se não houver chart)
+
+    Example:
+        >>> measures = extract_chart_measures(ai_response)
+        >>> print(f"{len(measures)} medidas")
+    """
+    best = pick_chart_block(scan_chart_blocks(text, lane_width))
+    return best["measures"] if best else []
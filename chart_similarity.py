@@ -0,0 +1,390 @@
+"""
+Chart Similarity Module
+
+Este módulo contém a similaridade de charts por tempo, e não por linha:
+cada chart vira um conjunto de eventos (posição, trilha, tipo), então uma
+medida de colcheias requantizada para semicolcheias continua igual quando
+todas as notas caem no mesmo tempo.
+
+- Posição em ticks (192 por medida, 48 por beat) ou em milissegundos,
+  pelos BPMs do arquivo (mesmas regras de Comparativo.beats_to_seconds)
+- Precisão (eventos do chart novo que existem no original), recall
+  (eventos do original mantidos) e F1
+- Contagem e diferença por trilha, e concordância por medida
+
+Os eventos viram chaves inteiras e a interseção é feita com np.isin,
+sem laços em Python: charts de milhares de notas são
+comparados em milissegundos. Com tolerância (modo "time"), cada evento
+casa com no máximo um evento do outro chart, num único passe linear
+sobre as chaves ordenadas.
+
+Uso:
+    python chart_similarity.py original.sm gerado.sm --difficulty Hard
+    python chart_similarity.py original.sm gerado.sm --mode time --tolerance-ms 10
+
+Author: Generated for StepMania Analysis
+"""
+
+import argparse
+import json
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+
+from chart_extractor import parse_sm_difficulties, choose_difficulty, split_measures
+from replay_extractor import ROWS_PER_MEASURE
+from Comparativo import parse_sm, beats_to_seconds
+
+
+TICKS_PER_BEAT = ROWS_PER_MEASURE // 4
+
+# Tipos de nota do formato SM ('0' = vazio, não é evento)
+NOTE_TYPES = {'1': 1, '2': 2, '4': 3, '3': 4, 'M': 5, 'L': 6, 'F': 7}
+NOTE_TYPE_NAMES = {1: "tap", 2: "hold", 3: "roll", 4: "tail", 5: "mine", 6: "lift", 7: "fake"}
+# Cabeças de nota (tap, início de hold e de roll): uma só classe com ignore_type
+HEAD_TYPES = (NOTE_TYPES['1'], NOTE_TYPES['2'], NOTE_TYPES['4'])
+
+# Espaço de cada grupo (trilha, tipo) na chave inteira do evento
+_TYPE_SLOTS = 8
+_POSITION_SPAN = 1 << 40
+
+_TYPE_TABLE = np.zeros(256, dtype=np.int8)
+for _char, _code in NOTE_TYPES.items():
+    _TYPE_TABLE[ord(_char)] = _code
+
+
+def beats_to_seconds_array(bpms: Optional[Dict[float, float]], beats: np.ndarray) -> np.ndarray:
+    """
+    Versão vetorizada de Comparativo.beats_to_seconds.
+
+    O tempo é linear entre mudanças de BPM, então beats_to_seconds só é
+    chamada uma vez por mudança e o resto é interpolado.
+
+    Args:
+        bpms (Optional[Dict[float, float]]): {beat: bpm} (de Comparativo.parse_sm)
+        beats (np.ndarray): Beats a converter
+
+    Returns:
+        np.ndarray: Segundos de cada beat
+
+    Example:
+        >>> beats_to_seconds_array({0.0: 120.0, 4.0: 60.0}, np.array([2.0, 6.0]))
+        array([1., 4.])
+    """
+    beats = np.asarray(beats, dtype=np.float64)
+    if not bpms:
+        return beats_to_seconds(bpms, 1.0) * beats
+
+    changes = sorted(bpms.items())
+    anchors = [beat for beat, _ in changes]
+    tempos = [bpm for _, bpm in changes]
+    if anchors[0] > 0:
+        # Antes da primeira mudança vale o primeiro BPM
+        anchors.insert(0, 0.0)
+        tempos.insert(0, tempos[0])
+
+    anchors_array = np.array(anchors)
+    starts = np.array([beats_to_seconds(bpms, beat) for beat in anchors])
+    seconds_per_beat = 60.0 / np.array(tempos)
+    segment = np.clip(np.searchsorted(anchors_array, beats, side="right") - 1, 0, None)
+    return starts[segment] + (beats - anchors_array[segment]) * seconds_per_beat[segment]
+
+
+def chart_events(chart_data: str, bpms: Optional[Dict[float, float]] = None) -> Dict[str, Any]:
+    """
+    Converte o chart em arrays de eventos (uma entrada por nota).
+
+    Args:
+        chart_data (str): Chart no formato SM (linhas, ',' e ';')
+        bpms (Optional[Dict[float, float]]): {beat: bpm}; sem BPMs, 120
+
+    Returns:
+        Dict[str, Any]: tick, lane, kind, measure e seconds (np.ndarray,
+            mesma ordem), lanes (trilhas) e measures (medidas do chart)
+
+    Example:
+        >>> events = chart_events("1000\\n0100\\n,\\n0010\\n0000\\n;")
+        >>> events["tick"].tolist(), events["lane"].tolist()
+        ([0, 96, 192], [0, 1, 2])
+    """
+    measures = split_measures(chart_data)
+    rows = [row for measure in measures for row in measure]
+    width = max((len(row) for row in rows), default=0)
+    if not rows or not width:
+        empty = np.zeros(0, dtype=np.int64)
+        return {"tick": empty, "lane": empty, "kind": empty, "measure": empty,
+                "seconds": np.zeros(0), "lanes": width, "measures": len(measures)}
+
+    # Linhas viram uma matriz de bytes (linhas curtas completadas com '0')
+    text = "".join(row.ljust(width, "0")[:width] for row in rows)
+    grid = np.frombuffer(text.encode("ascii", errors="replace"), dtype=np.uint8).reshape(len(rows), width)
+    kinds = _TYPE_TABLE[grid]
+
+    sizes = np.array([len(measure) for measure in measures], dtype=np.int64)
+    measure_of_row = np.repeat(np.arange(len(measures)), sizes)
+    row_in_measure = np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    tick_of_row = (measure_of_row * ROWS_PER_MEASURE
+                   + np.rint(row_in_measure * ROWS_PER_MEASURE / sizes[measure_of_row]).astype(np.int64))
+
+    row_index, lane = np.nonzero(kinds)
+    tick = tick_of_row[row_index]
+    return {
+        "tick": tick,
+        "lane": lane.astype(np.int64),
+        "kind": kinds[row_index, lane].astype(np.int64),
+        "measure": measure_of_row[row_index],
+        "seconds": beats_to_seconds_array(bpms, tick / TICKS_PER_BEAT),
+        "lanes": width,
+        "measures": len(measures)
+    }
+
+
+def _event_keys(events: Dict[str, Any], mode: str, ignore_type: bool) -> np.ndarray:
+    """Chave inteira por evento: grupo (trilha, tipo) e posição (tick ou ms)"""
+    if mode == "time":
+        position = np.rint(events["seconds"] * 1000).astype(np.int64)
+    else:
+        position = events["tick"]
+    kind = events["kind"]
+    if ignore_type:
+        kind = np.where(np.isin(kind, HEAD_TYPES), NOTE_TYPES['1'], kind)
+    return (events["lane"] * _TYPE_SLOTS + kind) * _POSITION_SPAN + position
+
+
+def _matched(keys: np.ndarray, other: np.ndarray, tolerance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pareia as chaves um a um: cada chave casa com no máximo uma de other.
+
+    Sem tolerância a interseção é exata (as chaves de um chart não se
+    repetem). Com tolerância, as duas listas ordenadas são percorridas
+    juntas e cada chave fica com a primeira chave livre de other a até
+    tolerance. Em uma dimensão essa escolha gulosa forma o maior número
+    de pares possível; o par pode não ser o mais próximo, mas a contagem
+    (precisão e recall) é a mesma.
+    """
+    if tolerance <= 0:
+        return np.isin(keys, other), np.isin(other, keys)
+
+    keys_order = np.argsort(keys, kind="stable")
+    other_order = np.argsort(other, kind="stable")
+    sorted_other = other[other_order].tolist()
+    keys_hit = np.zeros(len(keys), dtype=bool)
+    other_hit = np.zeros(len(other), dtype=bool)
+    j = 0
+    for i, key in zip(keys_order.tolist(), keys[keys_order].tolist()):
+        while j < len(sorted_other) and sorted_other[j] < key - tolerance:
+            j += 1
+        if j < len(sorted_other) and sorted_other[j] <= key + tolerance:
+            keys_hit[i] = True
+            other_hit[other_order[j]] = True
+            j += 1
+    return keys_hit, other_hit
+
+
+def _ratio(part: float, total: float) -> float:
+    return float(part / total) if total else 1.0
+
+
+def compare_chart_events(source: Dict[str, Any], candidate: Dict[str, Any], mode: str = "beat",
+                         tolerance_ms: float = 0.0, ignore_type: bool = False) -> Dict[str, Any]:
+    """
+    Compara os eventos de dois charts (ver chart_events).
+
+    Args:
+        source (Dict[str, Any]): Eventos do chart original
+        candidate (Dict[str, Any]): Eventos do chart gerado
+        mode (str): "beat" (posição exata em ticks) ou "time" (segundos,
+            pelos BPMs de cada chart)
+        tolerance_ms (float): Distância máxima no modo "time"; cada evento
+            casa com no máximo um evento do outro chart
+        ignore_type (bool): Se True, tap e início de hold ou roll no mesmo
+            lugar contam como o mesmo evento (minas, fim de hold, lifts e
+            fakes continuam distintos)
+
+    Returns:
+        Dict[str, Any]: precision, recall, f1, source_events,
+            candidate_events, matched_source, matched_candidate, lanes
+            (por trilha: source, candidate, delta, recall, precision),
+            measure_agreement (por medida: eventos casados / eventos, 1.0
+            para medidas vazias nos dois) e mean_measure_agreement
+
+    Raises:
+        ValueError: Se o modo for desconhecido
+
+    Example:
+        >>> original = chart_events("1000\\n0000\\n0100\\n0000\\n;")
+        >>> semicolcheias = chart_events("1000\\n0000\\n0000\\n0000\\n0100\\n0000\\n0000\\n0000\\n;")
+        >>> compare_chart_events(original, semicolcheias)["f1"]
+        1.0
+    """
+    if mode not in ("beat", "time"):
+        raise ValueError(f"Modo desconhecido: {mode} (use 'beat' ou 'time')")
+    tolerance = int(round(tolerance_ms)) if mode == "time" else 0
+
+    source_keys = _event_keys(source, mode, ignore_type)
+    candidate_keys = _event_keys(candidate, mode, ignore_type)
+    source_hit, candidate_hit = _matched(source_keys, candidate_keys, tolerance)
+
+    matched_source = int(source_hit.sum())
+    matched_candidate = int(candidate_hit.sum())
+    precision = _ratio(matched_candidate, len(candidate_keys))
+    recall = _ratio(matched_source, len(source_keys))
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    lanes = max(source["lanes"], candidate["lanes"])
+    lane_source = np.bincount(source["lane"], minlength=lanes)
+    lane_candidate = np.bincount(candidate["lane"], minlength=lanes)
+    lane_source_hit = np.bincount(source["lane"], weights=source_hit, minlength=lanes)
+    lane_candidate_hit = np.bincount(candidate["lane"], weights=candidate_hit, minlength=lanes)
+    lane_report = [{
+        "lane": lane,
+        "source": int(lane_source[lane]),
+        "candidate": int(lane_candidate[lane]),
+        "delta": int(lane_candidate[lane] - lane_source[lane]),
+        "recall": round(_ratio(lane_source_hit[lane], lane_source[lane]), 4),
+        "precision": round(_ratio(lane_candidate_hit[lane], lane_candidate[lane]), 4)
+    } for lane in range(lanes)]
+
+    measures = max(source["measures"], candidate["measures"])
+    events_per_measure = (np.bincount(source["measure"], minlength=measures)
+                          + np.bincount(candidate["measure"], minlength=measures))
+    hits_per_measure = (np.bincount(source["measure"], weights=source_hit, minlength=measures)
+                        + np.bincount(candidate["measure"], weights=candidate_hit, minlength=measures))
+    agreement = np.divide(hits_per_measure, events_per_measure,
+                          out=np.ones(measures), where=events_per_measure > 0)
+
+    return {
+        "mode": mode,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "source_events": len(source_keys),
+        "candidate_events": len(candidate_keys),
+        "matched_source": matched_source,
+        "matched_candidate": matched_candidate,
+        "lanes": lane_report,
+        "measure_agreement": [round(float(value), 4) for value in agreement],
+        "mean_measure_agreement": round(float(agreement.mean()), 4) if measures else 1.0
+    }
+
+
+def compare_charts(source_chart: str, candidate_chart: str,
+                   source_bpms: Optional[Dict[float, float]] = None,
+                   candidate_bpms: Optional[Dict[float, float]] = None, **options) -> Dict[str, Any]:
+    """
+    Atalho: chart_events dos dois charts e compare_chart_events.
+
+    Args:
+        source_chart (str): Chart original no formato SM
+        candidate_chart (str): Chart gerado no formato SM
+        source_bpms (Optional[Dict[float, float]]): BPMs do original
+        candidate_bpms (Optional[Dict[float, float]]): BPMs do gerado
+            (padrão: os do original)
+        **options: mode, tolerance_ms e ignore_type de compare_chart_events
+
+    Returns:
+        Dict[str, Any]: Ver compare_chart_events
+
+    Example:
+        >>> result = compare_charts(original_chart, ai_chart, bpms)
+        >>> print(f"F1 por tempo: {result['f1']:.2%}")
+    """
+    if candidate_bpms is None:
+        candidate_bpms = source_bpms
+    return compare_chart_events(chart_events(source_chart, source_bpms),
+                                chart_events(candidate_chart, candidate_bpms), **options)
+
+
+def compare_sm_files(file1: str, file2: str, difficulty1: str = "", difficulty2: Optional[str] = None,
+                     **options) -> Optional[Dict[str, Any]]:
+    """
+    Compara a mesma dificuldade (ou duas dificuldades) de dois arquivos SM.
+
+    Args:
+        file1 (str): Arquivo .sm original
+        file2 (str): Arquivo .sm gerado
+        difficulty1 (str): Dificuldade no original (vazio = a primeira)
+        difficulty2 (Optional[str]): Dificuldade no gerado (padrão:
+            difficulty1)
+        **options: mode, tolerance_ms e ignore_type de compare_chart_events
+
+    Returns:
+        Optional[Dict[str, Any]]: Ver compare_chart_events, com
+            difficulty1/difficulty2; None se uma dificuldade não existir
+    """
+    if difficulty2 is None:
+        difficulty2 = difficulty1
+
+    charts = []
+    for path, difficulty in ((file1, difficulty1), (file2, difficulty2)):
+        difficulties = parse_sm_difficulties(path)
+        if not difficulty and difficulties:
+            difficulty = next(iter(difficulties))
+        name, data = choose_difficulty(difficulties, difficulty, interactive=False)
+        if not data:
+            return None
+        bpms = parse_sm(path)[0]
+        charts.append((name, data["chart_data"], bpms))
+
+    (name1, chart1, bpms1), (name2, chart2, bpms2) = charts
+    result = compare_charts(chart1, chart2, bpms1, bpms2, **options)
+    result["difficulty1"] = name1
+    result["difficulty2"] = name2
+    return result
+
+
+def print_similarity_report(result: Dict[str, Any], worst_measures: int = 5) -> None:
+    """
+    Imprime precisão/recall, a tabela por trilha e as medidas que menos concordam.
+
+    Args:
+        result (Dict[str, Any]): Resultado de compare_chart_events
+        worst_measures (int): Quantas medidas com menor concordância mostrar
+    """
+    print(f"\n🎯 Similaridade por {'tempo' if result['mode'] == 'time' else 'beat'} "
+          f"(evento = posição, trilha, tipo)")
+    print(f"   Precisão: {result['precision']:.2%} ({result['matched_candidate']}/{result['candidate_events']} "
+          f"notas do novo chart existem no original)")
+    print(f"   Recall:   {result['recall']:.2%} ({result['matched_source']}/{result['source_events']} "
+          f"notas do original mantidas)")
+    print(f"   F1:       {result['f1']:.2%} | concordância média por medida: "
+          f"{result['mean_measure_agreement']:.2%}")
+
+    print(f"   {'Trilha':<8} {'Original':>9} {'Novo':>9} {'Delta':>7} {'Recall':>8} {'Precisão':>9}")
+    for lane in result["lanes"]:
+        print(f"   {lane['lane']:<8} {lane['source']:>9} {lane['candidate']:>9} {lane['delta']:>+7} "
+              f"{lane['recall']:>8.1%} {lane['precision']:>9.1%}")
+
+    agreement = result["measure_agreement"]
+    worst = sorted((value, index) for index, value in enumerate(agreement) if value < 1.0)[:worst_measures]
+    if worst:
+        listed = ", ".join(f"{index + 1} ({value:.0%})" for value, index in worst)
+        print(f"   Medidas com menor concordância: {listed}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Similaridade de charts por tempo (eventos posição/trilha/tipo)")
+    parser.add_argument("original", help="arquivo .sm original")
+    parser.add_argument("generated", help="arquivo .sm gerado")
+    parser.add_argument("--difficulty", default="", help="dificuldade (padrão: a primeira)")
+    parser.add_argument("--difficulty2", default=None, help="dificuldade no arquivo gerado")
+    parser.add_argument("--mode", default="beat", choices=["beat", "time"])
+    parser.add_argument("--tolerance-ms", type=float, default=0.0, help="tolerância no modo time")
+    parser.add_argument("--ignore-type", action="store_true", help="não diferencia tap de início de hold/roll")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    result = compare_sm_files(args.original, args.generated, args.difficulty, args.difficulty2,
+                              mode=args.mode, tolerance_ms=args.tolerance_ms, ignore_type=args.ignore_type)
+    if result is None:
+        print("❌ Dificuldade não encontrada em um dos arquivos")
+        raise SystemExit(1)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"📁 {args.original} [{result['difficulty1']}] x {args.generated} [{result['difficulty2']}]")
+        print_similarity_report(result)
+
+
+if __name__ == "__main__":
+    main()
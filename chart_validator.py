@@ -0,0 +1,227 @@
+"""
+Chart Validator Module
+
+Este módulo contém a validação estrutural dos charts gerados (comparados
+ao chart original) e o reparo automático de defeitos triviais, para que
+uma resposta quase certa da IA não precise de uma nova chamada:
+
+- Largura de linha errada ou caracteres inválidos: linha completada/cortada
+- Número de linhas da medida fora das quantizações válidas: medida
+  requantizada para a quantização válida mais próxima
+- Poucas medidas a mais ou a menos: medidas extras descartadas ou
+  completadas com as medidas finais do original
+
+Tudo em uma única passada pelas medidas (O(n) nas linhas do chart).
+
+Author: Generated for StepMania Analysis
+"""
+
+from typing import Dict, List, Tuple, Any
+
+from chart_extractor import split_measures, join_measures
+from chart_scanner import NOTE_CHARS
+
+
+# Quantizações de medida aceitas (linhas por medida)
+VALID_ROWS_PER_MEASURE = (4, 8, 12, 16, 24, 32, 48, 64, 192)
+
+EMPTY_ROW_CHAR = '0'
+
+
+def _measure_tolerance(expected: int) -> int:
+    """Diferença de medidas ainda considerada reparável: 10% ou 2 medidas"""
+    return max(2, expected // 10)
+
+
+def _is_empty_measure(rows: List[str]) -> bool:
+    return all(c == EMPTY_ROW_CHAR for row in rows for c in row)
+
+
+def validate_measures(measures: List[List[str]], original: List[List[str]],
+                      lane_width: int = 4) -> List[Dict[str, Any]]:
+    """
+    Lista as violações estruturais do chart gerado em relação ao original.
+
+    Args:
+        measures (List[List[str]]): Medidas do chart gerado
+        original (List[List[str]]): Medidas do chart original
+        lane_width (int): Número de colunas esperado
+
+    Returns:
+        List[Dict[str, Any]]: Violações com chaves type ("measure_count",
+            "row_count", "lane_width" ou "invalid_char"), measure (1-based,
+            0 para o chart todo) e detail
+
+    Example:
+        >>> validate_measures([['1000', '0000', '0000']], [['1000', '0000', '0000', '0000']])
+        [{'type': 'row_count', 'measure': 1, 'detail': '3 linhas (válidas: 4, 8, ...)'}]
+    """
+    violations: List[Dict[str, Any]] = []
+
+    if len(measures) != len(original):
+        violations.append({
+            "type": "measure_count",
+            "measure": 0,
+            "detail": f"{len(measures)} medidas, original tem {len(original)}"
+        })
+
+    for number, rows in enumerate(measures, 1):
+        if len(rows) not in VALID_ROWS_PER_MEASURE:
+            violations.append({
+                "type": "row_count",
+                "measure": number,
+                "detail": f"{len(rows)} linhas (válidas: 4, 8, ...)"
+            })
+        for row in rows:
+            if len(row) != lane_width:
+                violations.append({
+                    "type": "lane_width",
+                    "measure": number,
+                    "detail": f"'{row}' tem {len(row)} colunas, esperado {lane_width}"
+                })
+            elif not all(c in NOTE_CHARS for c in row):
+                violations.append({
+                    "type": "invalid_char",
+                    "measure": number,
+                    "detail": f"'{row}' tem caracteres inválidos"
+                })
+
+    return violations
+
+
+def validate_chart(chart: str, original_chart: str) -> List[Dict[str, Any]]:
+    """
+    Valida um chart gerado (formato SM) contra o chart original.
+
+    Args:
+        chart (str): Chart gerado
+        original_chart (str): Chart original
+
+    Returns:
+        List[Dict[str, Any]]: Violações encontradas (vazia se o chart é válido)
+
+    Example:
+        >>> for v in validate_chart(generated, original):
+        ...     print(f"Medida {v['measure']}: {v['detail']}")
+    """
+    original = split_measures(original_chart)
+    lane_width = len(next((row for rows in original for row in rows), "0000"))
+    return validate_measures(split_measures(chart), original, lane_width)
+
+
+def _repair_row(row: str, lane_width: int) -> str:
+    row = ''.join(c if c in NOTE_CHARS else EMPTY_ROW_CHAR for c in row)
+    return row[:lane_width].ljust(lane_width, EMPTY_ROW_CHAR)
+
+
+def requantize_measure(rows: List[str], lane_width: int = 4) -> List[str]:
+    """
+    Leva a medida para a menor quantização válida com pelo menos as mesmas linhas.
+
+    Cada linha é movida para a posição proporcional na nova quantização;
+    linhas que caem na mesma posição são combinadas (notas prevalecem).
+
+    Args:
+        rows (List[str]): Linhas da medida (quantidade fora de VALID_ROWS_PER_MEASURE)
+        lane_width (int): Número de colunas (usado em medidas vazias)
+
+    Returns:
+        List[str]: Linhas da medida requantizada
+
+    Example:
+        >>> requantize_measure(['1000', '0000', '0100'])
+        ['1000', '0000', '0000', '0100']
+    """
+    if not rows:
+        return [EMPTY_ROW_CHAR * lane_width] * VALID_ROWS_PER_MEASURE[0]
+
+    target = next((n for n in VALID_ROWS_PER_MEASURE if n >= len(rows)), VALID_ROWS_PER_MEASURE[-1])
+    result = [EMPTY_ROW_CHAR * lane_width] * target
+    for index, row in enumerate(rows):
+        if all(c == EMPTY_ROW_CHAR for c in row):
+            continue
+        position = min(target - 1, round(index * target / len(rows)))
+        result[position] = ''.join(
+            new if new != EMPTY_ROW_CHAR else old
+            for old, new in zip(result[position], row)
+        )
+    return result
+
+
+def repair_measures(measures: List[List[str]], original: List[List[str]],
+                    lane_width: int = 4) -> Tuple[List[List[str]], List[str]]:
+    """
+    Repara defeitos triviais das medidas geradas.
+
+    Args:
+        measures (List[List[str]]): Medidas do chart gerado
+        original (List[List[str]]): Medidas do chart original
+        lane_width (int): Número de colunas esperado
+
+    Returns:
+        Tuple[List[List[str]], List[str]]: Medidas reparadas e descrição dos
+            reparos; medidas vazias ([]) se a diferença de medidas for grande
+            demais para reparar
+
+    Example:
+        >>> repaired, fixes = repair_measures(generated, original)
+        >>> print("\\n".join(fixes))
+    """
+    fixes: List[str] = []
+    difference = len(measures) - len(original)
+    if abs(difference) > _measure_tolerance(len(original)):
+        return [], [f"{len(measures)} medidas, original tem {len(original)}: diferença grande demais"]
+
+    repaired: List[List[str]] = []
+    for number, rows in enumerate(measures[:len(original)], 1):
+        fixed_rows = [row if len(row) == lane_width and all(c in NOTE_CHARS for c in row)
+                      else _repair_row(row, lane_width) for row in rows]
+        if fixed_rows != rows:
+            fixes.append(f"medida {number}: linhas corrigidas para {lane_width} colunas")
+        if len(fixed_rows) not in VALID_ROWS_PER_MEASURE:
+            requantized = requantize_measure(fixed_rows, lane_width)
+            fixes.append(f"medida {number}: requantizada de {len(fixed_rows)} para {len(requantized)} linhas")
+            fixed_rows = requantized
+        repaired.append(fixed_rows)
+
+    if difference > 0:
+        extra = measures[len(original):]
+        dropped_notes = sum(not _is_empty_measure(rows) for rows in extra)
+        fixes.append(f"{difference} medidas extras descartadas ({dropped_notes} com notas)")
+    elif difference < 0:
+        repaired.extend([list(rows) for rows in original[len(measures):]])
+        fixes.append(f"{-difference} medidas faltando completadas com as medidas finais do original")
+
+    return repaired, fixes
+
+
+def repair_chart(chart: str, original_chart: str) -> Tuple[str, List[str]]:
+    """
+    Valida o chart gerado e repara defeitos triviais.
+
+    Args:
+        chart (str): Chart gerado (formato SM)
+        original_chart (str): Chart original (formato SM)
+
+    Returns:
+        Tuple[str, List[str]]: Chart reparado (ou o próprio chart se já era
+            válido; string vazia se não for reparável) e descrição dos reparos
+
+    Example:
+        >>> repaired, fixes = repair_chart(generated, original)
+        >>> if not repaired:
+        ...     print("Chart inválido:", fixes)
+    """
+    original = split_measures(original_chart)
+    lane_width = len(next((row for rows in original for row in rows), "0000"))
+    measures = split_measures(chart)
+    if measures == [[]]:
+        return "", ["chart vazio"]
+
+    if not validate_measures(measures, original, lane_width):
+        return chart, []
+
+    repaired, fixes = repair_measures(measures, original, lane_width)
+    if not repaired:
+        return "", fixes
+    return join_measures(repaired), fixes
@@ -0,0 +1,140 @@
+"""
+Chunked Generation Module
+
+Este módulo contém a geração em partes para charts longos: o chart é
+dividido em faixas de medidas (com algumas medidas anteriores como
+contexto), as partes são enviadas à IA em paralelo, cada resposta tem o
+número de medidas conferido e o resultado é costurado na ordem original.
+
+Author: Generated for StepMania Analysis
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Tuple, Any, Callable, Optional
+
+from chart_extractor import split_measures, join_measures
+
+
+def split_into_chunks(measures: List[List[str]], measures_per_chunk: int,
+                      overlap: int = 2) -> List[Dict[str, Any]]:
+    """
+    Divide as medidas em faixas consecutivas com contexto anterior.
+
+    Args:
+        measures (List[List[str]]): Linhas de notas agrupadas por medida
+        measures_per_chunk (int): Medidas por parte
+        overlap (int): Medidas anteriores enviadas como contexto (somente leitura)
+
+    Returns:
+        List[Dict[str, Any]]: Partes com chaves index, start, end (exclusivo),
+            context (medidas anteriores) e measures (medidas a gerar)
+
+    Example:
+        >>> chunks = split_into_chunks(split_measures(chart), 32, overlap=2)
+        >>> [(c["start"], c["end"]) for c in chunks]
+        [(0, 32), (32, 64), (64, 80)]
+    """
+    measures_per_chunk = max(1, measures_per_chunk)
+    chunks = []
+    for index, start in enumerate(range(0, len(measures), measures_per_chunk)):
+        end = min(start + measures_per_chunk, len(measures))
+        chunks.append({
+            "index": index,
+            "start": start,
+            "end": end,
+            "context": measures[max(0, start - overlap):start],
+            "measures": measures[start:end]
+        })
+    return chunks
+
+
+def generate_chunked(chart_data: str,
+                     request_chunk: Callable[[Dict[str, Any], int], str],
+                     extract_chart: Callable[[str], str],
+                     measures_per_chunk: int = 32, overlap: int = 2,
+                     concurrency: int = 4, max_attempts: int = 2,
+                     repair: Optional[Callable[[List[List[str]], List[List[str]]], List[List[str]]]] = None
+                     ) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Gera o chart em partes paralelas e costura o resultado.
+
+    Cada parte é pedida com request_chunk, extraída com extract_chart e
+    aceita somente se tiver exatamente o número de medidas da faixa
+    original; caso contrário é pedida de novo (até max_attempts). Partes
+    que nunca vierem corretas mantêm as medidas originais e são marcadas
+    no relatório.
+
+    Args:
+        chart_data (str): Chart original no formato SM
+        request_chunk (Callable[[Dict[str, Any], int], str]): Recebe a parte e o
+            número da tentativa e retorna a resposta da IA
+        extract_chart (Callable[[str], str]): Extrai o chart (formato SM) da resposta
+        measures_per_chunk (int): Medidas por parte
+        overlap (int): Medidas anteriores enviadas como contexto
+        concurrency (int): Máximo de requisições simultâneas
+        max_attempts (int): Tentativas por parte
+        repair (Optional[Callable]): Recebe as medidas geradas e as originais da
+            parte e retorna as medidas reparadas (ou [] se não reparáveis);
+            aplicado antes da conferência do número de medidas
+
+    Returns:
+        Tuple[str, List[Dict[str, Any]]]: Chart costurado e relatório por parte
+            (index, start, end, attempts, ok, seconds)
+
+    Example:
+        >>> chart, report = generate_chunked(chart_data, request_fn, extract_fn)
+        >>> failed = [r for r in report if not r["ok"]]
+    """
+    measures = split_measures(chart_data)
+    chunks = split_into_chunks(measures, measures_per_chunk, overlap)
+    print(f"🧩 Geração em partes: {len(measures)} medidas em {len(chunks)} partes "
+          f"de até {measures_per_chunk} (contexto: {overlap}, paralelismo: {concurrency})")
+
+    async def run_all() -> List[Tuple[List[List[str]], Dict[str, Any]]]:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_chunk(chunk: Dict[str, Any]) -> Tuple[List[List[str]], Dict[str, Any]]:
+            expected = len(chunk["measures"])
+            label = f"parte {chunk['index'] + 1}/{len(chunks)} (medidas {chunk['start'] + 1}-{chunk['end']})"
+            report = {"index": chunk["index"], "start": chunk["start"], "end": chunk["end"],
+                      "attempts": 0, "ok": False, "seconds": 0.0}
+            started = time.monotonic()
+
+            async with semaphore:
+                for attempt in range(1, max_attempts + 1):
+                    report["attempts"] = attempt
+                    try:
+                        response = await asyncio.to_thread(request_chunk, chunk, attempt)
+                    except Exception as e:
+                        print(f"⚠️ {label}: erro na tentativa {attempt}: {e}")
+                        continue
+
+                    generated = split_measures(extract_chart(response) or "")
+                    if generated == [[]]:
+                        generated = []
+                    if repair and generated:
+                        generated = repair(generated, chunk["measures"]) or generated
+                    if len(generated) == expected:
+                        report["ok"] = True
+                        report["seconds"] = round(time.monotonic() - started, 2)
+                        print(f"✅ {label}: {expected} medidas em {report['seconds']}s")
+                        return generated, report
+                    print(f"⚠️ {label}: {len(generated)} medidas, esperado {expected} "
+                          f"(tentativa {attempt}/{max_attempts})")
+
+            report["seconds"] = round(time.monotonic() - started, 2)
+            print(f"❌ {label}: mantendo as medidas originais")
+            return chunk["measures"], report
+
+        return await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    results = asyncio.run(run_all())
+
+    stitched: List[List[str]] = []
+    reports = []
+    for generated, report in results:
+        stitched.extend(generated)
+        reports.append(report)
+
+    return join_measures(stitched), reports
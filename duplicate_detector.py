@@ -0,0 +1,430 @@
+"""
+Duplicate Detector Module
+
+Este módulo contém a detecção de charts quase duplicados na biblioteca
+inteira (reuploads, edições e variantes LearnMode do mesmo chart), sem
+comparar todos os pares:
+
+1. Cada medida é normalizada pela posição das notas (192 por medida), então
+   uma medida requantizada continua igual; sequências de shingle_size
+   medidas viram shingles
+2. Cada chart vira uma assinatura MinHash (num_perm mínimos de hashes
+   universais dos shingles), que estima a similaridade de Jaccard
+3. As assinaturas são divididas em faixas (LSH): só charts que caem no
+   mesmo balde em alguma faixa são candidatos, e os candidatos com
+   similaridade estimada >= threshold viram grupos (union-find)
+
+O custo é linear no tamanho da biblioteca. As assinaturas ficam num
+índice JSON (por arquivo, com mtime e tamanho), então uma nova execução
+só lê os arquivos novos ou alterados.
+
+Uso:
+    python duplicate_detector.py "C:/Games/Etterna/Songs"
+    python duplicate_detector.py "C:/Songs" --threshold 0.7 --workers 4 --json
+
+Author: Generated for StepMania Analysis
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+
+from chart_extractor import (
+    parse_sm_difficulties,
+    split_measures,
+    learn_mode_path,
+    parse_learn_mode_path,
+    LEARN_MODE_SUFFIX
+)
+from replay_extractor import ROWS_PER_MEASURE
+
+
+DEFAULT_INDEX_PATH = ".chart_index.json"
+INDEX_VERSION = 1
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+
+# Maior primo abaixo de 2^32: com a, b < p e x < 2^32, a·x + b cabe em 64 bits
+_PRIME = 4294967291
+# Permutações fixas: assinaturas do índice continuam válidas entre execuções
+_RNG = np.random.default_rng(20240611)
+_PERM_A = _RNG.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _RNG.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def _difficulty_base(name: str) -> str:
+    """'Beginner (Autor)' -> 'beginner'"""
+    return re.sub(r"\s*\([^)]*\)", "", name).strip().replace(" ", "_").lower()
+
+
+def _measure_key(rows: List[str]) -> bytes:
+    """Medida normalizada: (posição em 1/192, linha) de cada linha com nota"""
+    count = len(rows)
+    notes = [f"{index * ROWS_PER_MEASURE // count}:{row}" for index, row in enumerate(rows)
+             if row.strip("0")]
+    return ";".join(notes).encode("ascii", errors="replace")
+
+
+def measure_shingles(measures: List[List[str]], shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hashes (32 bits) dos shingles de medidas consecutivas do chart.
+
+    Shingles só com medidas vazias são ignorados (introduções e pausas
+    são iguais em charts sem relação).
+
+    Args:
+        measures (List[List[str]]): Chart em medidas (split_measures)
+        shingle_size (int): Medidas por shingle
+
+    Returns:
+        np.ndarray: Hashes únicos dos shingles (uint64)
+    """
+    keys = [_measure_key(rows) for rows in measures]
+    size = min(shingle_size, len(keys))
+    hashes = set()
+    for start in range(len(keys) - size + 1):
+        window = keys[start:start + size]
+        if not any(window):
+            continue
+        digest = hashlib.blake2b(b"|".join(window), digest_size=4).digest()
+        hashes.add(int.from_bytes(digest, "little"))
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash_signature(shingles: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Assinatura MinHash: o menor valor de (a·x + b) mod p de cada permutação.
+
+    Args:
+        shingles (np.ndarray): Hashes de measure_shingles
+
+    Returns:
+        Optional[np.ndarray]: NUM_PERM valores (uint64), ou None para um
+            chart sem notas
+    """
+    if not len(shingles):
+        return None
+    values = (np.outer(shingles, _PERM_A) + _PERM_B) % np.uint64(_PRIME)
+    return values.min(axis=0)
+
+
+def estimate_similarity(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    """Similaridade de Jaccard estimada (fração de mínimos iguais)"""
+    return float(np.mean(signature1 == signature2))
+
+
+def choose_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    Faixas e linhas por faixa do LSH: o maior limiar ((1/faixas)^(1/linhas))
+    que não passa de threshold, para não perder pares (os candidatos são
+    conferidos pela similaridade estimada depois).
+
+    Example:
+        >>> choose_bands(0.8)
+        (16, 8)
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return max(below or options[:1], key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+def _file_signatures(path: str) -> Dict[str, Any]:
+    """Assinaturas de todas as dificuldades de um arquivo (roda no pool)"""
+    entry: Dict[str, Any] = {"charts": {}}
+    try:
+        stat = os.stat(path)
+        entry.update(mtime=stat.st_mtime, size=stat.st_size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            difficulties = parse_sm_difficulties(path)
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        return entry
+    # Variantes LearnMode copiam o original inteiro; só a dificuldade gerada é nova
+    variant = parse_learn_mode_path(path)
+    for name, data in difficulties.items():
+        if variant and _difficulty_base(name) != variant["difficulty"].lower():
+            continue
+        signature = minhash_signature(measure_shingles(split_measures(data["chart_data"])))
+        if signature is not None:
+            entry["charts"][name] = signature.tolist()
+    return entry
+
+
+def find_sm_files(sources: List[str]) -> List[str]:
+    """Arquivos .sm de pastas (recursivamente), arquivos ou padrões glob"""
+    files = []
+    for source in sources:
+        paths = sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, "**", "*.sm"), recursive=True)))
+            elif path.lower().endswith(".sm") and os.path.exists(path):
+                files.append(path)
+    return sorted({os.path.abspath(path) for path in files})
+
+
+def build_index(sources: List[str], index_path: Optional[str] = DEFAULT_INDEX_PATH,
+                workers: int = 2) -> Dict[str, Dict[str, Any]]:
+    """
+    Atualiza o índice de assinaturas da biblioteca.
+
+    Arquivos com o mesmo mtime e tamanho do índice não são lidos de novo;
+    os demais são processados num pool de processos.
+
+    Args:
+        sources (List[str]): Pastas da biblioteca, arquivos .sm ou globs
+        index_path (Optional[str]): Arquivo JSON do índice (None = sem índice)
+        workers (int): Processos para ler os arquivos novos/alterados
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {caminho: {mtime, size, charts: {dificuldade:
+            assinatura}}} dos arquivos encontrados
+
+    Example:
+        >>> index = build_index(["C:/Games/Etterna/Songs"])
+        >>> print(sum(len(e["charts"]) for e in index.values()), "charts")
+    """
+    cached: Dict[str, Dict[str, Any]] = {}
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (data.get("version"), data.get("num_perm"), data.get("shingle_size")) == (INDEX_VERSION, NUM_PERM, SHINGLE_SIZE):
+                cached = data.get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Índice ignorado ({e})")
+
+    index: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for path in find_sm_files(sources):
+        entry = cached.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            index[path] = entry
+        else:
+            pending.append(path)
+
+    started = time.monotonic()
+    if pending:
+        print(f"🔎 Lendo {len(pending)} arquivos ({len(index)} já no índice)")
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                entries = list(pool.map(_file_signatures, pending, chunksize=max(1, len(pending) // (workers * 4))))
+        else:
+            entries = [_file_signatures(path) for path in pending]
+        for path, entry in zip(pending, entries):
+            if "error" in entry:
+                print(f"⚠️ {path}: {entry['error']}")
+            index[path] = entry
+        print(f"🔎 Assinaturas calculadas em {time.monotonic() - started:.1f}s")
+
+    if index_path and pending:
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "num_perm": NUM_PERM, "shingle_size": SHINGLE_SIZE,
+                       "files": {**cached, **index}}, f)
+    return index
+
+
+def _index_charts(index: Dict[str, Dict[str, Any]]) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    keys = [(path, name) for path, entry in sorted(index.items()) for name in sorted(entry.get("charts", {}))]
+    if not keys:
+        return [], np.zeros((0, NUM_PERM), dtype=np.uint64)
+    signatures = np.array([index[path]["charts"][name] for path, name in keys], dtype=np.uint64)
+    return keys, signatures
+
+
+def _is_learn_mode(path: str) -> bool:
+    return path.lower().endswith(LEARN_MODE_SUFFIX.lower())
+
+
+def _lsh_candidates(signatures: np.ndarray, bands: int, rows: int) -> set:
+    """Pares (i, j) que caem no mesmo balde em alguma faixa"""
+    candidates = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for index, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(index)
+        for members in buckets.values():
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    candidates.add((i, j))
+    return candidates
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_duplicate_clusters(index: Dict[str, Dict[str, Any]],
+                            threshold: float = 0.8) -> List[Dict[str, Any]]:
+    """
+    Agrupa os charts quase duplicados do índice.
+
+    Args:
+        index (Dict[str, Dict[str, Any]]): Resultado de build_index
+        threshold (float): Similaridade de Jaccard estimada mínima (0-1)
+
+    Returns:
+        List[Dict[str, Any]]: Grupos com 2+ charts, maiores primeiro; cada
+            um com members (path, difficulty, learn_mode e similarity em
+            relação ao primeiro membro)
+
+    Example:
+        >>> clusters = find_duplicate_clusters(build_index(["C:/Songs"]), threshold=0.7)
+        >>> print(f"{len(clusters)} grupos de duplicados")
+    """
+    keys, signatures = _index_charts(index)
+    bands, rows = choose_bands(threshold)
+    parent = list(range(len(keys)))
+    for i, j in _lsh_candidates(signatures, bands, rows):
+        if estimate_similarity(signatures[i], signatures[j]) >= threshold:
+            parent[_find(parent, i)] = _find(parent, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(keys)):
+        groups.setdefault(_find(parent, i), []).append(i)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # Originais antes das variantes LearnMode
+        members.sort(key=lambda i: (_is_learn_mode(keys[i][0]), keys[i]))
+        first = members[0]
+        clusters.append({"members": [{
+            "path": keys[i][0],
+            "difficulty": keys[i][1],
+            "learn_mode": _is_learn_mode(keys[i][0]),
+            "similarity": round(estimate_similarity(signatures[first], signatures[i]), 3)
+        } for i in members]})
+    clusters.sort(key=lambda cluster: -len(cluster["members"]))
+    return clusters
+
+
+def print_duplicate_report(clusters: List[Dict[str, Any]], total_charts: int) -> None:
+    """Imprime os grupos de duplicados (originais primeiro)"""
+    duplicated = sum(len(cluster["members"]) for cluster in clusters)
+    print(f"\n🧬 {len(clusters)} grupos de charts quase duplicados ({duplicated}/{total_charts} charts)")
+    for number, cluster in enumerate(clusters, 1):
+        print(f"\n   Grupo {number} ({len(cluster['members'])} charts)")
+        for member in cluster["members"]:
+            mark = " [LearnMode]" if member["learn_mode"] else ""
+            print(f"   {member['similarity']:>6.0%}  {member['path']} [{member['difficulty']}]{mark}")
+
+
+def find_existing_variants(jobs: List[Dict[str, Any]], threshold: float = 0.8,
+                           index_path: Optional[str] = DEFAULT_INDEX_PATH,
+                           workers: int = 2) -> Dict[str, str]:
+    """
+    Jobs do lote cujo chart já tem uma variante LearnMode na biblioteca.
+
+    Um job é pulado se a saída esperada já existe, ou se algum chart
+    quase duplicado do chart do job (mesma dificuldade, inclusive em outra
+    pasta, como um reupload) já tem uma variante LearnMode gerada com a
+    mesma tag (output_tag do job, ver batch_runner.load_manifest).
+
+    Args:
+        jobs (List[Dict[str, Any]]): Jobs de batch_runner.load_manifest; a
+            biblioteca é o "library" do job (pastas ou glob) ou a pasta da
+            música do job
+        threshold (float): Similaridade mínima para considerar duplicado
+        index_path (Optional[str]): Índice de assinaturas (ver build_index)
+        workers (int): Processos para ler arquivos fora do índice
+
+    Returns:
+        Dict[str, str]: {id do job: variante existente}
+
+    Example:
+        >>> existing = find_existing_variants(load_manifest("turma.json"))
+        >>> jobs = [job for job in jobs if job["id"] not in existing]
+    """
+    existing: Dict[str, str] = {}
+    pending = []
+    for job in jobs:
+        difficulty = _difficulty_base(job.get("difficulty", ""))
+        # Mesmo nome de save_modified_chart
+        expected = job.get("output") or (
+            learn_mode_path(job["sm_path"], job["difficulty"], job.get("output_tag", "")) if difficulty else ""
+        )
+        if expected and os.path.exists(expected):
+            existing[job["id"]] = expected
+        elif difficulty:
+            pending.append(job)
+
+    if pending:
+        sources = set()
+        for job in pending:
+            library = job.get("library") or os.path.dirname(os.path.abspath(job["sm_path"]))
+            sources.update([library] if isinstance(library, str) else library)
+        sources.update(job["sm_path"] for job in pending)
+        index = build_index(sorted(sources), index_path, workers)
+
+        # Variantes da biblioteca: assinatura do chart original de onde saíram
+        variants = []
+        for path in index:
+            variant = parse_learn_mode_path(path)
+            if not variant:
+                continue
+            difficulty = variant["difficulty"].lower()
+            for name, signature in index.get(variant["original"], {}).get("charts", {}).items():
+                if _difficulty_base(name) == difficulty:
+                    variants.append((difficulty, variant["tag"], np.array(signature, dtype=np.uint64), path))
+
+        for job in pending:
+            difficulty = _difficulty_base(job["difficulty"])
+            charts = index.get(os.path.abspath(job["sm_path"]), {}).get("charts", {})
+            signatures = [np.array(signature, dtype=np.uint64) for name, signature in charts.items()
+                          if difficulty in _difficulty_base(name)]
+            for variant_difficulty, variant_tag, variant_signature, variant_path in variants:
+                if not variant_difficulty.startswith(difficulty) or variant_tag != job.get("output_tag", ""):
+                    continue
+                if any(estimate_similarity(signature, variant_signature) >= threshold for signature in signatures):
+                    existing[job["id"]] = variant_path
+                    break
+
+    for job_id, path in existing.items():
+        print(f"⏭️ [{job_id}] variante já existe: {path}")
+    return existing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Detecta charts quase duplicados na biblioteca (MinHash/LSH)")
+    parser.add_argument("sources", nargs="+", help="pastas da biblioteca, arquivos .sm ou globs")
+    parser.add_argument("--threshold", type=float, default=0.8, help="similaridade mínima (0-1)")
+    parser.add_argument("--workers", type=int, default=2, help="processos para ler os arquivos")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="índice de assinaturas ('' = sem índice)")
+    parser.add_argument("--json", action="store_true", help="imprime os grupos em JSON")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    # Com --json, o progresso vai para o stderr e o stdout fica só com o JSON
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        index = build_index(args.sources, args.index or None, args.workers)
+    clusters = find_duplicate_clusters(index, args.threshold)
+    total = sum(len(entry.get("charts", {})) for entry in index.values())
+    if args.json:
+        print(json.dumps(clusters, ensure_ascii=False, indent=2))
+    else:
+        print_duplicate_report(clusters, total)
+        print(f"\n⏱️ {len(index)} arquivos, {total} charts em {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
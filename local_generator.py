@@ -0,0 +1,287 @@
+"""
+Local Generator Module
+
+Este módulo contém o gerador local (sem IA) de charts LearnMode: aplica
+de forma determinística as mesmas regras pedagógicas do prompt
+(PROMPT_INSTRUCTIONS) sobre a matriz de notas do chart.
+
+- Acurácia geral (W1 + W2) <= 85%: reduz até 20% das notas, começando por
+  jacks e alternâncias rápidas, depois pelas trilhas com pior acurácia e
+  pelas notas fora do tempo forte.
+- Acurácia geral > 85%: acrescenta até 15% de notas em colcheias vazias,
+  nas trilhas com melhor acurácia e sem criar jacks.
+
+O número de medidas e de linhas por medida nunca muda; holds e minas são
+mantidos como estão.
+
+Author: Generated for StepMania Analysis
+"""
+
+import bisect
+from typing import Dict, List, Tuple, Any
+
+import numpy as np
+import pandas as pd
+
+from chart_extractor import split_measures, join_measures
+from replay_extractor import GOOD_JUDGMENTS
+
+# Limiar de acurácia entre facilitar e dificultar o chart
+ACCURACY_THRESHOLD = 0.85
+MAX_REDUCTION = 0.20
+MAX_INCREASE = 0.15
+# Acurácia a partir da qual a redução/aumento é máximo
+FULL_REDUCTION_ACCURACY = 0.60
+FULL_INCREASE_ACCURACY = 0.95
+
+# Notas a até 1/4 de tempo (semicolcheias) umas das outras são "rápidas"
+FAST_GAP_BEATS = 0.25
+# Menor alternância rápida tratada (notas seguidas em trilhas alternadas)
+MIN_ALTERNATION_RUN = 4
+# Distância mínima (em tempos) entre uma nota acrescentada e as vizinhas
+ADDED_NOTE_SPACING = 0.5
+
+_TAP = '1'
+_NOTE_HEADS = ('1', '2', '4')
+_HOLD_HEADS = ('2', '4')
+_HOLD_TAIL = '3'
+_EPS = 1e-9
+
+
+def lane_accuracy(performance_stats: pd.DataFrame, lane_count: int = 4) -> Tuple[np.ndarray, float]:
+    """
+    Calcula a acurácia (W1 + W2) por trilha e geral a partir de analyze_performance.
+
+    Args:
+        performance_stats (pd.DataFrame): Colunas track, judgment, count e total
+        lane_count (int): Número de trilhas do chart
+
+    Returns:
+        Tuple[np.ndarray, float]: Acurácia por trilha (0-1) e acurácia geral;
+            trilhas sem dados recebem a acurácia geral
+
+    Example:
+        >>> per_lane, overall = lane_accuracy(results['performance_stats'])
+        >>> print(f"Geral: {overall:.0%}")
+    """
+    good = performance_stats[performance_stats["judgment"].isin(GOOD_JUDGMENTS)]
+    good_by_track = good.groupby("track")["count"].sum()
+    total_by_track = performance_stats.groupby("track")["total"].first()
+
+    total = total_by_track.sum()
+    overall = float(good_by_track.sum() / total) if total else 0.0
+
+    per_lane = np.full(lane_count, overall)
+    for track, track_total in total_by_track.items():
+        if 0 <= track < lane_count and track_total:
+            per_lane[track] = good_by_track.get(track, 0) / track_total
+    return per_lane, overall
+
+
+def build_note_matrix(measures: List[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monta a matriz de notas (linhas x trilhas) e a posição de cada linha.
+
+    Args:
+        measures (List[List[str]]): Linhas de notas agrupadas por medida
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Matriz de caracteres,
+            posição de cada linha em tempos (4 por medida) e posição da
+            linha dentro da sua medida
+
+    Raises:
+        ValueError: Se as linhas não tiverem todas a mesma largura
+
+    Example:
+        >>> grid, beats, _ = build_note_matrix([['1000', '0000', '0100', '0000']])
+        >>> beats.tolist()
+        [0.0, 1.0, 2.0, 3.0]
+    """
+    rows = [row for measure in measures for row in measure]
+    if not rows:
+        return np.empty((0, 4), dtype='<U1'), np.empty(0), np.empty(0, dtype=int)
+
+    widths = {len(row) for row in rows}
+    if len(widths) != 1:
+        raise ValueError(f"Linhas com larguras diferentes no chart: {sorted(widths)}")
+
+    sizes = np.array([len(measure) for measure in measures])
+    grid = np.array([list(row) for row in rows], dtype='<U1')
+    measure_index = np.repeat(np.arange(len(measures)), sizes)
+    position = np.concatenate([np.arange(size) for size in sizes])
+    beats = measure_index * 4 + position * 4 / np.repeat(sizes, sizes)
+    return grid, beats, position
+
+
+def _jack_cells(taps: np.ndarray, beats: np.ndarray) -> np.ndarray:
+    """Marca a segunda nota de cada par de notas rápidas na mesma trilha"""
+    jacks = np.zeros_like(taps)
+    for lane in range(taps.shape[1]):
+        rows = np.flatnonzero(taps[:, lane])
+        if len(rows) < 2:
+            continue
+        fast = np.diff(beats[rows]) <= FAST_GAP_BEATS + _EPS
+        jacks[rows[1:][fast], lane] = True
+    return jacks
+
+
+def _alternation_cells(taps: np.ndarray, notes: np.ndarray, beats: np.ndarray) -> np.ndarray:
+    """Marca uma a cada duas notas das sequências rápidas de notas simples"""
+    alternations = np.zeros_like(taps)
+    note_rows = np.flatnonzero(notes.any(axis=1))
+    if len(note_rows) < MIN_ALTERNATION_RUN:
+        return alternations
+
+    # Sequências: linhas de nota consecutivas separadas por no máximo FAST_GAP
+    fast = np.diff(beats[note_rows]) <= FAST_GAP_BEATS + _EPS
+    run_id = np.concatenate([[0], np.cumsum(~fast)])
+    run_start = np.flatnonzero(np.concatenate([[True], ~fast]))
+    run_length = np.bincount(run_id)
+    offset = np.arange(len(note_rows)) - run_start[run_id]
+
+    single = (taps[note_rows].sum(axis=1) == 1) & (notes[note_rows].sum(axis=1) == 1)
+    selected = note_rows[(run_length[run_id] >= MIN_ALTERNATION_RUN) & (offset % 2 == 1) & single]
+    alternations[selected] = taps[selected]
+    return alternations
+
+
+def _reduce(grid: np.ndarray, beats: np.ndarray, position: np.ndarray,
+            per_lane: np.ndarray, fraction: float) -> Dict[str, int]:
+    taps = grid == _TAP
+    notes = np.isin(grid, _NOTE_HEADS)
+    total_notes = int(notes.sum())
+
+    jacks = _jack_cells(taps, beats)
+    alternations = _alternation_cells(taps, notes, beats) & ~jacks
+
+    # Classe de remoção: 0 = jack, 1 = alternância rápida, 2 = demais notas
+    # (o primeiro tempo de cada medida é preservado como acento)
+    klass = np.full(taps.shape, 2)
+    klass[alternations] = 1
+    klass[jacks] = 0
+    candidates = taps & ((klass < 2) | (position != 0)[:, None])
+
+    rows, lanes = np.nonzero(candidates)
+    cleanup = int((klass[rows, lanes] < 2).sum())
+    # Arredonda para baixo: o teto nunca passa de MAX_REDUCTION
+    limit = int(total_notes * MAX_REDUCTION)
+    target = min(max(int(round(total_notes * fraction)), cleanup), limit, len(rows))
+
+    on_beat = np.abs(beats[rows] - np.round(beats[rows])) < _EPS
+    order = np.lexsort((on_beat, per_lane[lanes], klass[rows, lanes]))[:target]
+    grid[rows[order], lanes[order]] = '0'
+
+    removed_classes = klass[rows[order], lanes[order]]
+    return {
+        "removed": int(target),
+        "removed_jacks": int((removed_classes == 0).sum()),
+        "removed_alternations": int((removed_classes == 1).sum())
+    }
+
+
+def _increase(grid: np.ndarray, beats: np.ndarray, per_lane: np.ndarray,
+              fraction: float) -> Dict[str, int]:
+    notes = np.isin(grid, _NOTE_HEADS)
+    total_notes = int(notes.sum())
+    target = min(int(round(total_notes * fraction)), int(total_notes * MAX_INCREASE))
+    if target == 0:
+        return {"added": 0}
+
+    # Linhas dentro de holds não recebem notas
+    hold_depth = np.cumsum(np.isin(grid, _HOLD_HEADS).astype(int) - (grid == _HOLD_TAIL), axis=0)
+    occupied = (grid != '0').any(axis=1) | (hold_depth > 0).any(axis=1)
+
+    note_rows = np.flatnonzero(notes.any(axis=1))
+    if len(note_rows) == 0:
+        return {"added": 0}
+    note_beats = beats[note_rows]
+
+    # Colcheias vazias longe o bastante das notas vizinhas
+    eighth = np.abs(beats * 2 - np.round(beats * 2)) < _EPS
+    candidate_rows = np.flatnonzero(eighth & ~occupied)
+    next_index = np.searchsorted(note_beats, beats[candidate_rows])
+    prev_gap = np.where(next_index > 0,
+                        beats[candidate_rows] - note_beats[np.maximum(next_index - 1, 0)], np.inf)
+    next_gap = np.where(next_index < len(note_beats),
+                        note_beats[np.minimum(next_index, len(note_beats) - 1)] - beats[candidate_rows], np.inf)
+    spaced = (prev_gap >= ADDED_NOTE_SPACING - _EPS) & (next_gap >= ADDED_NOTE_SPACING - _EPS)
+    candidate_rows = candidate_rows[spaced]
+    gaps = np.minimum(prev_gap, next_gap)[spaced]
+
+    # Tempos fortes primeiro, depois os trechos mais vazios
+    on_beat = np.abs(beats[candidate_rows] - np.round(beats[candidate_rows])) < _EPS
+    chosen = np.sort(candidate_rows[np.lexsort((-gaps, ~on_beat))[:target]])
+
+    added_per_lane = np.zeros(grid.shape[1])
+    filled = list(note_rows)
+    for row in chosen:
+        # Evita jacks com a linha de nota anterior e a seguinte
+        blocked = np.zeros(grid.shape[1], dtype=bool)
+        index = bisect.bisect_left(filled, row)
+        if index > 0:
+            blocked |= np.isin(grid[filled[index - 1]], _NOTE_HEADS)
+        if index < len(filled):
+            blocked |= np.isin(grid[filled[index]], _NOTE_HEADS)
+        if blocked.all():
+            continue
+        score = np.where(blocked, -np.inf, per_lane * 0.9 ** added_per_lane)
+        lane = int(np.argmax(score))
+        grid[row, lane] = _TAP
+        added_per_lane[lane] += 1
+        filled.insert(index, row)
+
+    return {"added": int(added_per_lane.sum())}
+
+
+def generate_local_chart(chart_data: str, performance_stats: pd.DataFrame) -> Tuple[str, Dict[str, Any]]:
+    """
+    Gera o chart LearnMode localmente, sem chamar a IA.
+
+    Args:
+        chart_data (str): Chart original no formato SM
+        performance_stats (pd.DataFrame): Estatísticas de analyze_performance
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: Chart gerado (mesmas medidas e linhas do
+            original) e relatório (mode, accuracy, lane_accuracy,
+            notes_before, notes_after e contagens de notas removidas/acrescentadas)
+
+    Raises:
+        ValueError: Se o chart tiver linhas de larguras diferentes
+
+    Example:
+        >>> chart, report = generate_local_chart(chart_data, results['performance_stats'])
+        >>> print(report["mode"], report["notes_before"], "->", report["notes_after"])
+    """
+    measures = split_measures(chart_data)
+    grid, beats, position = build_note_matrix(measures)
+    per_lane, overall = lane_accuracy(performance_stats, grid.shape[1])
+    notes_before = int(np.isin(grid, _NOTE_HEADS).sum())
+
+    report: Dict[str, Any] = {
+        "accuracy": round(overall, 4),
+        "lane_accuracy": [round(float(a), 4) for a in per_lane],
+        "notes_before": notes_before
+    }
+
+    if overall <= ACCURACY_THRESHOLD:
+        span = ACCURACY_THRESHOLD - FULL_REDUCTION_ACCURACY
+        fraction = MAX_REDUCTION * min(1.0, (ACCURACY_THRESHOLD - overall) / span)
+        report["mode"] = "easier"
+        report.update(_reduce(grid, beats, position, per_lane, fraction))
+    else:
+        span = FULL_INCREASE_ACCURACY - ACCURACY_THRESHOLD
+        fraction = MAX_INCREASE * min(1.0, (overall - ACCURACY_THRESHOLD) / span)
+        report["mode"] = "harder"
+        report.update(_increase(grid, beats, per_lane, fraction))
+
+    report["notes_after"] = int(np.isin(grid, _NOTE_HEADS).sum())
+
+    rows = [''.join(row) for row in grid]
+    generated: List[List[str]] = []
+    start = 0
+    for measure in measures:
+        generated.append(rows[start:start + len(measure)])
+        start += len(measure)
+    return join_measures(generated), report
@@ -0,0 +1,491 @@
+"""
+Mock LLM Server Module
+
+Este módulo contém um servidor HTTP local que imita os provedores de IA
+(schema chat completions do DeepSeek/OpenAI e schema messages do Claude),
+para medir vazão e concorrência do pipeline sem rede e sem custo:
+
+- Latência configurável (fixa, uniforme, normal ou lognormal)
+- Streaming SSE no formato de cada provedor, com velocidade de geração
+- Injeção de erros (429 com Retry-After, 500, 529 e chart malformado)
+- Respostas gravadas (ex.: debug_ai_response_*.txt) ou "eco" do chart
+  recebido no prompt (sempre válido)
+
+Uso:
+    python mock_llm_server.py serve --port 8765 --latency lognormal:3,0.5 --errors 429:0.05
+    python mock_llm_server.py bench --api claude --requests 40 --concurrency 8
+    python mock_llm_server.py bench --api claude --rate-limits --errors 429:0.1
+
+Para apontar o pipeline ao servidor, use no .env:
+    DEEPSEEK_API_URL=http://127.0.0.1:8765/v1/chat/completions
+    OPENAI_API_URL=http://127.0.0.1:8765/v1/chat/completions
+    CLAUDE_API_URL=http://127.0.0.1:8765/v1/messages
+
+Author: Generated for StepMania Analysis
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Any, Callable, Optional
+
+from chart_encoding import encode_chart
+from chart_extractor import join_measures
+
+
+DEFAULT_RESPONSE_FILES = "debug_ai_response_*.txt"
+CHARS_PER_TOKEN = 3.5
+# Tamanho dos pedaços enviados no streaming
+STREAM_CHUNK_CHARS = 24
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Converte a especificação de latência em um gerador de segundos.
+
+    Formatos: "fixed:S", "uniform:MIN,MAX", "normal:MEDIA,DESVIO",
+    "lognormal:MEDIANA,SIGMA".
+
+    Args:
+        spec (str): Especificação da distribuição
+
+    Returns:
+        Callable[[], float]: Sorteia uma latência (nunca negativa)
+
+    Raises:
+        ValueError: Se a especificação for inválida
+
+    Example:
+        >>> sample = parse_latency("uniform:1,3")
+        >>> 1 <= sample() <= 3
+        True
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Latência inválida: '{spec}'")
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Latência inválida: '{spec}' (use fixed:S, uniform:A,B, normal:M,D ou lognormal:M,S)")
+
+
+def parse_errors(spec: str) -> List[Tuple[str, float]]:
+    """
+    Converte "429:0.05,500:0.02,malformed:0.03" em [(tipo, probabilidade)].
+
+    Args:
+        spec (str): Tipos de erro (429, 500, 529, malformed) e probabilidades
+
+    Returns:
+        List[Tuple[str, float]]: Erros na ordem informada
+
+    Raises:
+        ValueError: Se algum tipo ou probabilidade for inválido
+    """
+    errors = []
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        kind, _, rate = item.partition(":")
+        if kind not in ("429", "500", "529", "malformed"):
+            raise ValueError(f"Tipo de erro inválido: '{kind}'")
+        errors.append((kind, float(rate)))
+    return errors
+
+
+def load_responses(pattern: str) -> List[str]:
+    """Lê as respostas gravadas que casam com o padrão glob"""
+    responses = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            responses.append(f.read())
+    return responses
+
+
+def _echo_response(content: str) -> str:
+    """Devolve o chart recebido no prompt (no mesmo formato) dentro de um bloco"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return "Sem chart no prompt."
+    chart = data.get("original_chart") or data.get("original_sm_file") or ""
+    return f"Chart ajustado:\n\n```\n{chart}\n```\n\nResposta gerada pelo servidor simulado."
+
+
+def _malformed(text: str) -> str:
+    """Estraga a largura das linhas de notas (exercita validação e aborto do streaming)"""
+    return "\n".join(line + "0" if len(line) == 4 and line.isdigit() else line
+                     for line in text.splitlines())
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Atende /v1/chat/completions (DeepSeek/OpenAI) e /v1/messages (Claude)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.settings.get("verbose"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _next_text(self, content: str) -> str:
+        settings = self.server.settings
+        if settings["responses"]:
+            with self.server.lock:
+                return next(self.server.response_cycle)
+        return _echo_response(content)
+
+    def do_POST(self) -> None:
+        settings = self.server.settings
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "JSON inválido"}})
+            return
+
+        anthropic = self.path.rstrip("/").endswith("/messages")
+        if not anthropic and not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Rota desconhecida: {self.path}"}})
+            return
+
+        messages = payload.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+        # Sorteia o erro (se houver) antes de "gerar"
+        roll = random.random()
+        injected = None
+        for kind, rate in settings["errors"]:
+            if roll < rate:
+                injected = kind
+                break
+            roll -= rate
+
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+            self.server.stats[injected or "ok"] = self.server.stats.get(injected or "ok", 0) + 1
+
+        time.sleep(settings["latency"]())
+
+        if injected == "429":
+            self._send_json(429, {"error": {"type": "rate_limit_error", "message": "Rate limit (simulado)"}},
+                            {"Retry-After": str(settings["retry_after"])})
+            return
+        if injected in ("500", "529"):
+            self._send_json(int(injected), {"error": {"type": "overloaded_error", "message": "Erro simulado"}})
+            return
+
+        text = self._next_text(content)
+        if injected == "malformed":
+            text = _malformed(text)
+
+        model = payload.get("model", "mock")
+        prompt_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+        completion_tokens = math.ceil(len(text) / CHARS_PER_TOKEN)
+
+        if payload.get("stream"):
+            self._stream(anthropic, model, text)
+        elif anthropic:
+            self._send_json(200, {
+                "id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant",
+                "model": model, "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}
+            })
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "object": "chat.completion",
+                "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+
+    def _stream(self, anthropic: bool, model: str, text: str) -> None:
+        settings = self.server.settings
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        # Como os provedores reais: cada evento num chunk HTTP, entregue assim que é gerado
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def write_chunk(data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def send(event: Dict[str, Any], name: Optional[str] = None) -> None:
+            prefix = f"event: {name}\n" if name else ""
+            write_chunk(f"{prefix}data: {json.dumps(event)}\n\n".encode("utf-8"))
+
+        delay = STREAM_CHUNK_CHARS / CHARS_PER_TOKEN / settings["tokens_per_second"]
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        try:
+            if anthropic:
+                send({"type": "message_start", "message": {"model": model, "role": "assistant"}}, "message_start")
+                send({"type": "content_block_start", "index": 0,
+                      "content_block": {"type": "text", "text": ""}}, "content_block_start")
+            for chunk in chunks:
+                time.sleep(delay)
+                if anthropic:
+                    send({"type": "content_block_delta", "index": 0,
+                          "delta": {"type": "text_delta", "text": chunk}}, "content_block_delta")
+                else:
+                    send({"choices": [{"index": 0, "delta": {"content": chunk}}], "model": model})
+            if anthropic:
+                send({"type": "message_stop"}, "message_stop")
+            else:
+                write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente abortou o stream (ex.: chart malformado detectado cedo)
+            with self.server.lock:
+                self.server.stats["aborted_streams"] = self.server.stats.get("aborted_streams", 0) + 1
+
+
+def start_mock_server(latency: str = "fixed:0.5", errors: str = "", responses: str = "",
+                      tokens_per_second: float = 200.0, retry_after: float = 1.0,
+                      host: str = "127.0.0.1", port: int = 0,
+                      verbose: bool = False) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Inicia o servidor simulado em uma thread daemon.
+
+    Args:
+        latency (str): Distribuição da latência até o primeiro byte (ver parse_latency)
+        errors (str): Erros injetados (ver parse_errors)
+        responses (str): Padrão glob de respostas gravadas (vazio = eco do prompt)
+        tokens_per_second (float): Velocidade de geração no streaming
+        retry_after (float): Valor do header Retry-After nas respostas 429
+        host (str): Endereço de escuta
+        port (int): Porta (0 = livre escolhida pelo sistema)
+        verbose (bool): Mostra o log de cada requisição
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: Servidor (use .shutdown()) e URL base
+
+    Example:
+        >>> server, base_url = start_mock_server(latency="uniform:1,2")
+        >>> url = f"{base_url}/v1/chat/completions"
+    """
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0}
+    loaded = load_responses(responses) if responses else []
+    if responses and not loaded:
+        print(f"⚠️ Nenhuma resposta gravada em '{responses}', usando eco do prompt")
+    server.response_cycle = itertools.cycle(loaded) if loaded else None
+    server.settings = {
+        "latency": parse_latency(latency),
+        "errors": parse_errors(errors),
+        "responses": loaded,
+        "tokens_per_second": tokens_per_second,
+        "retry_after": retry_after,
+        "verbose": verbose
+    }
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-llm").start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def _synthetic_chart(measures: int) -> str:
+    patterns = ["1000", "0100", "0010", "0001"]
+    return join_measures([
+        [patterns[(m + i) % 4] if i % 2 == 0 else "0000" for i in range(8)]
+        for m in range(measures)
+    ])
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_benchmark(api_name: str = "deepseek", requests_count: int = 20, concurrency: int = 4,
+                  measures: int = 64, stream: bool = False, compact: bool = False,
+                  rate_limits: bool = False, **server_options: Any) -> Dict[str, Any]:
+    """
+    Mede vazão e latência do caminho de chamada real (ai_providers) contra o servidor simulado.
+
+    Usa call_provider/stream_provider com retry e pool de conexões e
+    confere o chart de cada resposta. Por padrão o limitador de taxa fica
+    de fora (senão a vazão medida seria a cota configurada, não a do
+    pipeline); com rate_limits, as cotas configuradas valem, num limitador
+    próprio do servidor simulado que não divide estado com o provedor real.
+
+    Args:
+        api_name (str): Schema a usar ("deepseek", "openai" ou "claude")
+        requests_count (int): Total de requisições
+        concurrency (int): Requisições simultâneas
+        measures (int): Medidas do chart sintético enviado
+        stream (bool): Usa streaming (SSE)
+        compact (bool): Envia o chart no formato compacto
+        rate_limits (bool): Aplica os limites de taxa configurados (RPM/TPM/concorrência)
+        **server_options: Repassados para start_mock_server
+
+    Returns:
+        Dict[str, Any]: requests, ok, valid, errors, seconds, throughput (req/s),
+            p50, p95 e max (segundos por requisição) e stats do servidor
+
+    Example:
+        >>> report = run_benchmark("claude", requests_count=40, concurrency=8, latency="lognormal:2,0.4")
+        >>> print(report["throughput"], report["p95"])
+    """
+    # Imports locais: o servidor sozinho não precisa das configurações de API
+    import api_config
+    from dataclasses import replace
+    from api_config import resolve_provider_config
+    from ai_providers import call_provider, stream_provider
+    from chart_scanner import extract_chart_measures
+    from chart_encoding import decode_chart_response
+    from rate_limiter import set_rate_limiter
+
+    # Latências simuladas não podem influenciar a escolha automática de modelo
+    api_config.TELEMETRY_CONFIG["enabled"] = False
+
+    server, base_url = start_mock_server(**server_options)
+    path = "/v1/messages" if api_name == "claude" else "/v1/chat/completions"
+    provider = replace(resolve_provider_config(api_name), url=base_url + path, key="mock-key")
+    if not rate_limits:
+        set_rate_limiter(provider.api, provider.model, provider.url, None)
+
+    chart = _synthetic_chart(measures)
+    key = "original_chart" if compact else "original_sm_file"
+    content = json.dumps({key: encode_chart(chart) if compact else chart,
+                          "instructions": "benchmark"}, separators=(",", ":"))
+
+    def one_request(_: int) -> Tuple[float, bool, Optional[str]]:
+        started = time.monotonic()
+        try:
+            if stream:
+                text = stream_provider(provider, content, lambda piece: True)
+            else:
+                text = call_provider(provider, content)
+        except Exception as e:
+            return time.monotonic() - started, False, f"{type(e).__name__}: {e}"[:120]
+        generated = decode_chart_response(text) if compact else ""
+        count = len(generated.split("\n,\n")) if generated else len(extract_chart_measures(text))
+        return time.monotonic() - started, count == measures, None
+
+    print(f"🏁 Benchmark: {requests_count} requisições {api_name} ({'stream' if stream else 'normal'}), "
+          f"concorrência {concurrency}, {measures} medidas, "
+          f"{'com' if rate_limits else 'sem'} limites de taxa -> {base_url}")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(one_request, range(requests_count)))
+    elapsed = time.monotonic() - started
+    server.shutdown()
+    server.server_close()
+
+    latencies = [seconds for seconds, _, error in results if error is None]
+    errors: Dict[str, int] = {}
+    for _, _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+
+    report = {
+        "requests": requests_count,
+        "ok": len(latencies),
+        "valid": sum(1 for _, valid, error in results if valid and error is None),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "throughput": round(requests_count / elapsed, 2) if elapsed else 0.0,
+        "p50": round(_percentile(latencies, 0.50), 3),
+        "p95": round(_percentile(latencies, 0.95), 3),
+        "max": round(max(latencies), 3) if latencies else 0.0,
+        "server": dict(server.stats)
+    }
+
+    print(f"   Tempo total:   {report['seconds']}s ({report['throughput']} req/s)")
+    print(f"   Sucesso:       {report['ok']}/{requests_count} (charts válidos: {report['valid']})")
+    print(f"   Latência:      p50 {report['p50']}s | p95 {report['p95']}s | máx {report['max']}s")
+    print(f"   Servidor:      {report['server']}")
+    for error, count in errors.items():
+        print(f"   ❌ {count}x {error}")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor simulado de IA para benchmarks do pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_server_options(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--latency", default="fixed:0.5", help="fixed:S | uniform:A,B | normal:M,D | lognormal:M,S")
+        p.add_argument("--errors", default="", help="ex.: 429:0.05,500:0.02,malformed:0.03")
+        p.add_argument("--responses", default="", help=f"glob de respostas gravadas (ex.: {DEFAULT_RESPONSE_FILES})")
+        p.add_argument("--tokens-per-second", type=float, default=200.0)
+        p.add_argument("--retry-after", type=float, default=1.0)
+
+    serve = sub.add_parser("serve", help="inicia o servidor")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--verbose", action="store_true")
+    add_server_options(serve)
+
+    bench = sub.add_parser("bench", help="mede vazão do pipeline contra o servidor")
+    bench.add_argument("--api", default="deepseek", choices=["deepseek", "openai", "claude"])
+    bench.add_argument("--requests", type=int, default=20)
+    bench.add_argument("--concurrency", type=int, default=4)
+    bench.add_argument("--measures", type=int, default=64)
+    bench.add_argument("--stream", action="store_true")
+    bench.add_argument("--compact", action="store_true")
+    bench.add_argument("--rate-limits", action="store_true",
+                       help="aplica os limites de taxa configurados (*_RPM, *_TPM, *_MAX_CONCURRENCY)")
+    add_server_options(bench)
+
+    args = parser.parse_args()
+    server_options = {
+        "latency": args.latency, "errors": args.errors, "responses": args.responses,
+        "tokens_per_second": args.tokens_per_second, "retry_after": args.retry_after
+    }
+
+    if args.command == "serve":
+        server, base_url = start_mock_server(host=args.host, port=args.port, verbose=args.verbose,
+                                             **server_options)
+        print(f"🤖 Servidor simulado em {base_url}")
+        print(f"   DeepSeek/OpenAI: {base_url}/v1/chat/completions")
+        print(f"   Claude:          {base_url}/v1/messages")
+        print("   Ctrl+C para encerrar")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+            print(f"\n📊 {server.stats}")
+    else:
+        run_benchmark(args.api, args.requests, args.concurrency, args.measures,
+                      args.stream, args.compact, args.rate_limits, **server_options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Rate Limiter Module
+
+Este módulo contém o limitador de taxa por provedor/modelo usado por
+post_with_retry: cada par (API, modelo) tem um token bucket de requisições
+por minuto (RPM), um de tokens por minuto (TPM, pela estimativa da
+requisição) e um limite de requisições simultâneas.
+
+O limitador também é separado por host: um servidor simulado
+(mock_llm_server.py) apontado para a mesma API não divide a cota nem o
+estado de 429 com o provedor real.
+
+Quando o provedor responde 429 a taxa é reduzida pela metade e todas as
+requisições daquele par esperam o Retry-After; cada resposta bem-sucedida
+devolve 5% da taxa configurada, até o limite. Assim o lote se aproxima da
+cota do provedor sem estourá-la repetidamente.
+
+Author: Generated for StepMania Analysis
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, Tuple, Optional, Any
+from urllib.parse import urlsplit
+
+from api_config import get_rate_limit
+from token_budget import CHARS_PER_TOKEN_TEXT
+
+
+# Redução da taxa a cada 429 e recuperação a cada sucesso
+THROTTLE_FACTOR = 0.5
+RECOVERY_STEP = 0.05
+MIN_RATE_SCALE = 0.1
+# Espera após 429 sem Retry-After
+DEFAULT_THROTTLE_SECONDS = 1.0
+# Maior intervalo entre verificações enquanto espera a vez
+MAX_POLL_SECONDS = 5.0
+
+
+class TokenBucket:
+    """
+    Token bucket com capacidade de um minuto de cota.
+
+    Example:
+        >>> bucket = TokenBucket(per_minute=60)
+        >>> bucket.wait_time(1, time.monotonic())
+        0.0
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.scale = 1.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * self.scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos até haver `amount` disponível (0 se já há)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.rate * self.scale)
+
+    def take(self, amount: float) -> None:
+        """Consome `amount` (chamar depois de wait_time retornar 0)"""
+        self.level -= min(amount, self.capacity)
+
+    def drain(self) -> None:
+        """Esvazia o bucket (evita rajada logo após um 429)"""
+        self.level = min(self.level, 0.0)
+
+
+class ProviderRateLimiter:
+    """
+    Controla RPM, TPM e concorrência de um par (API, modelo).
+
+    Uso: acquire(tokens) antes de enviar, release() depois da resposta,
+    on_throttle() em 429 e on_success() em respostas 2xx.
+
+    Example:
+        >>> limiter = ProviderRateLimiter("deepseek/deepseek-chat", rpm=60, tpm=100000, concurrency=4)
+        >>> limiter.acquire(3000)
+        >>> try:
+        ...     response = session.post(url, json=payload)
+        ... finally:
+        ...     limiter.release()
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int, concurrency: int):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = concurrency
+        self.scale = 1.0
+        # Limite 0 = sem limite naquela dimensão
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Espera a vez da requisição (vaga de concorrência, RPM e TPM).
+
+        Args:
+            tokens (int): Tokens estimados da requisição (prompt + max_tokens)
+
+        Returns:
+            float: Segundos esperados
+        """
+        started = time.monotonic()
+        self._slots.acquire()
+        announced = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                demands = [(bucket, amount) for bucket, amount in
+                           ((self._requests, 1), (self._tokens, tokens)) if bucket]
+                wait = max([self._blocked_until - now] +
+                           [bucket.wait_time(amount, now) for bucket, amount in demands])
+                if wait <= 0:
+                    for bucket, amount in demands:
+                        bucket.take(amount)
+                    return time.monotonic() - started
+            if not announced and wait >= 1.0:
+                print(f"⏳ Limite de taxa de {self.name}: aguardando {wait:.1f}s")
+                announced = True
+            time.sleep(min(wait, MAX_POLL_SECONDS))
+
+    def release(self) -> None:
+        """Libera a vaga de concorrência"""
+        self._slots.release()
+
+    def _apply_scale(self, drain: bool = False) -> None:
+        for bucket in (self._requests, self._tokens):
+            if bucket:
+                bucket.scale = self.scale
+                if drain:
+                    bucket.drain()
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Reduz a taxa e bloqueia novas requisições até o Retry-After"""
+        with self._lock:
+            now = time.monotonic()
+            self.scale = max(MIN_RATE_SCALE, self.scale * THROTTLE_FACTOR)
+            self._apply_scale(drain=True)
+            wait = retry_after if retry_after is not None else DEFAULT_THROTTLE_SECONDS
+            self._blocked_until = max(self._blocked_until, now + wait)
+        print(f"🐢 {self.name}: 429 recebido, taxa reduzida para {self.scale:.0%} da configurada")
+
+    def on_success(self) -> None:
+        """Recupera parte da taxa após uma resposta bem-sucedida"""
+        if self.scale >= 1.0:
+            return
+        with self._lock:
+            self.scale = min(1.0, self.scale + RECOVERY_STEP)
+            self._apply_scale()
+
+
+_LIMITERS: Dict[Tuple[str, str, str], Optional[ProviderRateLimiter]] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(api_name: str, model: str, url: str = "") -> Optional[ProviderRateLimiter]:
+    """
+    Retorna o limitador compartilhado do par (API, modelo) no host da URL.
+
+    Args:
+        api_name (str): Nome da API ("deepseek", "openai", "claude")
+        model (str): Modelo usado
+        url (str): URL do provedor (cada host tem o seu limitador)
+
+    Returns:
+        Optional[ProviderRateLimiter]: Limitador, ou None se a limitação
+            estiver desligada, a API não tiver limites configurados ou o
+            host tiver sido liberado com set_rate_limiter
+
+    Example:
+        >>> limiter = get_rate_limiter("openai", "gpt-4o", "https://api.openai.com/v1/chat/completions")
+    """
+    key = (api_name, model, urlsplit(url).netloc)
+    with _LIMITERS_LOCK:
+        if key not in _LIMITERS:
+            limits = get_rate_limit(api_name, model)
+            _LIMITERS[key] = ProviderRateLimiter(
+                f"{api_name}/{model}", limits["rpm"], limits["tpm"], limits["concurrency"]
+            ) if limits else None
+        return _LIMITERS[key]
+
+
+def set_rate_limiter(api_name: str, model: str, url: str,
+                     limiter: Optional[ProviderRateLimiter]) -> None:
+    """
+    Substitui o limitador do par (API, modelo) no host da URL.
+
+    Args:
+        api_name (str): Nome da API
+        model (str): Modelo usado
+        url (str): URL do provedor
+        limiter (Optional[ProviderRateLimiter]): Novo limitador (None = sem limite)
+
+    Example:
+        >>> set_rate_limiter("claude", "claude-3-7-sonnet-20250219", mock_url, None)
+    """
+    with _LIMITERS_LOCK:
+        _LIMITERS[(api_name, model, urlsplit(url).netloc)] = limiter
+
+
+def estimate_payload_tokens(payload: Dict[str, Any]) -> int:
+    """
+    Estima os tokens que a requisição consome da cota (prompt + max_tokens).
+
+    Args:
+        payload (Dict[str, Any]): Corpo da requisição (ver build_provider_request)
+
+    Returns:
+        int: Tokens estimados
+
+    Example:
+        >>> tokens = estimate_payload_tokens(payload)
+    """
+    prompt_chars = len(json.dumps(payload.get("messages", []), ensure_ascii=False))
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or 0
+    return math.ceil(prompt_chars / CHARS_PER_TOKEN_TEXT) + int(completion)
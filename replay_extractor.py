@@ -7,10 +7,21 @@ de arquivos do Etterna/StepMania.
 Author: Generated for StepMania Analysis
 """
 
+from __future__ import annotations
+
 import os
 import glob
-from typing import Optional, List, Dict, Any
-import pandas as pd
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
+
+if TYPE_CHECKING:
+    # pandas é importado dentro de parse_replay_data (ver benchmark_imports.py)
+    import pandas as pd
+
+
+# Linhas de replay por medida (48 por tempo, compasso 4/4)
+ROWS_PER_MEASURE = 192
+# Julgamentos considerados acerto (o resto conta como erro no perfil por medida)
+GOOD_JUDGMENTS = ("W1 (Flawless)", "W2 (Perfect)")
 
 
 def get_latest_replay_data(replays_dir: str) -> Optional[str]:
@@ -74,6 +85,8 @@ def parse_replay_data(data_str: str) -> pd.DataFrame:
         >>> print(df.columns.tolist())
         ['row', 'offset', 'track']
     """
+    import pandas as pd
+
     rows = []
     
     for line in data_str.strip().splitlines():
@@ -130,6 +143,33 @@ def classify_judgment(offset: float) -> str:
         return "Miss"
 
 
+def measure_error_profile(df: pd.DataFrame) -> Dict[str, List[int]]:
+    """
+    Conta notas e erros (julgamento abaixo de W2) em cada medida do replay.
+    
+    Args:
+        df (pd.DataFrame): DataFrame com colunas 'row' e 'judgment'
+        
+    Returns:
+        Dict[str, List[int]]: Listas "notes" e "errors" indexadas pela medida
+            (0-based), incluindo medidas sem notas
+        
+    Example:
+        >>> profile = measure_error_profile(df)
+        >>> print(profile["errors"][:8])
+        [0, 0, 1, 0, 3, 2, 0, 0]
+    """
+    if df.empty:
+        return {"notes": [], "errors": []}
+    
+    measures = df["row"] // ROWS_PER_MEASURE
+    errors = ~df["judgment"].isin(GOOD_JUDGMENTS)
+    size = int(measures.max()) + 1
+    notes = measures.value_counts().reindex(range(size), fill_value=0)
+    error_counts = measures[errors].value_counts().reindex(range(size), fill_value=0)
+    return {"notes": notes.astype(int).tolist(), "errors": error_counts.astype(int).tolist()}
+
+
 def analyze_performance(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Analisa performance do jogador baseado nos dados de replay.
@@ -165,9 +205,14 @@ def analyze_performance(df: pd.DataFrame) -> Dict[str, Any]:
     
     performance_stats = counts[['track', 'track_name', 'judgment', 'count', 'total', 'percentage']]
     
+    # O perfil por medida acompanha as estatísticas (usado no payload enviado à IA)
+    measure_profile = measure_error_profile(df)
+    performance_stats.attrs["measure_profile"] = measure_profile
+    
     return {
         'dataframe': df,
         'performance_stats': performance_stats,
+        'measure_profile': measure_profile,
         'judgment_counts': df["judgment"].value_counts().sort_index(),
         'track_names': track_names
     }
\ No newline at end of file
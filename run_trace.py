@@ -0,0 +1,361 @@
+"""
+Run Trace Module
+
+Este módulo contém a instrumentação leve do pipeline: cada execução de
+main() grava um trace em JSON lines (um registro por etapa, span ou
+evento) com durações, tamanhos de payload, tokens e acertos de cache, e
+imprime uma tabela-resumo no final.
+
+Uso:
+    run = start_run("main")
+    trace_stage("replay_load")          # fecha a etapa anterior e abre a próxima
+    with trace_span("provider.post", url=url) as span:
+        response = session.post(...)
+        span["http_status"] = response.status_code
+    trace_event("cache", hit=True)
+    finish_run()
+
+Sem execução ativa, trace_span/trace_stage/trace_event não fazem nada
+(custo de uma verificação), então os módulos podem ser instrumentados sem
+depender de main().
+
+Author: Generated for StepMania Analysis
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional
+
+
+# Atributos somados no resumo (por nome de span e no total da execução)
+SUMMED_ATTRIBUTES = ("request_bytes", "response_bytes", "prompt_tokens", "completion_tokens")
+
+
+class RunTrace:
+    """
+    Trace de uma execução: spans aninhados por thread e gravação em JSONL.
+
+    Os registros são gravados assim que cada span fecha, então uma execução
+    interrompida ainda deixa o trace até o ponto da falha.
+
+    Example:
+        >>> run = RunTrace("main", ".traces")
+        >>> with run.span("chart_extract", chars=1200):
+        ...     pass
+        >>> run.close()
+    """
+
+    def __init__(self, name: str, trace_dir: str):
+        self.name = name
+        self.run_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.started = time.monotonic()
+        os.makedirs(trace_dir, exist_ok=True)
+        self.path = os.path.join(trace_dir, f"run_{self.run_id}.jsonl")
+        self.records: List[Dict[str, Any]] = []
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+        self._stage: Optional[Dict[str, Any]] = None
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def _stack(self) -> List[Dict[str, Any]]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _parent_id(self) -> Optional[int]:
+        # Threads auxiliares (partes, hedged) penduram seus spans na etapa atual
+        stack = self._stack()
+        if stack:
+            return stack[-1]["id"]
+        return self._stage["id"] if self._stage else None
+
+    def _open(self, kind: str, name: str, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "type": kind,
+            "id": self._new_id(),
+            "parent": self._parent_id(),
+            "name": name,
+            "thread": threading.current_thread().name,
+            "start": time.monotonic(),
+            "attrs": dict(attrs)
+        }
+
+    def _write(self, span: Dict[str, Any], status: str = "ok") -> None:
+        end = time.monotonic()
+        record = {
+            "run": self.run_id,
+            "type": span["type"],
+            "id": span["id"],
+            "parent": span["parent"],
+            "name": span["name"],
+            "thread": span["thread"],
+            "start": round(span["start"] - self.started, 6),
+            "duration": round(end - span["start"], 6),
+            "status": status
+        }
+        record.update(span["attrs"])
+        with self._lock:
+            self.records.append(record)
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; o dict retornado recebe atributos extras"""
+        span = self._open("span", name, attrs)
+        stack = self._stack()
+        stack.append(span)
+        status = "ok"
+        try:
+            yield span["attrs"]
+        except BaseException as e:
+            status = "error"
+            span["attrs"].setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            stack.pop()
+            self._write(span, status)
+
+    def stage(self, name: str, **attrs) -> None:
+        """Fecha a etapa atual (se houver) e abre a próxima"""
+        self.end_stage()
+        self._stage = self._open("stage", name, attrs)
+
+    def end_stage(self, status: str = "ok") -> None:
+        """Fecha a etapa atual"""
+        if self._stage:
+            stage, self._stage = self._stage, None
+            self._write(stage, status)
+
+    def annotate(self, **attrs) -> None:
+        """
+        Acrescenta atributos ao span mais interno desta thread (ou à etapa atual).
+
+        Os atributos de SUMMED_ATTRIBUTES são somados ao valor já anotado em
+        vez de substituí-lo: threads auxiliares (partes, hedged) sem span
+        próprio anotam todas na mesma etapa.
+        """
+        stack = self._stack()
+        target = stack[-1] if stack else self._stage
+        if not target:
+            return
+        with self._lock:
+            for key, value in attrs.items():
+                previous = target["attrs"].get(key)
+                if (key in SUMMED_ATTRIBUTES and isinstance(value, (int, float))
+                        and isinstance(previous, (int, float))):
+                    value = previous + value
+                target["attrs"][key] = value
+
+    def event(self, name: str, **attrs) -> None:
+        """Grava um evento instantâneo (ex.: acerto de cache)"""
+        self._write(self._open("event", name, attrs))
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Agrega o trace: duração de cada etapa, spans por nome e totais.
+
+        Returns:
+            Dict[str, Any]: total_seconds, stages (lista em ordem),
+                spans (por nome: count, seconds, max_seconds e atributos
+                somados), cache_hits, cache_misses e os totais de
+                SUMMED_ATTRIBUTES
+        """
+        with self._lock:
+            records = list(self.records)
+
+        stages = [{"name": r["name"], "seconds": r["duration"], "status": r["status"]}
+                  for r in records if r["type"] == "stage"]
+        spans: Dict[str, Dict[str, Any]] = {}
+        totals = {key: 0 for key in SUMMED_ATTRIBUTES}
+        cache_hits = cache_misses = 0
+        for record in records:
+            if record["type"] == "event" and record["name"] == "cache":
+                if record.get("hit"):
+                    cache_hits += 1
+                else:
+                    cache_misses += 1
+            if record["type"] == "stage":
+                for key in SUMMED_ATTRIBUTES:
+                    if isinstance(record.get(key), (int, float)):
+                        totals[key] += record[key]
+            if record["type"] != "span":
+                continue
+            entry = spans.setdefault(record["name"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                      "errors": 0})
+            entry["count"] += 1
+            entry["seconds"] += record["duration"]
+            entry["max_seconds"] = max(entry["max_seconds"], record["duration"])
+            entry["errors"] += record["status"] != "ok"
+            for key in SUMMED_ATTRIBUTES:
+                if isinstance(record.get(key), (int, float)):
+                    entry[key] = entry.get(key, 0) + record[key]
+                    totals[key] += record[key]
+
+        for entry in spans.values():
+            entry["seconds"] = round(entry["seconds"], 6)
+        return {
+            "total_seconds": round(time.monotonic() - self.started, 6),
+            "stages": stages,
+            "spans": spans,
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            **totals
+        }
+
+    def close(self) -> Dict[str, Any]:
+        """Fecha a etapa aberta, grava o registro de resumo e retorna o resumo"""
+        self.end_stage()
+        summary = self.summary()
+        with self._lock:
+            self._file.write(json.dumps({"run": self.run_id, "type": "summary", "name": self.name,
+                                         **summary}, ensure_ascii=False) + "\n")
+            self._file.close()
+        return summary
+
+
+_ACTIVE: Optional[RunTrace] = None
+
+
+def start_run(name: str = "main", trace_dir: str = ".traces", keep: int = 50) -> RunTrace:
+    """
+    Inicia o trace de uma execução (substitui uma execução ainda aberta).
+
+    Args:
+        name (str): Nome da execução (ex.: "main")
+        trace_dir (str): Pasta dos arquivos run_*.jsonl
+        keep (int): Quantos traces antigos manter na pasta (0 = todos)
+
+    Returns:
+        RunTrace: Trace ativo
+
+    Example:
+        >>> run = start_run("main")
+        >>> print(run.path)
+    """
+    global _ACTIVE
+    if _ACTIVE:
+        finish_run(print_summary=False)
+    if keep > 0:
+        old_traces = sorted(glob.glob(os.path.join(trace_dir, "run_*.jsonl")), key=os.path.getmtime)
+        for path in old_traces[:max(0, len(old_traces) - keep + 1)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    _ACTIVE = RunTrace(name, trace_dir)
+    return _ACTIVE
+
+
+def finish_run(print_summary: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Encerra o trace ativo e imprime a tabela-resumo.
+
+    Args:
+        print_summary (bool): Se deve imprimir a tabela
+
+    Returns:
+        Optional[Dict[str, Any]]: Resumo (ver RunTrace.summary) com run_id e
+            trace_path, ou None se não havia execução ativa
+    """
+    global _ACTIVE
+    run, _ACTIVE = _ACTIVE, None
+    if not run:
+        return None
+    summary = run.close()
+    if print_summary:
+        print_trace_summary(summary, run.path)
+    return dict(summary, run_id=run.run_id, trace_path=run.path)
+
+
+def tracing_active() -> bool:
+    """Indica se há uma execução sendo rastreada"""
+    return _ACTIVE is not None
+
+
+@contextmanager
+def trace_span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Mede um bloco dentro da execução ativa (não faz nada sem execução ativa).
+
+    Args:
+        name (str): Nome do span (ex.: "provider.post")
+        **attrs: Atributos iniciais do span
+
+    Yields:
+        Dict[str, Any]: Atributos do span, para acrescentar resultados
+
+    Example:
+        >>> with trace_span("chart_save", chars=len(chart)) as span:
+        ...     span["path"] = save_modified_chart(...)
+    """
+    run = _ACTIVE
+    if not run:
+        yield dict(attrs)
+        return
+    with run.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def trace_stage(name: str, **attrs) -> None:
+    """Fecha a etapa atual de main() e abre a próxima"""
+    if _ACTIVE:
+        _ACTIVE.stage(name, **attrs)
+
+
+def trace_annotate(**attrs) -> None:
+    """Acrescenta atributos ao span mais interno (ou à etapa atual)"""
+    if _ACTIVE:
+        _ACTIVE.annotate(**attrs)
+
+
+def trace_event(name: str, **attrs) -> None:
+    """Grava um evento instantâneo na execução ativa"""
+    if _ACTIVE:
+        _ACTIVE.event(name, **attrs)
+
+
+def print_trace_summary(summary: Dict[str, Any], trace_path: str = "") -> None:
+    """
+    Imprime a tabela de tempos por etapa e por span.
+
+    Args:
+        summary (Dict[str, Any]): Resumo de RunTrace.summary
+        trace_path (str): Arquivo do trace (mostrado no cabeçalho)
+    """
+    total = summary["total_seconds"] or 1e-9
+    print(f"\n⏱️ Tempos da execução ({summary['total_seconds']:.2f}s)"
+          + (f" - trace em {trace_path}" if trace_path else ""))
+    print(f"   {'Etapa':<28} {'Tempo':>9} {'%':>6}")
+    for stage in summary["stages"]:
+        mark = "" if stage["status"] == "ok" else " ❌"
+        print(f"   {stage['name']:<28} {stage['seconds']:>8.2f}s {stage['seconds'] / total:>6.1%}{mark}")
+
+    if summary["spans"]:
+        print(f"   {'Span':<28} {'Qtd':>5} {'Total':>9} {'Máx':>9}")
+        for name, entry in sorted(summary["spans"].items(), key=lambda item: -item[1]["seconds"]):
+            errors = f" ({entry['errors']} erros)" if entry["errors"] else ""
+            print(f"   {name:<28} {entry['count']:>5} {entry['seconds']:>8.2f}s "
+                  f"{entry['max_seconds']:>8.2f}s{errors}")
+
+    details = []
+    if summary["request_bytes"] or summary["response_bytes"]:
+        details.append(f"payload {summary['request_bytes'] / 1024:.1f} KB enviados, "
+                       f"{summary['response_bytes'] / 1024:.1f} KB recebidos")
+    if summary["prompt_tokens"] or summary["completion_tokens"]:
+        details.append(f"tokens {summary['prompt_tokens']} prompt + {summary['completion_tokens']} resposta")
+    if summary["cache_hits"] or summary["cache_misses"]:
+        details.append(f"cache {summary['cache_hits']} acertos / {summary['cache_misses']} falhas")
+    for detail in details:
+        print(f"   {detail}")
@@ -0,0 +1,327 @@
+"""
+Similarity Matrix Module
+
+Este módulo contém o modo matriz dos comparadores: em vez de um par fixo
+(Musica1/Musica2 em Comparativo.py e Similaridade.py), compara todos os
+pares de charts de uma pasta de música (todas as dificuldades e as
+variantes *_LearnMode.sm) ou de um arquivo de resultados do lote.
+
+Para cada par:
+- Similaridade por tempo (F1, precisão e recall de chart_similarity)
+- Diferença de densidade: NPS médio (notas / duração) e pico de notas em
+  uma janela de 1 segundo, pelos tempos dos BPMs de cada arquivo
+
+Os pares são distribuídos num pool de processos; os eventos e o NPS de
+cada chart são calculados uma vez por processo. A saída é uma tabela
+compacta (F1 ou delta de NPS) e, para cada variante gerada, o original
+mais parecido.
+
+Uso:
+    python similarity_matrix.py "C:/Songs/Hey, Soul Sister"
+    python similarity_matrix.py batch_results.jsonl --metric nps --output matriz.csv
+    python similarity_matrix.py "C:/Songs/*" --variants-only --workers 8
+
+Author: Generated for StepMania Analysis
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+
+from chart_extractor import parse_sm_difficulties, parse_learn_mode_path
+from chart_similarity import chart_events, compare_chart_events, NOTE_TYPES
+from Comparativo import parse_sm
+
+
+# Tipos de evento que contam como nota no NPS (sem minas, fins de hold e fakes)
+NPS_NOTE_TYPES = tuple(NOTE_TYPES[char] for char in "124L")
+
+
+def _difficulty_base(name: str) -> str:
+    """'Beginner (Autor)' -> 'Beginner'"""
+    return re.sub(r"\s*\([^)]*\)", "", name).strip().replace(" ", "_")
+
+
+def _load_sm(path: str, only_difficulty: str = "", generated: bool = False) -> List[Dict[str, Any]]:
+    """Charts (um por dificuldade) de um arquivo .sm"""
+    variant = parse_learn_mode_path(path)
+    if variant and not only_difficulty:
+        # Variantes LearnMode copiam o original inteiro; só a dificuldade gerada interessa
+        only_difficulty = variant["difficulty"]
+        generated = True
+
+    bpms = parse_sm(path)[0]
+    charts = []
+    for name, data in parse_sm_difficulties(path).items():
+        if only_difficulty and _difficulty_base(name).lower() != _difficulty_base(only_difficulty).lower():
+            continue
+        charts.append({
+            "label": f"{os.path.basename(path)} [{name}]",
+            "path": path,
+            "difficulty": name,
+            "generated": generated,
+            "chart_data": data["chart_data"],
+            "bpms": bpms
+        })
+    return charts
+
+
+def _load_results(path: str) -> List[Tuple[str, str, bool]]:
+    """(arquivo, dificuldade, gerado) dos registros ok de um arquivo de resultados do lote"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith(".jsonl"):
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text)
+        if isinstance(records, dict):
+            records = records.get("jobs", [])
+
+    entries = []
+    for record in records:
+        if record.get("status", "ok") != "ok":
+            continue
+        difficulty = record.get("difficulty", "")
+        if record.get("sm_path"):
+            entries.append((record["sm_path"], difficulty, False))
+        if record.get("output"):
+            entries.append((record["output"], difficulty, True))
+    return entries
+
+
+def collect_charts(sources: List[str]) -> List[Dict[str, Any]]:
+    """
+    Reúne os charts a comparar.
+
+    Args:
+        sources (List[str]): Pastas de música (todos os .sm), arquivos .sm,
+            padrões glob ou arquivos de resultados do lote (.jsonl/.json,
+            com sm_path, difficulty e output)
+
+    Returns:
+        List[Dict[str, Any]]: label, path, difficulty, generated,
+            chart_data e bpms de cada chart, sem repetições
+
+    Example:
+        >>> charts = collect_charts(["C:/Songs/Hey, Soul Sister"])
+        >>> print(sum(c["generated"] for c in charts), "variantes geradas")
+    """
+    entries: List[Tuple[str, str, bool]] = []
+    for source in sources:
+        paths = sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+        for path in paths:
+            if os.path.isdir(path):
+                entries.extend((sm, "", False) for sm in sorted(glob.glob(os.path.join(path, "*.sm"))))
+            elif path.lower().endswith((".jsonl", ".json")):
+                entries.extend(_load_results(path))
+            else:
+                entries.append((path, "", False))
+
+    charts = []
+    seen = set()
+    for path, difficulty, generated in entries:
+        if not os.path.exists(path):
+            print(f"⚠️ Arquivo não encontrado: {path}")
+            continue
+        for chart in _load_sm(path, difficulty, generated):
+            key = (os.path.abspath(chart["path"]), chart["difficulty"])
+            if key not in seen:
+                seen.add(key)
+                charts.append(chart)
+    return charts
+
+
+_CHARTS: List[Dict[str, Any]] = []
+_MODE = "beat"
+
+
+def _init_worker(charts: List[Dict[str, Any]], mode: str) -> None:
+    global _CHARTS, _MODE
+    _CHARTS = charts
+    _MODE = mode
+
+
+def nps_summary(events: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Densidade do chart a partir dos eventos de chart_events.
+
+    Returns:
+        Dict[str, Any]: notes, mean_nps (notas / tempo entre a primeira e a
+            última nota) e peak_nps (máximo de notas em um segundo)
+    """
+    times, counts = np.unique(events["seconds"][np.isin(events["kind"], NPS_NOTE_TYPES)], return_counts=True)
+    notes = int(counts.sum())
+    if notes == 0:
+        return {"notes": 0, "mean_nps": 0.0, "peak_nps": 0}
+    duration = float(times[-1] - times[0])
+    # Janela deslizante de 1 s: notas com tempo em [t, t + 1)
+    window_end = np.searchsorted(times, times + 1.0, side="left")
+    cumulative = np.concatenate(([0], np.cumsum(counts)))
+    peak = int((cumulative[window_end] - cumulative[:-1]).max())
+    return {"notes": notes, "mean_nps": round(notes / duration, 2) if duration > 0 else float(notes),
+            "peak_nps": peak}
+
+
+@lru_cache(maxsize=None)
+def _chart_profile(index: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Eventos e densidade de um chart (uma vez por processo)"""
+    chart = _CHARTS[index]
+    events = chart_events(chart["chart_data"], chart["bpms"])
+    return events, nps_summary(events)
+
+
+def _compare_pair(pair: Tuple[int, int]) -> Dict[str, Any]:
+    """Compara o par (i, j) no processo do pool"""
+    i, j = pair
+    events_i, nps_i = _chart_profile(i)
+    events_j, nps_j = _chart_profile(j)
+    result = compare_chart_events(events_i, events_j, mode=_MODE)
+    return {
+        "i": i,
+        "j": j,
+        "f1": result["f1"],
+        "precision": result["precision"],
+        "recall": result["recall"],
+        "notes_i": nps_i["notes"],
+        "notes_j": nps_j["notes"],
+        "nps_delta": round(nps_j["mean_nps"] - nps_i["mean_nps"], 2),
+        "peak_nps_delta": nps_j["peak_nps"] - nps_i["peak_nps"]
+    }
+
+
+def compute_similarity_matrix(charts: List[Dict[str, Any]], workers: Optional[int] = None,
+                              variants_only: bool = False, mode: str = "beat") -> List[Dict[str, Any]]:
+    """
+    Compara os pares de charts num pool de processos.
+
+    Args:
+        charts (List[Dict[str, Any]]): Charts de collect_charts
+        workers (Optional[int]): Processos (padrão: número de CPUs)
+        variants_only (bool): Só pares variante gerada x original
+        mode (str): "beat" ou "time" (ver compare_chart_events)
+
+    Returns:
+        List[Dict[str, Any]]: Um registro por par (i, j, f1, precision,
+            recall, notes_i, notes_j, nps_delta e peak_nps_delta, com os
+            deltas de j em relação a i), na ordem dos pares
+
+    Example:
+        >>> pairs = compute_similarity_matrix(collect_charts(["C:/Songs/Loca"]), workers=4)
+        >>> print(max(pairs, key=lambda p: p["f1"]))
+    """
+    pairs = [(i, j) for i, j in combinations(range(len(charts)), 2)
+             if not variants_only or charts[i]["generated"] != charts[j]["generated"]]
+    # Original sempre do lado i, para o delta de NPS ser gerado - original
+    pairs = [(j, i) if charts[i]["generated"] and not charts[j]["generated"] else (i, j) for i, j in pairs]
+    if not pairs:
+        return []
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pairs)))
+    started = time.monotonic()
+    print(f"🧮 {len(charts)} charts, {len(pairs)} pares ({workers} processos)")
+    if workers == 1:
+        _init_worker(charts, mode)
+        _chart_profile.cache_clear()
+        results = [_compare_pair(pair) for pair in pairs]
+    else:
+        chunksize = max(1, len(pairs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(charts, mode)) as pool:
+            results = list(pool.map(_compare_pair, pairs, chunksize=chunksize))
+    print(f"🧮 Matriz calculada em {time.monotonic() - started:.2f}s")
+    return results
+
+
+def print_matrix(charts: List[Dict[str, Any]], pairs: List[Dict[str, Any]], metric: str = "f1") -> None:
+    """
+    Imprime a legenda, a matriz (F1 em % ou delta de NPS médio) e o original
+    mais parecido de cada variante gerada.
+
+    Args:
+        charts (List[Dict[str, Any]]): Charts de collect_charts
+        pairs (List[Dict[str, Any]]): Resultado de compute_similarity_matrix
+        metric (str): "f1" ou "nps"
+    """
+    print("\n📁 Charts:")
+    for index, chart in enumerate(charts, 1):
+        mark = " (gerado)" if chart["generated"] else ""
+        print(f"   {index:>3}  {chart['label']}{mark}")
+
+    cells: Dict[Tuple[int, int], str] = {}
+    for pair in pairs:
+        i, j = pair["i"], pair["j"]
+        if metric == "nps":
+            cells[(i, j)] = f"{pair['nps_delta']:+.1f}"
+            cells[(j, i)] = f"{-pair['nps_delta'] or 0.0:+.1f}"
+        else:
+            cells[(i, j)] = cells[(j, i)] = f"{pair['f1'] * 100:.0f}"
+
+    used = sorted({index for key in cells for index in key})
+    title = "Delta de NPS médio (coluna - linha)" if metric == "nps" else "Similaridade por tempo (F1 %)"
+    print(f"\n📊 {title}")
+    print("     " + "".join(f"{index + 1:>6}" for index in used))
+    for i in used:
+        row = "".join(f"{cells.get((i, j), '·' if i == j else ''):>6}" for j in used)
+        print(f"{i + 1:>4} {row}")
+
+    variants = [index for index, chart in enumerate(charts) if chart["generated"]]
+    if variants:
+        print("\n🎯 Original mais parecido de cada variante:")
+    for variant in variants:
+        candidates = [p for p in pairs if variant in (p["i"], p["j"])
+                      and not charts[p["i"] if p["j"] == variant else p["j"]]["generated"]]
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda p: p["f1"])
+        original = best["i"] if best["j"] == variant else best["j"]
+        print(f"   {variant + 1:>3} -> {original + 1:>3}  F1 {best['f1']:.0%} | "
+              f"notas {best['notes_i']} -> {best['notes_j']} | NPS médio {best['nps_delta']:+.2f} "
+              f"| pico {best['peak_nps_delta']:+d}")
+
+
+def write_matrix_csv(charts: List[Dict[str, Any]], pairs: List[Dict[str, Any]], path: str) -> None:
+    """Grava um par por linha (com os nomes dos charts) em CSV"""
+    fields = ["chart_i", "chart_j", "f1", "precision", "recall", "notes_i", "notes_j",
+              "nps_delta", "peak_nps_delta"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for pair in pairs:
+            row = {key: pair[key] for key in fields[2:]}
+            writer.writerow(dict(row, chart_i=charts[pair["i"]]["label"], chart_j=charts[pair["j"]]["label"]))
+    print(f"💾 Pares gravados em {path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Matriz de similaridade entre todos os charts e variantes")
+    parser.add_argument("sources", nargs="+", help="pastas de música, arquivos .sm/glob ou resultados do lote")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: CPUs)")
+    parser.add_argument("--variants-only", action="store_true", help="só pares variante gerada x original")
+    parser.add_argument("--mode", default="beat", choices=["beat", "time"])
+    parser.add_argument("--metric", default="f1", choices=["f1", "nps"], help="valor mostrado na matriz")
+    parser.add_argument("--output", default="", help="CSV com todas as métricas de cada par")
+    args = parser.parse_args()
+
+    charts = collect_charts(args.sources)
+    if len(charts) < 2:
+        print("❌ São necessários pelo menos 2 charts")
+        raise SystemExit(1)
+
+    pairs = compute_similarity_matrix(charts, args.workers, args.variants_only, args.mode)
+    print_matrix(charts, pairs, args.metric)
+    if args.output:
+        write_matrix_csv(charts, pairs, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Single Flight Module
+
+Este módulo contém a deduplicação de requisições idênticas em andamento:
+quando o modo watch, o lote e uma execução manual pedem o mesmo chart
+(mesmo chart, stats e modelo) ao mesmo tempo, só a primeira chamada vai à
+API e as demais esperam pelo resultado dela.
+
+- No mesmo processo: as threads seguidoras esperam o resultado (ou a
+  exceção) da líder em memória
+- Entre processos: a líder cria um arquivo de trava <chave>.lock (criação
+  exclusiva) e o mantém vivo com um heartbeat; ao terminar grava
+  <chave>.result.json e remove a trava. Os outros processos esperam a
+  trava sumir e leem o resultado. Falhas não são compartilhadas entre
+  processos: sem resultado, o próximo processo vira líder e tenta de novo.
+  Uma trava sem heartbeat há stale_seconds (processo morto) é descartada.
+
+Author: Generated for StepMania Analysis
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Callable, Optional
+
+
+class _Flight:
+    """Chamada em andamento neste processo"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+_FLIGHTS: Dict[str, _Flight] = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def _lock_path(lock_dir: str, key: str) -> str:
+    return os.path.join(lock_dir, f"{key}.lock")
+
+
+def _result_path(lock_dir: str, key: str) -> str:
+    return os.path.join(lock_dir, f"{key}.result.json")
+
+
+def _try_lock(lock_dir: str, key: str, stale_seconds: float) -> bool:
+    """Cria a trava entre processos; descarta travas abandonadas"""
+    path = _lock_path(lock_dir, key)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) <= stale_seconds:
+                    return False
+                print(f"🧹 Trava abandonada de {key[:12]}... descartada")
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as f:
+            json.dump({"pid": os.getpid(), "started": time.time()}, f)
+        return True
+    return False
+
+
+def _heartbeat(path: str, interval: float, stop: threading.Event) -> None:
+    """Atualiza o mtime da trava enquanto a líder trabalha"""
+    while not stop.wait(interval):
+        try:
+            os.utime(path, None)
+        except OSError:
+            return
+
+
+def _read_result(lock_dir: str, key: str, max_age: float) -> Optional[str]:
+    """Lê o resultado gravado pela líder de outro processo (se recente)"""
+    path = _result_path(lock_dir, key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("finished", 0) > max_age:
+        return None
+    return entry.get("result")
+
+
+def _write_result(lock_dir: str, key: str, result: str) -> None:
+    path = _result_path(lock_dir, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "finished": time.time(), "result": result}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _cleanup_results(lock_dir: str, max_age: float) -> None:
+    """Remove resultados que nenhum seguidor vai mais ler"""
+    now = time.time()
+    try:
+        names = os.listdir(lock_dir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(".result.json"):
+            continue
+        path = os.path.join(lock_dir, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            continue
+
+
+def _run_across_processes(key: str, compute: Callable[[], str], lock_dir: str,
+                          wait_timeout: float, stale_seconds: float, result_ttl: float,
+                          poll_interval: float) -> str:
+    """Executa compute() como líder entre processos, ou espera a líder de outro processo"""
+    os.makedirs(lock_dir, exist_ok=True)
+    deadline = time.monotonic() + wait_timeout
+    waited = False
+    while True:
+        if _try_lock(lock_dir, key, stale_seconds):
+            break
+        if not waited:
+            print(f"⏳ Requisição idêntica em andamento em outro processo ({key[:12]}...), aguardando")
+            waited = True
+        if time.monotonic() >= deadline:
+            print(f"⚠️ Espera por {key[:12]}... excedeu {wait_timeout:.0f}s, chamando a API")
+            return compute()
+        time.sleep(poll_interval)
+        if not os.path.exists(_lock_path(lock_dir, key)):
+            result = _read_result(lock_dir, key, result_ttl)
+            if result is not None:
+                print(f"🤝 Resultado compartilhado pelo outro processo ({key[:12]}...)")
+                return result
+
+    path = _lock_path(lock_dir, key)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(path, max(1.0, stale_seconds / 3), stop),
+                            daemon=True)
+    beat.start()
+    try:
+        _cleanup_results(lock_dir, result_ttl)
+        result = compute()
+        _write_result(lock_dir, key, result)
+        return result
+    finally:
+        stop.set()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def single_flight(key: str, compute: Callable[[], str], lock_dir: Optional[str] = ".inflight",
+                  wait_timeout: float = 900, stale_seconds: float = 30, result_ttl: float = 120,
+                  poll_interval: float = 0.5) -> str:
+    """
+    Executa compute() uma única vez por chave entre chamadas simultâneas.
+
+    Args:
+        key (str): Chave da requisição (ex.: make_cache_key do conteúdo)
+        compute (Callable[[], str]): Faz a chamada de verdade
+        lock_dir (Optional[str]): Pasta das travas entre processos; None
+            deduplica só dentro do processo
+        wait_timeout (float): Espera máxima por outro processo; depois disso
+            chama a API mesmo assim
+        stale_seconds (float): Idade do heartbeat a partir da qual a trava é
+            considerada abandonada
+        result_ttl (float): Por quanto tempo o resultado gravado vale para
+            os processos que estavam esperando
+        poll_interval (float): Intervalo de verificação da trava
+
+    Returns:
+        str: Resultado de compute() (da líder, para as seguidoras)
+
+    Raises:
+        Exception: A mesma exceção da líder, para as seguidoras do mesmo
+            processo
+
+    Example:
+        >>> key = make_cache_key("deepseek", {"model": model, "content": data_json})
+        >>> response = single_flight(key, lambda: request_ai_completion(data_json))
+    """
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = _FLIGHTS[key] = _Flight()
+
+    if not leader:
+        print(f"⏳ Requisição idêntica em andamento ({key[:12]}...), aguardando o resultado")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        print(f"🤝 Resultado compartilhado ({key[:12]}...)")
+        return flight.result
+
+    try:
+        if lock_dir:
+            flight.result = _run_across_processes(key, compute, lock_dir, wait_timeout,
+                                                  stale_seconds, result_ttl, poll_interval)
+        else:
+            flight.result = compute()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _FLIGHTS_LOCK:
+            _FLIGHTS.pop(key, None)
+        flight.done.set()
+
+
+def in_flight_count() -> int:
+    """Número de chamadas em andamento neste processo"""
+    with _FLIGHTS_LOCK:
+        return len(_FLIGHTS)
@@ -0,0 +1,85 @@
+"""
+Stats Payload Module
+
+Este módulo contém a montagem do resumo de performance enviado à IA, com
+forma fixa em vez de um registro por (trilha, julgamento):
+
+- overall_accuracy: acurácia geral (W1 + W2)
+- lane_accuracy: acurácia por trilha
+- lane_histogram: contagem de cada julgamento por trilha, na ordem de
+  "judgments"
+- measure_errors: erros (abaixo de W2) por medida, quando o replay traz o
+  perfil por medida (ver replay_extractor.measure_error_profile); as notas
+  por medida a IA já vê no próprio chart
+
+O tamanho do resumo depende só do número de trilhas e de medidas, não do
+tamanho do replay.
+
+Author: Generated for StepMania Analysis
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Tuple, Any, Optional
+
+from replay_extractor import GOOD_JUDGMENTS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Ordem das colunas do histograma (rótulos de classify_judgment)
+JUDGMENT_ORDER = ("W1 (Flawless)", "W2 (Perfect)", "W3 (Great)", "W4 (Good)", "W5 (Boo)", "Miss")
+JUDGMENT_SHORT_NAMES = ["W1", "W2", "W3", "W4", "W5", "Miss"]
+LANE_NAMES = ["←", "↓", "↑", "→"]
+
+
+def _accuracy(histogram: List[int]) -> float:
+    total = sum(histogram)
+    good = sum(count for label, count in zip(JUDGMENT_ORDER, histogram) if label in GOOD_JUDGMENTS)
+    return round(good / total, 3) if total else 0.0
+
+
+def build_stats_payload(performance_stats: pd.DataFrame,
+                        measure_range: Optional[Tuple[int, int]] = None,
+                        lane_count: int = 4) -> Dict[str, Any]:
+    """
+    Resume as estatísticas de analyze_performance no formato enviado à IA.
+
+    Args:
+        performance_stats (pd.DataFrame): Colunas track, judgment e count
+            (attrs["measure_profile"] opcional, com o perfil por medida)
+        measure_range (Optional[Tuple[int, int]]): Medidas [início, fim) do
+            perfil a incluir (geração em partes); None inclui todas
+        lane_count (int): Número mínimo de trilhas do histograma
+
+    Returns:
+        Dict[str, Any]: judgments, lanes, overall_accuracy, lane_accuracy,
+            lane_histogram, measure_offset e measure_errors
+
+    Example:
+        >>> payload = build_stats_payload(results['performance_stats'])
+        >>> payload["lane_accuracy"]
+        [0.912, 0.874, 0.801, 0.93]
+    """
+    tracks = [int(track) for track in performance_stats["track"]]
+    lanes = max([lane_count] + [track + 1 for track in tracks])
+    histogram = [[0] * len(JUDGMENT_ORDER) for _ in range(lanes)]
+    columns = {label: index for index, label in enumerate(JUDGMENT_ORDER)}
+    for track, judgment, count in zip(tracks, performance_stats["judgment"], performance_stats["count"]):
+        if track >= 0 and judgment in columns:
+            histogram[track][columns[judgment]] += int(count)
+
+    totals = [sum(column) for column in zip(*histogram)]
+    errors = (performance_stats.attrs.get("measure_profile") or {}).get("errors", [])
+    start, end = measure_range if measure_range else (0, len(errors))
+
+    return {
+        "judgments": JUDGMENT_SHORT_NAMES,
+        "lanes": (LANE_NAMES + [str(lane) for lane in range(len(LANE_NAMES), lanes)])[:lanes],
+        "overall_accuracy": _accuracy(totals),
+        "lane_accuracy": [_accuracy(row) for row in histogram],
+        "lane_histogram": histogram,
+        "measure_offset": start,
+        "measure_errors": errors[start:end]
+    }
@@ -0,0 +1,373 @@
+"""
+Telemetry Module
+
+Este módulo contém o registro local (SQLite) de cada chamada aos
+provedores de IA: latência, tokens, custo estimado, status e se o chart
+gerado passou na validação. Com esse histórico, select_model escolhe o
+modelo com melhor latência p95 observada entre os que mantêm uma taxa de
+charts válidos mínima para charts de tamanho parecido.
+
+O tamanho do chart é medido pelos tokens do prompt (o chart é quase todo
+o prompt), disponível em qualquer ponto que faz a chamada.
+
+A validação do chart acontece longe da chamada (às vezes em outra
+thread): quem gera a resposta usa track_calls() para saber quais
+chamadas a produziram e depois as anota com record_validation.
+
+Author: Generated for StepMania Analysis
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Tuple, Any, Optional
+
+from api_config import get_telemetry_config, get_model_pricing
+from token_budget import estimate_prompt_tokens, CHARS_PER_TOKEN_TEXT
+
+
+# Erro gravado para a perdedora do modo hedged, fechada quando outra venceu
+CANCELLED_ERROR = "cancelado"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    api TEXT NOT NULL,
+    model TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    latency REAL NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    valid INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_model ON calls (api, model, prompt_tokens);
+"""
+
+# Faixa de tamanho considerada "parecida": de 1/2x a 2x os tokens do prompt
+SIZE_RATIO = 2.0
+
+_INITIALIZED = set()
+_INIT_LOCK = threading.Lock()
+# Ids das chamadas registradas no contexto atual (ver track_calls). Cópias do
+# contexto (asyncio.to_thread, tarefas do asyncio) compartilham a mesma lista.
+_TRACKED_CALLS: ContextVar[Optional[List[int]]] = ContextVar("tracked_calls", default=None)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Abre o banco (criando a tabela na primeira vez neste processo)"""
+    connection = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _INITIALIZED:
+        with _INIT_LOCK:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection.executescript(_SCHEMA)
+            _INITIALIZED.add(db_path)
+    return connection
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estima o custo da chamada em dólares pela tabela MODEL_PRICING.
+
+    Args:
+        model (str): Modelo usado
+        prompt_tokens (int): Tokens de entrada
+        completion_tokens (int): Tokens de saída
+
+    Returns:
+        float: Custo estimado em USD (0 se o modelo não tem preço cadastrado)
+
+    Example:
+        >>> estimate_cost("gpt-4o-mini", 10000, 2000)
+        0.0027
+    """
+    price = get_model_pricing(model)
+    if not price:
+        return 0.0
+    return round((prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000, 6)
+
+
+def record_call(api_name: str, model: str, latency: float, prompt_tokens: int,
+                completion_tokens: int, ok: bool = True, mode: str = "normal",
+                error: Optional[str] = None) -> Optional[int]:
+    """
+    Registra uma chamada ao provedor.
+
+    Falhas ao gravar são ignoradas: a telemetria nunca interrompe o pipeline.
+
+    Args:
+        api_name (str): Nome da API ("deepseek", "openai", "claude")
+        model (str): Modelo usado
+        latency (float): Segundos da chamada (incluindo retries)
+        prompt_tokens (int): Tokens de entrada (informados ou estimados)
+        completion_tokens (int): Tokens de saída (informados ou estimados)
+        ok (bool): Se a chamada retornou conteúdo
+        mode (str): "normal", "stream" ou "chunk"
+        error (Optional[str]): Erro da chamada, se houver
+
+    Returns:
+        Optional[int]: Id do registro (None se a telemetria estiver
+            desligada ou a gravação falhar)
+
+    Example:
+        >>> call_id = record_call("deepseek", "deepseek-chat", 41.2, 9000, 3500)
+    """
+    cfg = get_telemetry_config()
+    if not cfg["enabled"]:
+        return None
+    try:
+        with closing(_connect(cfg["db"])) as connection, connection:
+            cursor = connection.execute(
+                "INSERT INTO calls (created, api, model, mode, latency, prompt_tokens, completion_tokens, "
+                "cost, ok, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), api_name, model, mode, latency, prompt_tokens, completion_tokens,
+                 estimate_cost(model, prompt_tokens, completion_tokens), int(ok), error)
+            )
+    except sqlite3.Error as e:
+        print(f"⚠️ Não foi possível gravar a telemetria: {e}")
+        return None
+    attach_calls([cursor.lastrowid])
+    return cursor.lastrowid
+
+
+def record_provider_call(api_name: str, model: str, started: float, prompt: str,
+                         usage: Optional[Dict[str, int]] = None, content: str = "",
+                         error: Optional[str] = None, mode: str = "normal") -> Optional[int]:
+    """
+    Registra uma chamada a partir do que o chamador tem em mãos.
+
+    Tokens não informados pelo provedor (streaming, erros) são estimados
+    pelo tamanho do prompt e da resposta.
+
+    Args:
+        api_name (str): Nome da API
+        model (str): Modelo usado
+        started (float): time.monotonic() do início da chamada
+        prompt (str): Conteúdo enviado
+        usage (Optional[Dict[str, int]]): prompt_tokens/completion_tokens
+            do provedor (ver ai_providers.response_usage)
+        content (str): Texto recebido
+        error (Optional[str]): Erro da chamada (None = sucesso)
+        mode (str): "normal", "stream", "chunk" ou "hedged"
+
+    Returns:
+        Optional[int]: Id do registro (ver record_call)
+
+    Example:
+        >>> started = time.monotonic()
+        >>> text = stream_provider(provider, prompt, on_text)
+        >>> record_provider_call(provider.api, provider.model, started, prompt, content=text, mode="stream")
+    """
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or estimate_prompt_tokens(prompt)
+    completion_tokens = usage.get("completion_tokens") or math.ceil(len(content) / CHARS_PER_TOKEN_TEXT)
+    return record_call(api_name, model, time.monotonic() - started, prompt_tokens, completion_tokens,
+                       ok=error is None, mode=mode, error=error)
+
+
+@contextmanager
+def track_calls() -> Iterator[List[int]]:
+    """
+    Coleta os ids das chamadas registradas dentro do bloco.
+
+    Vale para a thread atual e para o que ela dispara com asyncio
+    (asyncio.run, asyncio.to_thread), que copiam o contexto; threads
+    criadas com threading.Thread começam sem coletor. Resposta servida do
+    cache ou de outra chamada em andamento (single flight) não registra
+    nada.
+
+    Yields:
+        List[int]: Ids das chamadas, preenchida conforme são registradas
+
+    Example:
+        >>> with track_calls() as call_ids:
+        ...     response = generate_ai_response(chart, stats)
+        >>> record_validation(call_ids, bool(extract_generated_chart(response)))
+    """
+    calls: List[int] = []
+    token = _TRACKED_CALLS.set(calls)
+    try:
+        yield calls
+    finally:
+        _TRACKED_CALLS.reset(token)
+
+
+def attach_calls(call_ids: Iterable[Optional[int]]) -> None:
+    """Acrescenta ids ao coletor do contexto atual (ex.: chamadas feitas em outra thread)"""
+    calls = _TRACKED_CALLS.get()
+    if calls is not None:
+        calls.extend(call_id for call_id in call_ids if call_id is not None)
+
+
+def record_validation(call_ids: Iterable[Optional[int]], valid: bool) -> None:
+    """
+    Anota se o chart gerado pelas chamadas passou na validação (após reparos).
+
+    Args:
+        call_ids (Iterable[Optional[int]]): Ids retornados por record_call
+            (ver track_calls; None é ignorado)
+        valid (bool): Se o chart foi aproveitado
+
+    Example:
+        >>> record_validation(call_ids, bool(modified_chart))
+    """
+    cfg = get_telemetry_config()
+    ids = [(int(valid), call_id) for call_id in call_ids if call_id is not None]
+    if not ids or not cfg["enabled"]:
+        return
+    try:
+        with closing(_connect(cfg["db"])) as connection, connection:
+            connection.executemany("UPDATE calls SET valid = ? WHERE id = ?", ids)
+    except sqlite3.Error as e:
+        print(f"⚠️ Não foi possível gravar a telemetria: {e}")
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Percentil por posição (valores já ordenados)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def model_stats(prompt_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Agrega a telemetria por (API, modelo).
+
+    Args:
+        prompt_tokens (Optional[int]): Se informado, considera só chamadas
+            com prompt entre 1/SIZE_RATIO e SIZE_RATIO vezes esse tamanho
+
+    Returns:
+        List[Dict[str, Any]]: Um item por modelo com api, model, calls,
+            p50, p95 (segundos, só chamadas bem-sucedidas), validity
+            (charts válidos / chamadas avaliadas, None sem avaliações),
+            judged, avg_cost e total_cost
+
+    Example:
+        >>> for row in model_stats():
+        ...     print(row["model"], row["p95"], row["validity"])
+    """
+    cfg = get_telemetry_config()
+    if not os.path.exists(cfg["db"]):
+        return []
+
+    query = "SELECT api, model, latency, ok, valid, cost, error FROM calls"
+    params: Tuple = ()
+    if prompt_tokens:
+        query += " WHERE prompt_tokens BETWEEN ? AND ?"
+        params = (int(prompt_tokens / SIZE_RATIO), int(prompt_tokens * SIZE_RATIO))
+    try:
+        with closing(_connect(cfg["db"])) as connection:
+            rows = connection.execute(query, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"⚠️ Não foi possível ler a telemetria: {e}")
+        return []
+
+    grouped: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for api_name, model, latency, ok, valid, cost, error in rows:
+        entry = grouped.setdefault((api_name, model), {"latencies": [], "calls": 0, "valid": 0,
+                                                       "judged": 0, "cost": 0.0})
+        entry["calls"] += 1
+        entry["cost"] += cost
+        # Cancelada no meio (hedged): não diz nada sobre latência nem validade
+        if error == CANCELLED_ERROR:
+            continue
+        if ok:
+            entry["latencies"].append(latency)
+        # Chamada que falhou conta como chart inválido
+        if not ok or valid is not None:
+            entry["judged"] += 1
+            entry["valid"] += bool(ok and valid)
+
+    stats = []
+    for (api_name, model), entry in grouped.items():
+        latencies = sorted(entry["latencies"])
+        stats.append({
+            "api": api_name,
+            "model": model,
+            "calls": entry["calls"],
+            "p50": round(_percentile(latencies, 0.50), 3),
+            "p95": round(_percentile(latencies, 0.95), 3),
+            "validity": round(entry["valid"] / entry["judged"], 3) if entry["judged"] else None,
+            "judged": entry["judged"],
+            "avg_cost": round(entry["cost"] / entry["calls"], 6),
+            "total_cost": round(entry["cost"], 6)
+        })
+    return sorted(stats, key=lambda row: (row["api"], row["model"]))
+
+
+def select_model(prompt_tokens: int, candidates: List[Tuple[str, str]],
+                 min_validity: Optional[float] = None,
+                 min_samples: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Escolhe o modelo com menor p95 entre os que atingem a taxa de validade.
+
+    Só entram modelos com pelo menos min_samples chamadas avaliadas em
+    charts de tamanho parecido; sem histórico suficiente retorna None e o
+    modelo configurado é mantido.
+
+    Args:
+        prompt_tokens (int): Tokens estimados do prompt (tamanho do chart)
+        candidates (List[Tuple[str, str]]): Pares (API, modelo) elegíveis
+        min_validity (Optional[float]): Taxa mínima de charts válidos
+            (padrão: TELEMETRY_MIN_VALIDITY)
+        min_samples (Optional[int]): Mínimo de chamadas avaliadas
+            (padrão: TELEMETRY_MIN_SAMPLES)
+
+    Returns:
+        Optional[Dict[str, Any]]: Estatísticas do modelo escolhido (ver
+            model_stats), ou None se nenhum candidato tiver histórico suficiente
+
+    Example:
+        >>> choice = select_model(9000, [("deepseek", "deepseek-chat"), ("openai", "gpt-4o-mini")])
+        >>> if choice:
+        ...     print(f"Usando {choice['model']} (p95 {choice['p95']}s)")
+    """
+    cfg = get_telemetry_config()
+    if min_validity is None:
+        min_validity = cfg["min_validity"]
+    if min_samples is None:
+        min_samples = cfg["min_samples"]
+
+    eligible = set(candidates)
+    qualified = [
+        row for row in model_stats(prompt_tokens)
+        if (row["api"], row["model"]) in eligible
+        and row["judged"] >= min_samples
+        and row["validity"] is not None and row["validity"] >= min_validity
+    ]
+    if not qualified:
+        return None
+    return min(qualified, key=lambda row: (row["p95"], row["avg_cost"]))
+
+
+def print_telemetry_report(prompt_tokens: Optional[int] = None) -> None:
+    """
+    Imprime a tabela de latência, validade e custo por modelo.
+
+    Args:
+        prompt_tokens (Optional[int]): Restringe a charts de tamanho parecido
+    """
+    stats = model_stats(prompt_tokens)
+    if not stats:
+        print("📭 Nenhuma chamada registrada na telemetria ainda")
+        return
+
+    title = f" (prompts de ~{prompt_tokens} tokens)" if prompt_tokens else ""
+    print(f"📈 Telemetria por modelo{title}")
+    print(f"   {'API/modelo':<40} {'Chamadas':>8} {'p50':>8} {'p95':>8} {'Válidos':>8} {'Custo méd.':>11}")
+    for row in stats:
+        validity = f"{row['validity']:.0%}" if row["validity"] is not None else "-"
+        print(f"   {row['api'] + '/' + row['model']:<40} {row['calls']:>8} {row['p50']:>7.1f}s "
+              f"{row['p95']:>7.1f}s {validity:>8} ${row['avg_cost']:>10.4f}")
+    total = sum(row["total_cost"] for row in stats)
+    print(f"   Custo total estimado: ${total:.4f}")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de respostas da IA (ai_cache.py): chaves, leitura e
+gravação e evicção LRU.
+
+Uso:
+    python -m pytest -q test_ai_cache.py
+"""
+
+import os
+
+import pytest
+
+from ai_cache import make_cache_key, cache_get, cache_put, cache_stats, clear_cache
+
+
+PAYLOAD = {"model": "deepseek-chat", "temperature": 0.7, "max_tokens": 4000,
+           "messages": [{"role": "user", "content": "1000\n0000\n;"}]}
+
+
+def test_chave_ignora_a_ordem_das_chaves_do_payload():
+    reordered = dict(reversed(list(PAYLOAD.items())))
+    assert make_cache_key("deepseek", reordered) == make_cache_key("deepseek", PAYLOAD)
+
+
+@pytest.mark.parametrize("api, change", [
+    ("openai", {}),
+    ("deepseek", {"model": "deepseek-reasoner"}),
+    ("deepseek", {"temperature": 0.2}),
+    ("deepseek", {"max_tokens": 1200}),
+    ("deepseek", {"messages": [{"role": "user", "content": "0100\n0000\n;"}]}),
+])
+def test_chave_muda_com_api_modelo_parametros_e_conteudo(api, change):
+    assert make_cache_key(api, dict(PAYLOAD, **change)) != make_cache_key("deepseek", PAYLOAD)
+
+
+def test_grava_e_le_a_resposta(tmp_path):
+    key = make_cache_key("deepseek", PAYLOAD)
+    assert cache_get(str(tmp_path), key) is None
+    cache_put(str(tmp_path), key, "```\n1000\n```", 1024 * 1024, metadata={"api": "deepseek"})
+    assert cache_get(str(tmp_path), key) == "```\n1000\n```"
+    assert cache_stats(str(tmp_path))["entries"] == 1
+
+
+def test_entrada_corrompida_conta_como_ausente(tmp_path):
+    key = make_cache_key("deepseek", PAYLOAD)
+    (tmp_path / f"{key}.json").write_text("{incompleto", encoding="utf-8")
+    assert cache_get(str(tmp_path), key) is None
+
+
+def test_evicao_remove_a_entrada_menos_usada(tmp_path):
+    cache_dir = str(tmp_path)
+    keys = [make_cache_key("deepseek", dict(PAYLOAD, temperature=t)) for t in (0.1, 0.2, 0.3)]
+    for age, key in zip((300, 200, 100), keys):
+        path = cache_put(cache_dir, key, "x" * 100, 1024 * 1024)
+        os.utime(path, (os.path.getmtime(path) - age,) * 2)
+
+    # Ler a mais antiga a torna a mais recente
+    assert cache_get(cache_dir, keys[0])
+    # Cabem 3 entradas (o tamanho varia alguns bytes com o timestamp "created")
+    entry_size = os.path.getsize(os.path.join(cache_dir, f"{keys[0]}.json"))
+    cache_put(cache_dir, make_cache_key("claude", PAYLOAD), "x" * 100, 3 * entry_size + entry_size // 2)
+
+    assert [cache_get(cache_dir, key) is not None for key in keys] == [True, False, True]
+    assert clear_cache(cache_dir) == 3
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Testes das chamadas aos provedores (ai_providers.py) contra o servidor
+simulado (mock_llm_server.py): streaming, modo hedged, telemetria e
+limite de concorrência.
+
+Uso:
+    python -m pytest -q test_ai_providers.py
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from dataclasses import replace
+
+import pytest
+
+import ai_providers
+import api_config
+from ai_providers import stream_provider, hedged_generate
+from api_config import resolve_provider_config
+from chart_extractor import join_measures
+from chart_scanner import IncrementalChartScanner
+from mock_llm_server import start_mock_server
+from rate_limiter import ProviderRateLimiter
+from telemetry import track_calls, model_stats
+
+
+MEASURES = 8
+
+
+@pytest.fixture
+def telemetry_db(tmp_path, monkeypatch):
+    """Telemetria ligada, gravando num banco temporário"""
+    db = str(tmp_path / "telemetry.sqlite3")
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "db", db)
+    return db
+
+
+def _mock_provider(**server_options):
+    server_options = dict({"latency": "fixed:0", "tokens_per_second": 100000}, **server_options)
+    server, base_url = start_mock_server(**server_options)
+    provider = replace(resolve_provider_config("deepseek"),
+                       url=base_url + "/v1/chat/completions", key="mock-key")
+    return server, provider
+
+
+def _prompt(measures: int = MEASURES) -> str:
+    chart = join_measures([["1000", "0000", "0100", "0000"] for _ in range(measures)])
+    return json.dumps({"original_sm_file": chart, "instructions": "teste"})
+
+
+def _calls(db: str) -> list:
+    with sqlite3.connect(db) as connection:
+        return connection.execute("SELECT mode, ok, error FROM calls").fetchall()
+
+
+def _stream(server_options: dict) -> IncrementalChartScanner:
+    server, provider = _mock_provider(**server_options)
+    scanner = IncrementalChartScanner(expected_measures=MEASURES)
+    try:
+        stream_provider(provider, _prompt(), scanner.feed, abort_reason=lambda: scanner.error)
+    finally:
+        server.shutdown()
+        server.server_close()
+    scanner.finish()
+    return scanner
+
+
+def test_stream_completo_conta_como_sucesso(telemetry_db):
+    """Parar a leitura no fim do chart não é aborto"""
+    scanner = _stream({})
+    assert scanner.complete and scanner.error is None
+    assert _calls(telemetry_db) == [("stream", 1, None)]
+
+
+def test_stream_malformado_conta_como_abortado(telemetry_db, tmp_path):
+    # Primeira medida certa, depois uma linha com 5 colunas
+    (tmp_path / "resposta.txt").write_text("```\n1000\n0000\n0100\n0000\n,\n10000\n0000\n```\n")
+    scanner = _stream({"responses": str(tmp_path / "*.txt")})
+    assert scanner.error
+    assert _calls(telemetry_db) == [("stream", 0, "abortado")]
+
+
+def test_hedged_anota_resposta_invalida_e_repassa_a_vencedora(telemetry_db, tmp_path):
+    (tmp_path / "ruim.txt").write_text("```\n10000\n```\n")
+    bad_server, bad = _mock_provider(responses=str(tmp_path / "ruim.txt"))
+    good_server, good = _mock_provider()
+    # O provedor ruim responde primeiro; o bom só sai depois do atraso
+    good = replace(good, api="openai", model="gpt-4o-mini")
+    try:
+        with track_calls() as call_ids:
+            winner, text = asyncio.run(hedged_generate(
+                _prompt(), [bad, good], lambda response: "10000" not in response, hedge_delay=0.3
+            ))
+    finally:
+        for server in (bad_server, good_server):
+            server.shutdown()
+            server.server_close()
+
+    assert winner == "openai"
+    with sqlite3.connect(telemetry_db) as connection:
+        rows = dict(connection.execute("SELECT api, id FROM calls").fetchall())
+        valid = dict(connection.execute("SELECT api, valid FROM calls").fetchall())
+    assert call_ids == [rows["openai"]]
+    assert valid == {"deepseek": 0, "openai": None}
+
+
+def test_stream_ocupa_a_vaga_de_concorrencia_ate_o_fim(monkeypatch):
+    """A vaga do limitador fica ocupada enquanto o corpo do stream chega"""
+    limiter = ProviderRateLimiter("mock", rpm=0, tpm=0, concurrency=1)
+    monkeypatch.setattr(ai_providers, "get_rate_limiter", lambda api_name, model, url: limiter)
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", False)
+    server, provider = _mock_provider()
+    slot_free_while_reading = []
+
+    def on_text(piece: str) -> bool:
+        # Com 1 vaga, outra requisição só pode entrar depois do fim do stream
+        free = limiter._slots.acquire(blocking=False)
+        if free:
+            limiter.release()
+        slot_free_while_reading.append(free)
+        return True
+
+    try:
+        stream_provider(provider, _prompt(), on_text)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert slot_free_while_reading and not any(slot_free_while_reading)
+    assert limiter._slots.acquire(blocking=False)
+
+
+def test_hedged_fecha_a_perdedora_e_libera_a_vaga(telemetry_db, monkeypatch):
+    """A requisição lenta é encerrada assim que a outra vence"""
+    limiters = {}
+    monkeypatch.setattr(ai_providers, "get_rate_limiter", lambda api_name, model, url: limiters.setdefault(
+        api_name, ProviderRateLimiter(api_name, rpm=0, tpm=0, concurrency=1)))
+    slow_server, slow = _mock_provider(tokens_per_second=20)
+    fast_server, fast = _mock_provider()
+    fast = replace(fast, api="openai", model="gpt-4o-mini")
+    try:
+        winner, text = asyncio.run(hedged_generate(_prompt(32), [slow, fast], lambda response: True))
+        assert winner == "openai"
+
+        # A perdedora fecha na próxima linha do stream, sem esperar o fim da geração
+        deadline = time.monotonic() + 3
+        while not slow_server.stats.get("aborted_streams") and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert slow_server.stats.get("aborted_streams") == 1
+        assert limiters["deepseek"]._slots.acquire(timeout=1)
+    finally:
+        for server in (slow_server, fast_server):
+            server.shutdown()
+            server.server_close()
+
+    # A perdedora grava a telemetria logo depois de liberar a vaga
+    while len(_calls(telemetry_db)) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with sqlite3.connect(telemetry_db) as connection:
+        rows = dict(connection.execute("SELECT api, error FROM calls").fetchall())
+    assert rows == {"openai": None, "deepseek": "cancelado"}
+    # A chamada cancelada não conta como chart inválido
+    stats = {row["api"]: row for row in model_stats()}
+    assert stats["deepseek"]["judged"] == 0 and stats["deepseek"]["calls"] == 1
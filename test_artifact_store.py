@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento de artefatos (artifact_store.py): deduplicação,
+leitura por hash, execução ou "latest" e retenção por número, idade e
+tamanho.
+
+Uso:
+    python -m pytest -q test_artifact_store.py
+"""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+from artifact_store import put_artifact, get_artifact, list_runs, apply_retention
+
+
+def put_run(store: str, run_id: str, age_days: float, **artifacts) -> dict:
+    """Grava os artefatos de uma execução criada há age_days dias"""
+    infos = {kind: put_artifact(store, run_id, kind, content) for kind, content in artifacts.items()}
+    with sqlite3.connect(os.path.join(store, "index.sqlite3")) as connection:
+        connection.execute("UPDATE runs SET created = ? WHERE run_id = ?",
+                           (time.time() - age_days * 86400, run_id))
+    return infos
+
+
+def run_ids(store: str) -> list:
+    return [run["run_id"] for run in list_runs(store)]
+
+
+def blob_files(store: str) -> set:
+    return {name for _, _, names in os.walk(os.path.join(store, "blobs")) for name in names}
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma"])
+def test_conteudo_repetido_e_gravado_uma_vez(tmp_path, compression):
+    store = str(tmp_path)
+    first = put_artifact(store, "run-1", "response", "resposta " * 500, compression)
+    second = put_artifact(store, "run-2", "response", "resposta " * 500, compression)
+    assert first["new"] and not second["new"]
+    assert first["hash"] == second["hash"] and first["path"] == second["path"]
+    assert first["stored_size"] < first["size"]
+    assert len(blob_files(store)) == 1
+    assert get_artifact(store, first["hash"]) == "resposta " * 500
+
+
+def test_leitura_por_hash_execucao_e_latest(tmp_path):
+    store = str(tmp_path)
+    old = put_run(store, "20250101-000000-aaaaaa", 2, response="antiga", chart="chart antigo")
+    put_run(store, "20250102-000000-bbbbbb", 1, response="nova")
+
+    assert get_artifact(store, old["response"]["hash"][:10]) == "antiga"
+    assert get_artifact(store, "20250101-000000-aaaaaa") == "antiga"
+    assert get_artifact(store, "20250101-000000-aaaaaa", "chart") == "chart antigo"
+    assert get_artifact(store, "latest") == "nova"
+    assert get_artifact(store, "latest", "chart") == "chart antigo"
+    assert get_artifact(store, "20250102-000000-bbbbbb", "chart") is None
+    assert get_artifact(store, "f" * 64) is None
+    assert get_artifact(str(tmp_path / "vazio"), "latest") is None
+
+
+def test_prefixo_ambiguo_nao_retorna_nada(tmp_path):
+    store = str(tmp_path)
+    by_prefix = {}
+    for index in range(100):
+        digest = put_artifact(store, "run-1", "response", f"resposta {index}")["hash"]
+        if digest[0] in by_prefix:
+            break
+        by_prefix[digest[0]] = digest
+    prefix = digest[0]
+    assert get_artifact(store, prefix) is None
+    # Um caractere a mais que o prefixo comum desfaz a ambiguidade
+    common = os.path.commonprefix([digest, by_prefix[prefix]])
+    assert get_artifact(store, digest[:len(common) + 1]) == f"resposta {index}"
+
+
+def test_retencao_por_numero_de_execucoes_apaga_o_conteudo_orfao(tmp_path):
+    store = str(tmp_path)
+    infos = [put_run(store, f"run-{index}", 10 - index, response=f"resposta {index}", prompt="prompt comum")
+             for index in range(5)]
+    assert apply_retention(store, keep_runs=2, max_age_days=0, max_bytes=0) == 3
+    assert run_ids(store) == ["run-4", "run-3"]
+    # Respostas das execuções removidas saem do disco; o prompt compartilhado fica
+    assert get_artifact(store, infos[0]["response"]["hash"]) is None
+    assert not os.path.exists(infos[0]["response"]["path"])
+    assert os.path.exists(infos[0]["prompt"]["path"])
+    assert len(blob_files(store)) == 3
+
+
+def test_retencao_por_idade(tmp_path):
+    store = str(tmp_path)
+    for index, age in enumerate([40, 31, 5, 0]):
+        put_run(store, f"run-{index}", age, response=f"resposta {index}")
+    assert apply_retention(store, keep_runs=0, max_age_days=30, max_bytes=0) == 2
+    assert run_ids(store) == ["run-3", "run-2"]
+    assert apply_retention(store, keep_runs=0, max_age_days=30, max_bytes=0) == 0
+
+
+def test_retencao_por_tamanho_mantem_a_execucao_mais_recente(tmp_path):
+    store = str(tmp_path)
+    # Conteúdo aleatório não comprime: ~10 KB por execução
+    for index in range(4):
+        put_run(store, f"run-{index}", 4 - index, response=os.urandom(10000))
+    assert apply_retention(store, keep_runs=0, max_age_days=0, max_bytes=25000) == 2
+    assert run_ids(store) == ["run-3", "run-2"]
+
+    # Mesmo maior que o limite, a execução mais recente fica
+    assert apply_retention(store, keep_runs=0, max_age_days=0, max_bytes=1) == 1
+    assert run_ids(store) == ["run-3"]
+    assert len(blob_files(store)) == 1
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Testes da geração em lote (batch_runner.py): manifesto, gravação do chart
+gerado e anotação da validação na telemetria.
+
+Uso:
+    python -m pytest -q test_batch_runner.py
+"""
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+import api_config
+from batch_runner import load_manifest, _finish_job, _generate_tracked
+from chart_extractor import extract_chart_data, parse_learn_mode_path
+from telemetry import record_call
+
+
+CHART = "1000\n0000\n0100\n0000\n,\n0010\n0000\n0001\n0000\n;"
+
+
+def write_sm(folder, name: str = "Stepchart.sm") -> str:
+    """Cria um .sm mínimo com uma dificuldade Beginner"""
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / name
+    path.write_text(
+        "#TITLE:Teste;\n#BPMS:0.000=120.000;\n#NOTES:\n     dance-single:\n     Autor:\n"
+        "     Beginner:\n     1:\n     0,0,0,0,0:\n" + CHART + "\n",
+        encoding="utf-8"
+    )
+    return str(path)
+
+
+def prepared_job(sm_path: str) -> dict:
+    chart_data, difficulty_name, difficulty_data = extract_chart_data(sm_path, "Beginner", interactive=False)
+    return {"chart_data": chart_data, "difficulty_name": difficulty_name,
+            "difficulty_data": difficulty_data, "performance_stats": None}
+
+
+@pytest.fixture
+def telemetry_db(tmp_path, monkeypatch):
+    """Telemetria ligada, gravando num banco temporário"""
+    db = str(tmp_path / "telemetry.sqlite3")
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "db", db)
+    return db
+
+
+@pytest.mark.parametrize("response, valid", [(f"```\n{CHART}\n```", 1), ("Sem chart.", 0)])
+def test_finish_job_anota_validacao_das_chamadas_do_job(tmp_path, telemetry_db, response, valid):
+    sm_path = write_sm(tmp_path / "song")
+    job = {"id": "ana", "sm_path": sm_path, "difficulty": "Beginner", "mode": "ai"}
+    prepared = prepared_job(sm_path)
+
+    def generate(job, prepared):
+        record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+        return response
+
+    text, call_ids = _generate_tracked(generate, job, prepared)
+    record = _finish_job(job, prepared, text, lambda r: r.split("```")[1].strip() if "```" in r else "",
+                         call_ids)
+
+    assert record["status"] == ("ok" if valid else "error")
+    with sqlite3.connect(telemetry_db) as connection:
+        assert connection.execute("SELECT id, valid FROM calls").fetchall() == [(call_ids[0], valid)]
+
+
+def write_manifest(tmp_path, jobs: list) -> str:
+    path = tmp_path / "turma.json"
+    path.write_text(json.dumps({"defaults": {"replay": "replay.txt"}, "jobs": jobs}), encoding="utf-8")
+    return str(path)
+
+
+def test_jobs_da_mesma_musica_e_dificuldade_nao_dividem_o_arquivo(tmp_path):
+    sm_path = write_sm(tmp_path / "song")
+    jobs = load_manifest(write_manifest(tmp_path, [
+        {"id": "ana", "sm_path": sm_path, "difficulty": "Beginner"},
+        {"id": "bia:2", "sm_path": sm_path, "difficulty": "beginner"},
+        {"id": "caio", "sm_path": sm_path, "difficulty": "Hard"}
+    ]))
+    tags = {job["id"]: job.get("output_tag") for job in jobs}
+    assert tags == {"ana": "ana", "bia:2": "bia-2", "caio": None}
+
+    prepared = prepared_job(sm_path)
+    saved = {_finish_job(job, prepared, f"```\n{CHART}\n```", lambda r: r.split("```")[1].strip())["output"]
+             for job in jobs[:2]}
+    assert {os.path.basename(path) for path in saved} == {
+        "Stepchart_Beginner_ana_LearnMode.sm", "Stepchart_Beginner_bia-2_LearnMode.sm"
+    }
+    # O nome com tag continua reconhecido como variante da dificuldade certa
+    variant = parse_learn_mode_path(sorted(saved)[0])
+    assert (variant["original"], variant["difficulty"], variant["tag"]) == (sm_path, "Beginner", "ana")
+
+
+@pytest.mark.parametrize("jobs, message", [
+    ([{"id": "ana", "output": "saida.sm"}, {"id": "bia", "output": "saida.sm"}], "mesmo arquivo"),
+    ([{"id": "ana"}, {"id": "ana", "difficulty": "Hard"}], "repetido"),
+])
+def test_manifesto_recusa_saida_ou_id_repetido(tmp_path, jobs, message):
+    sm_path = write_sm(tmp_path / "song")
+    for job in jobs:
+        job.setdefault("sm_path", sm_path)
+    with pytest.raises(ValueError, match=message):
+        load_manifest(write_manifest(tmp_path, jobs))
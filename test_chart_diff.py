@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Testes do diff de charts (chart_diff.py): opcodes, similaridade e medidas
+unidas ou divididas.
+
+Uso:
+    python -m pytest -q test_chart_diff.py
+"""
+
+import difflib
+
+from chart_diff import diff_chart_lines, myers_matching_blocks, unified_diff
+
+
+def chart_lines(measures: list) -> list:
+    lines = []
+    for index, measure in enumerate(measures):
+        lines.extend(measure)
+        lines.append(";" if index == len(measures) - 1 else ",")
+    return lines
+
+
+def apply_opcodes(lines1: list, lines2: list, opcodes: list) -> list:
+    """Reconstrói o chart modificado a partir do original e dos opcodes"""
+    rebuilt = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert tag != "equal" or lines1[i1:i2] == lines2[j1:j2]
+        rebuilt.extend(lines1[i1:i2] if tag == "equal" else lines2[j1:j2])
+    return rebuilt
+
+
+ORIGINAL = [
+    ["0001", "0000", "0100", "0001"], ["1000", "0100", "0100", "0010"],
+    ["0110", "0000", "0000", "1001"], ["0010", "0010", "0000", "1000"],
+    ["0110", "0010", "0010", "0001"], ["0001", "0000", "1001", "0001"],
+    ["0010", "1001", "0110", "0010"], ["0100", "1001", "0001", "0110"],
+    ["1001", "1000", "0010", "1001"], ["0100", "1001", "0010", "0001"],
+]
+# Medidas 1+2, 3+4 e 7+8 unidas, com algumas notas trocadas
+MERGED = [
+    ["0001", "0000", "0100", "0001", "1000", "0100", "0100", "0010"],
+    ["0110", "0000", "0000", "1001", "0010", "0010", "0000", "1000"],
+    ["1000", "0010", "0010", "0001"], ["0001", "0000", "0001", "0001"],
+    ["0010", "1001", "0110", "0010", "0100", "1001", "0001", "0110"],
+    ["1001", "1000", "0010", "0100"], ["1001", "1001", "0010", "0001"],
+]
+
+
+def test_medidas_alteradas_sao_comparadas_linha_a_linha():
+    lines1 = chart_lines([["1000", "0000"], ["0100", "0000"]])
+    lines2 = chart_lines([["1000", "0000"], ["0010", "0000"]])
+    result = diff_chart_lines(lines1, lines2)
+    assert result["same_lines"] == 5
+    assert result["measures_changed"] == 1
+    assert apply_opcodes(lines1, lines2, result["opcodes"]) == lines2
+
+
+def test_medidas_unidas_nao_desalinham_o_diff():
+    lines1, lines2 = chart_lines(ORIGINAL), chart_lines(MERGED)
+    result = diff_chart_lines(lines1, lines2)
+
+    lcs = sum(size for _, _, size in myers_matching_blocks(lines1, lines2))
+    assert result["same_lines"] == lcs
+    ratio = difflib.SequenceMatcher(None, lines1, lines2, autojunk=False).ratio()
+    assert result["similarity"] >= 100 * ratio
+    assert apply_opcodes(lines1, lines2, result["opcodes"]) == lines2
+
+
+def test_unified_diff_no_formato_do_difflib():
+    lines1 = chart_lines([["1000", "0000", "0100"], ["0010", "0000", "0001"]])
+    lines2 = chart_lines([["1000", "0000", "0100"], ["0010", "1000", "0001"]])
+    opcodes = diff_chart_lines(lines1, lines2)["opcodes"]
+    assert list(unified_diff(lines1, lines2, opcodes, "a", "b")) == list(
+        difflib.unified_diff(lines1, lines2, "a", "b", lineterm="")
+    )
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Testes da codificação compacta de charts (chart_encoding.py): ida e volta
+sem perdas e leitura da resposta da IA.
+
+Uso:
+    python -m pytest -q test_chart_encoding.py
+"""
+
+import random
+
+import pytest
+
+from chart_encoding import encode_chart, decode_chart, decode_chart_response, quantize_measure
+from chart_extractor import join_measures
+
+
+def random_chart(seed: int, lanes: int) -> str:
+    rng = random.Random(seed)
+    measures = []
+    for _ in range(rng.randint(1, 12)):
+        size = rng.choice([4, 8, 12, 16, 24, 48, 192])
+        rows = ["0" * lanes] * size
+        # Algumas medidas ficam vazias (a primeira não: é dela que sai o número de colunas)
+        if not measures:
+            rows[0] = "1" + "0" * (lanes - 1)
+        for _ in range(rng.choice([0, 1, 3, 6])):
+            rows[rng.randrange(size)] = "".join(rng.choice("0000123M") for _ in range(lanes))
+        measures.append(rows)
+    measures.append(list(measures[0]))  # medida repetida vira referência @1
+    return join_measures(measures)
+
+
+@pytest.mark.parametrize("lanes", [4, 8])
+@pytest.mark.parametrize("seed", range(25))
+def test_ida_e_volta_sem_perdas(seed, lanes):
+    chart = random_chart(seed, lanes)
+    assert decode_chart(encode_chart(chart)) == chart
+
+
+def test_quantizacao_e_referencias():
+    assert quantize_measure(["1000", "0000", "0000", "0000", "0100", "0000", "0000", "0000"]) == ["1000", "0100"]
+    chart = join_measures([["1000", "0000", "0100", "0000"]] * 3 + [["0000"] * 4])
+    assert encode_chart(chart) == "4|1000 0100\n@1\n@1\n4|."
+
+
+def test_resposta_da_ia_com_texto_em_volta():
+    chart = join_measures([["1000", "0000", "0100", "0000"], ["0000"] * 4])
+    response = f"Aqui está o chart:\n```\n{encode_chart(chart)}\n;\n```\nBoa sorte!"
+    assert decode_chart_response(response) == chart
+
+
+@pytest.mark.parametrize("encoded", ["4|1000 0100 0010", "@2", "sem chart"])
+def test_resposta_invalida_vira_string_vazia(encoded):
+    assert decode_chart_response(f"```\n{encoded}\n```") == ""
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Testes do scanner de charts (chart_scanner.py): validação incremental
+do modo streaming e extração do chart de uma resposta completa.
+
+Uso:
+    python -m pytest -q test_chart_scanner.py
+"""
+
+import pytest
+
+from chart_extractor import join_measures
+from chart_scanner import IncrementalChartScanner, scan_chart_blocks, extract_chart_measures
+
+
+CHART = join_measures([["1000", "0000", "0100", "0000"]] * 4)
+
+
+def scan(text: str, piece_size: int = 3, **options) -> IncrementalChartScanner:
+    """Alimenta o texto em pedaços pequenos, como chega do stream"""
+    scanner = IncrementalChartScanner(**options)
+    for start in range(0, len(text), piece_size):
+        if not scanner.feed(text[start:start + piece_size]):
+            break
+    scanner.finish()
+    return scanner
+
+
+@pytest.mark.parametrize("piece_size", [1, 3, 1000])
+def test_chart_completo_em_qualquer_tamanho_de_pedaco(piece_size):
+    scanner = scan(f"Aqui está:\n```\n{CHART}\n```\nObservações depois.", piece_size, expected_measures=4)
+    assert scanner.complete and scanner.error is None
+    assert scanner.measures == 4
+    assert scanner.chart_text() == CHART
+
+
+def test_para_de_ler_quando_o_chart_termina():
+    scanner = IncrementalChartScanner()
+    assert scanner.feed(f"{CHART}\n") is False
+    assert scanner.complete
+    assert scanner.feed("texto que não será lido\n") is False
+
+
+def test_bloco_de_exemplo_antes_do_chart_e_descartado():
+    scanner = scan(f"Formato:\n```\n1000\n```\nChart:\n```\n{CHART}\n```\n", expected_measures=4)
+    assert scanner.complete and scanner.chart_text() == CHART
+
+
+@pytest.mark.parametrize("text, options, message", [
+    ("```\n1000\n0000\n,\n10000\n", {}, "largura de linha inválida na medida 2"),
+    ("```\n" + "1000\n" * 193, {}, "medida 1 sem fim"),
+    ("```\n" + "1000\n,\n" * 7, {"expected_measures": 4}, "medidas demais: 7"),
+])
+def test_saida_malformada_interrompe_a_leitura(text, options, message):
+    scanner = scan(text, **options)
+    assert not scanner.complete
+    assert scanner.error.startswith(message)
+
+
+def test_extrai_o_chart_completo_e_nao_o_exemplo():
+    response = (f"Use o formato:\n```\n1000\n0000\n```\n"
+                f"Chart ajustado:\n```\n{CHART}\n```\n0100 é uma nota no meio do texto.")
+    blocks = scan_chart_blocks(response)
+    assert [(block["fenced"], block["terminated"], len(block["measures"])) for block in blocks] == [
+        (True, False, 1), (True, True, 4)
+    ]
+    assert extract_chart_measures(response) == [["1000", "0000", "0100", "0000"]] * 4
+
+
+def test_comentarios_e_texto_dentro_do_bloco_sao_ignorados():
+    commented = CHART.replace("0100", "0100 // nota da mão direita", 1)
+    response = f"```\n// medida 1\n{commented}\n```"
+    assert extract_chart_measures(response) == [["1000", "0000", "0100", "0000"]] * 4
+
+
+def test_chart_fora_de_bloco_e_resposta_sem_chart():
+    response = f"Chart:\n{CHART}\nFim."
+    assert extract_chart_measures(response) == [["1000", "0000", "0100", "0000"]] * 4
+    assert extract_chart_measures("Não consegui gerar o chart.") == []
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Testes da similaridade de charts por tempo (chart_similarity.py): eventos,
+conversão de beats em segundos com mudanças de BPM, requantização,
+tolerância e tipos de nota.
+
+Uso:
+    python -m pytest -q test_chart_similarity.py
+"""
+
+import numpy as np
+import pytest
+
+from chart_extractor import join_measures
+from chart_similarity import chart_events, beats_to_seconds_array, compare_chart_events, compare_charts
+from Comparativo import beats_to_seconds
+
+
+def test_eventos_por_tick_trilha_e_tipo():
+    events = chart_events(join_measures([["1000", "0200", "0030", "000M"], ["0000", "0000"]]))
+    assert events["tick"].tolist() == [0, 48, 96, 144]
+    assert events["lane"].tolist() == [0, 1, 2, 3]
+    assert events["kind"].tolist() == [1, 2, 4, 5]
+    assert events["measure"].tolist() == [0, 0, 0, 0]
+    assert (events["lanes"], events["measures"]) == (4, 2)
+    assert events["seconds"].tolist() == [0.0, 0.5, 1.0, 1.5]
+
+
+@pytest.mark.parametrize("bpms", [None, {0.0: 120.0}, {0.0: 150.0, 4.0: 75.0, 9.5: 200.0}, {2.0: 90.0}])
+def test_segundos_vetorizados_iguais_ao_comparativo(bpms):
+    beats = np.array([0.0, 1.0, 3.75, 4.0, 6.5, 9.5, 12.25])
+    expected = [beats_to_seconds(bpms, beat) for beat in beats]
+    assert beats_to_seconds_array(bpms, beats) == pytest.approx(expected)
+
+
+def test_colcheias_requantizadas_em_semicolcheias_sao_o_mesmo_chart():
+    eighths = [["1000", "0000", "0100", "0000", "0010", "0000", "0001", "0000"]] * 4
+    sixteenths = [[row for original in rows for row in (original, "0000")] for rows in eighths]
+    result = compare_charts(join_measures(eighths), join_measures(sixteenths))
+    assert (result["precision"], result["recall"], result["f1"]) == (1.0, 1.0, 1.0)
+    assert result["measure_agreement"] == [1.0] * 4
+
+    # Uma nota deslocada em uma semicolcheia deixa de casar
+    sixteenths[2] = list(sixteenths[2])
+    sixteenths[2][4], sixteenths[2][5] = "0000", "0100"
+    result = compare_charts(join_measures(eighths), join_measures(sixteenths))
+    assert (result["matched_source"], result["source_events"]) == (15, 16)
+    assert result["measure_agreement"][2] == 0.75
+
+
+def test_mudanca_de_bpm_compara_pelo_tempo():
+    # Original a 120 BPM: semínimas da medida 2 em 2.0, 2.5, 3.0 e 3.5s
+    source = join_measures([["1000", "0100", "0010", "0001"]] * 2)
+    # Gerado cai para 60 BPM no beat 4: as mesmas notas viram colcheias
+    candidate = join_measures([["1000", "0100", "0010", "0001"],
+                               ["1000", "0100", "0010", "0001", "0000", "0000", "0000", "0000"]])
+    by_beat = compare_charts(source, candidate, {0.0: 120.0}, {0.0: 120.0, 4.0: 60.0})
+    by_time = compare_charts(source, candidate, {0.0: 120.0}, {0.0: 120.0, 4.0: 60.0}, mode="time")
+    assert by_beat["f1"] < 1.0
+    assert by_time["f1"] == 1.0
+
+
+def test_tolerancia_casa_cada_nota_uma_vez_so():
+    source = chart_events("1000\n0000\n0000\n0000\n;")
+    # Duas notas do gerado, 4ms depois e 6ms antes da única nota do original
+    candidate = {key: np.concatenate([value, value]) for key, value in source.items()
+                 if isinstance(value, np.ndarray)}
+    candidate.update(seconds=np.array([0.004, -0.006]), lanes=4, measures=1)
+    result = compare_chart_events(source, candidate, mode="time", tolerance_ms=10)
+    assert (result["matched_source"], result["matched_candidate"]) == (1, 1)
+    assert (result["recall"], result["precision"]) == (1.0, 0.5)
+    # Sem tolerância nenhuma das duas casa
+    assert compare_chart_events(source, candidate, mode="time")["matched_candidate"] == 0
+
+
+def test_ignore_type_junta_so_as_cabecas_de_nota():
+    source = chart_events(join_measures([["1000", "0100", "0010", "0003"]]))
+    candidate = chart_events(join_measures([["2000", "0400", "00M0", "000F"]]))
+    strict = compare_chart_events(source, candidate)
+    loose = compare_chart_events(source, candidate, ignore_type=True)
+    assert strict["matched_source"] == 0
+    # Tap x início de hold/roll casam; mina, fim de hold e fake não
+    assert (loose["matched_source"], loose["source_events"]) == (2, 4)
+
+
+def test_modo_desconhecido():
+    with pytest.raises(ValueError):
+        compare_chart_events(chart_events("1000\n;"), chart_events("1000\n;"), mode="row")
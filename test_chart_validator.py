@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Testes da validação e do reparo dos charts gerados (chart_validator.py).
+
+Uso:
+    python -m pytest -q test_chart_validator.py
+"""
+
+from chart_extractor import join_measures, split_measures
+from chart_validator import validate_chart, repair_chart, requantize_measure
+
+
+MEASURE = ["1000", "0000", "0100", "0000"]
+ORIGINAL = join_measures([MEASURE] * 20)
+
+
+def test_chart_valido_passa_sem_reparo():
+    chart = join_measures([["0001", "0000", "0010", "0000"]] * 20)
+    assert validate_chart(chart, ORIGINAL) == []
+    assert repair_chart(chart, ORIGINAL) == (chart, [])
+
+
+def test_linhas_com_largura_ou_caracteres_errados_sao_corrigidas():
+    chart = join_measures([["10000", "0X00", "01", "0000"]] + [MEASURE] * 19)
+    assert {v["type"] for v in validate_chart(chart, ORIGINAL)} == {"lane_width", "invalid_char"}
+
+    repaired, fixes = repair_chart(chart, ORIGINAL)
+    assert split_measures(repaired)[0] == ["1000", "0000", "0100", "0000"]
+    assert validate_chart(repaired, ORIGINAL) == []
+    assert fixes == ["medida 1: linhas corrigidas para 4 colunas"]
+
+
+def test_medida_com_linhas_invalidas_e_requantizada():
+    # 3 linhas viram 4 e 6 viram 8, com as notas nas posições proporcionais
+    assert requantize_measure(["1000", "0000", "0100"]) == ["1000", "0000", "0000", "0100"]
+    assert requantize_measure(["1000", "0000", "0000", "0100", "0000", "0010"]) == [
+        "1000", "0000", "0000", "0000", "0100", "0000", "0000", "0010"
+    ]
+    chart = join_measures([["1000", "0000", "0100"]] + [MEASURE] * 19)
+    repaired, fixes = repair_chart(chart, ORIGINAL)
+    assert validate_chart(repaired, ORIGINAL) == []
+    assert fixes == ["medida 1: requantizada de 3 para 4 linhas"]
+
+
+def test_poucas_medidas_a_mais_ou_a_menos_sao_ajustadas():
+    extra = join_measures([["0001", "0000", "0000", "0000"]] * 22)
+    repaired, fixes = repair_chart(extra, ORIGINAL)
+    assert len(split_measures(repaired)) == 20
+    assert fixes == ["2 medidas extras descartadas (2 com notas)"]
+
+    missing = join_measures([["0001", "0000", "0000", "0000"]] * 18)
+    repaired, fixes = repair_chart(missing, ORIGINAL)
+    assert split_measures(repaired)[18:] == [MEASURE, MEASURE]
+    assert fixes == ["2 medidas faltando completadas com as medidas finais do original"]
+
+
+def test_diferenca_grande_de_medidas_nao_e_reparada():
+    repaired, fixes = repair_chart(join_measures([MEASURE] * 10), ORIGINAL)
+    assert repaired == ""
+    assert "diferença grande demais" in fixes[0]
+    assert repair_chart("", ORIGINAL) == ("", ["chart vazio"])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Testes da detecção de charts quase duplicados (duplicate_detector.py):
+assinaturas MinHash, grupos por LSH, índice incremental e variantes
+LearnMode já existentes.
+
+Uso:
+    python -m pytest -q test_duplicate_detector.py
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import duplicate_detector
+from chart_extractor import join_measures, learn_mode_path
+from duplicate_detector import (
+    measure_shingles, minhash_signature, estimate_similarity,
+    build_index, find_duplicate_clusters, find_existing_variants
+)
+
+
+ROWS = ["1000", "0100", "0010", "0001", "1001", "0110"]
+
+
+def random_measures(seed: int, count: int = 48) -> list:
+    rng = random.Random(seed)
+    return [[rng.choice(ROWS) if rng.random() < 0.6 else "0000" for _ in range(8)] for _ in range(count)]
+
+
+def write_sm(path, measures: list, difficulty: str = "Hard") -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "#TITLE:Teste;\n#BPMS:0.000=120.000;\n#NOTES:\n     dance-single:\n     Autor:\n"
+        f"     {difficulty}:\n     9:\n     0,0,0,0,0:\n" + join_measures(measures) + "\n",
+        encoding="utf-8"
+    )
+    return str(path)
+
+
+def requantize(measures: list) -> list:
+    """Mesmas notas em 16 linhas por medida (outra quantização)"""
+    return [[row for original in rows for row in (original, "0000")] for rows in measures]
+
+
+def test_medida_requantizada_tem_os_mesmos_shingles():
+    measures = random_measures(1)
+    assert set(measure_shingles(measures)) == set(measure_shingles(requantize(measures)))
+
+
+def test_assinatura_estima_a_similaridade_de_jaccard():
+    first = np.arange(0, 3000, dtype=np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)
+    second = np.arange(1000, 4000, dtype=np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)
+    # Jaccard = 2000 / 4000
+    similarity = estimate_similarity(minhash_signature(first), minhash_signature(second))
+    assert similarity == pytest.approx(0.5, abs=0.12)
+    assert minhash_signature(np.array([], dtype=np.uint64)) is None
+
+
+def test_charts_sem_relacao_nao_parecem_duplicados():
+    signatures = [minhash_signature(measure_shingles(random_measures(seed))) for seed in range(20)]
+    worst = max(estimate_similarity(a, b) for i, a in enumerate(signatures) for b in signatures[i + 1:])
+    assert worst < 0.2
+
+
+def test_reupload_requantizado_e_agrupado_com_o_original(tmp_path):
+    measures = random_measures(7)
+    edited = [list(rows) for rows in measures]
+    edited[20][0] = "1111"
+    original = write_sm(tmp_path / "pack" / "song" / "Song.sm", measures)
+    reupload = write_sm(tmp_path / "outro_pack" / "song" / "Song.sm", requantize(edited))
+    write_sm(tmp_path / "pack" / "other" / "Other.sm", random_measures(8))
+
+    index = build_index([str(tmp_path)], index_path=None, workers=1)
+    clusters = find_duplicate_clusters(index, threshold=0.8)
+    assert len(clusters) == 1
+    assert {member["path"] for member in clusters[0]["members"]} == {original, reupload}
+
+
+def test_indice_so_rele_arquivos_alterados(tmp_path, monkeypatch):
+    first = write_sm(tmp_path / "songs" / "a" / "A.sm", random_measures(1))
+    write_sm(tmp_path / "songs" / "b" / "B.sm", random_measures(2))
+    index_path = str(tmp_path / "index.json")
+    build_index([str(tmp_path / "songs")], index_path, workers=1)
+
+    read = []
+    file_signatures = duplicate_detector._file_signatures
+    monkeypatch.setattr(duplicate_detector, "_file_signatures", lambda path: read.append(path) or file_signatures(path))
+    write_sm(tmp_path / "songs" / "a" / "A.sm", random_measures(3, count=50))
+    index = build_index([str(tmp_path / "songs")], index_path, workers=1)
+    assert read == [first]
+    assert len(index) == 2
+
+
+def test_variante_de_um_reupload_conta_como_existente(tmp_path):
+    measures = random_measures(5)
+    original = write_sm(tmp_path / "pack" / "song" / "Song.sm", measures)
+    reupload = write_sm(tmp_path / "pack" / "song_v2" / "Song.sm", requantize(measures))
+    # A variante é comparada pelo chart original de onde saiu, não pelo conteúdo gerado
+    variant = write_sm(tmp_path / "pack" / "song" / "Song_Hard_LearnMode.sm", random_measures(6))
+    assert learn_mode_path(original, "Hard") == variant
+
+    jobs = [
+        {"id": "v2", "sm_path": reupload, "difficulty": "Hard", "library": str(tmp_path / "pack")},
+        {"id": "v2-ana", "sm_path": reupload, "difficulty": "Hard", "output_tag": "ana",
+         "library": str(tmp_path / "pack")},
+    ]
+    existing = find_existing_variants(jobs, threshold=0.8, index_path=None, workers=1)
+    # A variante sem tag é do chart do job; a do job "ana" ainda não existe
+    assert existing == {"v2": variant}
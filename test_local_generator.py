@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Testes do gerador local de charts LearnMode (local_generator.py): medidas
+preservadas, limites de -20%/+15%, remoção de jacks e alternâncias
+rápidas e determinismo.
+
+Uso:
+    python -m pytest -q test_local_generator.py
+"""
+
+import pandas as pd
+import pytest
+
+from chart_extractor import join_measures, split_measures
+from local_generator import generate_local_chart, MAX_REDUCTION, MAX_INCREASE
+
+
+def stats(accuracy: float, lanes: int = 4) -> pd.DataFrame:
+    """Estatísticas no formato de analyze_performance, com a mesma acurácia em todas as trilhas"""
+    good = int(round(accuracy * 100))
+    rows = []
+    for track in range(lanes):
+        rows.append({"track": track, "judgment": "W1 (Flawless)", "count": good, "total": 100})
+        rows.append({"track": track, "judgment": "Miss", "count": 100 - good, "total": 100})
+    return pd.DataFrame(rows)
+
+
+def count_notes(chart: str) -> int:
+    return sum(row.count("1") + row.count("2") + row.count("4")
+               for rows in split_measures(chart) for row in rows)
+
+
+def mixed_chart() -> str:
+    """Medidas de 4, 8 e 16 linhas, com hold e mina"""
+    measures = []
+    for m in range(12):
+        size = (4, 8, 16)[m % 3]
+        lanes = ["1000", "0100", "0010", "0001"]
+        measures.append([lanes[(m + i) % 4] if i % 2 == 0 else "0000" for i in range(size)])
+    measures[4][2] = "2000"
+    measures[4][6] = "3000"
+    measures[5][1] = "0M00"
+    return join_measures(measures)
+
+
+@pytest.mark.parametrize("accuracy", [0.40, 0.80, 0.90, 1.0])
+def test_medidas_e_linhas_sao_preservadas(accuracy):
+    chart = mixed_chart()
+    generated, report = generate_local_chart(chart, stats(accuracy))
+    assert [len(rows) for rows in split_measures(generated)] == [len(rows) for rows in split_measures(chart)]
+    assert report["notes_after"] == count_notes(generated)
+    # Hold e mina ficam como estavam
+    assert split_measures(generated)[4][2] == "2000" and split_measures(generated)[4][6] == "3000"
+    assert split_measures(generated)[5][1] == "0M00"
+
+
+def test_reducao_nunca_passa_de_20_por_cento():
+    # 129 notas em jacks de semicolcheia: a limpeza sozinha pediria mais que o teto
+    rows = ["1000"] * 129 + ["0000"] * 15
+    chart = join_measures([rows[i:i + 16] for i in range(0, len(rows), 16)])
+    _, report = generate_local_chart(chart, stats(0.30))
+    assert report["notes_before"] == 129
+    assert report["removed"] == int(129 * MAX_REDUCTION) == 25
+    assert report["notes_after"] == 104
+
+
+def test_aumento_nunca_passa_de_15_por_cento():
+    # 33 notas, uma por medida: round(33 * 0.15) = 5 passaria do teto
+    chart = join_measures([["1000"] + ["0000"] * 7 for _ in range(33)])
+    _, report = generate_local_chart(chart, stats(1.0))
+    assert report["mode"] == "harder"
+    assert report["added"] == int(33 * MAX_INCREASE) == 4
+
+
+def test_jacks_sao_removidos_mesmo_com_pouca_reducao():
+    rows = ["1000", "1000", "0000", "0000", "0100", "0000", "0000", "0000",
+            "0010", "0000", "0000", "0000", "0001", "0000", "0000", "0000"]
+    generated, report = generate_local_chart(join_measures([rows] * 2), stats(0.85))
+    assert report["removed_jacks"] == 2
+    for measure in split_measures(generated):
+        assert measure[:2] == ["1000", "0000"]
+
+
+def test_alternancia_rapida_perde_uma_nota_a_cada_duas():
+    run = ["1000", "0100", "1000", "0100", "1000", "0100"]
+    rows = run + ["0000"] * 2 + ["0010"] + ["0000"] * 3 + ["0001"] + ["0000"] * 3
+    # Medidas de semínimas para o teto de 20% não limitar a limpeza
+    quarters = ["0010", "0000", "0000", "0000", "0001", "0000", "0000", "0000"] * 2
+    generated, report = generate_local_chart(join_measures([rows] + [quarters] * 6), stats(0.85))
+    assert report["removed_alternations"] == 3
+    assert split_measures(generated)[0][:6] == ["1000", "0000", "1000", "0000", "1000", "0000"]
+
+
+def test_geracao_e_deterministica_e_nao_altera_a_entrada():
+    chart = mixed_chart()
+    performance = stats(0.55)
+    before = performance.copy()
+    first = generate_local_chart(chart, performance)
+    second = generate_local_chart(chart, performance)
+    assert first == second
+    pd.testing.assert_frame_equal(performance, before)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Testes do pipeline de geração (PlayerStats_Modular.py): modo hedged,
+chaves de cache compartilhadas com o modo normal e geração especulativa.
+
+Uso:
+    python -m pytest -q test_player_stats_modular.py
+"""
+
+import pandas as pd
+import pytest
+
+import ai_providers
+import api_config
+import PlayerStats_Modular as psm
+from api_config import resolve_provider_config
+from chart_extractor import join_measures
+
+
+CHART = join_measures([["1000", "0000", "0100", "0000"] for _ in range(8)])
+RESPONSE = f"```\n{CHART}\n```"
+
+
+def performance_stats() -> pd.DataFrame:
+    return pd.DataFrame({"track": [0, 1, 2, 3], "judgment": ["W1 (Flawless)"] * 4, "count": [10] * 4})
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Cache e orçamento adaptativo ligados, com o cache numa pasta temporária"""
+    monkeypatch.setitem(api_config.CACHE_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.CACHE_CONFIG, "dir", str(tmp_path / "cache"))
+    monkeypatch.setitem(api_config.TOKEN_BUDGET_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", False)
+    return tmp_path / "cache"
+
+
+def test_hedged_usa_o_orcamento_e_a_chave_do_modo_normal(cache_dir, monkeypatch):
+    sent = {}
+
+    async def fake_hedged_generate(content, providers, validate, hedge_delay=0.0, max_tokens=None):
+        sent.update(max_tokens or {})
+        return "deepseek", RESPONSE
+
+    monkeypatch.setattr(ai_providers, "hedged_generate", fake_hedged_generate)
+    stats = performance_stats()
+    assert psm.call_ai_hedged(CHART, stats, ["deepseek"], use_cache=True) == RESPONSE
+
+    provider = resolve_provider_config("deepseek")
+    data_json = psm.build_ai_request_content(CHART, stats)
+    plan = psm.plan_request_budget(CHART, data_json, provider)
+    assert sent == {"deepseek": plan["max_tokens"]}
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("a resposta do hedged deveria estar no cache")
+
+    # O modo normal encontra no cache a resposta gravada pelo hedged
+    monkeypatch.setattr(ai_providers, "post_with_retry", no_network)
+    assert psm._generate_chart_improvement(CHART, stats, data_json, provider, use_cache=True) == RESPONSE
+
+
+def test_variantes_especulativas_usam_o_modo_da_execucao_e_esperam_o_primeiro_plano(cache_dir, monkeypatch):
+    generated = []
+
+    def fake_streaming(chart_data, performance_stats, use_cache=None, variant=None, provider=None):
+        generated.append((variant, use_cache))
+        return RESPONSE
+
+    monkeypatch.setattr(psm, "call_ai_streaming", fake_streaming)
+    monkeypatch.setitem(api_config.SPECULATIVE_CONFIG, "variants", ["easier", "harder"])
+    options = psm.RunOptions(stream=True, speculative=True, variant="primary", use_cache=False)
+
+    with psm._foreground_generation():
+        # Outra geração (streaming, sem single-flight) ainda em andamento
+        speculative = psm.start_speculative_variants(CHART, performance_stats(), options)
+        speculative.join(timeout=1.0)
+        assert speculative.is_alive() and generated == []
+    speculative.join(timeout=10)
+
+    assert generated == [("easier", True), ("harder", True)]
+    assert psm.foreground_count() == 0
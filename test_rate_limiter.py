@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Testes do limitador de taxa por provedor (rate_limiter.py): token bucket,
+concorrência, reação a 429 e limitador por host.
+
+Uso:
+    python -m pytest -q test_rate_limiter.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import api_config
+from mock_llm_server import run_benchmark
+from rate_limiter import (
+    TokenBucket, ProviderRateLimiter, estimate_payload_tokens, get_rate_limiter, set_rate_limiter,
+    THROTTLE_FACTOR
+)
+
+
+def test_bucket_esvazia_e_recarrega_na_taxa_por_minuto():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    for _ in range(60):
+        assert bucket.wait_time(1, now) == 0.0
+        bucket.take(1)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+
+
+def test_pedido_maior_que_a_capacidade_espera_o_bucket_cheio():
+    bucket = TokenBucket(per_minute=1000)
+    now = bucket.updated
+    assert bucket.wait_time(5000, now) == 0.0
+    bucket.take(5000)
+    assert bucket.level == 0.0
+
+
+def test_concorrencia_bloqueia_ate_a_vaga_ser_liberada():
+    limiter = ProviderRateLimiter("mock", rpm=0, tpm=0, concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.2)
+    limiter.release()
+    assert acquired.wait(2)
+    waiter.join()
+    limiter.release()
+
+
+def test_429_reduz_a_taxa_e_bloqueia_ate_o_retry_after():
+    limiter = ProviderRateLimiter("mock", rpm=600, tpm=0, concurrency=4)
+    limiter.on_throttle(retry_after=0.3)
+    assert limiter.scale == THROTTLE_FACTOR
+    # O bucket foi esvaziado: a próxima requisição espera o Retry-After e a recarga
+    assert limiter.acquire() >= 0.25
+    limiter.release()
+
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.scale == pytest.approx(THROTTLE_FACTOR + 0.15)
+    assert limiter._requests.scale == limiter.scale
+
+
+def test_estimativa_inclui_prompt_e_max_tokens():
+    payload = {"messages": [{"role": "user", "content": "x" * 4000}], "max_tokens": 500}
+    estimate = estimate_payload_tokens(payload)
+    assert 500 < estimate < 500 + 4000
+    assert estimate_payload_tokens(dict(payload, max_tokens=None, max_completion_tokens=800)) == estimate + 300
+
+
+def test_cada_host_tem_o_seu_limitador(monkeypatch):
+    monkeypatch.setitem(api_config.RATE_LIMIT_CONFIG, "enabled", True)
+    real = get_rate_limiter("claude", "modelo-teste", "https://api.anthropic.com/v1/messages")
+    mock = get_rate_limiter("claude", "modelo-teste", "http://127.0.0.1:8765/v1/messages")
+    assert real is not None and mock is not None and real is not mock
+    assert get_rate_limiter("claude", "modelo-teste", "https://api.anthropic.com/v1/messages") is real
+
+    set_rate_limiter("claude", "modelo-teste", "http://127.0.0.1:8765/v1/messages", None)
+    assert get_rate_limiter("claude", "modelo-teste", "http://127.0.0.1:8765/v1/messages") is None
+    assert get_rate_limiter("claude", "modelo-teste", "https://api.anthropic.com/v1/messages") is real
+
+
+def test_benchmark_do_servidor_simulado_ignora_a_cota(monkeypatch):
+    """Com TPM baixo, a vazão do bench não pode ser a da cota"""
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", False)
+    monkeypatch.setitem(api_config.RATE_LIMIT_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.RATE_LIMIT_CONFIG["providers"], "claude",
+                        {"rpm": 1, "tpm": 100, "concurrency": 1})
+    report = run_benchmark("claude", requests_count=8, concurrency=4, measures=4,
+                           latency="fixed:0", tokens_per_second=100000)
+    assert report["valid"] == 8
+    assert report["seconds"] < 5
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testes do trace de execução (run_trace.py): spans, etapas, anotações de
+várias threads e resumo.
+
+Uso:
+    python -m pytest -q test_run_trace.py
+"""
+
+import json
+import threading
+
+import pytest
+
+from run_trace import RunTrace
+
+
+@pytest.fixture
+def run(tmp_path):
+    trace = RunTrace("teste", str(tmp_path))
+    yield trace
+    if not trace._file.closed:
+        trace.close()
+
+
+def test_threads_auxiliares_somam_os_tokens_na_etapa(run):
+    run.stage("6.generate")
+    barrier = threading.Barrier(3)
+
+    def worker(tokens: int) -> None:
+        barrier.wait()
+        run.annotate(api="deepseek", prompt_tokens=tokens, completion_tokens=tokens * 2)
+
+    threads = [threading.Thread(target=worker, args=(tokens,)) for tokens in (100, 200, 300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    summary = run.close()
+    assert (summary["prompt_tokens"], summary["completion_tokens"]) == (600, 1200)
+    stage = [record for record in run.records if record["type"] == "stage"][0]
+    assert stage["api"] == "deepseek"
+
+
+def test_anotacao_vai_para_o_span_mais_interno_da_thread(run):
+    run.stage("6.generate")
+    with run.span("provider.call"):
+        with run.span("provider.post") as span:
+            span["request_bytes"] = 1000
+            run.annotate(prompt_tokens=50)
+        run.annotate(prompt_tokens=70, model="deepseek-chat")
+
+    summary = run.close()
+    assert summary["spans"]["provider.post"]["prompt_tokens"] == 50
+    assert summary["spans"]["provider.call"]["prompt_tokens"] == 70
+    assert (summary["prompt_tokens"], summary["request_bytes"]) == (120, 1000)
+
+
+def test_span_com_erro_e_gravado_no_arquivo(run):
+    run.stage("1.load")
+    with pytest.raises(ValueError):
+        with run.span("parse"):
+            raise ValueError("replay inválido")
+    run.event("cache", hit=True)
+    summary = run.close()
+
+    with open(run.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    span = next(record for record in records if record["name"] == "parse")
+    assert span["status"] == "error" and span["error"] == "ValueError: replay inválido"
+    assert records[-1]["type"] == "summary"
+    assert summary["spans"]["parse"]["errors"] == 1
+    assert summary["cache_hits"] == 1
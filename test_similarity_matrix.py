@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Testes do modo matriz dos comparadores (similarity_matrix.py): charts de
+uma pasta e de um arquivo de resultados do lote, densidade (NPS) e
+orientação dos pares.
+
+Uso:
+    python -m pytest -q test_similarity_matrix.py
+"""
+
+import json
+import os
+
+import pytest
+
+from chart_extractor import join_measures, learn_mode_path
+from chart_similarity import chart_events
+from similarity_matrix import collect_charts, nps_summary, compute_similarity_matrix
+
+
+# 4 medidas de semínimas, colcheias e semicolcheias na mesma trilha (2, 4 e 8 nps a 120 BPM)
+QUARTERS = [["1000"] * 4] * 4
+EIGHTHS = [["1000"] * 8] * 4
+SIXTEENTHS = [["1000"] * 16] * 4
+
+
+def write_sm(path, charts: dict) -> str:
+    """Arquivo .sm a 120 BPM com um bloco #NOTES por dificuldade"""
+    blocks = "".join(
+        f"#NOTES:\n     dance-single:\n     Autor:\n     {difficulty}:\n     5:\n     0,0,0,0,0:\n"
+        + join_measures(measures) + "\n"
+        for difficulty, measures in charts.items()
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("#TITLE:Teste;\n#BPMS:0.000=120.000;\n" + blocks, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def song(tmp_path):
+    """Pasta com o original (Hard e Easy) e a variante LearnMode do Hard"""
+    original = write_sm(tmp_path / "song" / "Song.sm", {"Hard": EIGHTHS, "Easy": QUARTERS})
+    # A variante copia o arquivo inteiro; só o Hard foi gerado
+    variant = write_sm(tmp_path / "song" / "Song_Hard_LearnMode.sm", {"Hard": SIXTEENTHS, "Easy": QUARTERS})
+    assert learn_mode_path(original, "Hard") == variant
+    return original, variant
+
+
+def labels(charts: list) -> list:
+    return [(chart["label"], chart["generated"]) for chart in charts]
+
+
+def test_pasta_traz_todas_as_dificuldades_e_so_a_gerada_da_variante(song):
+    original, variant = song
+    charts = collect_charts([os.path.dirname(original)])
+    assert labels(charts) == [
+        ("Song.sm [Hard (Autor)]", False),
+        ("Song.sm [Easy (Autor)]", False),
+        ("Song_Hard_LearnMode.sm [Hard (Autor)]", True),
+    ]
+
+
+def test_resultados_do_lote_trazem_original_e_saida(song, tmp_path):
+    original, variant = song
+    results = tmp_path / "batch_results.jsonl"
+    results.write_text("\n".join(json.dumps(record) for record in [
+        {"id": "a", "status": "ok", "sm_path": original, "difficulty": "Hard", "output": variant},
+        {"id": "b", "status": "error", "sm_path": original, "difficulty": "Easy"},
+    ]) + "\n", encoding="utf-8")
+    charts = collect_charts([str(results)])
+    assert labels(charts) == [("Song.sm [Hard (Autor)]", False), ("Song_Hard_LearnMode.sm [Hard (Autor)]", True)]
+
+    # A mesma dificuldade vinda de duas fontes aparece uma vez só
+    assert len(collect_charts([str(results), original])) == 3
+
+
+def test_nps_conta_so_notas_e_acordes():
+    # Mina e fim de hold não contam; o acorde conta como duas notas
+    measures = [["1001", "0000", "2000", "0000", "3000", "0000", "0M00", "0000"]] + EIGHTHS[1:]
+    summary = nps_summary(chart_events(join_measures(measures), {0.0: 120.0}))
+    assert summary["notes"] == 2 + 1 + 3 * 8
+    assert summary["peak_nps"] == 4
+    # Primeira nota em 0s, última em 7.75s
+    assert summary["mean_nps"] == round(27 / 7.75, 2)
+    assert nps_summary(chart_events(join_measures([["0000"] * 4]))) == {"notes": 0, "mean_nps": 0.0, "peak_nps": 0}
+
+
+def test_delta_de_nps_e_da_variante_em_relacao_ao_original(song):
+    charts = collect_charts([song[1], song[0]])
+    assert labels(charts)[0] == ("Song_Hard_LearnMode.sm [Hard (Autor)]", True)
+
+    pairs = compute_similarity_matrix(charts, workers=1, variants_only=True)
+    assert [(charts[p["i"]]["label"], charts[p["j"]]["label"]) for p in pairs] == [
+        ("Song.sm [Hard (Autor)]", "Song_Hard_LearnMode.sm [Hard (Autor)]"),
+        ("Song.sm [Easy (Autor)]", "Song_Hard_LearnMode.sm [Hard (Autor)]"),
+    ]
+    hard = pairs[0]
+    # Semicolcheias (8 nps) contra colcheias (4 nps): o delta é variante - original
+    assert (hard["notes_i"], hard["notes_j"]) == (32, 64)
+    assert hard["nps_delta"] == pytest.approx(4.0, abs=0.05) and hard["peak_nps_delta"] == 4
+    # Todas as colcheias do original continuam na variante
+    assert hard["recall"] == 1.0 and hard["precision"] == 0.5
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes da deduplicação de requisições em andamento (single_flight.py),
+no mesmo processo e entre processos.
+
+Uso:
+    python -m pytest -q test_single_flight.py
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from single_flight import single_flight, in_flight_count
+
+
+def run_concurrently(count: int, target) -> list:
+    results = [None] * count
+
+    def worker(index: int) -> None:
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_chamadas_identicas_simultaneas_fazem_uma_so_requisicao():
+    calls = []
+
+    def compute() -> str:
+        calls.append(1)
+        time.sleep(0.3)
+        return "resposta"
+
+    results = run_concurrently(5, lambda: single_flight("chave-a", compute, lock_dir=None))
+    assert results == ["resposta"] * 5
+    assert len(calls) == 1
+    assert in_flight_count() == 0
+    # Terminada a líder, a próxima chamada vai de novo à API
+    assert single_flight("chave-a", compute, lock_dir=None) == "resposta"
+    assert len(calls) == 2
+
+
+def test_erro_da_lider_e_repassado_as_seguidoras():
+    def compute() -> str:
+        time.sleep(0.3)
+        raise TimeoutError("API fora do ar")
+
+    results = run_concurrently(3, lambda: single_flight("chave-b", compute, lock_dir=None))
+    assert all(isinstance(result, TimeoutError) for result in results)
+
+
+def test_espera_o_resultado_de_outro_processo(tmp_path):
+    lock = tmp_path / "chave-c.lock"
+    lock.write_text(json.dumps({"pid": 0}))
+
+    def other_process_finishes() -> None:
+        time.sleep(0.3)
+        (tmp_path / "chave-c.result.json").write_text(
+            json.dumps({"key": "chave-c", "finished": time.time(), "result": "do outro processo"})
+        )
+        os.remove(lock)
+
+    threading.Thread(target=other_process_finishes).start()
+    result = single_flight("chave-c", lambda: pytest.fail("não deveria chamar a API"),
+                           lock_dir=str(tmp_path), poll_interval=0.05)
+    assert result == "do outro processo"
+
+
+def test_trava_abandonada_e_descartada(tmp_path):
+    lock = tmp_path / "chave-d.lock"
+    lock.write_text(json.dumps({"pid": 0}))
+    old = time.time() - 120
+    os.utime(lock, (old, old))
+
+    assert single_flight("chave-d", lambda: "nova", lock_dir=str(tmp_path), stale_seconds=30) == "nova"
+    assert not lock.exists()
+    # O resultado fica para os processos que estavam esperando
+    assert json.loads((tmp_path / "chave-d.result.json").read_text())["result"] == "nova"
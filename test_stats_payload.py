@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Testes do resumo de performance enviado à IA (stats_payload.py): forma
+fixa para qualquer tamanho de replay e replays sem perfil por medida.
+
+Uso:
+    python -m pytest -q test_stats_payload.py
+"""
+
+import json
+import random
+
+import pandas as pd
+
+from replay_extractor import analyze_performance, ROWS_PER_MEASURE
+from stats_payload import build_stats_payload, JUDGMENT_SHORT_NAMES
+
+
+MEASURES = 32
+
+
+def replay(notes: int, seed: int = 1) -> pd.DataFrame:
+    """Replay sintético no formato de parse_replay_data, espalhado por MEASURES medidas"""
+    rng = random.Random(seed)
+    rows = sorted(rng.randrange(MEASURES * ROWS_PER_MEASURE) for _ in range(notes - 1)) + [
+        MEASURES * ROWS_PER_MEASURE - 1]
+    return pd.DataFrame({
+        "row": rows,
+        "offset": [rng.gauss(0, 0.05) for _ in rows],
+        "track": [rng.randrange(4) for _ in rows],
+    })
+
+
+def shape(payload: dict) -> dict:
+    return {key: len(value) if isinstance(value, list) else type(value).__name__
+            for key, value in payload.items()}
+
+
+def test_forma_nao_depende_do_tamanho_do_replay():
+    small = build_stats_payload(analyze_performance(replay(60))["performance_stats"])
+    large = build_stats_payload(analyze_performance(replay(6000, seed=2))["performance_stats"])
+    assert shape(small) == shape(large)
+    assert small["judgments"] == JUDGMENT_SHORT_NAMES
+    assert len(small["lane_histogram"]) == 4 and all(len(row) == 6 for row in small["lane_histogram"])
+    assert len(large["measure_errors"]) == MEASURES
+    # O tamanho do JSON só cresce com os dígitos das contagens
+    assert len(json.dumps(large)) - len(json.dumps(small)) < 4 * MEASURES
+    assert sum(map(sum, large["lane_histogram"])) == 6000
+
+
+def test_acuracia_por_trilha_e_geral():
+    stats = pd.DataFrame({
+        "track": [0, 0, 1, 1, 2],
+        "judgment": ["W1 (Flawless)", "Miss", "W2 (Perfect)", "W3 (Great)", "W1 (Flawless)"],
+        "count": [3, 1, 1, 1, 4],
+    })
+    payload = build_stats_payload(stats)
+    assert payload["lane_accuracy"] == [0.75, 0.5, 1.0, 0.0]
+    assert payload["overall_accuracy"] == 0.8
+    assert payload["lane_histogram"][0] == [3, 0, 0, 0, 0, 1]
+
+
+def test_sem_perfil_por_medida_envia_o_resto():
+    stats = analyze_performance(replay(200))["performance_stats"]
+    with_profile = build_stats_payload(stats)
+    # Estatísticas montadas fora de analyze_performance não têm attrs["measure_profile"]
+    without_profile = build_stats_payload(pd.DataFrame(stats.to_dict("list")))
+    assert without_profile["measure_errors"] == [] and without_profile["measure_offset"] == 0
+    assert build_stats_payload(pd.DataFrame(stats.to_dict("list")), measure_range=(8, 16))["measure_errors"] == []
+    for key in ("lane_histogram", "lane_accuracy", "overall_accuracy"):
+        assert without_profile[key] == with_profile[key]
+
+
+def test_intervalo_de_medidas_da_geracao_em_partes():
+    stats = analyze_performance(replay(500))["performance_stats"]
+    errors = stats.attrs["measure_profile"]["errors"]
+    payload = build_stats_payload(stats, measure_range=(8, 16))
+    assert payload["measure_offset"] == 8
+    assert payload["measure_errors"] == errors[8:16]
+
+
+def test_trilhas_extras_ampliam_o_histograma():
+    stats = pd.DataFrame({"track": [0, 5], "judgment": ["W1 (Flawless)", "Miss"], "count": [2, 1]})
+    payload = build_stats_payload(stats)
+    assert payload["lanes"] == ["←", "↓", "↑", "→", "4", "5"]
+    assert payload["lane_histogram"][5] == [0, 0, 0, 0, 0, 1]
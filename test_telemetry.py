@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Testes da telemetria (telemetry.py): registro das chamadas, anotação da
+validação pelos ids coletados e estatísticas por modelo.
+
+Uso:
+    python -m pytest -q test_telemetry.py
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import api_config
+from telemetry import record_call, record_validation, track_calls, model_stats
+
+
+@pytest.fixture
+def telemetry_db(tmp_path, monkeypatch):
+    """Telemetria ligada, gravando num banco temporário"""
+    db = str(tmp_path / "telemetry.sqlite3")
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "enabled", True)
+    monkeypatch.setitem(api_config.TELEMETRY_CONFIG, "db", db)
+    return db
+
+
+def _valid_column(db: str) -> dict:
+    with sqlite3.connect(db) as connection:
+        return dict(connection.execute("SELECT id, valid FROM calls").fetchall())
+
+
+def test_track_calls_coleta_so_as_chamadas_do_bloco(telemetry_db):
+    before = record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+    with track_calls() as call_ids:
+        inside = record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+    after = record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+
+    assert call_ids == [inside]
+    record_validation(call_ids, True)
+    assert _valid_column(telemetry_db) == {before: None, inside: 1, after: None}
+
+
+def test_track_calls_inclui_asyncio_to_thread(telemetry_db):
+    """Chamadas das partes (asyncio.run + to_thread) entram no coletor de quem chamou"""
+    async def run_chunks():
+        return await asyncio.gather(*(
+            asyncio.to_thread(record_call, "openai", "gpt-4o-mini", 1.0, 1000, 200, True, "chunk")
+            for _ in range(3)
+        ))
+
+    with track_calls() as call_ids:
+        chunk_ids = asyncio.run(run_chunks())
+    assert sorted(call_ids) == sorted(chunk_ids)
+
+
+def test_track_calls_ignora_outras_threads(telemetry_db):
+    """Uma thread em segundo plano (ex.: variantes especulativas) não anota a chamada principal"""
+    with track_calls() as call_ids:
+        background = threading.Thread(target=record_call, args=("claude", "claude-3-5-haiku", 1.0, 1000, 200))
+        background.start()
+        background.join()
+        main_id = record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+    assert call_ids == [main_id]
+
+
+def test_resposta_do_cache_nao_anota_chamada_antiga(telemetry_db):
+    old = record_call("deepseek", "deepseek-chat", 1.0, 1000, 200)
+    with track_calls() as call_ids:
+        pass  # resposta servida do cache: nenhuma chamada registrada
+    record_validation(call_ids, False)
+    assert _valid_column(telemetry_db) == {old: None}
+
+
+def test_model_stats_usa_validacao_e_falhas(telemetry_db):
+    with track_calls() as ok_ids:
+        record_call("deepseek", "deepseek-chat", 2.0, 1000, 200)
+        record_call("deepseek", "deepseek-chat", 4.0, 1000, 200)
+    record_validation(ok_ids, True)
+    record_call("deepseek", "deepseek-chat", 9.0, 1000, 0, ok=False, error="Timeout")
+
+    [row] = model_stats()
+    assert row["calls"] == 3
+    assert row["judged"] == 3
+    assert row["validity"] == pytest.approx(2 / 3, abs=0.001)
+    # Latência só das chamadas bem-sucedidas
+    assert row["p95"] == 4.0
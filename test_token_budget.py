@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Testes do orçamento adaptativo de tokens (token_budget.py e a
+configuração em api_config.py).
+
+Uso:
+    python -m pytest -q test_token_budget.py
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from token_budget import plan_token_budget
+
+
+LIMITS = {"context": 64000, "max_output": 8192}
+
+
+def test_desligado_por_padrao(tmp_path):
+    """Sem ADAPTIVE_MAX_TOKENS no ambiente nem no .env, as requisições não mudam"""
+    env = {name: value for name, value in os.environ.items() if name != "ADAPTIVE_MAX_TOKENS"}
+    env["PYTHONPATH"] = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", "import api_config; print(api_config.get_token_budget_config()['enabled'])"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "False"
+
+
+def test_resposta_que_cabe_usa_a_estimativa_com_folga():
+    plan = plan_token_budget(1200, 2000, "deepseek-chat", LIMITS, margin=1.25)
+    assert (plan["strategy"], plan["model"], plan["max_tokens"]) == ("single", "deepseek-chat", 2500)
+    assert plan_token_budget(100, 100, "deepseek-chat", LIMITS, min_tokens=512)["max_tokens"] == 512
+
+
+def test_troca_de_modelo_quando_permitida():
+    alternatives = {"deepseek-math": {"context": 4096, "max_output": 4096},
+                    "deepseek-big": {"context": 128000, "max_output": 32000}}
+    plan = plan_token_budget(1200, 9000, "deepseek-chat", LIMITS, alternatives=alternatives)
+    assert (plan["strategy"], plan["model"], plan["max_tokens"]) == ("switch_model", "deepseek-big", 11250)
+
+
+@pytest.mark.parametrize("completion, chunks", [(9000, 2), (20000, 4)])
+def test_resposta_grande_demais_e_dividida_em_partes(completion, chunks):
+    plan = plan_token_budget(1200, completion, "deepseek-chat", LIMITS, total_measures=120)
+    assert plan["strategy"] == "chunked"
+    assert plan["measures_per_chunk"] == 120 // chunks
+    assert plan["max_tokens"] <= LIMITS["max_output"]
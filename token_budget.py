@@ -0,0 +1,137 @@
+"""
+Token Budget Module
+
+Este módulo contém o estimador de tokens das requisições à IA e o
+planejamento do orçamento de cada chamada: a partir do número de linhas e
+medidas do chart (e do formato do prompt) estima os tokens do prompt e da
+resposta, define o max_tokens da requisição e decide entre uma chamada
+única, outro modelo da mesma API ou a geração em partes.
+
+As estimativas são heurísticas (sem tokenizer do provedor) e calibradas
+para o pior caso comum: linhas "0000" viram cerca de 2 tokens cada.
+
+Author: Generated for StepMania Analysis
+"""
+
+import math
+from typing import Dict, Any, Optional
+
+from chart_extractor import split_measures
+from chart_encoding import encode_measures
+
+
+# Caracteres por token em JSON/texto (instruções em português, stats)
+CHARS_PER_TOKEN_TEXT = 3.5
+# Uma linha "0000" + quebra de linha
+TOKENS_PER_ROW = 2.0
+# Uma linha "," + quebra de linha
+TOKENS_PER_SEPARATOR = 2.0
+# Formato compacto: dígitos e símbolos tokenizam pior que texto comum
+CHARS_PER_TOKEN_ENCODED = 2.5
+# Bloco de código e a lista opcional de mudanças fora dele
+RESPONSE_OVERHEAD_TOKENS = 300
+# A IA pode aumentar a densidade em até 15%, o que alonga o formato compacto
+DENSITY_HEADROOM = 1.15
+
+
+def estimate_prompt_tokens(content: str) -> int:
+    """
+    Estima os tokens do conteúdo enviado à IA.
+
+    Args:
+        content (str): Conteúdo da mensagem (JSON com chart, stats e instruções)
+
+    Returns:
+        int: Tokens estimados
+
+    Example:
+        >>> estimate_prompt_tokens("x" * 3500)
+        1000
+    """
+    return math.ceil(len(content) / CHARS_PER_TOKEN_TEXT)
+
+
+def estimate_completion_tokens(chart_data: str, encoding: str = "raw") -> int:
+    """
+    Estima os tokens da resposta com o chart completo.
+
+    Args:
+        chart_data (str): Chart original no formato SM
+        encoding (str): Formato da resposta ("raw" ou "compact")
+
+    Returns:
+        int: Tokens estimados da resposta
+
+    Example:
+        >>> estimate_completion_tokens(chart_data)
+        2450
+    """
+    measures = split_measures(chart_data)
+    if encoding == "compact":
+        encoded_chars = len(encode_measures(measures)) * DENSITY_HEADROOM
+        return math.ceil(encoded_chars / CHARS_PER_TOKEN_ENCODED) + RESPONSE_OVERHEAD_TOKENS
+
+    rows = sum(len(rows) for rows in measures)
+    return math.ceil(rows * TOKENS_PER_ROW + len(measures) * TOKENS_PER_SEPARATOR) + RESPONSE_OVERHEAD_TOKENS
+
+
+def plan_token_budget(prompt_tokens: int, completion_tokens: int, model: str,
+                      limits: Dict[str, int], margin: float = 1.25, min_tokens: int = 512,
+                      alternatives: Optional[Dict[str, Dict[str, int]]] = None,
+                      total_measures: int = 0) -> Dict[str, Any]:
+    """
+    Decide max_tokens e a estratégia de geração para uma requisição.
+
+    Args:
+        prompt_tokens (int): Tokens estimados do prompt
+        completion_tokens (int): Tokens estimados da resposta
+        model (str): Modelo configurado
+        limits (Dict[str, int]): Limites do modelo ({"context", "max_output"})
+        margin (float): Folga multiplicativa sobre a estimativa da resposta
+        min_tokens (int): Menor max_tokens enviado
+        alternatives (Optional[Dict[str, Dict[str, int]]]): Outros modelos da
+            mesma API que podem ser usados, com seus limites
+        total_measures (int): Medidas do chart (para dimensionar as partes)
+
+    Returns:
+        Dict[str, Any]: Plano com strategy ("single", "switch_model" ou
+            "chunked"), model, max_tokens, estimativas e, no modo em partes,
+            measures_per_chunk
+
+    Example:
+        >>> plan = plan_token_budget(1200, 9000, "deepseek-chat",
+        ...                          {"context": 64000, "max_output": 8192},
+        ...                          total_measures=120)
+        >>> plan["strategy"], plan["measures_per_chunk"]
+        ('chunked', 60)
+    """
+    needed = max(min_tokens, math.ceil(completion_tokens * margin))
+    plan = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "model": model,
+        "max_tokens": needed,
+        "strategy": "single"
+    }
+
+    def fits(model_limits: Dict[str, int]) -> bool:
+        return (needed <= model_limits["max_output"]
+                and prompt_tokens + needed <= model_limits["context"])
+
+    if fits(limits):
+        return plan
+
+    for alt_model, alt_limits in (alternatives or {}).items():
+        if alt_model != model and fits(alt_limits):
+            plan["strategy"] = "switch_model"
+            plan["model"] = alt_model
+            return plan
+
+    # Nem o modelo nem as alternativas comportam a resposta: divide em partes
+    # que usem no máximo 80% da saída disponível
+    usable = int(min(limits["max_output"], max(limits["context"] - prompt_tokens, 0)) * 0.8)
+    chunks = max(2, math.ceil(needed / max(usable, 1)))
+    plan["strategy"] = "chunked"
+    plan["max_tokens"] = min(limits["max_output"], max(min_tokens, math.ceil(needed / chunks)))
+    plan["measures_per_chunk"] = max(1, math.ceil(total_measures / chunks)) if total_measures else 0
+    return plan